@@ -1,69 +1,61 @@
 from flask import Flask, render_template, request, redirect, url_for, flash
-import psycopg2
-from datetime import datetime, timedelta
-import os
-import pytz
+from markupsafe import Markup
+from datetime import datetime
 
 # SEGURIDAD Y LOGIN
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user, UserMixin
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import check_password_hash
 from dotenv import load_dotenv
+from cache_usuarios import obtener_usuario
+from limite_login import configurar_backend, verificar_intento, registrar_fallo, registrar_exito
+import auditoria
+import cache_fragmentos
+import compresion
+import consultas_lentas
+import db
+import instantanea_pizarra
+import metricas
+import repositorio
+import terminales
+from db import obtener_conexion
+from limite_login import obtener_contadores as contadores_login
+from config import Config
+from repositorio import obtener_repositorio, SinConexion
 
 # --- 1. IMPORTACIÓN DE BLUEPRINTS ---
 from rutas_admin import admin_bp          
 from rutas_recorridos import usuario_bp   
 from rutas_operador import operador_bp
 
-load_dotenv()
-
-app = Flask(__name__)
-# SEGURIDAD: Solo usa el .env
-app.secret_key = os.getenv("SECRET_KEY") 
-
-# --- 2. REGISTRO DE BLUEPRINTS ---
-app.register_blueprint(admin_bp)
-app.register_blueprint(usuario_bp)
-app.register_blueprint(operador_bp)
-
-# --- 3. CONFIGURACIÓN LOGIN ---
+# --- 2. CONFIGURACIÓN LOGIN ---
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login' 
 
 login_manager.login_message = "Por favor, inicie sesión para ingresar."
 login_manager.login_message_category = "warning"
 
 class User(UserMixin):
-    def __init__(self, id, username, password, rol):
+    def __init__(self, id, username, password, rol, terminal_id):
         self.id = id
         self.username = username
         self.password = password
         self.rol = rol
+        self.terminal_id = terminal_id
 
-def obtener_conexion():
-    try:
-        return psycopg2.connect(
-            host=os.getenv("DB_HOST"),
-            database=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASS"),
-            port=os.getenv("DB_PORT", "5432")
-        )
-    except Exception as e:
-        print(f"Error conexión DB: {e}")
-        return None
+def cargar_usuario_db(user_id):
+    return obtener_repositorio().usuario_por_id(user_id)
 
 @login_manager.user_loader
 def load_user(user_id):
-    conn = obtener_conexion()
-    if conn:
-        cur = conn.cursor()
-        cur.execute("SELECT id, username, password, rol FROM usuarios WHERE id = %s", (user_id,))
-        user_data = cur.fetchone()
-        cur.close()
-        conn.close()
-        if user_data:
-            return User(user_data[0], user_data[1], user_data[2], user_data[3])
+    # Caché en memoria con TTL; se invalida al editar, desactivar o eliminar usuarios
+    try:
+        user_data = obtener_usuario(user_id, cargar_usuario_db)
+    except RuntimeError:
+        return None
+    # Una cuenta desactivada pierde la sesión en la siguiente petición
+    if user_data and user_data[4]:
+        return User(user_data[0], user_data[1], user_data[2], user_data[3], user_data[5])
     return None
 
 
@@ -71,130 +63,175 @@ def load_user(user_id):
 # RUTA PÚBLICA (PANTALLA TV) - LÓGICA CONTINUIDAD MADRUGADA
 
 
-def obtener_datos_filtrados(tabla):
-    conn = obtener_conexion()
-    if not conn: return []
-
-    cur = conn.cursor()
-
-    # ZONA HORARIA PUNTA ARENAS (GMT-3)
-    tz_chile = pytz.timezone('America/Punta_Arenas')
-    ahora_chile = datetime.now(tz_chile)
-
-    fecha_hoy    = ahora_chile.strftime('%Y-%m-%d')
-    fecha_manana = (ahora_chile + timedelta(days=1)).strftime('%Y-%m-%d')
-
-    # FILTRO: mostrar desde 2 horas antes de la hora actual
-    hace_dos_horas = ahora_chile - timedelta(hours=2)
-    fecha_limite   = hace_dos_horas.strftime('%Y-%m-%d')
-    hora_limite    = hace_dos_horas.strftime('%H:%M:%S')
-
-    # Si hace 2 horas era ayer (madrugada 00:00-01:59), mostramos todo el día sin filtrar hora
-    if fecha_limite < fecha_hoy:
-        sql = f"""
-            SELECT id, hora, empresa_nombre, lugar, anden, fecha, estado 
-            FROM {tabla}
-            WHERE fecha = %s
-               OR (fecha = %s AND hora <= '04:00:00')
-            ORDER BY fecha ASC, hora ASC
-        """
-        cur.execute(sql, (fecha_hoy, fecha_manana))
-    else:
-        # Caso normal: hoy desde hora_limite en adelante + madrugada de mañana
-        sql = f"""
-            SELECT id, hora, empresa_nombre, lugar, anden, fecha, estado 
-            FROM {tabla}
-            WHERE (fecha = %s AND hora >= %s)
-               OR (fecha = %s AND hora <= '04:00:00')
-            ORDER BY fecha ASC, hora ASC
-        """
-        cur.execute(sql, (fecha_hoy, hora_limite, fecha_manana))
-
-    datos = cur.fetchall()
-
-    cur.close()
-    conn.close()
-    return datos
-
-@app.route('/pantalla')
+def ventana_pizarra(terminal):
+    """(fecha_hoy, fecha_manana, hora_limite) de la pantalla en la hora local del terminal."""
+    return repositorio.ventana_pizarra(datetime.now(terminal.zona))
+
+def renderizar_filas_pizarra(pizarra):
+    return (Markup(render_template('_filas_pizarra.html', filas=pizarra['salidas'], tipo='salida')),
+            Markup(render_template('_filas_pizarra.html', filas=pizarra['llegadas'], tipo='llegada')))
+
 def inicio():
-    # Obtenemos los buses con la nueva lógica (Hoy + Madrugada siguiente)
-    llegadas = obtener_datos_filtrados('import_llegadas')
-    salidas = obtener_datos_filtrados('import_salidas')
-    
-    noticias = []
-    conn = obtener_conexion()
-    if conn:
-        cur = conn.cursor()
-        # Solo traemos las noticias donde activa = TRUE
-        cur.execute("SELECT contenido FROM noticias WHERE activa = TRUE ORDER BY id DESC")
-        noticias = [row[0] for row in cur.fetchall()]
-        cur.close()
-        conn.close()
+    repo = obtener_repositorio()
+    terminal = terminales.terminal_publico()
+    ventana = ventana_pizarra(terminal)
+    instantanea_pizarra.iniciar()
+
+    # Con el escritor de instantáneas vivo la pantalla sale del disco, sin
+    # consultar la base (ver instantanea_pizarra.py)
+    instantanea = instantanea_pizarra.vigente(terminal.id)
+    if instantanea is None:
+        # Filas (Hoy + Madrugada siguiente) y noticias activas del terminal desde la
+        # caché de fragmentos: solo se consulta y renderiza de nuevo si cambiaron los datos
+        try:
+            version_recorridos = cache_fragmentos.version(repo, terminal.id, 'import_llegadas', 'import_salidas')
+            version_noticias = cache_fragmentos.version(repo, terminal.id, 'noticias')
+            filas_salidas, filas_llegadas = cache_fragmentos.obtener(
+                terminal.id, ('pizarra', version_recorridos) + ventana,
+                lambda: renderizar_filas_pizarra(repo.pizarra(terminal.id, *ventana)))
+            noticias = cache_fragmentos.obtener(terminal.id, ('noticias', version_noticias),
+                                                lambda: repo.noticias_activas(terminal.id))
+        except SinConexion:
+            # Sin base: la última instantánea guardada, si hay
+            instantanea = instantanea_pizarra.leer(terminal.id)
+            if instantanea is None:
+                filas_salidas, filas_llegadas = renderizar_filas_pizarra({'llegadas': [], 'salidas': []})
+                noticias = []
+
+    datos_desde = None
+    if instantanea is not None:
+        # Misma llave que las filas leídas de la base: una versión de los datos, un HTML
+        filas_salidas, filas_llegadas = cache_fragmentos.obtener(
+            terminal.id, ('pizarra', instantanea_pizarra.version_recorridos(instantanea)) + ventana,
+            lambda: renderizar_filas_pizarra(instantanea_pizarra.filtrar(instantanea.pizarra, *ventana)))
+        noticias = instantanea.noticias
+        datos_desde = instantanea_pizarra.aviso(instantanea, terminal.zona)
 
     if not noticias:
-        noticias = ["Bienvenido al Terminal de Buses de Coyhaique"]
+        noticias = [terminal.bienvenida]
 
-    # Hora del servidor en Punta Arenas para el reloj del frontend
-    tz_chile = pytz.timezone('America/Punta_Arenas')
-    ahora_servidor = datetime.now(tz_chile)
+    # Hora del servidor en la zona del terminal para el reloj del frontend
+    ahora_servidor = datetime.now(terminal.zona)
     hora_servidor_iso = ahora_servidor.strftime('%Y-%m-%dT%H:%M:%S')
 
     return render_template('index.html', 
-                           llegadas=llegadas, 
-                           salidas=salidas, 
+                           terminal=terminal,
+                           filas_salidas=filas_salidas, 
+                           filas_llegadas=filas_llegadas, 
                            noticias_db=noticias,
+                           datos_desde=datos_desde,
                            hora_servidor=hora_servidor_iso)
 
 
-@app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         # 1. Recibimos 'rut' en lugar de 'username' del formulario HTML
         rut_ingresado = request.form['rut'] 
         clave = request.form['password']
+        ip_cliente = request.remote_addr
+
+        # Rechazamos antes de consultar la BD y de calcular el hash (costoso)
+        permitido, espera = verificar_intento(rut_ingresado, ip_cliente)
+        if not permitido:
+            flash(f'Demasiados intentos. Espere {espera} segundos antes de volver a intentar.', 'danger')
+            return render_template('login.html'), 429
         
-        conn = obtener_conexion()
-        if conn:
-            cur = conn.cursor()
-            
-            # 2. Buscamos por RUT en el WHERE
-            # (Seguimos trayendo el username en el SELECT para mostrarlo después)
-            cur.execute("SELECT id, username, password, rol, activo, rut FROM usuarios WHERE rut = %s", (rut_ingresado,))
-            user_data = cur.fetchone()
-            cur.close()
-            conn.close()
-
-            if user_data:
-                # user_data[4] es 'activo'
-                if not user_data[4]: 
-                    flash('Tu cuenta ha sido desactivada.', 'danger')
-                    return render_template('login.html')
-
-                # user_data[2] es la contraseña hash
-                if check_password_hash(user_data[2], clave):
-                    # Creamos la sesión. Nota: user_data[1] sigue siendo el NOMBRE para mostrar
-                    user_obj = User(user_data[0], user_data[1], user_data[2], user_data[3])
-                    login_user(user_obj)
-                    
-                    if user_obj.rol == 'operador':
-                        return redirect(url_for('operador_bp.panel_operador'))
-                    elif user_obj.rol == 'admin':
-                        return redirect(url_for('admin_bp.admin_panel'))
-                    else:
-                        return redirect(url_for('usuario_bp.dashboard')) 
+        # Buscamos por RUT (el username se trae para mostrarlo después)
+        try:
+            user_data = obtener_repositorio().usuario_por_rut(rut_ingresado)
+        except SinConexion:
+            return render_template('login.html')
+
+        if user_data:
+            # user_data[4] es 'activo'
+            if not user_data[4]: 
+                flash('Tu cuenta ha sido desactivada.', 'danger')
+                return render_template('login.html')
+
+            # user_data[2] es la contraseña hash
+            if check_password_hash(user_data[2], clave):
+                registrar_exito(rut_ingresado, ip_cliente)
+                # Creamos la sesión. Nota: user_data[1] sigue siendo el NOMBRE para mostrar
+                user_obj = User(user_data[0], user_data[1], user_data[2], user_data[3], user_data[6])
+                login_user(user_obj)
+                
+                if user_obj.rol == 'operador':
+                    return redirect(url_for('operador_bp.panel_operador'))
+                elif user_obj.rol == 'admin':
+                    return redirect(url_for('admin_bp.admin_panel'))
                 else:
-                    flash('RUT o contraseña incorrectos', 'danger')
+                    return redirect(url_for('usuario_bp.dashboard')) 
             else:
+                registrar_fallo(rut_ingresado, ip_cliente)
                 flash('RUT o contraseña incorrectos', 'danger')
+        else:
+            registrar_fallo(rut_ingresado, ip_cliente)
+            flash('RUT o contraseña incorrectos', 'danger')
     return render_template('login.html')
 
-@app.route('/logout')
 @login_required
 def logout():
     logout_user()
     flash('Sesión cerrada.', 'success')
     return redirect(url_for('login'))
 
+
+# --- 3. FÁBRICA DE LA APLICACIÓN ---
+def create_app(config=None):
+    """
+    Construye la app. 'config' (dict u objeto con atributos en mayúsculas)
+    sobreescribe lo que viene del .env. En producción se usa desde wsgi.py.
+    """
+    load_dotenv()
+
+    app = Flask(__name__)
+    app.config.from_object(Config())
+    if isinstance(config, dict):
+        app.config.from_mapping(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    # Detrás de nginx todas las peticiones llegan desde 127.0.0.1: el límite de
+    # login por IP y /metrics necesitan la IP real del cliente
+    if app.config['PROXY_SALTOS']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_SALTOS'])
+
+    # El pool se crea por proceso al primer uso (o en post_fork con gunicorn)
+    db.configurar(app.config)
+    # Capa de datos de pantalla, dashboard, operador e importación (Postgres o SQLite)
+    repositorio.configurar(app.config)
+    app.teardown_request(lambda _exc: db.liberar_pendientes())
+
+    # Latencia, tamaño y consultas por endpoint; /metrics en formato Prometheus
+    metricas.init_app(app)
+    # Después de métricas: su after_request corre antes y se mide lo que sale comprimido
+    compresion.init_app(app)
+
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(usuario_bp)
+    app.register_blueprint(operador_bp)
+
+    app.add_url_rule('/pantalla', 'inicio', inicio)
+    app.add_url_rule('/login', 'login', login, methods=['GET', 'POST'])
+    app.add_url_rule('/logout', 'logout', logout)
+
+    login_manager.init_app(app)
+
+    # Límite de intentos de login (memoria, o Postgres si LOGIN_LIMITE_BACKEND=postgres)
+    configurar_backend(obtener_conexion)
+    # Auditoría en segundo plano: el hilo escribe con su propia conexión
+    auditoria.configurar(obtener_conexion)
+    consultas_lentas.configurar(db.conexion_directa)
+    # Instantánea de /pantalla en disco (solo con Postgres; el kiosco SQLite ya es local)
+    instantanea_pizarra.configurar(app.config['DB_BACKEND'] == 'postgres', db.conexion_directa)
+    metricas.registrar_colector('login', contadores_login)
+    metricas.registrar_colector('auditoria', auditoria.obtener_contadores, medidores=('en_cola',))
+    metricas.registrar_colector('fragmentos', cache_fragmentos.obtener_contadores,
+                                medidores=('terminales', 'entradas', 'bytes'))
+    metricas.registrar_colector('instantanea', instantanea_pizarra.obtener_contadores)
+
+    return app
+
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    create_app().run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,87 @@
+# ARCHIVADO DE RECORRIDOS ANTIGUOS (TRABAJO PROGRAMADO)
+# Pasa al archivo los meses de import_llegadas / import_salidas más viejos
+# que el horizonte (ARCHIVO_MESES, por defecto 12) con archivar_recorridos()
+# de sql/007, y después compacta y congela cada mes archivado. Los reportes
+# siguen viendo todo a través de las vistas *_historico. Un mes archivado
+# queda cerrado: importar o mover recorridos a esas fechas da error.
+#
+# Pensado para cron, de noche (DETACH bloquea la tabla viva un instante):
+#   0 4 1 * *  cd /ruta/proyecto/Estructura && python archivado.py
+# Uso manual (desde proyecto/Estructura, con el .env):
+#   python archivado.py --meses 18
+#   python archivado.py --simular
+import argparse
+import os
+import time
+
+from dotenv import load_dotenv
+
+from db import conexion_directa
+
+
+def pendientes(cur, meses):
+    """Particiones que se archivarían con este horizonte (sin tocar nada)."""
+    cur.execute("""
+        SELECT padre.relname, hija.relname
+        FROM pg_inherits i
+        JOIN pg_class padre ON padre.oid = i.inhparent
+        JOIN pg_class hija ON hija.oid = i.inhrelid
+        WHERE padre.relname IN ('import_llegadas', 'import_salidas')
+          AND hija.relname ~ '_\\d{4}_\\d{2}$'
+          AND to_date(right(hija.relname, 7), 'YYYY_MM') + interval '1 month'
+              <= date_trunc('month', CURRENT_DATE) - make_interval(months => %s)
+        ORDER BY hija.relname
+    """, (meses,))
+    return cur.fetchall()
+
+
+def archivar(meses):
+    """Archiva y compacta; devuelve [(tabla, partición, filas)]."""
+    conn = conexion_directa()
+    try:
+        cur = conn.cursor()
+        # Todo el DETACH/ATTACH en una transacción: o se archiva el lote completo o nada
+        cur.execute("SELECT tabla, particion, filas FROM archivar_recorridos(%s)", (meses,))
+        archivadas = cur.fetchall()
+        conn.commit()
+
+        # CLUSTER / VACUUM fuera de la transacción, un mes a la vez
+        conn.autocommit = True
+        for _, particion, _ in archivadas:
+            cur.execute(f'CLUSTER "{particion}" USING "{particion}_pkey"')
+            cur.execute(f'VACUUM (FREEZE, ANALYZE) "{particion}"')
+        if archivadas:
+            cur.execute("ANALYZE import_llegadas")
+            cur.execute("ANALYZE import_salidas")
+        cur.close()
+        return archivadas
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mueve los recorridos antiguos a las tablas de archivo.")
+    parser.add_argument('--meses', type=int, default=int(os.getenv("ARCHIVO_MESES", "12")),
+                        help="Meses completos que se mantienen en las tablas vivas")
+    parser.add_argument('--simular', action='store_true', help="Solo muestra lo que se archivaría")
+    args = parser.parse_args()
+
+    if args.simular:
+        conn = conexion_directa()
+        cur = conn.cursor()
+        for tabla, particion in pendientes(cur, args.meses):
+            print(f"{tabla:<18}{particion}")
+        cur.close()
+        conn.close()
+        return
+
+    inicio = time.perf_counter()
+    archivadas = archivar(args.meses)
+    for tabla, particion, filas in archivadas:
+        print(f"{tabla:<18}{particion:<34}{filas:>8} filas")
+    print(f"{len(archivadas)} meses archivados en {time.perf_counter() - inicio:.1f}s")
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    main()
@@ -0,0 +1,135 @@
+# AUDITORÍA ASÍNCRONA (QUIÉN CAMBIÓ QUÉ)
+# Las rutas que modifican datos llaman a registrar(...), que solo deja el
+# evento en una cola en memoria. Un hilo por proceso la vacía cada pocos
+# segundos con un INSERT de varias filas en la tabla 'auditoria'
+# (sql/005_auditoria.sql), así la petición no espera a la base de datos.
+#
+# - La cola tiene tope: si se llena (base de datos caída) el evento se
+#   descarta y se cuenta en contadores['descartados'].
+# - Al terminar el proceso se escribe lo que quede en la cola (atexit).
+import atexit
+import datetime
+import json
+import os
+import queue
+import threading
+
+from psycopg2.extras import Json, execute_values
+
+TAMANO_COLA = int(os.getenv("AUDITORIA_COLA", "10000"))
+TAMANO_LOTE = int(os.getenv("AUDITORIA_LOTE", "500"))
+INTERVALO_SEG = float(os.getenv("AUDITORIA_INTERVALO", "2"))
+
+contadores = {
+    'encolados': 0,
+    'escritos': 0,
+    'descartados': 0,   # cola llena
+    'perdidos': 0,      # error al escribir el lote
+}
+_lock = threading.Lock()
+_cola = None
+_pid = None
+_obtener_conexion = None
+
+
+def configurar(obtener_conexion):
+    global _obtener_conexion
+    _obtener_conexion = obtener_conexion
+
+
+def _sumar(contador, cantidad=1):
+    with _lock:
+        contadores[contador] += cantidad
+
+
+def _cola_del_proceso():
+    global _cola, _pid
+    # Cola e hilo propios por proceso: los hilos no sobreviven a un fork
+    if _pid != os.getpid():
+        with _lock:
+            if _pid != os.getpid():
+                _cola = queue.Queue(maxsize=TAMANO_COLA)
+                _pid = os.getpid()
+                threading.Thread(target=_trabajador, args=(_cola,), name="auditoria", daemon=True).start()
+    return _cola
+
+
+def _a_json(valor):
+    # Fechas, horas y decimales de los formularios se guardan como texto
+    return json.dumps(valor, default=str, ensure_ascii=False)
+
+
+def registrar(usuario_id, accion, tabla, registro_id=None, detalle=None):
+    """
+    Encola un evento de auditoría. No toca la base de datos ni bloquea.
+    detalle: dict opcional con los valores relevantes (se guarda como JSONB).
+    """
+    evento = (datetime.datetime.now(), usuario_id, accion, tabla,
+              None if registro_id is None else str(registro_id),
+              Json(detalle, dumps=_a_json) if detalle else None)
+    try:
+        _cola_del_proceso().put_nowait(evento)
+        _sumar('encolados')
+    except queue.Full:
+        _sumar('descartados')
+
+
+def _tomar_lote(cola, espera):
+    lote = []
+    try:
+        lote.append(cola.get(timeout=espera) if espera else cola.get_nowait())
+        while len(lote) < TAMANO_LOTE:
+            lote.append(cola.get_nowait())
+    except queue.Empty:
+        pass
+    return lote
+
+
+def _escribir(lote):
+    conn = _obtener_conexion() if _obtener_conexion else None
+    if not conn:
+        _sumar('perdidos', len(lote))
+        return
+    cur = conn.cursor()
+    try:
+        execute_values(cur, """
+            INSERT INTO auditoria (fecha, usuario_id, accion, tabla, registro_id, detalle)
+            VALUES %s
+        """, lote, page_size=TAMANO_LOTE)
+        conn.commit()
+        _sumar('escritos', len(lote))
+    except Exception as e:
+        conn.rollback()
+        print(f"Error al escribir auditoría: {e}")
+        _sumar('perdidos', len(lote))
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _trabajador(cola):
+    while True:
+        lote = _tomar_lote(cola, INTERVALO_SEG)
+        if lote:
+            _escribir(lote)
+
+
+def vaciar():
+    """Escribe de inmediato lo pendiente en la cola de este proceso."""
+    if _cola is None or _pid != os.getpid():
+        return
+    while True:
+        lote = _tomar_lote(_cola, 0)
+        if not lote:
+            break
+        _escribir(lote)
+
+
+def obtener_contadores():
+    with _lock:
+        datos = dict(contadores)
+    datos['en_cola'] = _cola.qsize() if _cola is not None and _pid == os.getpid() else 0
+    return datos
+
+
+atexit.register(vaciar)
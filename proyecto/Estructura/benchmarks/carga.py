@@ -0,0 +1,323 @@
+# PRUEBA DE CARGA CONCURRENTE
+# Simula el tráfico real contra un servidor ya levantado (gunicorn o flask):
+#   - N pantallas (TV) que consultan /pantalla cada --intervalo-tv segundos
+#   - M operadores que entran con su RUT y recorren /operador,
+#     /actualizar_estado y /operador/verificar
+#   - P visitantes del dashboard público (/) con filtros al azar
+# Cada cliente es un hilo con su propia conexión keep-alive y su cookie de
+# sesión. Se descartan los primeros --calentamiento segundos.
+#
+# Reporta por ruta: peticiones, errores, p50/p95/p99 y peticiones/segundo, y
+# guarda todo en benchmarks/resultados/carga_<fecha>.json para comparar
+# corridas (--comparar archivo_anterior.json).
+#
+# Los ids, empresas y patentes se leen de la base (la misma del servidor),
+# que debe tener datos de benchmarks/generar_datos.py. Ojo: los operadores
+# escriben (estados y verificaciones); para comparar corridas de forma
+# estricta vuelva a generar los datos con --limpiar antes de cada una.
+#
+# Uso (desde proyecto/Estructura):
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#   python benchmarks/carga.py --url http://127.0.0.1:8000 --tvs 20 --operadores 5 --publico 10 --duracion 60
+import argparse
+import datetime
+import http.client
+import json
+import math
+import os
+import random
+import threading
+import time
+import urllib.parse
+
+import pytz
+
+from comun import CLAVE_OPERADORES, conectar, error, guardar_resultado, rut_operador, version_codigo
+
+ZONA = pytz.timezone('America/Punta_Arenas')
+ESTADOS = ['Programado', 'En Andén', 'En Recorrido', 'Demorado', 'Finalizado']
+
+
+class Registro:
+    """Latencias por ruta, compartido por todos los hilos."""
+
+    def __init__(self, inicio_medicion):
+        self.inicio_medicion = inicio_medicion
+        self._lock = threading.Lock()
+        self.muestras = {}      # ruta -> [(latencia, codigo)]
+
+    def anotar(self, ruta, instante, latencia, codigo):
+        if instante < self.inicio_medicion:
+            return
+        with self._lock:
+            self.muestras.setdefault(ruta, []).append((latencia, codigo))
+
+
+class Cliente:
+    """Un navegador simulado: conexión keep-alive + cookie de sesión, sin seguir redirecciones."""
+
+    def __init__(self, url, registro):
+        partes = urllib.parse.urlsplit(url)
+        self.host = partes.hostname
+        self.puerto = partes.port or (443 if partes.scheme == 'https' else 80)
+        self.https = partes.scheme == 'https'
+        self.registro = registro
+        self.cookies = {}
+        self.conn = None
+
+    def _conectar(self):
+        clase = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        self.conn = clase(self.host, self.puerto, timeout=60)
+
+    def _cerrar(self):
+        if self.conn is not None:
+            self.conn.close()
+        self.conn = None
+
+    def _enviar(self, metodo, camino, cuerpo, cabeceras):
+        if self.conn is None:
+            self._conectar()
+        self.conn.request(metodo, camino, body=cuerpo, headers=cabeceras)
+        return self.conn.getresponse()
+
+    def pedir(self, ruta, metodo, camino, datos=None):
+        cuerpo = urllib.parse.urlencode(datos).encode() if datos is not None else None
+        cabeceras = {'Connection': 'keep-alive'}
+        if cuerpo is not None:
+            cabeceras['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookies:
+            cabeceras['Cookie'] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+
+        inicio = time.perf_counter()
+        try:
+            try:
+                respuesta = self._enviar(metodo, camino, cuerpo, cabeceras)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # El servidor cerró la conexión inactiva (keepalive): el navegador reintenta
+                self._cerrar()
+                inicio = time.perf_counter()
+                respuesta = self._enviar(metodo, camino, cuerpo, cabeceras)
+            respuesta.read()
+            codigo = respuesta.status
+            for cabecera in respuesta.headers.get_all('Set-Cookie') or []:
+                nombre, _, resto = cabecera.partition('=')
+                self.cookies[nombre.strip()] = resto.split(';', 1)[0]
+            if respuesta.getheader('Connection', '').lower() == 'close':
+                self._cerrar()
+        except (OSError, http.client.HTTPException):
+            codigo = 0          # Error de conexión / timeout
+            self._cerrar()
+        fin = time.perf_counter()
+        self.registro.anotar(ruta, fin, fin - inicio, codigo)
+        return codigo
+
+
+# --- DATOS PARA LOS CLIENTES ---
+
+def cargar_datos():
+    hoy = datetime.datetime.now(ZONA).date()
+    conn = conectar()
+    cur = conn.cursor()
+    datos = {'hoy': hoy}
+    for tipo, tabla in (('salidas', 'import_salidas'), ('llegadas', 'import_llegadas')):
+        cur.execute(f"SELECT id, anden FROM {tabla} WHERE fecha BETWEEN %s AND %s",
+                    (hoy, hoy + datetime.timedelta(days=1)))
+        datos[tipo] = cur.fetchall()
+    cur.execute("SELECT MIN(fecha), MAX(fecha) FROM import_salidas")
+    datos['fecha_min'], datos['fecha_max'] = cur.fetchone()
+    cur.execute("SELECT nombre FROM empresas ORDER BY nombre")
+    datos['empresas'] = [f[0] for f in cur.fetchall()]
+    cur.execute("SELECT nombre FROM lugares ORDER BY nombre")
+    datos['lugares'] = [f[0] for f in cur.fetchall()]
+    cur.execute("SELECT patente FROM buses_permitidos")
+    datos['patentes'] = [f[0] for f in cur.fetchall()]
+    cur.close()
+    conn.close()
+    if not datos['salidas'] or not datos['llegadas'] or datos['fecha_min'] is None:
+        error("No hay recorridos para hoy: ejecute benchmarks/generar_datos.py --limpiar")
+    return datos
+
+
+# --- CLIENTES SIMULADOS ---
+
+def pantalla(cliente, azar, fin, args):
+    time.sleep(azar.uniform(0, args.intervalo_tv))     # Las TV no se prenden todas a la vez
+    while time.perf_counter() < fin:
+        cliente.pedir('/pantalla', 'GET', '/pantalla')
+        time.sleep(args.intervalo_tv * azar.uniform(0.9, 1.1))
+
+
+def operador(cliente, azar, fin, args, datos, indice):
+    codigo = cliente.pedir('/login', 'POST', '/login',
+                           {'rut': rut_operador(indice), 'password': CLAVE_OPERADORES})
+    if codigo != 302:
+        print(f"Operador {indice}: login falló (HTTP {codigo}); ¿se generaron los datos?")
+        return
+    while time.perf_counter() < fin:
+        cliente.pedir('/operador', 'GET', '/operador')
+        time.sleep(azar.expovariate(1 / args.pausa_operador))
+
+        tipo = azar.choice(['salidas', 'llegadas'])
+        id_rec, anden = azar.choice(datos[tipo])
+        cliente.pedir('/actualizar_estado', 'POST', '/actualizar_estado',
+                      {'id': id_rec, 'tipo': tipo, 'estado': azar.choice(ESTADOS)})
+        time.sleep(azar.expovariate(1 / args.pausa_operador))
+
+        tipo = azar.choice(['salidas', 'llegadas'])
+        id_rec, anden = azar.choice(datos[tipo])
+        ahora = datetime.datetime.now(ZONA)
+        cliente.pedir('/operador/verificar', 'POST', '/operador/verificar', {
+            'id_recorrido': id_rec, 'tipo_recorrido': tipo,
+            'patente': azar.choice(datos['patentes']),
+            'anden_real': anden if azar.random() < 0.85 else azar.randint(1, 20),
+            'observaciones': '',
+            'fecha_manual': ahora.strftime('%Y-%m-%d'), 'hora_manual': ahora.strftime('%H:%M'),
+        })
+        time.sleep(azar.expovariate(1 / args.pausa_operador))
+
+
+def publico(cliente, azar, fin, args, datos):
+    dias = (datos['fecha_max'] - datos['fecha_min']).days
+    while time.perf_counter() < fin:
+        filtros = {}
+        if azar.random() < 0.7:
+            filtros['fecha'] = (datos['fecha_min'] + datetime.timedelta(days=azar.randint(0, dias))).isoformat()
+        if azar.random() < 0.3:
+            filtros['empresa'] = azar.choice(datos['empresas'])
+        if azar.random() < 0.3:
+            filtros['lugar'] = azar.choice(datos['lugares'])
+        if azar.random() < 0.1:
+            filtros['anden'] = str(azar.randint(1, 20))
+        if azar.random() < 0.1:
+            filtros['hora'] = f"{azar.randint(6, 22):02d}:00"
+        if azar.random() < 0.2:
+            filtros['page'] = str(azar.randint(2, 4))
+        camino = '/' + ('?' + urllib.parse.urlencode(filtros) if filtros else '')
+        cliente.pedir('/ (dashboard)', 'GET', camino)
+        time.sleep(azar.expovariate(1 / args.pausa_publico))
+
+
+# --- RESULTADOS ---
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return None
+    indice = max(0, math.ceil(p / 100 * len(valores_ordenados)) - 1)
+    return valores_ordenados[indice]
+
+
+def resumir(registro, segundos):
+    rutas = {}
+    for ruta, muestras in sorted(registro.muestras.items()):
+        latencias = sorted(l for l, _ in muestras)
+        codigos = {}
+        for _, codigo in muestras:
+            codigos[str(codigo)] = codigos.get(str(codigo), 0) + 1
+        errores = sum(1 for _, c in muestras if c == 0 or c >= 500)
+        rutas[ruta] = {
+            'peticiones': len(muestras),
+            'errores': errores,
+            'codigos': codigos,
+            'por_segundo': round(len(muestras) / segundos, 2),
+            'promedio_ms': round(sum(latencias) / len(latencias) * 1000, 2),
+            'p50_ms': round(percentil(latencias, 50) * 1000, 2),
+            'p95_ms': round(percentil(latencias, 95) * 1000, 2),
+            'p99_ms': round(percentil(latencias, 99) * 1000, 2),
+            'maximo_ms': round(latencias[-1] * 1000, 2),
+        }
+    return rutas
+
+
+def imprimir(rutas):
+    print(f"{'Ruta':<22}{'Pet.':>8}{'Err.':>6}{'Pet/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'Máx ms':>10}")
+    for ruta, r in rutas.items():
+        print(f"{ruta:<22}{r['peticiones']:>8}{r['errores']:>6}{r['por_segundo']:>9}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['maximo_ms']:>10}")
+
+
+def comparar(rutas, ruta_anterior):
+    with open(ruta_anterior, encoding='utf-8') as f:
+        anterior = json.load(f)
+    print(f"\nComparación con {os.path.basename(ruta_anterior)} (commit {anterior['meta'].get('commit')}):")
+    print(f"{'Ruta':<22}{'p95 antes':>11}{'p95 ahora':>11}{'Δ p95':>9}{'Pet/s antes':>13}{'Pet/s ahora':>13}")
+    for ruta, r in rutas.items():
+        a = anterior['rutas'].get(ruta)
+        if not a:
+            continue
+        delta = (r['p95_ms'] - a['p95_ms']) / a['p95_ms'] * 100 if a['p95_ms'] else 0
+        print(f"{ruta:<22}{a['p95_ms']:>11}{r['p95_ms']:>11}{delta:>+8.1f}%{a['por_segundo']:>13}{r['por_segundo']:>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la aplicación del terminal.")
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--tvs', type=int, default=10, help="Pantallas consultando /pantalla")
+    parser.add_argument('--operadores', type=int, default=5, help="Operadores (no más que los generados)")
+    parser.add_argument('--publico', type=int, default=10, help="Visitantes del dashboard")
+    parser.add_argument('--duracion', type=float, default=60, help="Segundos medidos")
+    parser.add_argument('--calentamiento', type=float, default=5, help="Segundos iniciales descartados")
+    parser.add_argument('--intervalo-tv', type=float, default=5, help="Segundos entre consultas de cada TV")
+    parser.add_argument('--pausa-operador', type=float, default=2, help="Pausa media entre acciones del operador")
+    parser.add_argument('--pausa-publico', type=float, default=1, help="Pausa media entre búsquedas del público")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--etiqueta', default='', help="Texto libre guardado en el resultado")
+    parser.add_argument('--salida', help="Archivo JSON de resultados (por defecto en benchmarks/resultados/)")
+    parser.add_argument('--comparar', help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args()
+
+    datos = cargar_datos()
+    inicio = time.perf_counter()
+    registro = Registro(inicio + args.calentamiento)
+    fin = inicio + args.calentamiento + args.duracion
+
+    hilos = []
+    for i in range(args.tvs):
+        azar = random.Random(f"{args.semilla}-tv-{i}")
+        hilos.append(threading.Thread(target=pantalla, args=(Cliente(args.url, registro), azar, fin, args)))
+    for i in range(args.operadores):
+        azar = random.Random(f"{args.semilla}-op-{i}")
+        hilos.append(threading.Thread(target=operador,
+                                      args=(Cliente(args.url, registro), azar, fin, args, datos, i + 1)))
+    for i in range(args.publico):
+        azar = random.Random(f"{args.semilla}-pub-{i}")
+        hilos.append(threading.Thread(target=publico, args=(Cliente(args.url, registro), azar, fin, args, datos)))
+
+    print(f"{len(hilos)} clientes contra {args.url} durante {args.duracion:.0f}s "
+          f"(+{args.calentamiento:.0f}s de calentamiento)...")
+    for hilo in hilos:
+        hilo.daemon = True
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    segundos = max(time.perf_counter() - registro.inicio_medicion, 0.001)
+
+    rutas = resumir(registro, segundos)
+    total = sum(r['peticiones'] for r in rutas.values())
+    resultado = {
+        'meta': {
+            'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': version_codigo(),
+            'etiqueta': args.etiqueta,
+            'url': args.url,
+            'segundos_medidos': round(segundos, 2),
+            'parametros': {k: v for k, v in vars(args).items() if k not in ('salida', 'comparar')},
+            'datos': {'recorridos_hoy': len(datos['salidas']) + len(datos['llegadas']),
+                      'desde': datos['fecha_min'].isoformat(), 'hasta': datos['fecha_max'].isoformat()},
+        },
+        'total': {'peticiones': total, 'por_segundo': round(total / segundos, 2),
+                  'errores': sum(r['errores'] for r in rutas.values())},
+        'rutas': rutas,
+    }
+
+    imprimir(rutas)
+    print(f"\nTotal: {total} peticiones, {resultado['total']['por_segundo']} pet/s, "
+          f"{resultado['total']['errores']} errores")
+
+    guardar_resultado("carga", resultado, args.salida)
+
+    if args.comparar:
+        comparar(rutas, args.comparar)
+
+
+if __name__ == '__main__':
+    main()
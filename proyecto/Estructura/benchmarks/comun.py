@@ -0,0 +1,73 @@
+# UTILIDADES COMPARTIDAS DE LOS BENCHMARKS
+# Conexión directa a Postgres (mismas variables DB_* del .env), RUT de los
+# operadores sintéticos y rutas de archivos. Los scripts se ejecutan desde
+# proyecto/Estructura, por ejemplo: python benchmarks/generar_datos.py
+import datetime
+import json
+import os
+import subprocess
+import sys
+
+import psycopg2
+from dotenv import load_dotenv
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(CARPETA)
+CARPETA_RESULTADOS = os.path.join(CARPETA, "resultados")
+CARPETA_SQL = os.path.join(RAIZ, "sql")
+
+# Los operadores sintéticos usan RUT 9000XXXX-DV (ver rut_operador)
+PREFIJO_RUT = 9000_0000
+CLAVE_OPERADORES = "bench"
+
+load_dotenv(os.path.join(RAIZ, ".env"))
+
+
+def conectar():
+    return psycopg2.connect(
+        host=os.getenv("DB_HOST"),
+        database=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASS"),
+        port=os.getenv("DB_PORT", "5432"),
+    )
+
+
+def digito_verificador(numero):
+    """Dígito verificador del RUT (módulo 11)."""
+    suma, factor = 0, 2
+    for digito in reversed(str(numero)):
+        suma += int(digito) * factor
+        factor = 2 if factor == 7 else factor + 1
+    resto = 11 - suma % 11
+    return {11: '0', 10: 'K'}.get(resto, str(resto))
+
+
+def rut_operador(indice):
+    numero = PREFIJO_RUT + indice
+    return f"{numero}-{digito_verificador(numero)}"
+
+
+def version_codigo():
+    """Commit actual (para saber contra qué versión se midió)."""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def guardar_resultado(prefijo, resultado, salida=None):
+    """Guarda el JSON de la corrida (por defecto resultados/<prefijo>_<fecha>.json)."""
+    salida = salida or os.path.join(
+        CARPETA_RESULTADOS, f"{prefijo}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {salida}")
+    return salida
+
+
+def error(mensaje):
+    print(f"Error: {mensaje}", file=sys.stderr)
+    sys.exit(1)
@@ -0,0 +1,245 @@
+# GENERADOR DE DATOS SINTÉTICOS PARA PRUEBAS DE CARGA
+# Llena una base LOCAL con un año de operación del terminal:
+#   - empresas y lugares
+#   - flota (buses_permitidos)
+#   - import_salidas / import_llegadas: un itinerario fijo que se repite cada
+#     día (con servicios solo de lunes a viernes y cancelaciones al azar)
+#   - historial_verificaciones e historial_extras de los días ya pasados
+#   - operadores con RUT 9000XXXX-DV y clave 'bench' (los usa carga.py)
+# Al final se recalculan los resúmenes diarios (sql/001) y se hace ANALYZE.
+#
+# Con la misma --semilla se generan exactamente los mismos datos.
+#
+# Uso (desde proyecto/Estructura, con la base creada con sql/000..005):
+#   python benchmarks/generar_datos.py --limpiar
+#   python benchmarks/generar_datos.py --dias 730 --servicios 250 --limpiar
+import argparse
+import datetime
+import random
+import time
+
+import pytz
+from psycopg2.extras import execute_values
+from werkzeug.security import generate_password_hash
+
+from comun import CLAVE_OPERADORES, conectar, error, rut_operador
+
+ZONA = pytz.timezone('America/Punta_Arenas')
+
+LUGARES = [
+    "PUERTO NATALES", "RIO GALLEGOS", "USHUAIA", "PORVENIR", "RIO GRANDE", "EL CALAFATE",
+    "TORRES DEL PAINE", "CERRO CASTILLO", "SAN GREGORIO", "VILLA TEHUELCHES", "PUERTO WILLIAMS",
+    "COYHAIQUE", "PUERTO MONTT", "OSORNO", "CALETA OLIVIA", "COMODORO RIVADAVIA",
+    "EL CHALTEN", "PUNTA DELGADA", "CAMERON", "TIMAUKEL",
+]
+APELLIDOS = [
+    "FERNANDEZ", "PACHECO", "GHISONI", "SUR", "AUSTRAL", "TECNI", "MARGA", "QUEILEN",
+    "TURIBUS", "BAHIA AZUL", "PATAGONIA", "FUEGUINA", "MAGALLANES", "CRUZ DEL SUR", "PINGÜINO",
+    "TAQSA", "ANDESMAR", "MARGA MARGA", "VIA AUSTRAL", "ESTRECHO",
+]
+CONSONANTES = "BCDFGHJKLPRSTVWXYZ"
+
+# Estados de los días pasados (el resto queda 'Programado')
+ESTADOS_PASADOS = [('Finalizado', 0.93), ('Cancelado', 0.03), ('Demorado', 0.04)]
+ESTADOS_HOY = ['En Andén', 'En Recorrido', 'Demorado']
+
+
+def _nombres(base, cantidad, prefijo):
+    nombres = list(base[:cantidad])
+    while len(nombres) < cantidad:
+        nombres.append(f"{prefijo} {len(nombres) + 1}")
+    return nombres
+
+
+def _patentes(azar, cantidad):
+    patentes = set()
+    while len(patentes) < cantidad:
+        patentes.add("".join(azar.choice(CONSONANTES) for _ in range(4)) + f"{azar.randint(10, 99)}")
+    return sorted(patentes)
+
+
+def _itinerario(azar, servicios, empresas, lugares, andenes):
+    """Servicios que se repiten cada día: (hora, empresa, lugar, anden, solo_habiles)."""
+    usados = set()
+    resultado = []
+    while len(resultado) < servicios:
+        # Más servicios entre las 06:00 y las 22:00, pocos en la madrugada
+        hora_base = azar.choices(range(24), weights=[1, 1, 1, 1, 2, 4] + [8] * 16 + [3, 2])[0]
+        hora = datetime.time(hora_base, azar.randrange(0, 60, 5))
+        empresa, lugar = azar.choice(empresas), azar.choice(lugares)
+        if (hora, empresa, lugar) in usados:
+            continue
+        usados.add((hora, empresa, lugar))
+        resultado.append((hora, empresa, lugar, azar.randint(1, andenes), azar.random() < 0.2))
+    return sorted(resultado)
+
+
+def _estado(azar, fecha, hora, ahora):
+    momento = ZONA.localize(datetime.datetime.combine(fecha, hora))
+    if momento > ahora:
+        return 'Programado'
+    if fecha == ahora.date():
+        return azar.choice(ESTADOS_HOY) if ahora - momento < datetime.timedelta(hours=2) else 'Finalizado'
+    return azar.choices([e for e, _ in ESTADOS_PASADOS], weights=[p for _, p in ESTADOS_PASADOS])[0]
+
+
+def limpiar(cur):
+    cur.execute("""
+        TRUNCATE import_salidas, import_llegadas, historial_verificaciones, historial_extras,
+                 buses_permitidos, resumen_diario_verificaciones, resumen_diario_extras
+        RESTART IDENTITY
+    """)
+    cur.execute("DELETE FROM usuarios WHERE rut LIKE %s", (rut_operador(0)[:4] + '%',))
+
+
+def generar(args):
+    azar = random.Random(args.semilla)
+    ahora = datetime.datetime.now(ZONA)
+    hoy = ahora.date()
+    inicio = hoy - datetime.timedelta(days=args.dias)
+    fin = hoy + datetime.timedelta(days=args.dias_futuros)
+
+    conn = conectar()
+    cur = conn.cursor()
+    cur.execute("SELECT to_regclass('import_salidas') IS NOT NULL AND to_regclass('auditoria') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        error("Faltan tablas: aplique primero sql/000_esquema_base.sql y las migraciones 001..005.")
+
+    cur.execute("SELECT EXISTS (SELECT 1 FROM import_salidas) OR EXISTS (SELECT 1 FROM import_llegadas)")
+    if cur.fetchone()[0]:
+        if not args.limpiar:
+            error("La base ya tiene recorridos. Use --limpiar (SOLO en una base de pruebas).")
+    if args.limpiar:
+        limpiar(cur)
+
+    # Con sql/006 aplicada, las particiones del rango se crean antes de insertar
+    cur.execute("SELECT to_regproc('asegurar_particiones') IS NOT NULL")
+    if cur.fetchone()[0]:
+        cur.execute("SELECT asegurar_particiones(%s, %s)", (inicio, fin))
+
+    t0 = time.perf_counter()
+
+    # 1. MAESTROS Y FLOTA
+    empresas = [f"BUSES {n}" for n in _nombres(APELLIDOS, args.empresas, "EMPRESA")]
+    lugares = _nombres(LUGARES, args.lugares, "DESTINO")
+    execute_values(cur, "INSERT INTO empresas (nombre) VALUES %s ON CONFLICT (nombre) DO NOTHING",
+                   [(e,) for e in empresas])
+    execute_values(cur, "INSERT INTO lugares (nombre) VALUES %s ON CONFLICT (nombre) DO NOTHING",
+                   [(l,) for l in lugares])
+
+    patentes = _patentes(azar, args.buses)
+    flota = [(p, azar.choice(empresas), azar.random() < 0.95) for p in patentes]
+    execute_values(cur, "INSERT INTO buses_permitidos (patente, empresa, activa) VALUES %s", flota)
+    patentes_por_empresa = {}
+    for patente, empresa, _ in flota:
+        patentes_por_empresa.setdefault(empresa, []).append(patente)
+
+    # 2. OPERADORES (una sola vez el hash: es caro a propósito)
+    clave = generate_password_hash(CLAVE_OPERADORES)
+    operadores = [(f"Operador Bench {i + 1}", rut_operador(i + 1), clave, 'operador')
+                  for i in range(args.operadores)]
+    ids_operadores = [fila[0] for fila in execute_values(cur, """
+        INSERT INTO usuarios (username, rut, password, rol) VALUES %s
+        ON CONFLICT (rut) DO UPDATE SET password = EXCLUDED.password, activo = TRUE
+        RETURNING id
+    """, operadores, fetch=True)]
+
+    # 3. RECORRIDOS: el mismo itinerario cada día
+    recorridos = {}
+    for tipo, tabla in (('salidas', 'import_salidas'), ('llegadas', 'import_llegadas')):
+        itinerario = _itinerario(azar, args.servicios, empresas, lugares, args.andenes)
+        filas = []
+        fecha = inicio
+        while fecha <= fin:
+            habil = fecha.weekday() < 5
+            for hora, empresa, lugar, anden, solo_habiles in itinerario:
+                if (solo_habiles and not habil) or azar.random() < 0.02:
+                    continue
+                filas.append((fecha, hora, empresa, lugar, anden, _estado(azar, fecha, hora, ahora)))
+            fecha += datetime.timedelta(days=1)
+        recorridos[tipo] = execute_values(cur, f"""
+            INSERT INTO {tabla} (fecha, hora, empresa_nombre, lugar, anden, estado) VALUES %s
+            RETURNING id, fecha, hora, empresa_nombre, anden, estado
+        """, filas, page_size=5000, fetch=True)
+    t_recorridos = time.perf_counter()
+
+    # 4. VERIFICACIONES DE LOS RECORRIDOS YA OCURRIDOS
+    flota_activa = {p for p, _, activa in flota if activa}
+    verificaciones = []
+    for tipo, filas in recorridos.items():
+        for id_rec, fecha, hora, empresa, anden, estado in filas:
+            if estado == 'Programado' or estado == 'Cancelado' or azar.random() > args.verificados:
+                continue
+            propias = patentes_por_empresa.get(empresa)
+            if propias and azar.random() < 0.9:
+                patente = azar.choice(propias)
+            else:
+                patente = azar.choice(patentes) if azar.random() < 0.5 else _patentes(azar, 1)[0]
+            anden_real = anden if azar.random() < 0.85 else azar.randint(1, args.andenes)
+            registro = datetime.datetime.combine(fecha, hora) + datetime.timedelta(minutes=azar.randint(-20, 10))
+            verificaciones.append((id_rec, tipo, azar.choice(ids_operadores), patente, str(anden_real),
+                                   patente in flota_activa, anden_real == anden, str(anden), '', fecha, hora, registro))
+    execute_values(cur, """
+        INSERT INTO historial_verificaciones
+        (recorrido_id, tipo_recorrido, operador_id, patente_ingresada, anden_real,
+         es_patente_valida, es_anden_correcto, anden_programado, observaciones,
+         fecha_manual, hora_manual, fecha_registro)
+        VALUES %s
+    """, verificaciones, page_size=5000)
+
+    # 5. EXTRAS (buses fuera de itinerario)
+    extras = []
+    fecha = inicio
+    while fecha < hoy:
+        for _ in range(azar.randint(0, 2 * args.extras_dia)):
+            hora = datetime.time(azar.randint(6, 23), azar.randrange(0, 60, 5))
+            patente = azar.choice(patentes)
+            extras.append((fecha, hora, patente, azar.choice(empresas), azar.choice(lugares),
+                           azar.choice(['salida', 'llegada']), str(azar.randint(1, args.andenes)),
+                           azar.choice(ids_operadores), ''))
+        fecha += datetime.timedelta(days=1)
+    execute_values(cur, """
+        INSERT INTO historial_extras
+        (fecha, hora, patente, empresa, lugar, tipo_recorrido, anden, operador_id, observacion)
+        VALUES %s
+    """, extras, page_size=5000)
+    conn.commit()
+    t_historial = time.perf_counter()
+
+    # 6. RESÚMENES DIARIOS Y ESTADÍSTICAS
+    conn.autocommit = True
+    cur.execute("SELECT recalcular_resumenes_diarios()")
+    cur.execute("ANALYZE")
+    cur.close()
+    conn.close()
+    t_fin = time.perf_counter()
+
+    total = sum(len(f) for f in recorridos.values())
+    print(f"Rango: {inicio} a {fin} (semilla {args.semilla})")
+    print(f"Recorridos: {total} ({len(recorridos['salidas'])} salidas, {len(recorridos['llegadas'])} llegadas) "
+          f"en {t_recorridos - t0:.1f}s")
+    print(f"Verificaciones: {len(verificaciones)} | Extras: {len(extras)} en {t_historial - t_recorridos:.1f}s")
+    print(f"Flota: {len(flota)} buses | Operadores: {len(ids_operadores)} (clave '{CLAVE_OPERADORES}')")
+    print(f"Resúmenes y ANALYZE: {t_fin - t_historial:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos para las pruebas de carga.")
+    parser.add_argument('--dias', type=int, default=365, help="Días hacia atrás desde hoy")
+    parser.add_argument('--dias-futuros', type=int, default=7, help="Días programados hacia adelante")
+    parser.add_argument('--servicios', type=int, default=150, help="Salidas (y llegadas) por día")
+    parser.add_argument('--empresas', type=int, default=20)
+    parser.add_argument('--lugares', type=int, default=20)
+    parser.add_argument('--andenes', type=int, default=20)
+    parser.add_argument('--buses', type=int, default=300, help="Patentes en buses_permitidos")
+    parser.add_argument('--operadores', type=int, default=20)
+    parser.add_argument('--verificados', type=float, default=0.7, help="Fracción de recorridos verificados")
+    parser.add_argument('--extras-dia', type=int, default=5, help="Promedio de extras por día")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--limpiar', action='store_true',
+                        help="Vacía recorridos, flota e historiales antes de generar (SOLO base de pruebas)")
+    generar(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
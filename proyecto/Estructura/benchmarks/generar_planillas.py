@@ -0,0 +1,191 @@
+# GENERADOR DE PLANILLAS EXCEL SINTÉTICAS (LLEGADAS / SALIDAS)
+# Produce archivos como los que se suben cada mes en "Importar Excel": un
+# libro por tipo y mes, una hoja por día. Con --desorden (0 a 1) aparecen
+# los problemas de las planillas reales que generar_salidas_llegadas.py
+# tiene que resolver:
+#   - filas de título antes del encabezado (mes y año escondidos ahí, a
+#     veces en filas separadas y en minúsculas)
+#   - nombres de columna distintos (HORA / HORA SALIDA / HORARIO, DESDE /
+#     ORIGEN, mayúsculas y espacios) y columnas que sobran
+#   - operadores mal escritos como los de MAPPING_EMPRESAS (BELA‰N, BUES LINO...)
+#   - horas como hora de Excel, texto "8:05", "08:05:00" o fecha-hora
+#   - andén vacío o como texto, filas en blanco, duplicadas y totales al pie
+#
+# Uso (desde proyecto/Estructura):
+#   python benchmarks/generar_planillas.py --filas 300 --desorden 0.8
+import argparse
+import calendar
+import datetime
+import os
+import random
+import sys
+
+from openpyxl import Workbook
+
+from comun import CARPETA, RAIZ
+
+sys.path.insert(0, RAIZ)
+from manipulacion_datos.generar_salidas_llegadas import MAPPING_EMPRESAS, MESES_MAP  # noqa: E402
+
+CARPETA_PLANILLAS = os.path.join(CARPETA, "planillas")
+NOMBRES_MES = {numero: nombre for nombre, numero in MESES_MAP.items()}
+
+EMPRESAS = sorted(set(MAPPING_EMPRESAS.values()) | {
+    "BUSES FERNANDEZ", "BUSES PACHECO", "BUSES GHISONI", "BUS SUR", "BUSES TECNI AUSTRAL",
+    "BUSES MARGA", "TURISMO ZAAHJ", "QUEILEN BUS",
+})
+# Variantes mal escritas de cada empresa (las que corrige MAPPING_EMPRESAS)
+VARIANTES = {}
+for mal_escrita, correcta in MAPPING_EMPRESAS.items():
+    VARIANTES.setdefault(correcta, []).append(mal_escrita)
+
+LUGARES = [
+    "PUERTO NATALES", "RÍO GALLEGOS", "USHUAIA", "PORVENIR", "RÍO GRANDE", "EL CALAFATE",
+    "TORRES DEL PAINE", "CERRO CASTILLO", "SAN GREGORIO", "VILLA TEHUELCHES",
+    "COYHAIQUE", "PUERTO MONTT", "OSORNO", "PUNTA DELGADA", "CAMERÓN", "PEÑA BLANCA",
+]
+
+COLUMNAS_HORA = {
+    'LLEGADAS': ['HORA LLEGADA', 'LLEGADA', 'HORA', 'HORA LLEGADA.', 'HORARIO'],
+    'SALIDAS': ['HORA SALIDA', 'SALIDA', 'HORA', 'HORARIO'],
+}
+COLUMNAS_LUGAR = {'LLEGADAS': ['DESDE', 'ORIGEN'], 'SALIDAS': ['DESTINO']}
+COLUMNAS_SOBRANTES = ['PATENTE', 'OBSERVACION', 'CONDUCTOR', None]
+DIAS_SEMANA = ["LUNES", "MARTES", "MIERCOLES", "JUEVES", "VIERNES", "SABADO", "DOMINGO"]
+
+
+def _nombre_hoja(azar, fecha, desorden):
+    dia = fecha.day
+    if azar.random() >= desorden:
+        return str(dia)
+    return azar.choice([f"DIA {dia}", f"{dia:02d}", f"{dia} {DIAS_SEMANA[fecha.weekday()]}",
+                        f"{DIAS_SEMANA[fecha.weekday()]} {dia}"])
+
+
+def _titulo(azar, tipo, fecha, desorden):
+    """Filas antes del encabezado; el mes y el año siempre aparecen en alguna."""
+    mes = NOMBRES_MES[fecha.month]
+    if azar.random() >= desorden:
+        return [[f"{tipo} {mes} {fecha.year}"]]
+    filas = [["TERMINAL DE BUSES PUNTA ARENAS"]]
+    if azar.random() < 0.5:
+        filas += [[f"Mes: {mes.lower()}", None, f"Año {fecha.year}"]]
+    else:
+        filas += [[f"PROGRAMACIÓN {tipo}"], [None, f"{mes} DE {fecha.year}"]]
+    if azar.random() < 0.5:
+        filas.append([])
+    return filas
+
+
+def _encabezado(azar, tipo, desorden):
+    columnas = [azar.choice(COLUMNAS_HORA[tipo]), 'OPERADOR', azar.choice(COLUMNAS_LUGAR[tipo]), 'ANDEN']
+    if azar.random() < desorden:
+        azar.shuffle(columnas)
+        columnas.insert(azar.randint(0, len(columnas)), azar.choice(COLUMNAS_SOBRANTES))
+        columnas = [c if c is None or azar.random() > 0.3 else f" {c.title()} " for c in columnas]
+    return columnas
+
+
+def _hora(azar, hora, desorden):
+    if azar.random() >= desorden:
+        return hora
+    formato = azar.randrange(3)
+    if formato == 0:
+        return f"{hora.hour}:{hora.minute:02d}"
+    if formato == 1:
+        return hora.strftime('%H:%M:%S')
+    return datetime.datetime(1900, 1, 1, hora.hour, hora.minute)
+
+
+def _empresa(azar, empresa, desorden):
+    if azar.random() >= desorden * 0.4:
+        return empresa
+    variantes = VARIANTES.get(empresa)
+    if variantes and azar.random() < 0.7:
+        return azar.choice(variantes)
+    return azar.choice([empresa.lower(), f"  {empresa} ", empresa.title()])
+
+
+def _anden(azar, anden, desorden):
+    if azar.random() >= desorden * 0.3:
+        return anden
+    return azar.choice([str(anden), None, f" {anden}"])
+
+
+def _hoja(libro, azar, tipo, fecha, filas, desorden):
+    hoja = libro.create_sheet(_nombre_hoja(azar, fecha, desorden))
+    for fila in _titulo(azar, tipo, fecha, desorden):
+        hoja.append(fila)
+    columnas = _encabezado(azar, tipo, desorden)
+    hoja.append(columnas)
+    posicion = {(c or '').strip().upper(): i for i, c in enumerate(columnas)}
+    i_hora = next(i for c, i in posicion.items() if c in COLUMNAS_HORA[tipo])
+    i_lugar = next(i for c, i in posicion.items() if c in COLUMNAS_LUGAR[tipo])
+
+    horas = sorted(datetime.time(azar.choices(range(24), weights=[1] * 5 + [4] + [8] * 16 + [3, 2])[0],
+                                 azar.randrange(0, 60, 5)) for _ in range(filas))
+    anterior = None
+    for hora in horas:
+        valores = [None] * len(columnas)
+        valores[i_hora] = _hora(azar, hora, desorden)
+        valores[posicion['OPERADOR']] = _empresa(azar, azar.choice(EMPRESAS), desorden)
+        valores[i_lugar] = azar.choice(LUGARES) if azar.random() >= desorden * 0.2 else azar.choice(LUGARES).title()
+        valores[posicion['ANDEN']] = _anden(azar, azar.randint(1, 20), desorden)
+        if 'PATENTE' in posicion:
+            valores[posicion['PATENTE']] = f"{azar.choice('BCDFGHJKLPRST')}{azar.choice('BCDFGHJKLPRST')}{azar.randint(1000, 9999)}"
+
+        if azar.random() < desorden * 0.05:
+            hoja.append([])                                         # Fila en blanco
+        hoja.append(valores)
+        if anterior is not None and azar.random() < desorden * 0.02:
+            hoja.append(anterior)                                   # Fila duplicada
+        anterior = valores
+
+    if azar.random() < desorden:
+        pie = [None] * len(columnas)
+        pie[i_lugar] = f"TOTAL {tipo}: {filas}"                      # Sin operador: se descarta
+        hoja.append([])
+        hoja.append(pie)
+
+
+def generar(carpeta, anio=2031, mes=3, meses=1, dias=None, filas=150, desorden=0.5, semilla=42):
+    """Escribe LLEGADAS/SALIDAS <MES> <AÑO>.xlsx en carpeta y devuelve (rutas, filas escritas)."""
+    azar = random.Random(semilla)
+    os.makedirs(carpeta, exist_ok=True)
+    rutas, total = [], 0
+    for desplazamiento in range(meses):
+        anio_mes, mes_actual = divmod(mes - 1 + desplazamiento, 12)
+        anio_actual, mes_actual = anio + anio_mes, mes_actual + 1
+        dias_mes = calendar.monthrange(anio_actual, mes_actual)[1]
+        for tipo in ('LLEGADAS', 'SALIDAS'):
+            libro = Workbook(write_only=True)
+            for dia in range(1, min(dias or dias_mes, dias_mes) + 1):
+                _hoja(libro, azar, tipo, datetime.date(anio_actual, mes_actual, dia), filas, desorden)
+                total += filas
+            ruta = os.path.join(carpeta, f"{tipo} {NOMBRES_MES[mes_actual]} {anio_actual}.xlsx")
+            libro.save(ruta)
+            rutas.append(ruta)
+    return rutas, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera planillas LLEGADAS/SALIDAS sintéticas.")
+    parser.add_argument('--carpeta', default=CARPETA_PLANILLAS)
+    parser.add_argument('--anio', type=int, default=2031)
+    parser.add_argument('--mes', type=int, default=3, help="Mes inicial (1-12)")
+    parser.add_argument('--meses', type=int, default=1, help="Cantidad de meses (un par de archivos por mes)")
+    parser.add_argument('--dias', type=int, help="Hojas por archivo (por defecto el mes completo)")
+    parser.add_argument('--filas', type=int, default=150, help="Recorridos por hoja")
+    parser.add_argument('--desorden', type=float, default=0.5, help="0 = planilla limpia, 1 = muy desordenada")
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    rutas, total = generar(args.carpeta, args.anio, args.mes, args.meses, args.dias,
+                           args.filas, args.desorden, args.semilla)
+    for ruta in rutas:
+        print(ruta)
+    print(f"{len(rutas)} archivos, {total} filas")
+
+
+if __name__ == '__main__':
+    main()
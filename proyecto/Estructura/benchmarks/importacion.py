@@ -0,0 +1,228 @@
+# BENCHMARK DEL PIPELINE DE IMPORTACIÓN DE EXCEL
+# Genera planillas con generar_planillas.py (o usa las de --carpeta) y pasa
+# por el mismo camino que "Importar Excel" del panel:
+#   leer        pd.read_excel de cada libro
+#   detectar    día, mes/año, fila de encabezado y columnas de cada hoja
+#   normalizar  limpieza de texto/andén y escritura de los CSV
+#   cargar      ejecutar_insercion_datos (INSERT ... ON CONFLICT en Postgres)
+# Se repite --repeticiones veces y se informa la mediana y el mínimo de cada
+# etapa; una pasada extra con tracemalloc mide el pico de memoria de
+# procesamiento (leer+detectar+normalizar) y de carga.
+#
+# Las filas cargadas se borran al final de cada repetición (por el rango de
+# fechas de las planillas, por defecto 2031) salvo con --conservar. Se
+# cargan en el terminal TERMINAL (sql/010).
+#
+# Con --comparar anterior.json --umbral 20 el script termina con código 1 si
+# alguna etapa es más de 20% más lenta: sirve para detectar regresiones
+# antes de la carga mensual.
+#
+# Uso (desde proyecto/Estructura, con la base de pruebas en el .env):
+#   python benchmarks/importacion.py --filas 300 --desorden 0.7
+#   python benchmarks/importacion.py --sin-carga --comparar benchmarks/resultados/importacion_X.json
+import argparse
+import datetime
+import glob
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from comun import RAIZ, conectar, error, guardar_resultado, version_codigo
+from generar_planillas import generar
+
+sys.path.insert(0, RAIZ)
+from manipulacion_datos.generar_salidas_llegadas import ejecutar_procesamiento_excel  # noqa: E402
+from manipulacion_datos.insertar_datos import ejecutar_insercion_datos  # noqa: E402
+
+ETAPAS = ['leer', 'detectar', 'normalizar', 'cargar']
+TERMINAL = 1
+
+
+def _copiar_planillas(origen):
+    # Cada repetición en una carpeta nueva: el pipeline deja sus CSV junto a los Excel
+    destino = tempfile.mkdtemp(prefix="importacion_")
+    for ruta in glob.glob(os.path.join(origen, "*.xlsx")):
+        shutil.copy(ruta, destino)
+    return destino
+
+
+def _rango_fechas(carpeta):
+    fechas = []
+    for nombre in ('llegadas_limpio.csv', 'salidas_limpio.csv'):
+        ruta = os.path.join(carpeta, nombre)
+        if os.path.exists(ruta):
+            fechas += list(pd.read_csv(ruta, sep=';', usecols=['fecha'])['fecha'])
+    return (min(fechas), max(fechas)) if fechas else None
+
+
+def _filas_csv(carpeta):
+    total = 0
+    for nombre in ('llegadas_limpio.csv', 'salidas_limpio.csv'):
+        ruta = os.path.join(carpeta, nombre)
+        if os.path.exists(ruta):
+            with open(ruta, encoding='utf-8') as f:
+                total += sum(1 for _ in f) - 1
+    return total
+
+
+def _borrar_cargadas(rango):
+    conn = conectar()
+    cur = conn.cursor()
+    for tabla in ('import_llegadas', 'import_salidas'):
+        cur.execute(f"DELETE FROM {tabla} WHERE terminal_id = %s AND fecha BETWEEN %s AND %s",
+                    (TERMINAL,) + tuple(rango))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def corrida(origen, cargar, conservar, memoria=False):
+    """Una pasada completa; devuelve (segundos por etapa, filas, picos de memoria en bytes)."""
+    carpeta = _copiar_planillas(origen)
+    tiempos, picos = {}, {}
+    try:
+        if memoria:
+            tracemalloc.start()
+        exito, mensajes = ejecutar_procesamiento_excel(carpeta, tiempos)
+        if memoria:
+            picos['procesar'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+        if not exito:
+            error("El pipeline no produjo datos: " + "; ".join(mensajes))
+        filas = _filas_csv(carpeta)
+        rango = _rango_fechas(carpeta)
+
+        if cargar:
+            inicio = time.perf_counter()
+            exito_db, mensajes_db = ejecutar_insercion_datos(carpeta, TERMINAL)
+            tiempos['cargar'] = time.perf_counter() - inicio
+            if memoria:
+                picos['cargar'] = tracemalloc.get_traced_memory()[1]
+            if not exito_db:
+                error("La carga falló: " + "; ".join(mensajes_db))
+            if not conservar:
+                _borrar_cargadas(rango)
+        return tiempos, filas, picos
+    finally:
+        if memoria:
+            tracemalloc.stop()
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide cada etapa de la importación de planillas Excel.")
+    parser.add_argument('--carpeta', help="Usar estas planillas en vez de generarlas")
+    parser.add_argument('--meses', type=int, default=1)
+    parser.add_argument('--dias', type=int, help="Hojas por archivo (por defecto el mes completo)")
+    parser.add_argument('--filas', type=int, default=150, help="Recorridos por hoja")
+    parser.add_argument('--desorden', type=float, default=0.5)
+    parser.add_argument('--anio', type=int, default=2031, help="Año de las planillas (no debe chocar con datos reales)")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--sin-carga', action='store_true', help="No toca la base de datos")
+    parser.add_argument('--sin-memoria', action='store_true', help="Omite la pasada con tracemalloc")
+    parser.add_argument('--conservar', action='store_true', help="No borra las filas cargadas")
+    parser.add_argument('--etiqueta', default='')
+    parser.add_argument('--salida')
+    parser.add_argument('--comparar', help="JSON de una corrida anterior")
+    parser.add_argument('--umbral', type=float, default=20, help="%% de lentitud que se considera regresión")
+    args = parser.parse_args()
+
+    cargar = not args.sin_carga
+    carpeta_generada = None
+    if args.carpeta:
+        origen = args.carpeta
+    else:
+        origen = carpeta_generada = tempfile.mkdtemp(prefix="planillas_")
+        inicio = time.perf_counter()
+        rutas, _ = generar(origen, anio=args.anio, meses=args.meses, dias=args.dias, filas=args.filas,
+                           desorden=args.desorden, semilla=args.semilla)
+        print(f"{len(rutas)} planillas generadas en {time.perf_counter() - inicio:.1f}s")
+
+    try:
+        tamano = sum(os.path.getsize(r) for r in glob.glob(os.path.join(origen, "*.xlsx")))
+        # Con --conservar solo la primera repetición inserta; el resto mediría duplicados
+        repeticiones = 1 if args.conservar and cargar else args.repeticiones
+        mediciones, filas = {e: [] for e in ETAPAS}, 0
+        for i in range(repeticiones):
+            tiempos, filas, _ = corrida(origen, cargar, args.conservar)
+            for etapa, segundos in tiempos.items():
+                mediciones[etapa].append(segundos)
+            print(f"Repetición {i + 1}: " + ", ".join(f"{e} {s:.3f}s" for e, s in tiempos.items()))
+
+        picos = {}
+        if not args.sin_memoria:
+            _, _, picos = corrida(origen, cargar and not args.conservar, args.conservar, memoria=True)
+    finally:
+        if carpeta_generada:
+            shutil.rmtree(carpeta_generada, ignore_errors=True)
+
+    etapas = {}
+    for etapa in ETAPAS:
+        valores = mediciones[etapa]
+        if not valores:
+            continue
+        mediana = statistics.median(valores)
+        etapas[etapa] = {
+            'mediana_s': round(mediana, 4),
+            'minimo_s': round(min(valores), 4),
+            'filas_por_segundo': round(filas / mediana) if mediana else None,
+        }
+    total = sum(e['mediana_s'] for e in etapas.values())
+
+    print(f"\n{'Etapa':<12}{'Mediana s':>11}{'Mínimo s':>11}{'Filas/s':>11}")
+    for etapa, e in etapas.items():
+        print(f"{etapa:<12}{e['mediana_s']:>11}{e['minimo_s']:>11}{e['filas_por_segundo']:>11}")
+    print(f"{'total':<12}{total:>11.4f}")
+    print(f"\n{filas} filas, {tamano / 1024 / 1024:.1f} MB de Excel")
+    for nombre, pico in picos.items():
+        print(f"Pico de memoria ({nombre}): {pico / 1024 / 1024:.1f} MB")
+
+    resultado = {
+        'meta': {
+            'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': version_codigo(),
+            'etiqueta': args.etiqueta,
+            'parametros': {k: v for k, v in vars(args).items() if k not in ('salida', 'comparar')},
+            'filas': filas,
+            'bytes_excel': tamano,
+        },
+        'etapas': etapas,
+        'total_s': round(total, 4),
+        'memoria_pico_bytes': picos,
+    }
+    guardar_resultado("importacion", resultado, args.salida)
+
+    if args.comparar:
+        regresiones = comparar(etapas, args.comparar, args.umbral)
+        if regresiones:
+            print(f"\nREGRESIÓN en: {', '.join(regresiones)}")
+            sys.exit(1)
+
+
+def comparar(etapas, ruta_anterior, umbral):
+    with open(ruta_anterior, encoding='utf-8') as f:
+        anterior = json.load(f)
+    print(f"\nComparación con {os.path.basename(ruta_anterior)} (commit {anterior['meta'].get('commit')}):")
+    print(f"{'Etapa':<12}{'Antes s':>10}{'Ahora s':>10}{'Δ':>9}")
+    regresiones = []
+    for etapa, e in etapas.items():
+        a = anterior['etapas'].get(etapa)
+        if not a or not a['mediana_s']:
+            continue
+        delta = (e['mediana_s'] - a['mediana_s']) / a['mediana_s'] * 100
+        print(f"{etapa:<12}{a['mediana_s']:>10}{e['mediana_s']:>10}{delta:>+8.1f}%")
+        if delta > umbral:
+            regresiones.append(etapa)
+    return regresiones
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# PRESUPUESTO DE ARRANQUE EN FRÍO DE LA APP WEB
+# Importa wsgi (lo mismo que carga gunicorn) en un proceso nuevo con
+# "python -X importtime", --repeticiones veces, y revisa tres cosas:
+#   - que el tiempo acumulado del módulo (la mediana) no pase de
+#     --presupuesto-ms;
+#   - que la memoria máxima (RSS) del proceso no pase de --presupuesto-rss-mb;
+#   - que no se haya cargado ningún módulo pesado de PROHIBIDOS (pandas,
+#     openpyxl, xlsxwriter...): esos solo se importan dentro de la
+#     importación de Excel y de los reportes. Si aparece uno, se muestra
+#     la cadena de imports que lo trajo.
+# Termina con código 1 si algo falla, así sirve antes de un despliegue o
+# en CI. La misma revisión corre con pytest (tests/test_tiempo_importacion.py,
+# marcada 'lento').
+#
+# Uso (desde proyecto/Estructura):
+#   python benchmarks/tiempo_importacion.py
+#   python benchmarks/tiempo_importacion.py --presupuesto-ms 300 --repeticiones 7
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from comun import RAIZ, guardar_resultado, version_codigo
+
+PROHIBIDOS = ('pandas', 'numpy', 'openpyxl', 'xlsxwriter', 'pyarrow', 'sqlalchemy')
+
+PRESUPUESTO_MS = float(os.getenv("IMPORTACION_PRESUPUESTO_MS", "400"))
+PRESUPUESTO_RSS_MB = float(os.getenv("IMPORTACION_PRESUPUESTO_RSS_MB", "60"))
+
+# __import__ y no importlib.import_module: este último no aparece en -X importtime
+CODIGO = """
+import sys
+__import__(sys.argv[1])
+try:
+    import resource
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+except ImportError:
+    print(0)
+"""
+
+
+def medir(modulo):
+    """Una corrida en un proceso nuevo: [(profundidad, módulo, acumulado_us)] y RSS máximo en KB."""
+    proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", CODIGO, modulo],
+                             cwd=RAIZ, capture_output=True, text=True)
+    if proceso.returncode != 0:
+        print(proceso.stderr[-2000:], file=sys.stderr)
+        raise RuntimeError(f"No se pudo importar {modulo}")
+
+    filas = []
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        profundidad = (len(nombre) - len(nombre.lstrip(" "))) // 2
+        filas.append((profundidad, nombre.strip(), int(acumulado)))
+    rss = int(proceso.stdout.strip().splitlines()[-1] or 0)
+    return filas, rss
+
+
+def cadena(filas, indice):
+    """Módulo en 'indice' y quienes lo importaron (importtime lista al padre después de sus hijos)."""
+    profundidad, nombre, _ = filas[indice]
+    resultado = [nombre]
+    for otra_profundidad, otro_nombre, _ in filas[indice + 1:]:
+        if otra_profundidad < profundidad:
+            resultado.append(otro_nombre)
+            profundidad = otra_profundidad
+    return " <- ".join(resultado)
+
+
+def revisar(modulo='wsgi', presupuesto_ms=PRESUPUESTO_MS, presupuesto_rss_mb=PRESUPUESTO_RSS_MB,
+            repeticiones=5):
+    """Mide 'repeticiones' veces y devuelve las medidas y la lista de fallas (vacía si todo cumple)."""
+    tiempos, memorias, cargados = [], [], {}
+    for _ in range(repeticiones):
+        filas, rss = medir(modulo)
+        tiempos.append(next(us for prof, nombre, us in filas if prof == 0 and nombre == modulo) / 1000)
+        memorias.append(rss)
+        for i, (_, nombre, _) in enumerate(filas):
+            raiz = nombre.split(".")[0]
+            if raiz in PROHIBIDOS and raiz not in cargados:
+                cargados[raiz] = cadena(filas, i)
+
+    mediana = statistics.median(tiempos)
+    rss_mb = max(memorias) / 1024
+    fallas = []
+    if mediana > presupuesto_ms:
+        fallas.append(f"el import tarda {mediana:.0f} ms (> {presupuesto_ms:.0f} ms)")
+    # Sin el módulo resource (Windows) el RSS llega en 0 y no se revisa
+    if rss_mb > presupuesto_rss_mb:
+        fallas.append(f"el proceso usa {rss_mb:.1f} MB de RSS (> {presupuesto_rss_mb:.0f} MB)")
+    for nombre, traza in sorted(cargados.items()):
+        fallas.append(f"se cargó {nombre} al arrancar: {traza}")
+    return {'tiempos_ms': tiempos, 'rss_kb': memorias, 'prohibidos_cargados': cargados,
+            'mediana_ms': mediana, 'fallas': fallas}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Controla el tiempo de import y los módulos cargados al arrancar la app.")
+    parser.add_argument('--modulo', default='wsgi', help="Módulo a importar (por defecto wsgi)")
+    parser.add_argument('--presupuesto-ms', type=float, default=PRESUPUESTO_MS)
+    parser.add_argument('--presupuesto-rss-mb', type=float, default=PRESUPUESTO_RSS_MB)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--guardar', action='store_true', help="Guarda el resultado en benchmarks/resultados/")
+    args = parser.parse_args()
+
+    resultado = revisar(args.modulo, args.presupuesto_ms, args.presupuesto_rss_mb, args.repeticiones)
+    tiempos, memorias = resultado['tiempos_ms'], resultado['rss_kb']
+    print(f"import {args.modulo}: mediana {resultado['mediana_ms']:.0f} ms, mínimo {min(tiempos):.0f} ms "
+          f"(presupuesto {args.presupuesto_ms:.0f} ms)")
+    if max(memorias):
+        print(f"RSS máximo: {max(memorias) / 1024:.1f} MB (presupuesto {args.presupuesto_rss_mb:.0f} MB)")
+
+    if args.guardar:
+        guardar_resultado("tiempo_importacion", {
+            'version': version_codigo(),
+            'modulo': args.modulo,
+            'tiempos_ms': tiempos,
+            'rss_kb': memorias,
+            'prohibidos_cargados': resultado['prohibidos_cargados'],
+        })
+
+    for falla in resultado['fallas']:
+        print(f"FALLA: {falla}", file=sys.stderr)
+    sys.exit(1 if resultado['fallas'] else 0)
+
+
+if __name__ == '__main__':
+    main()
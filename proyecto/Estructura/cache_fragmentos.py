@@ -0,0 +1,97 @@
+# CACHÉ DE FRAGMENTOS HTML (PANTALLA Y DASHBOARD PÚBLICO)
+# Las filas de la pantalla y los resultados del dashboard salen iguales para
+# todos mientras no cambien los datos ni los filtros, así que se renderizan
+# una vez y se guardan como HTML. La llave lleva la versión de las tablas de
+# origen (version_datos, sql/009): cualquier escritura, de este proceso, de
+# otro worker o de una carga externa, cambia la llave y el fragmento viejo
+# deja de usarse. La versión se relee a lo más cada VERSION_SEGUNDOS.
+#
+# Un LRU en memoria por terminal, cada uno con su tope en bytes
+# (FRAGMENTOS_MAX_MB): un terminal con mucho tráfico o muchos filtros
+# distintos solo descarta sus propios fragmentos. Las versiones también son
+# por terminal (sql/010), así que las escrituras de un terminal no invalidan
+# lo guardado de otro. Un fragmento más grande que el tope se devuelve pero
+# no se guarda.
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import metricas
+
+MAX_BYTES = int(float(os.getenv("FRAGMENTOS_MAX_MB", "16")) * 1024 * 1024)
+VERSION_SEGUNDOS = float(os.getenv("FRAGMENTOS_VERSION_SEG", "2"))
+
+_caches = {}   # terminal_id -> OrderedDict llave -> (valor, bytes)
+_bytes = {}    # terminal_id -> bytes guardados
+_versiones = {}
+_versiones_leidas = None  # time.monotonic() de la última lectura de version_datos
+_lock = threading.Lock()
+_contadores = {'descartes': 0}   # aciertos y fallos van en metricas.contar_cache
+
+
+def _tamano(valor):
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(_tamano(v) for v in valor)
+    return sys.getsizeof(valor)
+
+
+def version(repo, terminal_id, *tablas):
+    """
+    Tupla con la versión actual de cada tabla para el terminal, leída de la BD
+    cada VERSION_SEGUNDOS. Las tablas comunes (empresas, lugares) van con terminal 0.
+    """
+    global _versiones, _versiones_leidas
+    ahora = time.monotonic()
+    if _versiones_leidas is None or ahora - _versiones_leidas >= VERSION_SEGUNDOS:
+        versiones = repo.version_datos()
+        with _lock:
+            _versiones, _versiones_leidas = versiones, ahora
+    return tuple(_versiones.get((tabla, terminal_id), _versiones.get((tabla, 0), 0)) for tabla in tablas)
+
+
+def obtener(terminal_id, llave, generar):
+    """Valor guardado para 'llave' en el terminal o generar() (que se guarda). Las excepciones no se cachean."""
+    with _lock:
+        cache = _caches.setdefault(terminal_id, OrderedDict())
+        entrada = cache.get(llave)
+        if entrada is not None:
+            cache.move_to_end(llave)
+    if entrada is not None:
+        metricas.contar_cache('fragmentos', True)
+        return entrada[0]
+    metricas.contar_cache('fragmentos', False)
+
+    valor = generar()
+    tamano = _tamano(valor)
+    if tamano > MAX_BYTES:
+        return valor
+    with _lock:
+        anterior = cache.pop(llave, None)
+        usados = _bytes.get(terminal_id, 0) - (anterior[1] if anterior is not None else 0)
+        cache[llave] = (valor, tamano)
+        usados += tamano
+        while usados > MAX_BYTES:
+            _, (_, liberado) = cache.popitem(last=False)
+            usados -= liberado
+            _contadores['descartes'] += 1
+        _bytes[terminal_id] = usados
+    return valor
+
+
+def vaciar(terminal_id=None):
+    """Borra los fragmentos de un terminal, o de todos (y fuerza releer las versiones)."""
+    global _versiones_leidas
+    with _lock:
+        for id_terminal in ([terminal_id] if terminal_id is not None else list(_caches)):
+            _caches.pop(id_terminal, None)
+            _bytes.pop(id_terminal, None)
+        _versiones_leidas = None
+
+
+def obtener_contadores():
+    with _lock:
+        return dict(_contadores, terminales=len(_caches),
+                    entradas=sum(len(cache) for cache in _caches.values()),
+                    bytes=sum(_bytes.values()))
@@ -0,0 +1,68 @@
+# CACHÉ DE USUARIOS PARA FLASK-LOGIN
+# load_user se llama en cada petición autenticada; guardamos la fila del
+# usuario en memoria por unos segundos para no consultar 'usuarios' siempre.
+# Al editar/desactivar/eliminar se invalida localmente y se "toca" un archivo
+# marca, así los demás procesos del servidor vacían su caché en la siguiente
+# petición (un os.stat, mucho más barato que ir a la base de datos).
+import os
+import tempfile
+import threading
+import time
+
+import metricas
+
+TTL_SEGUNDOS = int(os.getenv("USUARIOS_CACHE_TTL", "60"))
+ARCHIVO_MARCA = os.getenv("USUARIOS_CACHE_MARCA",
+                          os.path.join(tempfile.gettempdir(), "terminal_usuarios.version"))
+
+_cache = {}          # id (str) -> (expira, fila o None)
+_marca_vista = None
+_lock = threading.Lock()
+
+
+def _leer_marca():
+    try:
+        return os.stat(ARCHIVO_MARCA).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _revisar_marca():
+    global _marca_vista
+    marca = _leer_marca()
+    if marca != _marca_vista:
+        with _lock:
+            _cache.clear()
+            _marca_vista = marca
+
+
+def obtener_usuario(user_id, cargar):
+    """
+    Devuelve la fila del usuario desde la caché o usando cargar(user_id).
+    También se guarda el resultado None (usuario eliminado) para no repetir la consulta.
+    """
+    _revisar_marca()
+    clave = str(user_id)
+    ahora = time.monotonic()
+
+    entrada = _cache.get(clave)
+    if entrada and entrada[0] > ahora:
+        metricas.contar_cache('usuarios', True)
+        return entrada[1]
+    metricas.contar_cache('usuarios', False)
+
+    fila = cargar(user_id)
+    with _lock:
+        _cache[clave] = (ahora + TTL_SEGUNDOS, fila)
+    return fila
+
+
+def invalidar_usuario(user_id):
+    with _lock:
+        _cache.pop(str(user_id), None)
+    # Aviso a los otros procesos (y a este: la próxima petición vacía la caché)
+    try:
+        with open(ARCHIVO_MARCA, 'w') as f:
+            f.write(f"{time.time_ns()} {user_id}")
+    except OSError as e:
+        print(f"Error al invalidar caché de usuarios: {e}")
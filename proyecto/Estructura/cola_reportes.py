@@ -0,0 +1,139 @@
+# COLA DE REPORTES EN SEGUNDO PLANO + CACHÉ DE ARCHIVOS
+# Cada reporte se identifica por (tipo, rango de fechas, versión de datos).
+# La versión la calcula la ruta (versiones por día del rango pedido, sql/002 y
+# resumenes_diarios.version_*), así que cualquier escritura en esos datos
+# genera otra clave y el archivo viejo deja de servirse. El estado se guarda
+# en disco junto al archivo para que cualquier proceso del servidor pueda
+# responder la consulta de avance.
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metricas
+
+CARPETA_CACHE = os.getenv("REPORTES_CACHE_DIR", os.path.join(tempfile.gettempdir(), "reportes_terminal"))
+MAX_TRABAJOS = int(os.getenv("REPORTES_WORKERS", "2"))
+# Un 'pendiente' más viejo que esto se considera abandonado (proceso caído)
+LIMITE_PENDIENTE_SEG = int(os.getenv("REPORTES_LIMITE_SEG", "600"))
+
+_ejecutor = None
+_ejecutor_pid = None
+_en_curso = set()
+_lock = threading.Lock()
+
+
+def _obtener_ejecutor():
+    global _ejecutor, _ejecutor_pid
+    # Un ejecutor por proceso (los hilos no sobreviven a un fork)
+    with _lock:
+        if _ejecutor is None or _ejecutor_pid != os.getpid():
+            _ejecutor = ThreadPoolExecutor(max_workers=MAX_TRABAJOS, thread_name_prefix="reportes")
+            _ejecutor_pid = os.getpid()
+            _en_curso.clear()
+        return _ejecutor
+
+
+def _hash_corto(texto):
+    return hashlib.sha1(str(texto).encode('utf-8')).hexdigest()[:10]
+
+
+def clave_reporte(tipo, f_inicio, f_fin, version):
+    return f"{tipo}_{_hash_corto(f'{f_inicio}|{f_fin}')}_{_hash_corto(version)}"
+
+
+def ruta_archivo(clave, extension):
+    return os.path.join(CARPETA_CACHE, f"{clave}.{extension}")
+
+
+def _ruta_estado(clave):
+    return os.path.join(CARPETA_CACHE, f"{clave}.json")
+
+
+def _guardar_estado(clave, estado):
+    ruta_tmp = f"{_ruta_estado(clave)}.{os.getpid()}.tmp"
+    with open(ruta_tmp, 'w', encoding='utf-8') as f:
+        json.dump(estado, f)
+    os.replace(ruta_tmp, _ruta_estado(clave))
+
+
+def leer_estado(clave):
+    """Devuelve el estado del trabajo ('pendiente', 'listo', 'vacio', 'error') o None si no existe."""
+    if clave in _en_curso:
+        return {'estado': 'pendiente'}
+    try:
+        with open(_ruta_estado(clave), encoding='utf-8') as f:
+            estado = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if estado.get('estado') == 'listo' and not os.path.exists(ruta_archivo(clave, estado['extension'])):
+        return None
+    return estado
+
+
+def _purgar_versiones_antiguas(clave):
+    # Mismo tipo y rango, distinta versión de datos
+    prefijo = clave.rsplit('_', 1)[0]
+    for ruta in glob.glob(os.path.join(CARPETA_CACHE, f"{prefijo}_*")):
+        if not os.path.basename(ruta).startswith(clave):
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+
+
+def _ejecutar(clave, generador, f_inicio, f_fin, mensaje_vacio, extension):
+    # La extensión va al final: pandas/xlsxwriter la revisan al abrir el archivo
+    ruta_tmp = os.path.join(CARPETA_CACHE, f"{clave}.{os.getpid()}.tmp.{extension}")
+    try:
+        nombre_descarga = generador(ruta_tmp, f_inicio, f_fin)
+        if nombre_descarga is None:
+            estado = {'estado': 'vacio', 'mensaje': mensaje_vacio}
+        else:
+            os.replace(ruta_tmp, ruta_archivo(clave, extension))
+            estado = {'estado': 'listo', 'nombre': nombre_descarga, 'extension': extension}
+        _guardar_estado(clave, estado)
+        _purgar_versiones_antiguas(clave)
+    except Exception as e:
+        print(f"Error generando reporte {clave}: {e}")
+        _guardar_estado(clave, {'estado': 'error', 'mensaje': f"Error al generar reporte: {e}"})
+    finally:
+        if os.path.exists(ruta_tmp):
+            os.remove(ruta_tmp)
+        with _lock:
+            _en_curso.discard(clave)
+
+
+def solicitar_reporte(tipo, f_inicio, f_fin, version, generador, mensaje_vacio, extension='xlsx'):
+    """
+    Encola la generación si no hay un archivo vigente para la clave.
+    generador(ruta_destino, f_inicio, f_fin) escribe el archivo y devuelve el
+    nombre de descarga, o None si no hay datos en el rango.
+    Retorna (clave, estado).
+    """
+    os.makedirs(CARPETA_CACHE, exist_ok=True)
+    clave = clave_reporte(tipo, f_inicio, f_fin, version)
+
+    estado = leer_estado(clave)
+    if estado and estado['estado'] == 'pendiente' and clave not in _en_curso:
+        # Lo está generando otro proceso; si lleva demasiado, lo reintentamos
+        if time.time() - estado.get('inicio', 0) > LIMITE_PENDIENTE_SEG:
+            estado = None
+    if estado and estado['estado'] != 'error':
+        # 'listo' = archivo servido desde la caché; 'pendiente' = otra petición ya lo genera
+        metricas.contar_cache('reportes', estado['estado'] in ('listo', 'vacio'))
+        return clave, estado
+    metricas.contar_cache('reportes', False)
+
+    ejecutor = _obtener_ejecutor()
+    with _lock:
+        if clave in _en_curso:
+            return clave, {'estado': 'pendiente'}
+        _en_curso.add(clave)
+    _guardar_estado(clave, {'estado': 'pendiente', 'inicio': time.time()})
+    ejecutor.submit(_ejecutar, clave, generador, f_inicio, f_fin, mensaje_vacio, extension)
+    return clave, {'estado': 'pendiente'}
@@ -0,0 +1,181 @@
+# COMPRESIÓN Y CACHÉ HTTP
+# - Las respuestas de texto (HTML, JSON, CSS, JS) de más de COMPRESION_MINIMO
+#   bytes salen comprimidas con brotli (si está instalado) o gzip, según el
+#   Accept-Encoding del navegador. Los estáticos se comprimen una sola vez
+#   (nivel máximo) y quedan en memoria.
+# - url_for('static', ...) agrega ?v=<huella del contenido>. Esas URL se
+#   sirven con "immutable" por un año: las pantallas no vuelven a pedir
+#   LOGO.png ni Bootstrap hasta que el archivo cambie (y con él la URL).
+#   Sin ?v= se cachean ESTATICOS_MAX_AGE segundos.
+# - vendor('bootstrap.min.css') en las plantillas usa la copia local de
+#   static/vendor (la baja vendor_estaticos.py al arrancar gunicorn y al
+#   sincronizar el kiosco) y, si falta, el CDN.
+import gzip
+import hashlib
+import os
+import threading
+import time
+
+from flask import current_app, request, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+TIPOS_COMPRIMIBLES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'image/svg+xml',
+}
+UN_ANIO = 365 * 24 * 3600
+
+# Nombre en plantillas -> (ruta dentro de static/, URL del CDN con la misma versión)
+VENDOR = {
+    'bootstrap.min.css': (
+        'vendor/bootstrap/bootstrap.min.css',
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css'),
+    'bootstrap.bundle.min.js': (
+        'vendor/bootstrap/bootstrap.bundle.min.js',
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js'),
+    'bootstrap-icons.css': (
+        'vendor/bootstrap-icons/bootstrap-icons.css',
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.5/font/bootstrap-icons.css'),
+    # Las fuentes las pide el CSS de los íconos con ruta relativa (./fonts/...)
+    'bootstrap-icons.woff2': (
+        'vendor/bootstrap-icons/fonts/bootstrap-icons.woff2',
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.5/font/fonts/bootstrap-icons.woff2'),
+    'bootstrap-icons.woff': (
+        'vendor/bootstrap-icons/fonts/bootstrap-icons.woff',
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.5/font/fonts/bootstrap-icons.woff'),
+}
+
+MAX_COMPRIMIDOS = 256
+
+_lock = threading.Lock()
+_huellas = {}        # ruta -> ((mtime, tamaño), huella)
+_comprimidos = {}    # (archivo, etag, codificación) -> bytes
+
+
+# --- HUELLAS DE ESTÁTICOS ---
+
+def huella(carpeta, archivo):
+    """Primeros 12 hex del sha256 del archivo; se recalcula solo si cambia mtime o tamaño."""
+    ruta = safe_join(carpeta, archivo)
+    if ruta is None:
+        return None
+    try:
+        st = os.stat(ruta)
+    except OSError:
+        return None
+    firma = (st.st_mtime_ns, st.st_size)
+    actual = _huellas.get(ruta)
+    if actual is not None and actual[0] == firma:
+        return actual[1]
+    with open(ruta, 'rb') as f:
+        valor = hashlib.sha256(f.read()).hexdigest()[:12]
+    with _lock:
+        _huellas[ruta] = (firma, valor)
+    return valor
+
+
+def _agregar_huella(endpoint, valores):
+    if endpoint == 'static' and 'filename' in valores and 'v' not in valores:
+        valor = huella(current_app.static_folder, valores['filename'])
+        if valor:
+            valores['v'] = valor
+
+
+def vendor(nombre):
+    """URL local (con huella) de una librería de VENDOR, o la del CDN si no se descargó."""
+    ruta, cdn = VENDOR[nombre]
+    if os.path.isfile(os.path.join(current_app.static_folder, ruta)):
+        return url_for('static', filename=ruta)
+    return cdn
+
+
+# --- COMPRESIÓN ---
+
+def _codificacion():
+    aceptadas = request.accept_encodings
+    if brotli is not None and aceptadas['br']:
+        return 'br'
+    if aceptadas['gzip']:
+        return 'gzip'
+    return None
+
+
+def _codificar(datos, codificacion, maximo=False):
+    if codificacion == 'br':
+        # Calidad 11 es lenta; solo para estáticos, que se comprimen una vez
+        return brotli.compress(datos, quality=11 if maximo else 5)
+    return gzip.compress(datos, compresslevel=9 if maximo else 6, mtime=0)
+
+
+def _comprimir(respuesta, minimo):
+    if respuesta.status_code != 200 or 'Content-Encoding' in respuesta.headers:
+        return
+    if respuesta.mimetype not in TIPOS_COMPRIMIBLES:
+        return
+    estatico = request.endpoint == 'static'
+    # Descargas y streams generados quedan como están
+    if respuesta.is_streamed and not estatico:
+        return
+    respuesta.vary.add('Accept-Encoding')
+    codificacion = _codificacion()
+    if codificacion is None:
+        return
+
+    respuesta.direct_passthrough = False
+    datos = respuesta.get_data()
+    if len(datos) < minimo:
+        return
+
+    etag, debil = respuesta.get_etag()
+    if estatico and etag:
+        clave = (request.view_args.get('filename'), etag, codificacion)
+        comprimido = _comprimidos.get(clave)
+        if comprimido is None:
+            comprimido = _codificar(datos, codificacion, maximo=True)
+            with _lock:
+                if len(_comprimidos) >= MAX_COMPRIMIDOS:
+                    _comprimidos.clear()
+                _comprimidos[clave] = comprimido
+    else:
+        comprimido = _codificar(datos, codificacion)
+    if len(comprimido) >= len(datos):
+        return
+
+    respuesta.set_data(comprimido)
+    respuesta.headers['Content-Encoding'] = codificacion
+    if etag:
+        # Otra representación, otro ETag; con eso el If-None-Match vuelve a dar 304
+        respuesta.set_etag(f"{etag}-{codificacion}", debil)
+        respuesta.make_conditional(request.environ)
+
+
+# --- MIDDLEWARE ---
+
+def _despues(respuesta):
+    config = current_app.config
+    if request.endpoint == 'static' and respuesta.status_code in (200, 304):
+        version = request.args.get('v')
+        if version and version == huella(current_app.static_folder, request.view_args.get('filename', '')):
+            max_age = UN_ANIO
+            respuesta.cache_control.immutable = True
+        else:
+            max_age = config['ESTATICOS_MAX_AGE']
+        respuesta.cache_control.no_cache = None
+        respuesta.cache_control.public = True
+        respuesta.cache_control.max_age = max_age
+        respuesta.expires = int(time.time() + max_age)
+
+    if config['COMPRESION_ACTIVA']:
+        _comprimir(respuesta, config['COMPRESION_MINIMO'])
+    return respuesta
+
+
+def init_app(app):
+    app.url_defaults(_agregar_huella)
+    app.after_request(_despues)
+    app.jinja_env.globals['vendor'] = vendor
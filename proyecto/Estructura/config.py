@@ -0,0 +1,38 @@
+# CONFIGURACIÓN DE LA APLICACIÓN
+# Los valores salen del .env / variables de entorno. create_app(config)
+# acepta un dict u objeto para sobreescribirlos (por ejemplo en pruebas).
+import os
+
+
+class Config:
+    def __init__(self):
+        # SEGURIDAD: Solo usa el .env
+        self.SECRET_KEY = os.getenv("SECRET_KEY")
+
+        self.DB_HOST = os.getenv("DB_HOST")
+        self.DB_NAME = os.getenv("DB_NAME")
+        self.DB_USER = os.getenv("DB_USER")
+        self.DB_PASS = os.getenv("DB_PASS")
+        self.DB_PORT = os.getenv("DB_PORT", "5432")
+
+        # Proxies de confianza delante de gunicorn (nginx = 1): la IP del cliente
+        # sale de X-Forwarded-For. Con 0 se usa la del socket y el encabezado se ignora
+        self.PROXY_SALTOS = int(os.getenv("PROXY_SALTOS", "0"))
+
+        # Pool por proceso: con N workers de gunicorn hay hasta N * DB_POOL_MAX conexiones
+        self.DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+        self.DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+        self.DB_POOL_ESPERA = float(os.getenv("DB_POOL_ESPERA", "10"))
+        # Pool asyncpg de servicio_async.py (un solo proceso para pantalla y dashboard)
+        self.ASYNC_POOL_MIN = int(os.getenv("ASYNC_POOL_MIN", "0"))
+        self.ASYNC_POOL_MAX = int(os.getenv("ASYNC_POOL_MAX", "10"))
+
+        # Capa de datos (repositorio.py): 'postgres' o 'sqlite' (kiosco / pruebas sin servidor)
+        self.DB_BACKEND = os.getenv("DB_BACKEND", "postgres")
+        self.DB_SQLITE_RUTA = os.getenv("DB_SQLITE_RUTA", "terminal.db")
+
+        # Compresión de respuestas (compresion.py): brotli si está instalado, si no gzip
+        self.COMPRESION_ACTIVA = os.getenv("COMPRESION_ACTIVA", "1") == "1"
+        self.COMPRESION_MINIMO = int(os.getenv("COMPRESION_MINIMO", "500"))
+        # Estáticos pedidos sin ?v=<huella>; con huella se cachean un año (immutable)
+        self.ESTATICOS_MAX_AGE = int(os.getenv("ESTATICOS_MAX_AGE", "3600"))
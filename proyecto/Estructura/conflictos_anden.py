@@ -0,0 +1,113 @@
+# CONFLICTOS DE ANDÉN
+# Nada revisaba que dos buses no quedaran programados en el mismo andén a
+# la misma hora: verificar_recorrido solo compara el andén real con el
+# programado cuando el bus ya llegó. Aquí cada recorrido es un intervalo
+# de ocupación de su andén:
+#   - salida:  [hora - permanencia, hora]   (el bus llega antes a cargar)
+#   - llegada: [hora, hora + permanencia]   (descarga)
+# con la permanencia en minutos de permanencia_anden (sql/011) por tipo y,
+# si hay fila, por empresa. Dos intervalos del mismo andén y terminal que
+# se solapan son un conflicto; uno que termina justo cuando empieza el
+# otro no lo es. Los recorridos cancelados o sin andén no ocupan nada.
+#
+# Barrido por andén: se ordenan los intervalos por inicio y se mantiene un
+# heap con los que siguen ocupando el andén (por fin). Al llegar un
+# intervalo se sacan los que ya terminaron y cada uno que queda en el heap
+# se solapa con él. O(n log n + k) para n recorridos y k conflictos.
+#
+# Se revisa al importar (manipulacion_datos/insertar_datos.py), al crear o
+# editar un recorrido desde el panel y a pedido para un rango de fechas
+# (/admin/api/conflictos_anden, modal "Conflictos de Andén").
+import datetime
+import heapq
+from collections import defaultdict, namedtuple
+
+# Si permanencia_anden no tiene la fila del tipo
+PERMANENCIA_DEFECTO = {'salidas': 15, 'llegadas': 10}
+# Rango máximo de una revisión a pedido
+MAX_DIAS = 31
+
+Ocupacion = namedtuple('Ocupacion', 'tipo id fecha hora empresa lugar anden inicio fin')
+Conflicto = namedtuple('Conflicto', 'anden desde hasta a b')
+
+
+def _fecha(valor):
+    return datetime.date.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+def minutos_permanencia(permanencias, tipo, empresa):
+    if (tipo, empresa) in permanencias:
+        return permanencias[(tipo, empresa)]
+    return permanencias.get((tipo, ''), PERMANENCIA_DEFECTO[tipo])
+
+
+def ocupacion(fila, permanencias):
+    """Fila de Repositorio.ocupacion_andenes -> Ocupacion con su intervalo."""
+    tipo, id_recorrido, fecha, hora, empresa, lugar, anden = fila
+    momento = datetime.datetime.combine(fecha, hora)
+    permanencia = datetime.timedelta(minutes=minutos_permanencia(permanencias, tipo, empresa))
+    if tipo == 'salidas':
+        inicio, fin = momento - permanencia, momento
+    else:
+        inicio, fin = momento, momento + permanencia
+    return Ocupacion(tipo, id_recorrido, fecha, hora, empresa, lugar, anden, inicio, fin)
+
+
+def buscar_conflictos(ocupaciones):
+    """Pares de ocupaciones que se solapan en el mismo andén, ordenados por inicio del solape."""
+    por_anden = defaultdict(list)
+    for o in ocupaciones:
+        por_anden[o.anden].append(o)
+
+    conflictos = []
+    for anden, lista in por_anden.items():
+        lista.sort(key=lambda o: (o.inicio, o.fin))
+        activas = []   # heap (fin, orden, ocupación) de las que aún ocupan el andén
+        for orden, o in enumerate(lista):
+            while activas and activas[0][0] <= o.inicio:
+                heapq.heappop(activas)
+            for fin, _, otra in activas:
+                conflictos.append(Conflicto(anden, o.inicio, min(fin, o.fin), otra, o))
+            heapq.heappush(activas, (o.fin, orden, o))
+
+    conflictos.sort(key=lambda c: (c.desde, c.anden))
+    return conflictos
+
+
+def detectar(repo, terminal_id, desde, hasta):
+    """
+    Conflictos del terminal cuyo solape cae en los días desde..hasta. Se lee
+    un día más por lado: una llegada de las 23:55 ocupa el andén pasada la
+    medianoche y choca con las salidas del día siguiente.
+    """
+    desde, hasta = _fecha(desde), _fecha(hasta)
+    un_dia = datetime.timedelta(days=1)
+    permanencias = repo.permanencias_anden()
+    ocupaciones = [ocupacion(fila, permanencias)
+                   for fila in repo.ocupacion_andenes(terminal_id, desde - un_dia, hasta + un_dia)]
+
+    inicio = datetime.datetime.combine(desde, datetime.time())
+    fin = datetime.datetime.combine(hasta + un_dia, datetime.time())
+    return [c for c in buscar_conflictos(ocupaciones) if c.desde < fin and c.hasta > inicio]
+
+
+def del_recorrido(conflictos, tipo, id_recorrido):
+    """Los conflictos en que participa el recorrido (tipo 'llegadas' | 'salidas')."""
+    return [c for c in conflictos if (tipo, id_recorrido) in ((c.a.tipo, c.a.id), (c.b.tipo, c.b.id))]
+
+
+def describir(o):
+    """'SALIDA 10:30 BUSES X (PUERTO MONTT)' para mensajes del panel."""
+    return f"{o.tipo[:-1].upper()} {o.hora.strftime('%H:%M')} {o.empresa} ({o.lugar})"
+
+
+def a_dict(conflicto):
+    """Conflicto -> dict para la API JSON del panel."""
+    def recorrido(o):
+        return {'tipo': o.tipo, 'id': o.id, 'fecha': o.fecha.isoformat(), 'hora': o.hora.strftime('%H:%M'),
+                'empresa': o.empresa, 'lugar': o.lugar}
+    return {'anden': conflicto.anden,
+            'desde': conflicto.desde.strftime('%Y-%m-%d %H:%M'),
+            'hasta': conflicto.hasta.strftime('%H:%M'),
+            'minutos': int((conflicto.hasta - conflicto.desde).total_seconds() // 60),
+            'a': recorrido(conflicto.a), 'b': recorrido(conflicto.b)}
@@ -0,0 +1,231 @@
+# REGISTRO DE CONSULTAS LENTAS
+# El cursor de db.py llama a registrar(...) con cada consulta que supera
+# CONSULTAS_LENTAS_MS. Se guarda el SQL, su huella (el SQL normalizado: sin
+# literales ni parámetros), los parámetros, la duración y la ruta que la
+# ejecutó en un buffer circular por proceso.
+#
+# Una muestra de ellas (solo lecturas: SELECT / WITH sin INSERT-UPDATE-DELETE)
+# se vuelve a ejecutar con EXPLAIN (ANALYZE, BUFFERS) en un hilo aparte, con
+# su propia conexión en modo solo lectura, para no frenar la petición ni
+# tocar la transacción de la ruta. Las consultas armadas con f-strings
+# (filtros del dashboard, admin_panel, reportes) comparten huella cuando
+# tienen la misma forma, así se ve qué combinación de filtros necesita índice.
+#
+# Igual que metricas.py, cada proceso deja una copia en METRICAS_DIR y la
+# página del administrador junta las de todos los workers vivos.
+import collections
+import datetime
+import hashlib
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+from flask import has_request_context, request
+
+import metricas
+
+UMBRAL_MS = float(os.getenv("CONSULTAS_LENTAS_MS", "200"))
+MUESTREO = float(os.getenv("CONSULTAS_LENTAS_MUESTREO", "0.2"))       # Fracción con EXPLAIN
+MAXIMO = int(os.getenv("CONSULTAS_LENTAS_MAX", "200"))                 # Tamaño del buffer
+MAXIMO_HUELLAS = int(os.getenv("CONSULTAS_LENTAS_HUELLAS", "500"))
+ESPERA_EXPLAIN_SEG = float(os.getenv("CONSULTAS_LENTAS_ESPERA_EXPLAIN", "300"))  # Por huella
+TIMEOUT_EXPLAIN_MS = int(os.getenv("CONSULTAS_LENTAS_TIMEOUT_MS", "30000"))
+
+_RE_COMENTARIO = re.compile(r"--[^\n]*")
+_RE_CADENA = re.compile(r"'(?:[^']|'')*'")
+_RE_MARCADOR = re.compile(r"%\(\w+\)s|%s")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACIOS = re.compile(r"\s+")
+_RE_ESCRITURA = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|TRUNCATE)\b", re.IGNORECASE)
+
+_lock = threading.Lock()
+_recientes = collections.deque(maxlen=MAXIMO)
+_huellas = {}          # huella -> {'sql', 'cuenta', 'total_ms', 'maximo_ms', 'ultimo_explain'}
+_pendientes = None     # Cola de entradas que esperan EXPLAIN o copia en disco
+_pid = None
+_conexion_directa = None
+
+
+def configurar(conexion_directa):
+    """conexion_directa() -> conexión nueva fuera del pool (db.conexion_directa)."""
+    global _conexion_directa
+    _conexion_directa = conexion_directa
+
+
+def normalizar(sql):
+    """SQL sin comentarios, literales ni parámetros y con los espacios colapsados."""
+    texto = _RE_COMENTARIO.sub(" ", sql)
+    texto = _RE_CADENA.sub("?", texto)
+    texto = _RE_MARCADOR.sub("?", texto)
+    texto = _RE_NUMERO.sub("?", texto)
+    texto = _RE_LISTA.sub("(?, ...)", texto)
+    return _RE_ESPACIOS.sub(" ", texto).strip()
+
+
+def huella(sql_normalizado):
+    return hashlib.md5(sql_normalizado.encode('utf-8')).hexdigest()[:12]
+
+
+def _es_lectura(sql_normalizado):
+    inicio = sql_normalizado[:4].upper()
+    return inicio in ('SELE', 'WITH') and not _RE_ESCRITURA.search(sql_normalizado)
+
+
+def _texto(consulta, cursor):
+    if isinstance(consulta, bytes):
+        return consulta.decode('utf-8', 'replace')
+    if hasattr(consulta, 'as_string'):      # psycopg2.sql.Composed
+        return consulta.as_string(cursor)
+    return str(consulta)
+
+
+def _parametros_visibles(sql, parametros):
+    if parametros is None:
+        return None
+    # No guardamos contraseñas (hash) ni datos de login en el registro
+    if 'password' in sql.lower():
+        return '[oculto]'
+    texto = repr(parametros)
+    return texto if len(texto) <= 500 else texto[:500] + '...'
+
+
+def registrar(cursor, consulta, parametros, duracion):
+    """Lo llama CursorMedido.execute cuando la consulta supera el umbral."""
+    try:
+        pendientes = _cola_del_proceso()
+        sql = _texto(consulta, cursor)
+        normalizado = normalizar(sql)
+        clave = huella(normalizado)
+        ms = duracion * 1000
+        entrada = {
+            'fecha': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'huella': clave,
+            'sql': sql.strip(),
+            'parametros': _parametros_visibles(sql, parametros),
+            'duracion_ms': round(ms, 1),
+            'ruta': request.endpoint if has_request_context() else None,
+            'pid': os.getpid(),
+            'plan': None,
+        }
+
+        explicar = False
+        with _lock:
+            datos = _huellas.get(clave)
+            if datos is None and len(_huellas) < MAXIMO_HUELLAS:
+                datos = _huellas[clave] = {'sql': normalizado, 'cuenta': 0, 'total_ms': 0.0,
+                                           'maximo_ms': 0.0, 'ultimo_explain': 0.0}
+            if datos is not None:
+                datos['cuenta'] += 1
+                datos['total_ms'] += ms
+                datos['maximo_ms'] = max(datos['maximo_ms'], ms)
+                ahora = time.monotonic()
+                if (_es_lectura(normalizado) and random.random() < MUESTREO
+                        and ahora - datos['ultimo_explain'] >= ESPERA_EXPLAIN_SEG):
+                    datos['ultimo_explain'] = ahora
+                    explicar = True
+            _recientes.append(entrada)
+
+        # cursor.query = SQL final con los parámetros ya escapados por psycopg2
+        # (en un cursor con nombre es un DECLARE, que no se puede explicar)
+        consulta_final = cursor.query if explicar and not cursor.name else None
+        pendientes.put_nowait((entrada, consulta_final))
+    except queue.Full:
+        pass
+    except Exception as e:
+        print(f"Error al registrar consulta lenta: {e}")
+
+
+# --- EXPLAIN Y COPIA EN DISCO (hilo por proceso) ---
+
+def _cola_del_proceso():
+    global _pendientes, _pid
+    if _pid != os.getpid():
+        with _lock:
+            if _pid != os.getpid():
+                _pendientes = queue.Queue(maxsize=100)
+                _pid = os.getpid()
+                _recientes.clear()
+                _huellas.clear()
+                threading.Thread(target=_trabajador, args=(_pendientes,),
+                                 name="consultas_lentas", daemon=True).start()
+    return _pendientes
+
+
+def _explicar(conn, consulta_final):
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SET LOCAL statement_timeout = {TIMEOUT_EXPLAIN_MS}")
+        cur.execute(b"EXPLAIN (ANALYZE, BUFFERS) " + consulta_final)
+        return "\n".join(fila[0] for fila in cur.fetchall())
+    finally:
+        cur.close()
+        conn.rollback()
+
+
+def _trabajador(pendientes):
+    conn = None
+    while True:
+        entrada, consulta_final = pendientes.get()
+        if consulta_final is not None and _conexion_directa is not None:
+            try:
+                if conn is None or conn.closed:
+                    conn = _conexion_directa()
+                    # Solo lectura: aunque algo se cuele, EXPLAIN ANALYZE no puede escribir
+                    conn.set_session(readonly=True)
+                entrada['plan'] = _explicar(conn, consulta_final)
+            except Exception as e:
+                entrada['plan'] = f"No se pudo obtener el plan: {e}"
+                if conn is not None and conn.closed:
+                    conn = None
+        try:
+            _volcar()
+        except OSError as e:
+            print(f"Error al guardar consultas lentas: {e}")
+
+
+def _instantanea():
+    with _lock:
+        return {
+            'recientes': list(_recientes),
+            'huellas': {k: {c: v for c, v in d.items() if c != 'ultimo_explain'}
+                        for k, d in _huellas.items()},
+        }
+
+
+def _volcar():
+    os.makedirs(metricas.CARPETA, exist_ok=True)
+    ruta = os.path.join(metricas.CARPETA, f"lentas_{os.getpid()}.json")
+    with open(f"{ruta}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(_instantanea(), f, default=str)
+    os.replace(f"{ruta}.tmp", ruta)
+
+
+# --- CONSULTA (página del administrador) ---
+
+def obtener_resumen(limite_huellas=50):
+    """
+    Junta los registros de todos los procesos vivos.
+    Devuelve (huellas ordenadas por tiempo total, consultas recientes de la más nueva a la más antigua).
+    """
+    instantaneas = [_instantanea()] + metricas.leer_otros_procesos("lentas_")
+
+    huellas, recientes = {}, []
+    for datos in instantaneas:
+        recientes.extend(datos['recientes'])
+        for clave, d in datos['huellas'].items():
+            actual = huellas.setdefault(clave, {'huella': clave, 'sql': d['sql'], 'cuenta': 0,
+                                                'total_ms': 0.0, 'maximo_ms': 0.0})
+            actual['cuenta'] += d['cuenta']
+            actual['total_ms'] += d['total_ms']
+            actual['maximo_ms'] = max(actual['maximo_ms'], d['maximo_ms'])
+
+    for d in huellas.values():
+        d['promedio_ms'] = d['total_ms'] / d['cuenta'] if d['cuenta'] else 0
+    ordenadas = sorted(huellas.values(), key=lambda d: d['total_ms'], reverse=True)[:limite_huellas]
+    recientes.sort(key=lambda e: e['fecha'], reverse=True)
+    return ordenadas, recientes[:MAXIMO]
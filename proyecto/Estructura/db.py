@@ -0,0 +1,203 @@
+# CONEXIONES A POSTGRES (POOL POR PROCESO)
+# Todas las rutas y módulos piden la conexión con obtener_conexion().
+# En vez de abrir un socket nuevo por petición se toma uno del pool; al
+# llamar close() la conexión vuelve al pool (con rollback si quedó una
+# transacción abierta), así el código existente no cambia.
+#
+# El pool se crea la primera vez que se usa EN CADA PROCESO: con gunicorn
+# (prefork) cada worker abre sus propios sockets y nunca usa los del padre.
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions, pool
+
+import consultas_lentas
+import metricas
+
+_parametros = None
+_pool = None
+_pool_pid = None
+_cupos = None              # Semáforo: limita las conexiones prestadas a DB_POOL_MAX
+_lock = threading.Lock()
+_prestadas = threading.local()
+
+
+class CursorMedido(extensions.cursor):
+    """Cursor de todas las conexiones del pool: mide cada consulta para metricas.py."""
+
+    def execute(self, consulta, parametros=None):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(consulta, parametros)
+        finally:
+            duracion = time.perf_counter() - inicio
+            metricas.registrar_consulta(duracion)
+            if duracion * 1000 >= consultas_lentas.UMBRAL_MS:
+                consultas_lentas.registrar(self, consulta, parametros, duracion)
+
+    def executemany(self, consulta, lista_parametros):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(consulta, lista_parametros)
+        finally:
+            metricas.registrar_consulta(time.perf_counter() - inicio)
+
+
+def _parametros_env():
+    return {
+        'host': os.getenv("DB_HOST"),
+        'database': os.getenv("DB_NAME"),
+        'user': os.getenv("DB_USER"),
+        'password': os.getenv("DB_PASS"),
+        'port': os.getenv("DB_PORT", "5432"),
+        'minimo': int(os.getenv("DB_POOL_MIN", "1")),
+        'maximo': int(os.getenv("DB_POOL_MAX", "10")),
+        'espera': float(os.getenv("DB_POOL_ESPERA", "10")),
+    }
+
+
+def configurar(config):
+    """Toma los parámetros DB_* de la configuración de Flask (ver config.py)."""
+    global _parametros, _pool_pid
+    _parametros = {
+        'host': config.get('DB_HOST'),
+        'database': config.get('DB_NAME'),
+        'user': config.get('DB_USER'),
+        'password': config.get('DB_PASS'),
+        'port': config.get('DB_PORT', '5432'),
+        'minimo': int(config.get('DB_POOL_MIN', 1)),
+        'maximo': int(config.get('DB_POOL_MAX', 10)),
+        'espera': float(config.get('DB_POOL_ESPERA', 10)),
+    }
+    # Se recrea el pool con los nuevos parámetros en el próximo uso
+    _pool_pid = None
+
+
+def _obtener_pool():
+    global _pool, _pool_pid, _cupos, _parametros
+    if _pool_pid == os.getpid():
+        return _pool
+    with _lock:
+        if _pool_pid != os.getpid():
+            if _parametros is None:
+                _parametros = _parametros_env()
+            p = _parametros
+            # Si heredamos un pool del proceso padre NO lo cerramos: sus sockets
+            # siguen siendo del padre. Solo lo olvidamos.
+            _pool = pool.ThreadedConnectionPool(
+                p['minimo'], p['maximo'],
+                host=p['host'], database=p['database'], user=p['user'],
+                password=p['password'], port=p['port'], cursor_factory=CursorMedido)
+            _cupos = threading.BoundedSemaphore(p['maximo'])
+            _pool_pid = os.getpid()
+    return _pool
+
+
+def iniciar_pool():
+    """Crea el pool de este proceso (lo llama gunicorn en post_fork)."""
+    try:
+        _obtener_pool()
+    except Exception as e:
+        print(f"Error al crear el pool de conexiones: {e}")
+
+
+def cerrar_pool():
+    global _pool_pid
+    with _lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool_pid = None
+
+
+def conexion_directa(**opciones):
+    """
+    Conexión nueva fuera del pool (EXPLAIN de consultas_lentas.py, escritor de
+    instantanea_pizarra.py). 'opciones' va a psycopg2.connect (connect_timeout, options).
+    """
+    p = _parametros or _parametros_env()
+    return psycopg2.connect(host=p['host'], database=p['database'], user=p['user'],
+                            password=p['password'], port=p['port'], **opciones)
+
+
+class ConexionPool:
+    """Envoltura de la conexión: se usa igual que la de psycopg2, pero close() la devuelve al pool."""
+
+    def __init__(self, pool_origen, cupos, conn):
+        self._pool = pool_origen
+        self._cupos = cupos
+        self._conn = conn
+
+    def __getattr__(self, nombre):
+        if self._conn is None:
+            raise psycopg2.InterfaceError("connection already closed")
+        return getattr(self._conn, nombre)
+
+    @property
+    def closed(self):
+        return 1 if self._conn is None else self._conn.closed
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        _lista_prestadas().discard(self)
+        descartar = bool(conn.closed)
+        if not descartar and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                descartar = True
+        try:
+            self._pool.putconn(conn, close=descartar)
+        except Exception as e:
+            # Pool de otro proceso o ya cerrado: cerramos el socket y seguimos
+            print(f"Error al devolver conexión al pool: {e}")
+        finally:
+            self._cupos.release()
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+
+def _lista_prestadas():
+    if not hasattr(_prestadas, 'conexiones'):
+        _prestadas.conexiones = set()
+    return _prestadas.conexiones
+
+
+def obtener_conexion():
+    """Conexión del pool, o None si no se pudo obtener (mismo contrato que antes)."""
+    try:
+        pool_actual = _obtener_pool()
+        cupos = _cupos
+        inicio = time.perf_counter()
+        if not cupos.acquire(timeout=_parametros['espera']):
+            print("Error conexión DB: pool agotado (DB_POOL_MAX)")
+            return None
+        try:
+            conn = pool_actual.getconn()
+            if conn.closed:
+                pool_actual.putconn(conn, close=True)
+                conn = pool_actual.getconn()
+        except Exception:
+            cupos.release()
+            raise
+        metricas.observar('db_pool_espera_segundos', time.perf_counter() - inicio)
+    except Exception as e:
+        print(f"Error conexión DB: {e}")
+        return None
+
+    envoltura = ConexionPool(pool_actual, cupos, conn)
+    _lista_prestadas().add(envoltura)
+    return envoltura
+
+
+def liberar_pendientes():
+    """Devuelve al pool las conexiones que la petición no cerró (teardown de Flask)."""
+    for envoltura in list(_lista_prestadas()):
+        envoltura.close()
@@ -0,0 +1,67 @@
+# CONFIGURACIÓN DE GUNICORN (PRODUCCIÓN, VARIOS PROCESOS EN UN SERVIDOR)
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Cada worker es un proceso con sus propios hilos y su propio pool de
+# conexiones (db.py), creado después del fork: ningún socket se comparte
+# entre procesos. Conexiones totales a Postgres = workers * DB_POOL_MAX,
+# y DB_POOL_MAX debería ser >= threads.
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# La importación de Excel puede tardar; los reportes ya van en segundo plano
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# Reciclar workers de vez en cuando acota el crecimiento de memoria (pandas
+# queda cargado en el worker que atendió una importación de Excel)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = 200
+
+# La app (Flask, plantillas) se importa una vez en el maestro y los workers la
+# heredan por copy-on-write; pools e hilos se crean por worker. pandas y
+# openpyxl no se cargan al arrancar (benchmarks/tiempo_importacion.py lo vigila).
+preload_app = True
+
+accesslog = "-"
+
+
+def on_starting(server):
+    # Bootstrap e íconos locales (static/vendor) antes de levantar los workers:
+    # solo baja lo que falte; sin red sigue con el CDN y avisa
+    import vendor_estaticos
+    fallidos = vendor_estaticos.descargar()
+    if fallidos:
+        server.log.warning("No se pudieron descargar a static/vendor: %s (se usará el CDN)", ", ".join(fallidos))
+
+
+def when_ready(server):
+    # Una vez en el maestro, con conexión propia (el pool es de cada worker)
+    if os.getenv("DB_BACKEND", "postgres") != "postgres":
+        return
+    import db
+    from repositorio import RepositorioPostgres
+    try:
+        creadas = RepositorioPostgres(db.conexion_directa).asegurar_particiones()
+        if creadas:
+            server.log.info("Particiones mensuales creadas: %s", creadas)
+    except Exception as e:
+        print(f"Error al asegurar particiones: {e}")
+
+
+def post_fork(server, worker):
+    import db
+    db.iniciar_pool()
+
+
+def worker_exit(server, worker):
+    import auditoria
+    import db
+    # Primero la auditoría pendiente (usa el pool), después cerramos el pool
+    auditoria.vaciar()
+    db.cerrar_pool()
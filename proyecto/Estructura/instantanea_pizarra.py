@@ -0,0 +1,269 @@
+# INSTANTÁNEA DE LA PANTALLA EN DISCO (MODO SIN BASE DE DATOS)
+# Si Postgres se cae o se pone lento, /pantalla salía vacía y las TVs
+# quedaban en blanco hasta la recarga siguiente. Ahora un hilo escritor
+# guarda cada INTERVALO_SEG (PIZARRA_INSTANTANEA_SEG) la pizarra de cada
+# terminal en un JSON compacto en CARPETA (PIZARRA_INSTANTANEA_DIR): el día
+# completo + la madrugada de mañana, las noticias activas, la versión de
+# los datos (version_datos, sql/009 y 010) y la hora en que se confirmaron.
+#
+# Cómo se sirve /pantalla (app.inicio y servicio_async.pantalla):
+#   - Con el escritor vivo (archivo tocado hace menos de 3 intervalos) se
+#     sirve desde el disco, sin tocar la base: la carga de las TVs sobre
+#     Postgres es cero y un cambio de estado tarda a lo más INTERVALO_SEG
+#     en verse.
+#   - Sin escritor (recién partido, modo apagado): se consulta la base como
+#     antes y, si no hay conexión, se sirve la última instantánea que haya.
+#   - El escritor lee con presupuesto PRESUPUESTO_MS (para conectarse y
+#     para cada consulta). Si la base no responde a tiempo la instantánea
+#     no se reescribe, solo se toca (el escritor sigue vivo), y la pantalla
+#     sigue con esos datos; pasados AVISO_SEG sin confirmar muestra desde
+#     qué hora son.
+#
+# La ventana de la pantalla (desde 2 horas atrás) se aplica al servir, no
+# al guardar: una instantánea vieja se sigue recortando con la hora actual.
+#
+# Un solo proceso por servidor escribe (flock sobre CARPETA/escritor.lock);
+# si muere, el candado se libera y lo toma el hilo de otro worker. Si la
+# versión de los datos y el día no cambiaron, no se repiten las consultas
+# de la pizarra. El archivo se reemplaza con os.replace (nunca se lee a
+# medias) y lleva 'formato': uno de otro formato se ignora.
+import datetime
+import glob
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+import psycopg2
+
+import terminales
+from repositorio import CONSULTA_TERMINALES, consulta_noticias, consulta_pizarra, separar_por_tipo
+
+try:
+    import fcntl
+except ImportError:   # Windows (desarrollo): cada proceso escribe
+    fcntl = None
+
+CARPETA = os.getenv("PIZARRA_INSTANTANEA_DIR", os.path.join(tempfile.gettempdir(), "pizarra_terminal"))
+INTERVALO_SEG = float(os.getenv("PIZARRA_INSTANTANEA_SEG", "15"))    # 0 apaga el modo
+PRESUPUESTO_MS = int(os.getenv("PIZARRA_PRESUPUESTO_MS", "1500"))
+AVISO_SEG = float(os.getenv("PIZARRA_AVISO_SEG", "120"))
+FORMATO = 1
+TABLAS = ('import_llegadas', 'import_salidas', 'noticias')
+
+Instantanea = namedtuple('Instantanea', 'version fecha confirmada pizarra noticias')
+
+_activa = False
+_conexion_directa = None
+_leidas = {}          # terminal_id -> (st_mtime_ns, Instantanea)
+_lock = threading.Lock()
+_pid = None
+_contadores = {'servidas': 0, 'respaldo': 0, 'escrituras': 0, 'fallos': 0}
+
+
+def configurar(activa, conexion_directa):
+    """activa: backend Postgres; conexion_directa(**opciones) -> conexión fuera del pool (db.conexion_directa)."""
+    global _activa, _conexion_directa
+    _activa = activa and INTERVALO_SEG > 0
+    _conexion_directa = conexion_directa
+
+
+def _contar(nombre):
+    with _lock:
+        _contadores[nombre] += 1
+
+
+def _ruta(terminal_id):
+    return os.path.join(CARPETA, f"pizarra_{terminal_id}.json")
+
+
+# --- LECTURA (PETICIONES) ---
+
+def _leer(terminal_id):
+    """(segundos desde que se tocó el archivo, Instantanea) o None; se parsea de nuevo solo si cambió."""
+    ruta = _ruta(terminal_id)
+    try:
+        estado = os.stat(ruta)
+    except OSError:
+        return None
+    leida = _leidas.get(terminal_id)
+    if leida is None or leida[0] != estado.st_mtime_ns:
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if datos.get('formato') != FORMATO:
+            return None
+        leida = (estado.st_mtime_ns, Instantanea(
+            version=datos['version'],
+            fecha=datetime.date.fromisoformat(datos['fecha']),
+            confirmada=datos['confirmada'],
+            pizarra={tipo: [_de_json(fila) for fila in datos[tipo]] for tipo in ('llegadas', 'salidas')},
+            noticias=datos['noticias']))
+        _leidas[terminal_id] = leida
+    return time.time() - estado.st_mtime, leida[1]
+
+
+def vigente(terminal_id):
+    """Instantánea del terminal si el escritor la mantiene (se sirve sin consultar la base), o None."""
+    if not _activa:
+        return None
+    leida = _leer(terminal_id)
+    if leida is None or leida[0] > 3 * INTERVALO_SEG:
+        return None
+    _contar('servidas')
+    return leida[1]
+
+
+def leer(terminal_id):
+    """Última instantánea del terminal, de cualquier antigüedad (respaldo cuando la base falla), o None."""
+    if not _activa:
+        return None
+    leida = _leer(terminal_id)
+    if leida is None:
+        return None
+    _contar('respaldo')
+    return leida[1]
+
+
+def filtrar(pizarra, fecha_hoy, fecha_manana, hora_limite=None):
+    """La ventana de repositorio.consulta_pizarra aplicada a las filas guardadas."""
+    def en_ventana(fila):
+        hora, fecha = fila[1], fila[5]
+        if fecha == fecha_hoy:
+            return hora_limite is None or hora >= hora_limite
+        return fecha == fecha_manana and hora <= datetime.time(4, 0)
+    return {tipo: [fila for fila in filas if en_ventana(fila)] for tipo, filas in pizarra.items()}
+
+
+def version_recorridos(instantanea):
+    """Misma tupla que cache_fragmentos.version(..., 'import_llegadas', 'import_salidas')."""
+    return instantanea.version['import_llegadas'], instantanea.version['import_salidas']
+
+
+def aviso(instantanea, zona):
+    """'HH:MM' (o 'dd/mm HH:MM' si es de otro día) de los datos si llevan más de AVISO_SEG sin confirmarse."""
+    if time.time() - instantanea.confirmada <= AVISO_SEG:
+        return None
+    confirmada = datetime.datetime.fromtimestamp(instantanea.confirmada, zona)
+    formato = '%H:%M' if confirmada.date() == datetime.datetime.now(zona).date() else '%d/%m %H:%M'
+    return confirmada.strftime(formato)
+
+
+# --- ESCRITURA (HILO DE FONDO) ---
+
+def _a_json(fila):
+    id_recorrido, hora, empresa, lugar, anden, fecha, estado = fila
+    return [id_recorrido, hora.isoformat(), empresa, lugar, anden, fecha.isoformat(), estado]
+
+
+def _de_json(fila):
+    id_recorrido, hora, empresa, lugar, anden, fecha, estado = fila
+    return (id_recorrido, datetime.time.fromisoformat(hora), empresa, lugar, anden,
+            datetime.date.fromisoformat(fecha), estado)
+
+
+def _escribir(terminal_id, instantanea):
+    datos = {'formato': FORMATO, 'terminal': terminal_id, 'version': instantanea.version,
+             'fecha': instantanea.fecha.isoformat(), 'confirmada': instantanea.confirmada,
+             'llegadas': [_a_json(fila) for fila in instantanea.pizarra['llegadas']],
+             'salidas': [_a_json(fila) for fila in instantanea.pizarra['salidas']],
+             'noticias': instantanea.noticias}
+    ruta = _ruta(terminal_id)
+    ruta_tmp = f"{ruta}.{os.getpid()}.tmp"
+    with open(ruta_tmp, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(ruta_tmp, ruta)
+
+
+def refrescar():
+    """Una pasada del escritor: confirma o vuelve a leer la pizarra de cada terminal."""
+    conn = _conexion_directa(connect_timeout=max(1, math.ceil(PRESUPUESTO_MS / 1000)),
+                             options=f"-c statement_timeout={PRESUPUESTO_MS}")
+    try:
+        # Versiones y filas de una misma foto de la base
+        conn.set_session(readonly=True, isolation_level='REPEATABLE READ')
+        cur = conn.cursor()
+        cur.execute(CONSULTA_TERMINALES)
+        filas_terminales = cur.fetchall()
+        terminales.cargar(filas_terminales)
+        cur.execute("SELECT tabla, terminal_id, version FROM version_datos")
+        versiones = {(tabla, terminal_id): version for tabla, terminal_id, version in cur.fetchall()}
+
+        os.makedirs(CARPETA, exist_ok=True)
+        for id_terminal, *_ in filas_terminales:
+            terminal = terminales.por_id(id_terminal)
+            hoy = datetime.datetime.now(terminal.zona).date()
+            version = {tabla: versiones.get((tabla, id_terminal), 0) for tabla in TABLAS}
+            anterior = _leer(id_terminal)
+            if anterior is not None and anterior[1].version == version and anterior[1].fecha == hoy:
+                pizarra, noticias = anterior[1].pizarra, anterior[1].noticias
+            else:
+                cur.execute(*consulta_pizarra(id_terminal, hoy, hoy + datetime.timedelta(days=1)))
+                pizarra = separar_por_tipo(cur.fetchall())
+                cur.execute(*consulta_noticias(id_terminal))
+                noticias = [fila[0] for fila in cur.fetchall()]
+            _escribir(id_terminal, Instantanea(version, hoy, time.time(), pizarra, noticias))
+            _contar('escrituras')
+        cur.close()
+    finally:
+        conn.close()
+
+
+def _marcar_vivas():
+    """La base no respondió: se tocan las instantáneas (el escritor sigue vivo) sin cambiar 'confirmada'."""
+    for ruta in glob.glob(os.path.join(CARPETA, "pizarra_*.json")):
+        try:
+            os.utime(ruta)
+        except OSError:
+            pass
+
+
+def _tomar_candado():
+    """Archivo con el candado de escritor tomado, o None si lo tiene otro proceso."""
+    os.makedirs(CARPETA, exist_ok=True)
+    archivo = open(os.path.join(CARPETA, "escritor.lock"), 'a')
+    if fcntl is not None:
+        try:
+            fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            archivo.close()
+            return None
+    return archivo
+
+
+def _trabajador():
+    candado = None
+    while True:
+        try:
+            if candado is None:
+                candado = _tomar_candado()
+            if candado is not None:
+                refrescar()
+        except (psycopg2.Error, OSError) as e:
+            _contar('fallos')
+            print(f"Error al guardar la instantánea de la pantalla: {e}")
+            if candado is not None:
+                _marcar_vivas()
+        time.sleep(INTERVALO_SEG)
+
+
+def iniciar():
+    """Arranca el hilo escritor de este proceso (uno por proceso; escribe el que tenga el candado)."""
+    global _pid
+    if not _activa or _pid == os.getpid():
+        return
+    with _lock:
+        if _pid != os.getpid():
+            _pid = os.getpid()
+            _leidas.clear()
+            threading.Thread(target=_trabajador, name="instantanea_pizarra", daemon=True).start()
+
+
+def obtener_contadores():
+    with _lock:
+        return dict(_contadores)
@@ -0,0 +1,191 @@
+# LÍMITE DE INTENTOS DE LOGIN (TOKEN BUCKET + ESPERA EXPONENCIAL)
+# check_password_hash es caro a propósito; este módulo rechaza el intento
+# ANTES de calcular el hash cuando un RUT o una IP exceden su cuota.
+#
+# - Cada clave ('rut:...' / 'ip:...') tiene un balde de fichas que se recarga
+#   con el tiempo; cada intento consume una ficha.
+# - Tras varios fallos seguidos se bloquea la clave 1s, 2s, 4s... (con tope).
+#
+# Backend por defecto: memoria del proceso. Con LOGIN_LIMITE_BACKEND=postgres
+# el estado vive en la tabla 'limite_login' (sql/003_limite_login.sql) y el
+# límite se respeta entre todos los procesos del servidor.
+import os
+import threading
+import time
+
+LIMITES = {
+    'rut': {
+        'capacidad': int(os.getenv("LOGIN_CAPACIDAD_RUT", "5")),
+        'recarga_seg': float(os.getenv("LOGIN_RECARGA_RUT", "12")),
+        'umbral_fallos': int(os.getenv("LOGIN_UMBRAL_RUT", "3")),
+    },
+    # Varias personas pueden compartir la IP de un kiosco: cuota más holgada
+    'ip': {
+        'capacidad': int(os.getenv("LOGIN_CAPACIDAD_IP", "30")),
+        'recarga_seg': float(os.getenv("LOGIN_RECARGA_IP", "2")),
+        'umbral_fallos': int(os.getenv("LOGIN_UMBRAL_IP", "15")),
+    },
+}
+ESPERA_BASE_SEG = float(os.getenv("LOGIN_ESPERA_BASE", "1"))
+ESPERA_MAX_SEG = float(os.getenv("LOGIN_ESPERA_MAX", "900"))
+# Fallos más antiguos que esto ya no cuentan para la espera exponencial
+VENTANA_FALLOS_SEG = float(os.getenv("LOGIN_VENTANA_FALLOS", "900"))
+MAX_CLAVES_MEMORIA = 10000
+
+contadores = {
+    'intentos': 0,
+    'rechazos_rut': 0,
+    'rechazos_ip': 0,
+    'fallos': 0,
+}
+_lock_contadores = threading.Lock()
+
+
+def _sumar(contador):
+    with _lock_contadores:
+        contadores[contador] += 1
+
+
+def _estado_nuevo(cfg, ahora):
+    return {'tokens': float(cfg['capacidad']), 'actualizado': ahora, 'fallos': 0,
+            'ultimo_fallo': 0.0, 'bloqueado_hasta': 0.0}
+
+
+# --- TRANSICIONES (iguales para ambos backends) ---
+
+def _consumir(estado, cfg, ahora):
+    if estado['bloqueado_hasta'] > ahora:
+        return estado, estado['bloqueado_hasta'] - ahora
+
+    transcurrido = max(0.0, ahora - estado['actualizado'])
+    estado['tokens'] = min(float(cfg['capacidad']), estado['tokens'] + transcurrido / cfg['recarga_seg'])
+    estado['actualizado'] = ahora
+
+    if estado['tokens'] < 1:
+        return estado, (1 - estado['tokens']) * cfg['recarga_seg']
+    estado['tokens'] -= 1
+    return estado, 0
+
+
+def _fallo(estado, cfg, ahora):
+    if ahora - estado['ultimo_fallo'] > VENTANA_FALLOS_SEG:
+        estado['fallos'] = 0
+    estado['fallos'] += 1
+    estado['ultimo_fallo'] = ahora
+    if estado['fallos'] >= cfg['umbral_fallos']:
+        exponente = estado['fallos'] - cfg['umbral_fallos']
+        espera = min(ESPERA_MAX_SEG, ESPERA_BASE_SEG * (2 ** min(exponente, 30)))
+        estado['bloqueado_hasta'] = ahora + espera
+    return estado, None
+
+
+def _exito(estado, _cfg, _ahora):
+    estado['fallos'] = 0
+    estado['bloqueado_hasta'] = 0.0
+    return estado, None
+
+
+# --- BACKENDS ---
+
+class BackendMemoria:
+    def __init__(self):
+        self.estados = {}
+        self.lock = threading.Lock()
+
+    def aplicar(self, clave, cfg, transicion):
+        ahora = time.time()
+        with self.lock:
+            if len(self.estados) > MAX_CLAVES_MEMORIA:
+                self._podar(ahora)
+            estado = self.estados.get(clave) or _estado_nuevo(cfg, ahora)
+            estado, resultado = transicion(estado, cfg, ahora)
+            self.estados[clave] = estado
+            return resultado
+
+    def _podar(self, ahora):
+        # Quitamos claves sin bloqueo ni fallos recientes
+        for clave in [c for c, e in self.estados.items()
+                      if e['bloqueado_hasta'] <= ahora and ahora - e['ultimo_fallo'] > VENTANA_FALLOS_SEG]:
+            del self.estados[clave]
+
+
+class BackendPostgres:
+    def __init__(self, obtener_conexion):
+        self.obtener_conexion = obtener_conexion
+
+    def aplicar(self, clave, cfg, transicion):
+        ahora = time.time()
+        conn = self.obtener_conexion()
+        if not conn:
+            # Sin base de datos el login tampoco funcionaría; no bloqueamos
+            return None
+        cur = conn.cursor()
+        try:
+            nuevo = _estado_nuevo(cfg, ahora)
+            cur.execute("""
+                INSERT INTO limite_login (clave, tokens, actualizado, fallos, ultimo_fallo, bloqueado_hasta)
+                VALUES (%s, %s, %s, 0, 0, 0)
+                ON CONFLICT (clave) DO NOTHING
+            """, (clave, nuevo['tokens'], ahora))
+            cur.execute("""
+                SELECT tokens, actualizado, fallos, ultimo_fallo, bloqueado_hasta
+                FROM limite_login WHERE clave = %s FOR UPDATE
+            """, (clave,))
+            fila = cur.fetchone()
+            estado = {'tokens': fila[0], 'actualizado': fila[1], 'fallos': fila[2],
+                      'ultimo_fallo': fila[3], 'bloqueado_hasta': fila[4]}
+            estado, resultado = transicion(estado, cfg, ahora)
+            cur.execute("""
+                UPDATE limite_login
+                SET tokens = %s, actualizado = %s, fallos = %s, ultimo_fallo = %s, bloqueado_hasta = %s
+                WHERE clave = %s
+            """, (estado['tokens'], estado['actualizado'], estado['fallos'], estado['ultimo_fallo'],
+                  estado['bloqueado_hasta'], clave))
+            conn.commit()
+            return resultado
+        except Exception as e:
+            conn.rollback()
+            print(f"Error límite login: {e}")
+            return None
+        finally:
+            cur.close()
+            conn.close()
+
+
+_backend = BackendMemoria()
+
+
+def configurar_backend(obtener_conexion):
+    """Activa el backend compartido si LOGIN_LIMITE_BACKEND=postgres."""
+    global _backend
+    if os.getenv("LOGIN_LIMITE_BACKEND", "memoria") == "postgres":
+        _backend = BackendPostgres(obtener_conexion)
+
+
+# --- API USADA POR LA RUTA /login ---
+
+def verificar_intento(rut, ip):
+    """Consume una ficha del RUT y de la IP. Retorna (permitido, segundos_de_espera)."""
+    _sumar('intentos')
+    for tipo, valor in (('ip', ip), ('rut', rut)):
+        espera = _backend.aplicar(f"{tipo}:{valor}", LIMITES[tipo], _consumir)
+        if espera:
+            _sumar(f'rechazos_{tipo}')
+            return False, int(espera) + 1
+    return True, 0
+
+
+def registrar_fallo(rut, ip):
+    _sumar('fallos')
+    _backend.aplicar(f"rut:{rut}", LIMITES['rut'], _fallo)
+    _backend.aplicar(f"ip:{ip}", LIMITES['ip'], _fallo)
+
+
+def registrar_exito(rut, ip):
+    # Solo se limpia el RUT: un acierto no debe "perdonar" los fallos de toda la IP
+    _backend.aplicar(f"rut:{rut}", LIMITES['rut'], _exito)
+
+
+def obtener_contadores():
+    with _lock_contadores:
+        return dict(contadores)
@@ -1,6 +1,7 @@
 import pandas as pd
 import os
 import re
+import time
 import unicodedata
 
 # 1. CONFIGURACIONES
@@ -70,7 +71,12 @@ def encontrar_encabezado(df):
             return i + 1
     return 0
 
-def procesar_excel(tipo, carpeta_uploads):
+def _medir(tiempos, etapa, inicio):
+    # Tiempo acumulado por etapa (lo usa benchmarks/importacion.py)
+    if tiempos is not None:
+        tiempos[etapa] = tiempos.get(etapa, 0) + time.perf_counter() - inicio
+
+def procesar_excel(tipo, carpeta_uploads, tiempos=None):
     archivos = [f for f in os.listdir(carpeta_uploads) if f.endswith('.xlsx') and "~$" not in f]
     
     dfs = []
@@ -84,12 +90,16 @@ def procesar_excel(tipo, carpeta_uploads):
         ruta_completa = os.path.join(carpeta_uploads, archivo)
         archivos_procesados += 1
 
+        inicio = time.perf_counter()
         try:
             xls = pd.read_excel(ruta_completa, sheet_name=None)
         except Exception as e:
             reporte_errores.append(f"Error al leer '{archivo}': Formato inválido.")
             continue
+        finally:
+            _medir(tiempos, 'leer', inicio)
 
+        inicio = time.perf_counter()
         for nombre_hoja, df_raw in xls.items():
             dia = extraer_dia_de_hoja(nombre_hoja)
             mes, anio = buscar_mes_y_anio_en_filas(df_raw)
@@ -128,11 +138,15 @@ def procesar_excel(tipo, carpeta_uploads):
             df = df[list(cols_existentes.keys())].rename(columns=cols_existentes)
             df['fecha'] = f"{anio}-{mes:02d}-{dia:02d}"
             dfs.append(df)
+        _medir(tiempos, 'detectar', inicio)
 
     if not dfs:
         return pd.DataFrame(), reporte_errores
 
-    return pd.concat(dfs, ignore_index=True), reporte_errores
+    inicio = time.perf_counter()
+    resultado = pd.concat(dfs, ignore_index=True)
+    _medir(tiempos, 'detectar', inicio)
+    return resultado, reporte_errores
 
 def guardar_csv(df, ruta_salida):
     if df.empty: return False
@@ -154,9 +168,10 @@ def guardar_csv(df, ruta_salida):
     df[cols].to_csv(ruta_salida, index=False, sep=';', encoding='utf-8')
     return True
 
-def ejecutar_procesamiento_excel(carpeta_uploads):
-    df_llegadas, errores_llegadas = procesar_excel('LLEGADAS', carpeta_uploads)
-    df_salidas, errores_salidas = procesar_excel('SALIDAS', carpeta_uploads)
+def ejecutar_procesamiento_excel(carpeta_uploads, tiempos=None):
+    """tiempos: dict opcional donde se acumulan los segundos de cada etapa (leer, detectar, normalizar)."""
+    df_llegadas, errores_llegadas = procesar_excel('LLEGADAS', carpeta_uploads, tiempos)
+    df_salidas, errores_salidas = procesar_excel('SALIDAS', carpeta_uploads, tiempos)
 
     ruta_llegadas = os.path.join(carpeta_uploads, 'llegadas_limpio.csv')
     ruta_salidas = os.path.join(carpeta_uploads, 'salidas_limpio.csv')
@@ -164,6 +179,7 @@ def ejecutar_procesamiento_excel(carpeta_uploads):
     mensajes = errores_llegadas + errores_salidas
     exito_total = False
 
+    inicio = time.perf_counter()
     if not df_llegadas.empty:
         guardar_csv(df_llegadas, ruta_llegadas)
         exito_total = True
@@ -171,5 +187,6 @@ def ejecutar_procesamiento_excel(carpeta_uploads):
     if not df_salidas.empty:
         guardar_csv(df_salidas, ruta_salidas)
         exito_total = True
+    _medir(tiempos, 'normalizar', inicio)
 
     return exito_total, mensajes
\ No newline at end of file
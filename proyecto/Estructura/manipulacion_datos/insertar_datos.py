@@ -1,79 +1,37 @@
 import pandas as pd
-import psycopg2
 import os
-from dotenv import load_dotenv
+from repositorio import obtener_repositorio, SinConexion
+import conflictos_anden
 
-load_dotenv()
-
-def conectar_db():
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST"),
-        database=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASS"),
-        port=os.getenv("DB_PORT", "5432")
-    )
-
-def obtener_id_empresa(cursor, nombre_empresa):
-    cursor.execute("SELECT id FROM empresas WHERE nombre = %s;", (nombre_empresa,))
-    resultado = cursor.fetchone()
-    if resultado: 
-        return resultado[0]
-    else:
-        cursor.execute("INSERT INTO empresas (nombre) VALUES (%s) RETURNING id;", (nombre_empresa,))
-        return cursor.fetchone()[0]
-
-def obtener_id_lugar(cursor, nombre_lugar):
-    if not nombre_lugar: return None
-    cursor.execute("SELECT id FROM lugares WHERE nombre = %s;", (nombre_lugar,))
-    resultado = cursor.fetchone()
-    if resultado: 
-        return resultado[0]
-    else:
-        cursor.execute("INSERT INTO lugares (nombre) VALUES (%s) RETURNING id;", (nombre_lugar,))
-        return cursor.fetchone()[0]
-
-def insertar_csv_en_tabla(conn, archivo_csv, tabla):
+def insertar_csv_en_tabla(repo, archivo_csv, tipo, terminal_id):
     if not os.path.exists(archivo_csv): 
-        return 0, 0 # Insertados, Duplicados
+        return 0, 0, None # Insertados, Duplicados, (fecha mínima, fecha máxima)
 
     try:
         df = pd.read_csv(archivo_csv, sep=';')
     except:
-        return 0, 0
+        return 0, 0, None
 
-    if df.empty: return 0, 0
+    if df.empty: return 0, 0, None
 
-    cur = conn.cursor()
-    insertados = 0
     total_filas = len(df)
 
-    # --- CAMBIO IMPORTANTE AQUÍ ---
-    # Agregamos la columna 'estado' y le forzamos el valor 'Programado'
-    sql = f"""
-        INSERT INTO {tabla} (lugar, hora, anden, empresa_nombre, fecha, estado)
-        VALUES (%s, %s, %s, %s, %s, 'Programado')
-        ON CONFLICT (fecha, hora, empresa_nombre, lugar) DO NOTHING
-    """
+    # Particiones de los meses de la planilla (si no existen, las filas caerían en la DEFAULT)
+    rango = (str(df['fecha'].min()), str(df['fecha'].max()))
+    repo.asegurar_particiones(*rango)
 
-    for _, row in df.iterrows():
-        obtener_id_empresa(cur, row['empresa'])
-        obtener_id_lugar(cur, row['lugar'])
-        
-        cur.execute(sql, (row['lugar'], row['hora'], row['anden'], row['empresa'], row['fecha']))
-        
-        if cur.rowcount > 0: 
-            insertados += 1
+    # Valores nativos de Python (sin tipos de numpy) y NaN -> NULL, para cualquier backend
+    df = df.astype(object).where(df.notna(), None)
+    filas = df[['lugar', 'hora', 'anden', 'empresa', 'fecha']].itertuples(index=False, name=None)
 
-    conn.commit()
-    cur.close()
+    # Crea empresas/lugares nuevos y entra con estado 'Programado' en el terminal; los duplicados se omiten
+    insertados = repo.insertar_recorridos(terminal_id, tipo, filas)
     
     duplicados = total_filas - insertados
-    return insertados, duplicados
+    return insertados, duplicados, rango
 
-def ejecutar_insercion_datos(carpeta_uploads):
-    conn = conectar_db()
-    if not conn: return False, ["Error crítico conectando a BD."]
+def ejecutar_insercion_datos(carpeta_uploads, terminal_id):
+    repo = obtener_repositorio()
 
     ruta_llegadas = os.path.join(carpeta_uploads, 'llegadas_limpio.csv')
     ruta_salidas = os.path.join(carpeta_uploads, 'salidas_limpio.csv')
@@ -81,10 +39,8 @@ def ejecutar_insercion_datos(carpeta_uploads):
     mensajes = []
     
     try:
-        ins_llegadas, dup_llegadas = insertar_csv_en_tabla(conn, ruta_llegadas, 'import_llegadas')
-        ins_salidas, dup_salidas = insertar_csv_en_tabla(conn, ruta_salidas, 'import_salidas')
-        
-        conn.close()
+        ins_llegadas, dup_llegadas, rango_llegadas = insertar_csv_en_tabla(repo, ruta_llegadas, 'llegadas', terminal_id)
+        ins_salidas, dup_salidas, rango_salidas = insertar_csv_en_tabla(repo, ruta_salidas, 'salidas', terminal_id)
         
         if ins_llegadas > 0:
             mensajes.append(f"Éxito: {ins_llegadas} nuevas llegadas insertadas.")
@@ -99,8 +55,18 @@ def ejecutar_insercion_datos(carpeta_uploads):
         if ins_llegadas == 0 and ins_salidas == 0 and dup_llegadas == 0 and dup_salidas == 0:
              return False, ["No se encontraron datos válidos para insertar."]
 
+        # Andenes ocupados a la vez en los días de las planillas (conflictos_anden.py)
+        if ins_llegadas > 0 or ins_salidas > 0:
+            rangos = [r for r in (rango_llegadas, rango_salidas) if r]
+            desde, hasta = min(r[0] for r in rangos), max(r[1] for r in rangos)
+            conflictos = conflictos_anden.detectar(repo, terminal_id, desde, hasta)
+            if conflictos:
+                mensajes.append(f"Advertencia: {len(conflictos)} conflictos de andén entre {desde} y {hasta}. "
+                                "Revíselos en 'Conflictos de Andén'.")
+
         return True, mensajes
 
+    except SinConexion:
+        return False, ["Error crítico conectando a BD."]
     except Exception as e:
-        if conn: conn.close()
         return False, [f"Error base de datos: {str(e)}"]
\ No newline at end of file
@@ -0,0 +1,275 @@
+# MÉTRICAS DE RENDIMIENTO (FORMATO PROMETHEUS EN /metrics)
+# - Por endpoint: latencia, tamaño de respuesta, consultas SQL y tiempo en
+#   base de datos por petición (el cursor de db.py avisa cada execute).
+# - Espera por una conexión del pool y aciertos/fallos de las cachés.
+# - Contadores de otros módulos (límite de login, auditoría) vía colectores.
+#
+# Cada proceso guarda sus métricas en memoria y cada pocos segundos deja una
+# copia en METRICAS_DIR; /metrics suma las de todos los workers vivos, así
+# no importa a qué worker de gunicorn llegue el scrape.
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+from flask import g, request
+
+CARPETA = os.getenv("METRICAS_DIR", os.path.join(tempfile.gettempdir(), "metricas_terminal"))
+INTERVALO_SEG = float(os.getenv("METRICAS_INTERVALO", "5"))
+# Si se define, /metrics siempre exige "Authorization: Bearer <token>"; si no, solo
+# responde a localhost sin proxy de por medio (detrás de nginx definir el token)
+TOKEN = os.getenv("METRICAS_TOKEN")
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_BYTES = (1000, 10000, 100000, 1000000, 10000000)
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+AYUDA = {
+    'http_peticion_segundos': ('histogram', "Latencia por endpoint"),
+    'http_respuesta_bytes': ('histogram', "Tamaño de la respuesta por endpoint"),
+    'http_peticiones_total': ('counter', "Peticiones por endpoint y código HTTP"),
+    'db_consultas_por_peticion': ('histogram', "Consultas SQL ejecutadas por petición"),
+    'db_segundos_por_peticion': ('histogram', "Tiempo total en base de datos por petición"),
+    'db_consulta_segundos': ('histogram', "Duración de cada consulta SQL"),
+    'db_pool_espera_segundos': ('histogram', "Espera para obtener una conexión del pool"),
+    'cache_consultas_total': ('counter', "Consultas a cachés por resultado (acierto/fallo)"),
+}
+
+_lock = threading.Lock()
+_histogramas = {}     # (nombre, etiquetas) -> [conteos por bucket..., suma, cuenta]
+_contadores = {}      # (nombre, etiquetas) -> valor
+_buckets = {}         # nombre -> buckets
+_colectores = []      # (prefijo, funcion) -> dict de contadores
+_medidores = set()    # nombres de colectores que son valores del momento (gauge), no acumulados
+_pid = None
+_local = threading.local()
+
+
+def _clave(nombre, etiquetas):
+    return nombre, tuple(sorted((etiquetas or {}).items()))
+
+
+def observar(nombre, valor, etiquetas=None, buckets=BUCKETS_SEGUNDOS):
+    _asegurar_volcado()
+    clave = _clave(nombre, etiquetas)
+    with _lock:
+        _buckets[nombre] = buckets
+        datos = _histogramas.get(clave)
+        if datos is None:
+            datos = _histogramas[clave] = [0] * (len(buckets) + 2)
+        for i, limite in enumerate(buckets):
+            if valor <= limite:
+                datos[i] += 1
+        datos[-2] += valor
+        datos[-1] += 1
+
+
+def sumar(nombre, etiquetas=None, valor=1):
+    _asegurar_volcado()
+    clave = _clave(nombre, etiquetas)
+    with _lock:
+        _contadores[clave] = _contadores.get(clave, 0) + valor
+
+
+def contar_cache(cache, acierto):
+    sumar('cache_consultas_total', {'cache': cache, 'resultado': 'acierto' if acierto else 'fallo'})
+
+
+def registrar_colector(prefijo, funcion, medidores=()):
+    """
+    funcion() -> dict {nombre: valor}; se exporta como <prefijo>_<nombre>, de tipo
+    counter salvo los nombres de 'medidores' (largo de una cola, tamaño de una caché).
+    """
+    _colectores.append((prefijo, funcion))
+    _medidores.update(f"{prefijo}_{nombre}" for nombre in medidores)
+
+
+# --- CONSULTAS SQL (las llama el cursor de db.py) ---
+
+def registrar_consulta(duracion):
+    observar('db_consulta_segundos', duracion)
+    peticion = getattr(_local, 'peticion', None)
+    if peticion is not None:
+        peticion['consultas'] += 1
+        peticion['segundos'] += duracion
+
+
+# --- MIDDLEWARE ---
+
+def _antes():
+    _local.peticion = {'consultas': 0, 'segundos': 0.0}
+    g.metricas_inicio = time.perf_counter()
+
+
+def _despues(respuesta):
+    inicio = g.pop('metricas_inicio', None)
+    peticion = getattr(_local, 'peticion', None)
+    _local.peticion = None
+    if inicio is None:
+        return respuesta
+
+    endpoint = request.endpoint or 'sin_ruta'
+    if endpoint == 'metricas':
+        return respuesta
+    etiquetas = {'endpoint': endpoint}
+    observar('http_peticion_segundos', time.perf_counter() - inicio, etiquetas)
+    sumar('http_peticiones_total', {'endpoint': endpoint, 'codigo': str(respuesta.status_code)})
+    if respuesta.content_length is not None:
+        observar('http_respuesta_bytes', respuesta.content_length, etiquetas, BUCKETS_BYTES)
+    if peticion is not None:
+        observar('db_consultas_por_peticion', peticion['consultas'], etiquetas, BUCKETS_CONSULTAS)
+        observar('db_segundos_por_peticion', peticion['segundos'], etiquetas)
+    return respuesta
+
+
+# --- COPIA EN DISCO POR PROCESO ---
+
+def _instantanea():
+    with _lock:
+        datos = {
+            'histogramas': [[n, list(e), list(v)] for (n, e), v in _histogramas.items()],
+            'contadores': [[n, list(e), v] for (n, e), v in _contadores.items()],
+            'buckets': {n: list(b) for n, b in _buckets.items()},
+        }
+    extra = []
+    for prefijo, funcion in _colectores:
+        try:
+            for nombre, valor in funcion().items():
+                if isinstance(valor, (int, float)):
+                    extra.append([f"{prefijo}_{nombre}", [], valor])
+        except Exception as e:
+            print(f"Error en colector de métricas {prefijo}: {e}")
+    datos['contadores'] += extra
+    return datos
+
+
+def _volcar():
+    os.makedirs(CARPETA, exist_ok=True)
+    ruta = os.path.join(CARPETA, f"metricas_{os.getpid()}.json")
+    ruta_tmp = f"{ruta}.tmp"
+    with open(ruta_tmp, 'w', encoding='utf-8') as f:
+        json.dump(_instantanea(), f)
+    os.replace(ruta_tmp, ruta)
+
+
+def _trabajador():
+    while True:
+        time.sleep(INTERVALO_SEG)
+        try:
+            _volcar()
+        except OSError as e:
+            print(f"Error al guardar métricas: {e}")
+
+
+def _asegurar_volcado():
+    global _pid
+    # Un hilo de volcado por proceso (los hilos no sobreviven a un fork)
+    if _pid != os.getpid():
+        with _lock:
+            if _pid != os.getpid():
+                _pid = os.getpid()
+                _histogramas.clear()
+                _contadores.clear()
+                threading.Thread(target=_trabajador, name="metricas", daemon=True).start()
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+
+def leer_otros_procesos(prefijo):
+    """Copias <prefijo><pid>.json de los demás procesos vivos (borra las de procesos muertos)."""
+    datos = []
+    for ruta in glob.glob(os.path.join(CARPETA, f"{prefijo}*.json")):
+        try:
+            pid = int(os.path.basename(ruta)[len(prefijo):-len(".json")])
+        except ValueError:
+            continue
+        if pid == os.getpid():
+            continue
+        if not _proceso_vivo(pid):
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                datos.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return datos
+
+
+# --- EXPOSICIÓN ---
+
+def _formato_etiquetas(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ""
+    texto = ",".join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pares)
+    return "{" + texto + "}"
+
+
+def exponer():
+    """Suma las métricas de todos los procesos vivos y las devuelve en formato de texto Prometheus."""
+    _asegurar_volcado()
+    instantaneas = [_instantanea()] + leer_otros_procesos("metricas_")
+
+    histogramas, contadores, buckets = {}, {}, {}
+    for datos in instantaneas:
+        buckets.update(datos['buckets'])
+        for nombre, etiquetas, valores in datos['histogramas']:
+            clave = (nombre, tuple(tuple(e) for e in etiquetas))
+            actual = histogramas.setdefault(clave, [0] * len(valores))
+            for i, v in enumerate(valores):
+                actual[i] += v
+        for nombre, etiquetas, valor in datos['contadores']:
+            clave = (nombre, tuple(tuple(e) for e in etiquetas))
+            contadores[clave] = contadores.get(clave, 0) + valor
+
+    lineas = []
+    declarados = set()
+
+    def declarar(nombre, tipo_defecto):
+        if nombre not in declarados:
+            tipo, ayuda = AYUDA.get(nombre, (tipo_defecto, nombre))
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            declarados.add(nombre)
+
+    for (nombre, etiquetas), valores in sorted(histogramas.items()):
+        declarar(nombre, 'histogram')
+        for limite, conteo in zip(buckets[nombre], valores):
+            lineas.append(f"{nombre}_bucket{_formato_etiquetas(etiquetas, [('le', limite)])} {conteo}")
+        lineas.append(f"{nombre}_bucket{_formato_etiquetas(etiquetas, [('le', '+Inf')])} {valores[-1]}")
+        lineas.append(f"{nombre}_sum{_formato_etiquetas(etiquetas)} {valores[-2]}")
+        lineas.append(f"{nombre}_count{_formato_etiquetas(etiquetas)} {valores[-1]}")
+
+    for (nombre, etiquetas), valor in sorted(contadores.items()):
+        declarar(nombre, 'gauge' if nombre in _medidores else 'counter')
+        lineas.append(f"{nombre}{_formato_etiquetas(etiquetas)} {valor}")
+
+    return "\n".join(lineas) + "\n"
+
+
+def _vista_metricas():
+    if TOKEN:
+        if request.headers.get('Authorization') != f"Bearer {TOKEN}":
+            return "No autorizado\n", 401
+    elif request.remote_addr not in ('127.0.0.1', '::1') or 'X-Forwarded-For' in request.headers:
+        # Lo que pasa por nginx llega desde 127.0.0.1 (sin PROXY_SALTOS): no es local
+        return "No autorizado\n", 403
+    return exponer(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+def init_app(app):
+    app.before_request(_antes)
+    app.after_request(_despues)
+    app.add_url_rule('/metrics', 'metricas', _vista_metricas)
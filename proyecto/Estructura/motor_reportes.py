@@ -0,0 +1,225 @@
+# MOTOR DE REPORTES
+# Un reporte se declara con DefinicionReporte (consulta, columnas y resumen)
+# y sus filas pasan por lotes a una salida: XLSX con estilos, CSV o Parquet.
+# La consulta usa un cursor con nombre (del lado del servidor), así que ni la
+# base de datos ni Python cargan el rango completo en memoria.
+import csv
+import datetime
+
+TAMANO_LOTE = 5000
+
+# Excel admite 1.048.576 filas por hoja (una es el encabezado)
+MAX_FILAS_EXCEL = 1048575
+
+FORMATOS = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+class DefinicionReporte:
+    """
+    consulta: SQL con parámetros %(terminal)s, %(inicio)s y %(fin)s.
+    columnas: lista de (titulo, ancho); ancho None = ajustar al contenido.
+    resumen: (nombre_hoja, columnas, funcion(cur, terminal, inicio, fin) -> filas) o None.
+             Solo se incluye en XLSX; CSV y Parquet llevan el detalle.
+    """
+    def __init__(self, nombre, consulta, columnas, hoja, archivo, color_encabezado, resumen=None):
+        self.nombre = nombre
+        self.consulta = consulta
+        self.columnas = columnas
+        self.hoja = hoja
+        self.archivo = archivo
+        self.color_encabezado = color_encabezado
+        self.resumen = resumen
+
+    def titulos(self):
+        return [titulo for titulo, _ in self.columnas]
+
+
+# --- SALIDAS ---
+
+class SalidaXlsx:
+    def __init__(self, ruta, color_encabezado):
+        import xlsxwriter
+        # constant_memory: cada fila se escribe a disco apenas se completa
+        self.libro = xlsxwriter.Workbook(ruta, {'constant_memory': True})
+        self.fmt_head = self.libro.add_format({'bold': True, 'bg_color': color_encabezado, 'font_color': 'white',
+                                               'border': 1, 'align': 'center'})
+        self.fmt_center = self.libro.add_format({'align': 'center', 'border': 1})
+        self.fmt_fecha = self.libro.add_format({'align': 'center', 'border': 1, 'num_format': 'yyyy-mm-dd'})
+        self.fmt_hora = self.libro.add_format({'align': 'center', 'border': 1, 'num_format': 'hh:mm'})
+        self.fmt_fecha_hora = self.libro.add_format({'align': 'center', 'border': 1, 'num_format': 'yyyy-mm-dd hh:mm'})
+        self.hoja = None
+
+    def abrir_hoja(self, nombre, columnas, _descripcion=None):
+        self._cerrar_hoja()
+        self.nombre_hoja = nombre
+        self.columnas = columnas
+        self.partes = 1
+        self._nueva_hoja(nombre)
+
+    def _nueva_hoja(self, nombre):
+        self.hoja = self.libro.add_worksheet(nombre)
+        self.fila = 1
+        self.largos = [len(str(titulo)) for titulo, _ in self.columnas]
+        for i, (titulo, _) in enumerate(self.columnas):
+            self.hoja.write(0, i, titulo, self.fmt_head)
+
+    def _cerrar_hoja(self):
+        if self.hoja is None:
+            return
+        for i, (_, ancho) in enumerate(self.columnas):
+            self.hoja.set_column(i, i, ancho if ancho else self.largos[i] + 2)
+        self.hoja = None
+
+    def escribir_filas(self, filas):
+        for fila in filas:
+            if self.fila > MAX_FILAS_EXCEL:
+                # Seguimos en otra hoja en vez de cortar el reporte
+                self._cerrar_hoja()
+                self.partes += 1
+                self._nueva_hoja(f"{self.nombre_hoja[:27]}_{self.partes}")
+            for i, valor in enumerate(fila):
+                self._escribir_celda(i, valor)
+            self.fila += 1
+
+    def _escribir_celda(self, col, valor):
+        if valor is None:
+            self.hoja.write_blank(self.fila, col, None, self.fmt_center)
+            return
+        if isinstance(valor, datetime.datetime):
+            self.hoja.write_datetime(self.fila, col, valor, self.fmt_fecha_hora)
+        elif isinstance(valor, datetime.date):
+            self.hoja.write_datetime(self.fila, col, valor, self.fmt_fecha)
+        elif isinstance(valor, datetime.time):
+            self.hoja.write_datetime(self.fila, col, valor, self.fmt_hora)
+        else:
+            self.hoja.write(self.fila, col, valor, self.fmt_center)
+        largo = len(str(valor))
+        if largo > self.largos[col]:
+            self.largos[col] = largo
+
+    def cerrar(self):
+        self._cerrar_hoja()
+        self.libro.close()
+
+
+class SalidaCsv:
+    def __init__(self, ruta, _color_encabezado=None):
+        # utf-8-sig: Excel abre el CSV con los acentos y la Ñ correctos
+        self.archivo = open(ruta, 'w', newline='', encoding='utf-8-sig')
+        self.escritor = csv.writer(self.archivo, delimiter=';')
+        self.con_detalle = False
+
+    def abrir_hoja(self, _nombre, columnas, _descripcion=None):
+        if self.con_detalle:
+            raise ValueError("CSV admite una sola tabla por archivo.")
+        self.con_detalle = True
+        self.escritor.writerow([titulo for titulo, _ in columnas])
+
+    def escribir_filas(self, filas):
+        self.escritor.writerows(filas)
+
+    def cerrar(self):
+        self.archivo.close()
+
+
+class SalidaParquet:
+    def __init__(self, ruta, _color_encabezado=None):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("El formato Parquet requiere el paquete 'pyarrow'.")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.ruta = ruta
+        self.escritor = None
+
+    def _tipo(self, oid):
+        # Tipo de la columna en Postgres (type_code del cursor) -> Arrow; lo demás va como texto
+        pa = self.pa
+        return {16: pa.bool_(), 20: pa.int64(), 21: pa.int16(), 23: pa.int32(), 700: pa.float32(),
+                701: pa.float64(), 1700: pa.float64(), 1082: pa.date32(), 1083: pa.time64('us'),
+                1114: pa.timestamp('us'), 1184: pa.timestamp('us', tz='UTC')}.get(oid, pa.string())
+
+    def abrir_hoja(self, _nombre, columnas, descripcion=None):
+        # El esquema sale de las columnas de la consulta, no de los valores: un
+        # lote con una columna toda NULL no cambia el tipo a mitad del archivo
+        tipos = [self._tipo(d[1]) for d in descripcion] if descripcion else [self.pa.string()] * len(columnas)
+        self.esquema = self.pa.schema([self.pa.field(titulo, tipo) for (titulo, _), tipo in zip(columnas, tipos)])
+        self.escritor = self.pq.ParquetWriter(self.ruta, self.esquema, compression='zstd')
+
+    def _valores(self, columna, tipo):
+        if tipo == self.pa.string():
+            return [None if v is None else str(v) for v in columna]
+        if self.pa.types.is_floating(tipo):
+            return [None if v is None else float(v) for v in columna]
+        return columna
+
+    def escribir_filas(self, filas):
+        if not filas:
+            return
+        columnas = list(zip(*filas))
+        tabla = self.pa.table([self.pa.array(self._valores(col, campo.type), type=campo.type)
+                               for col, campo in zip(columnas, self.esquema)], schema=self.esquema)
+        self.escritor.write_table(tabla)
+
+    def cerrar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+
+
+SALIDAS = {'xlsx': SalidaXlsx, 'csv': SalidaCsv, 'parquet': SalidaParquet}
+
+
+# --- EJECUCIÓN ---
+
+def generar_reporte(definicion, formato, obtener_conexion, terminal_id, ruta_destino, f_inicio, f_fin):
+    """
+    Escribe el reporte del terminal en ruta_destino y devuelve el nombre de
+    descarga, o None si el rango no tiene datos (en ese caso no se crea el archivo).
+    """
+    if formato not in SALIDAS:
+        raise ValueError(f"Formato de reporte no soportado: {formato}")
+
+    parametros = {'terminal': terminal_id, 'inicio': f_inicio, 'fin': f_fin}
+    conn = obtener_conexion()
+    if conn is None:
+        # El trabajo queda en estado 'error' con este mensaje (cola_reportes._ejecutar)
+        raise ConnectionError("Error de conexión a la base de datos")
+    try:
+        # Cursor con nombre = cursor del lado del servidor (lectura por lotes)
+        cur = conn.cursor(name=f"reporte_{definicion.nombre}")
+        cur.itersize = TAMANO_LOTE
+        cur.execute(definicion.consulta, parametros)
+
+        lote = cur.fetchmany(TAMANO_LOTE)
+        if not lote:
+            cur.close()
+            return None
+
+        salida = SALIDAS[formato](ruta_destino, definicion.color_encabezado)
+        try:
+            # description: tipos de las columnas (Parquet arma su esquema con ellos)
+            salida.abrir_hoja(definicion.hoja, definicion.columnas, cur.description)
+            while lote:
+                salida.escribir_filas(lote)
+                lote = cur.fetchmany(TAMANO_LOTE)
+            cur.close()
+
+            if definicion.resumen and formato == 'xlsx':
+                hoja_resumen, columnas_resumen, obtener_filas = definicion.resumen
+                cur_resumen = conn.cursor()
+                filas_resumen = obtener_filas(cur_resumen, terminal_id, f_inicio, f_fin)
+                cur_resumen.close()
+                salida.abrir_hoja(hoja_resumen, columnas_resumen)
+                salida.escribir_filas(filas_resumen)
+        finally:
+            salida.cerrar()
+
+        return definicion.archivo.format(inicio=f_inicio, fin=f_fin) + f".{formato}"
+    finally:
+        conn.close()
@@ -0,0 +1,557 @@
+# CAPA DE ACCESO A DATOS (REPOSITORIO)
+# Las consultas de lectura y escritura que usan la pantalla, el dashboard
+# público, el panel del operador (estados, verificaciones, extras), el login,
+# la importación de Excel y los resúmenes de reportes viven aquí, no en las
+# rutas. Hay dos implementaciones con el mismo SQL:
+#
+#   - RepositorioPostgres: conexiones del pool de db.py (producción).
+#   - RepositorioSqlite:   un archivo SQLite local. Sirve para un kiosco de
+#     pantalla remoto (se llena con sincronizar_kiosco.py) y para correr
+#     pruebas y benchmarks sin servidor de base de datos.
+#
+# Las lecturas usan la vista 'recorridos' (salidas + llegadas con columna
+# tipo, sql/008): una sola consulta trae ambos tipos ya ordenados.
+#
+# Todo lo que es de un terminal (recorridos, noticias, verificaciones,
+# extras) recibe terminal_id como primer argumento y lo filtra o lo guarda
+# (sql/010); empresas, lugares y la flota son comunes.
+#
+# El SQL se escribe en el dialecto de Postgres (%s, ::int, ILIKE); el cursor
+# de SQLite lo traduce y devuelve fechas y horas como date/time, igual que
+# psycopg2, así las plantillas no cambian.
+#
+# Se elige con DB_BACKEND=postgres|sqlite (y DB_SQLITE_RUTA) en config.py.
+# El panel de administración sigue usando Postgres directamente.
+import datetime
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+from psycopg2.extras import execute_values
+
+from db import obtener_conexion
+from resumenes_diarios import (acumular_verificacion, acumular_extra,
+                               obtener_resumen_verificaciones, obtener_resumen_extras)
+
+ESQUEMA_SQLITE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql", "sqlite_esquema.sql")
+
+COLUMNAS_RECORRIDO = "id, hora, empresa_nombre, lugar, anden, fecha, estado"
+TABLAS_MAESTRO = {'empresa': 'empresas', 'lugar': 'lugares'}
+
+
+class SinConexion(RuntimeError):
+    pass
+
+
+def tabla_recorridos(tipo):
+    """'llegada(s)' -> import_llegadas; cualquier otro valor -> import_salidas."""
+    return 'import_llegadas' if tipo in ('llegada', 'llegadas') else 'import_salidas'
+
+
+def separar_por_tipo(filas):
+    """[(tipo, ...columnas)] -> {'llegadas': [...], 'salidas': [...]} conservando el orden."""
+    separadas = {'llegadas': [], 'salidas': []}
+    for tipo, *fila in filas:
+        separadas[tipo].append(tuple(fila))
+    return separadas
+
+
+def _nombres_maestro(filas):
+    """Empresas y lugares distintos de filas (terminal_id, lugar, hora, anden, empresa, fecha)."""
+    return (('empresas', sorted({fila[4] for fila in filas if fila[4]}, key=str)),
+            ('lugares', sorted({fila[1] for fila in filas if fila[1]}, key=str)))
+
+
+def _fecha(valor):
+    return datetime.date.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+# --- CONSULTAS DE LECTURA PÚBLICAS ---
+# (sql, parámetros) de la pantalla y del dashboard. Las usan los métodos de
+# Repositorio y también servicio_async.py (asyncpg), así ambos servicios
+# leen exactamente lo mismo. Fechas y horas van como date/time: asyncpg no
+# acepta texto para columnas DATE/TIME.
+
+CONSULTA_TERMINALES = "SELECT id, codigo, nombre, zona_horaria, bienvenida FROM terminales ORDER BY id"
+
+
+def ventana_pizarra(ahora):
+    """(fecha_hoy, fecha_manana, hora_limite) de la pantalla para 'ahora' (hora local del terminal)."""
+    fecha_hoy = ahora.date()
+    fecha_manana = fecha_hoy + datetime.timedelta(days=1)
+
+    # Desde 2 horas antes de la hora actual, al minuto: la ventana (y con ella
+    # la llave de la caché de fragmentos) cambia una vez por minuto
+    hace_dos_horas = ahora - datetime.timedelta(hours=2)
+    hora_limite = hace_dos_horas.time().replace(second=0, microsecond=0, tzinfo=None)
+
+    # Si hace 2 horas era ayer (madrugada 00:00-01:59), se muestra todo el día sin filtrar hora
+    if hace_dos_horas.date() < fecha_hoy:
+        hora_limite = None
+    return fecha_hoy, fecha_manana, hora_limite
+
+
+def consulta_pizarra(terminal_id, fecha_hoy, fecha_manana, hora_limite=None):
+    if hora_limite is None:
+        condicion, params = "fecha = %s", [_fecha(fecha_hoy)]
+    else:
+        if isinstance(hora_limite, str):
+            hora_limite = datetime.time.fromisoformat(hora_limite)
+        condicion, params = "(fecha = %s AND hora >= %s)", [_fecha(fecha_hoy), hora_limite]
+    sql = f"""
+        SELECT tipo, {COLUMNAS_RECORRIDO}
+        FROM recorridos
+        WHERE terminal_id = %s
+          AND ({condicion}
+               OR (fecha = %s AND hora <= '04:00:00'))
+        ORDER BY tipo, fecha ASC, hora ASC
+    """
+    return sql, [terminal_id] + params + [_fecha(fecha_manana)]
+
+
+def consulta_noticias(terminal_id):
+    return "SELECT contenido FROM noticias WHERE terminal_id = %s AND activa = TRUE ORDER BY id DESC", [terminal_id]
+
+
+def consulta_nombres_maestro(tipo):
+    return f"SELECT nombre FROM {TABLAS_MAESTRO[tipo]} ORDER BY nombre ASC", []
+
+
+def consulta_buscar_recorridos(terminal_id, filtros, limite, offset):
+    """Ver Repositorio.buscar_recorridos; una fecha mal escrita levanta ValueError."""
+    condiciones = ["terminal_id = %s"]
+    params = [terminal_id]
+    if filtros.get('fecha'):
+        condiciones.append("fecha = %s")
+        params.append(_fecha(filtros['fecha']))
+    if filtros.get('hora'):
+        condiciones.append("hora::text LIKE %s")
+        params.append(f"{filtros['hora']}%")
+    if filtros.get('empresa'):
+        condiciones.append("empresa_nombre = %s")
+        params.append(filtros['empresa'])
+    if filtros.get('lugar'):
+        condiciones.append("lugar = %s")
+        params.append(filtros['lugar'])
+    if filtros.get('anden') and str(filtros['anden']).isdigit():
+        condiciones.append("anden = %s")
+        params.append(int(filtros['anden']))
+    where_clause = "WHERE " + " AND ".join(condiciones)
+
+    # n = 1 siempre viene (aunque quede fuera de la página) para traer el total de cada tipo
+    sql = f"""
+        SELECT tipo, total, n, {COLUMNAS_RECORRIDO}
+        FROM (
+            SELECT tipo, {COLUMNAS_RECORRIDO},
+                   ROW_NUMBER() OVER (PARTITION BY tipo ORDER BY hora, id) AS n,
+                   COUNT(*) OVER (PARTITION BY tipo) AS total
+            FROM recorridos
+            {where_clause}
+        ) AS filtrados
+        WHERE n = 1 OR n BETWEEN %s AND %s
+        ORDER BY tipo, n
+    """
+    return sql, params + [offset + 1, offset + limite]
+
+
+def paginar_por_tipo(filas, limite, offset):
+    """Filas de consulta_buscar_recorridos -> {'llegadas': (total, filas), 'salidas': (total, filas)}."""
+    resultado = {'llegadas': (0, []), 'salidas': (0, [])}
+    for tipo, total, n, *fila in filas:
+        pagina = resultado[tipo][1]
+        if offset < n <= offset + limite:
+            pagina.append(tuple(fila))
+        resultado[tipo] = (total, pagina)
+    return resultado
+
+
+class Repositorio:
+    """Consultas compartidas; las subclases solo saben abrir una conexión."""
+
+    def _abrir(self):
+        raise NotImplementedError
+
+    @contextmanager
+    def _cursor(self, escribir=False):
+        conn = self._abrir()
+        if not conn:
+            raise SinConexion("Sin conexión a la base de datos")
+        cur = conn.cursor()
+        try:
+            yield cur
+            if escribir:
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+    # --- PANTALLA (TV) ---
+
+    def pizarra(self, terminal_id, fecha_hoy, fecha_manana, hora_limite=None):
+        """
+        Llegadas y salidas de hoy (desde hora_limite si se indica) + madrugada de
+        mañana hasta las 04:00, en una sola consulta: {'llegadas': [...], 'salidas': [...]}.
+        """
+        with self._cursor() as cur:
+            cur.execute(*consulta_pizarra(terminal_id, fecha_hoy, fecha_manana, hora_limite))
+            return separar_por_tipo(cur.fetchall())
+
+    def noticias_activas(self, terminal_id):
+        with self._cursor() as cur:
+            cur.execute(*consulta_noticias(terminal_id))
+            return [fila[0] for fila in cur.fetchall()]
+
+    def version_datos(self):
+        """{(tabla, terminal_id): versión}; la suben los triggers de sql/009 y 010 (caché de fragmentos)."""
+        with self._cursor() as cur:
+            cur.execute("SELECT tabla, terminal_id, version FROM version_datos")
+            return {(tabla, terminal_id): version for tabla, terminal_id, version in cur.fetchall()}
+
+    def terminales(self):
+        """(id, codigo, nombre, zona_horaria, bienvenida) de cada terminal (ver terminales.py)."""
+        with self._cursor() as cur:
+            cur.execute(CONSULTA_TERMINALES)
+            return cur.fetchall()
+
+    # --- DASHBOARD PÚBLICO ---
+
+    def nombres_maestro(self, tipo):
+        """Nombres de empresas o lugares ('empresa' / 'lugar') en orden alfabético."""
+        with self._cursor() as cur:
+            cur.execute(*consulta_nombres_maestro(tipo))
+            return [fila[0] for fila in cur.fetchall()]
+
+    def buscar_recorridos(self, terminal_id, filtros, limite, offset):
+        """
+        filtros: dict con fecha, hora (prefijo 'HH' o 'HH:MM'), empresa, lugar, anden.
+        Misma página de llegadas y de salidas (por hora) y el total de cada una, en
+        una sola consulta: {'llegadas': (total, filas), 'salidas': (total, filas)}.
+        """
+        with self._cursor() as cur:
+            cur.execute(*consulta_buscar_recorridos(terminal_id, filtros, limite, offset))
+            return paginar_por_tipo(cur.fetchall(), limite, offset)
+
+    # --- PANEL DEL OPERADOR ---
+
+    def nombres_en_recorridos(self, terminal_id, columna):
+        """Valores distintos de 'empresa_nombre' o 'lugar' usados en salidas y llegadas del terminal."""
+        if columna not in ('empresa_nombre', 'lugar'):
+            raise ValueError(columna)
+        with self._cursor() as cur:
+            cur.execute(f"SELECT DISTINCT {columna} FROM recorridos WHERE terminal_id = %s ORDER BY 1",
+                        (terminal_id,))
+            return [fila[0] for fila in cur.fetchall()]
+
+    def recorridos_del_dia(self, terminal_id, fecha, fecha_siguiente):
+        """
+        Salidas y llegadas del día completo + madrugada siguiente hasta las 04:00,
+        ya mezcladas en orden cronológico (a igual hora, salidas primero):
+        (tipo, id, hora, empresa, lugar, anden, estado, fecha).
+        """
+        with self._cursor() as cur:
+            cur.execute("""
+                SELECT tipo, id, hora, empresa_nombre, lugar, anden, estado, fecha
+                FROM recorridos
+                WHERE terminal_id = %s
+                  AND (fecha = %s
+                       OR (fecha = %s AND hora <= '04:00:00'))
+                ORDER BY fecha ASC, hora ASC, tipo DESC, id ASC
+            """, (terminal_id, fecha, fecha_siguiente))
+            return cur.fetchall()
+
+    def actualizar_estado(self, terminal_id, tipo, id_recorrido, estado):
+        with self._cursor(escribir=True) as cur:
+            cur.execute(f"UPDATE {tabla_recorridos(tipo)} SET estado = %s WHERE id = %s AND terminal_id = %s",
+                        (estado, id_recorrido, terminal_id))
+            return cur.rowcount
+
+    # --- VERIFICACIONES Y EXTRAS ---
+
+    def registrar_verificacion(self, terminal_id, recorrido_id, tipo, operador_id, patente, anden_real,
+                               observaciones, fecha_manual, hora_manual):
+        """
+        Valida patente y andén, guarda el historial, el rollup diario y deja el
+        recorrido 'En Andén', todo en una transacción. Devuelve un dict con
+        'resultado': 'no_encontrado' | 'ya_registrado' | 'registrado'.
+        """
+        tabla = tabla_recorridos(tipo)
+        with self._cursor(escribir=True) as cur:
+            cur.execute("SELECT id FROM buses_permitidos WHERE patente = %s AND activa = TRUE", (patente,))
+            es_patente_valida = cur.fetchone() is not None
+
+            # Solo recorridos del terminal del operador
+            cur.execute(f"SELECT anden FROM {tabla} WHERE id = %s AND terminal_id = %s", (recorrido_id, terminal_id))
+            resultado_origen = cur.fetchone()
+            if not resultado_origen:
+                return {'resultado': 'no_encontrado'}
+
+            anden_programado = str(resultado_origen[0])
+            es_anden_correcto = (str(anden_real) == anden_programado)
+
+            # Bloquea re-registro del mismo recorrido (ya controlado una vez)
+            cur.execute("""
+                SELECT patente_ingresada, fecha_manual, hora_manual
+                FROM historial_verificaciones
+                WHERE recorrido_id = %s
+                  AND tipo_recorrido = %s
+                ORDER BY id DESC
+                LIMIT 1
+            """, (recorrido_id, tipo))
+            registro_existente = cur.fetchone()
+            if registro_existente:
+                return {'resultado': 'ya_registrado', 'patente': registro_existente[0],
+                        'fecha': registro_existente[1], 'hora': registro_existente[2]}
+
+            cur.execute("""
+                INSERT INTO historial_verificaciones
+                (terminal_id, recorrido_id, tipo_recorrido, operador_id, patente_ingresada, anden_real,
+                 es_patente_valida, es_anden_correcto, anden_programado, observaciones,
+                 fecha_manual, hora_manual)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (terminal_id, recorrido_id, tipo, operador_id, patente, anden_real,
+                  es_patente_valida, es_anden_correcto, anden_programado, observaciones,
+                  fecha_manual, hora_manual))
+
+            # Rollup diario (misma transacción que el historial)
+            acumular_verificacion(cur, terminal_id, fecha_manual, patente, es_patente_valida, es_anden_correcto)
+
+            cur.execute(f"UPDATE {tabla} SET estado = 'En Andén' WHERE id = %s AND terminal_id = %s",
+                        (recorrido_id, terminal_id))
+
+        return {'resultado': 'registrado', 'patente_valida': es_patente_valida,
+                'anden_correcto': es_anden_correcto, 'anden_programado': anden_programado}
+
+    def registrar_extra(self, terminal_id, fecha, hora, patente, empresa_manual, lugar, tipo, anden, operador_id,
+                        observacion):
+        """Guarda un bus fuera de itinerario. Devuelve (empresa final, patente conocida)."""
+        with self._cursor(escribir=True) as cur:
+            # Validar Empresa (corrección de nombre de empresa)
+            cur.execute("SELECT empresa FROM buses_permitidos WHERE patente = %s", (patente,))
+            res_patente = cur.fetchone()
+            if res_patente:
+                empresa_final, es_conocida = res_patente[0], True
+            else:
+                empresa_final, es_conocida = empresa_manual or "NO REGISTRADA", False
+
+            cur.execute("""
+                INSERT INTO historial_extras
+                (terminal_id, fecha, hora, patente, empresa, lugar, tipo_recorrido, anden, operador_id, observacion)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (terminal_id, fecha, hora, patente, empresa_final, lugar, tipo, anden, operador_id, observacion))
+            acumular_extra(cur, terminal_id, fecha, patente, empresa_final)
+        return empresa_final, es_conocida
+
+    # --- USUARIOS (LOGIN) ---
+
+    def usuario_por_id(self, user_id):
+        with self._cursor() as cur:
+            cur.execute("SELECT id, username, password, rol, activo, terminal_id FROM usuarios WHERE id = %s", (user_id,))
+            return cur.fetchone()
+
+    def usuario_por_rut(self, rut):
+        with self._cursor() as cur:
+            cur.execute("SELECT id, username, password, rol, activo, rut, terminal_id FROM usuarios WHERE rut = %s",
+                        (rut,))
+            return cur.fetchone()
+
+    # --- IMPORTACIÓN ---
+
+    def insertar_recorridos(self, terminal_id, tipo, filas):
+        """
+        filas: (lugar, hora, anden, empresa, fecha). Crea empresas/lugares nuevos
+        y omite duplicados del terminal (ON CONFLICT). Devuelve cuántas filas se insertaron.
+        """
+        filas = [(terminal_id,) + tuple(fila) for fila in filas]
+        with self._cursor(escribir=True) as cur:
+            for tabla, nombres in _nombres_maestro(filas):
+                cur.executemany(f"INSERT INTO {tabla} (nombre) VALUES (%s) ON CONFLICT (nombre) DO NOTHING",
+                                [(nombre,) for nombre in nombres])
+            # Una sola sentencia preparada para toda la planilla; rowcount suma las filas insertadas
+            cur.executemany(f"""
+                INSERT INTO {tabla_recorridos(tipo)} (terminal_id, lugar, hora, anden, empresa_nombre, fecha, estado)
+                VALUES (%s, %s, %s, %s, %s, %s, 'Programado')
+                ON CONFLICT (terminal_id, fecha, hora, empresa_nombre, lugar) DO NOTHING
+            """, filas)
+            return max(cur.rowcount, 0)
+
+    def asegurar_particiones(self, desde=None, hasta=None):
+        """Particiones mensuales de desde..hasta (sql/006). SQLite no particiona."""
+        return 0
+
+    # --- CONFLICTOS DE ANDÉN (conflictos_anden.py) ---
+
+    def ocupacion_andenes(self, terminal_id, desde, hasta):
+        """(tipo, id, fecha, hora, empresa, lugar, anden) de desde..hasta con andén asignado, sin los cancelados."""
+        with self._cursor() as cur:
+            cur.execute("""
+                SELECT tipo, id, fecha, hora, empresa_nombre, lugar, anden
+                FROM recorridos
+                WHERE terminal_id = %s AND fecha BETWEEN %s AND %s
+                  AND anden IS NOT NULL AND estado <> 'Cancelado'
+            """, (terminal_id, _fecha(desde), _fecha(hasta)))
+            return cur.fetchall()
+
+    def permanencias_anden(self):
+        """{(tipo, empresa_nombre): minutos} de sql/011; empresa '' es el valor del tipo."""
+        with self._cursor() as cur:
+            cur.execute("SELECT tipo, empresa_nombre, minutos FROM permanencia_anden")
+            return {(tipo, empresa): minutos for tipo, empresa, minutos in cur.fetchall()}
+
+    # --- REPORTES (RESÚMENES DIARIOS) ---
+
+    def resumen_verificaciones(self, terminal_id, f_inicio, f_fin):
+        with self._cursor() as cur:
+            return obtener_resumen_verificaciones(cur, terminal_id, f_inicio, f_fin)
+
+    def resumen_extras(self, terminal_id, f_inicio, f_fin):
+        with self._cursor() as cur:
+            return obtener_resumen_extras(cur, terminal_id, f_inicio, f_fin)
+
+
+class RepositorioPostgres(Repositorio):
+
+    def __init__(self, obtener=obtener_conexion):
+        self._obtener = obtener
+
+    def _abrir(self):
+        return self._obtener()
+
+    def insertar_recorridos(self, terminal_id, tipo, filas):
+        """Igual que Repositorio.insertar_recorridos, con INSERT de varias filas por sentencia."""
+        filas = [(terminal_id,) + tuple(fila) for fila in filas]
+        with self._cursor(escribir=True) as cur:
+            for tabla, nombres in _nombres_maestro(filas):
+                execute_values(cur, f"INSERT INTO {tabla} (nombre) VALUES %s ON CONFLICT (nombre) DO NOTHING",
+                               [(nombre,) for nombre in nombres])
+            # RETURNING solo devuelve las filas que sí entraron (los duplicados no)
+            insertadas = execute_values(cur, f"""
+                INSERT INTO {tabla_recorridos(tipo)} (terminal_id, lugar, hora, anden, empresa_nombre, fecha, estado)
+                VALUES %s
+                ON CONFLICT (terminal_id, fecha, hora, empresa_nombre, lugar) DO NOTHING
+                RETURNING 1
+            """, filas, template="(%s, %s, %s, %s, %s, %s, 'Programado')", page_size=1000, fetch=True)
+            return len(insertadas)
+
+    def asegurar_particiones(self, desde=None, hasta=None):
+        """Crea las particiones que falten (mes actual + 3 por defecto); 0 si 006 no está aplicada."""
+        with self._cursor(escribir=True) as cur:
+            cur.execute("SELECT to_regproc('asegurar_particiones') IS NOT NULL")
+            if not cur.fetchone()[0]:
+                return 0
+            cur.execute("SELECT asegurar_particiones(%s, %s)", (desde, hasta))
+            return cur.fetchone()[0]
+
+
+# --- SQLITE ---
+
+_RE_CAST = re.compile(r"::\w+")
+_RE_NOMBRADO = re.compile(r"%\((\w+)\)s")
+
+
+@lru_cache(maxsize=512)
+def traducir_sql(sql):
+    """SQL de Postgres -> SQLite: parámetros ? / :nombre, sin casts ::tipo, ILIKE -> LIKE."""
+    sql = _RE_CAST.sub("", sql)
+    sql = _RE_NOMBRADO.sub(r":\1", sql)
+    return sql.replace("%s", "?").replace("%%", "%").replace(" ILIKE ", " LIKE ")
+
+
+# Fechas y horas se guardan como texto ISO y vuelven como date/time (igual que psycopg2)
+sqlite3.register_adapter(datetime.date, lambda v: v.isoformat())
+sqlite3.register_adapter(datetime.datetime, lambda v: v.isoformat(sep=' '))
+sqlite3.register_adapter(datetime.time, lambda v: v.isoformat())
+sqlite3.register_converter("DATE", lambda v: datetime.date.fromisoformat(v.decode()))
+sqlite3.register_converter("TIME", lambda v: datetime.time.fromisoformat(v.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda v: datetime.datetime.fromisoformat(v.decode()))
+sqlite3.register_converter("BOOLEAN", lambda v: v not in (b"0", b""))
+
+
+class _CursorSqlite:
+
+    def __init__(self, cur):
+        self._cur = cur
+
+    def execute(self, sql, parametros=()):
+        return self._cur.execute(traducir_sql(sql), parametros if parametros is not None else ())
+
+    def executemany(self, sql, lista_parametros):
+        return self._cur.executemany(traducir_sql(sql), lista_parametros)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cur, nombre)
+
+
+class _ConexionSqlite:
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return _CursorSqlite(self._conn.cursor())
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+
+class RepositorioSqlite(Repositorio):
+    """Base SQLite en un archivo (o ':memory:', compartida entre hilos mientras viva el repositorio)."""
+
+    def __init__(self, ruta, crear_esquema=True):
+        self._uri = False
+        self._ancla = None
+        if ruta == ':memory:':
+            # Memoria compartida: cada conexión ve la misma base mientras exista el ancla
+            ruta = f"file:terminal_{id(self)}?mode=memory&cache=shared"
+            self._uri = True
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        if self._uri:
+            self._ancla = self._conectar()
+        if crear_esquema:
+            self.crear_esquema()
+
+    def _conectar(self):
+        conn = sqlite3.connect(self.ruta, uri=self._uri, timeout=10,
+                               detect_types=sqlite3.PARSE_DECLTYPES)
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def _abrir(self):
+        return _ConexionSqlite(self._conectar())
+
+    def crear_esquema(self):
+        with open(ESQUEMA_SQLITE, encoding='utf-8') as f:
+            script = f.read()
+        with self._lock:
+            conn = self._conectar()
+            try:
+                conn.executescript(script)
+            finally:
+                conn.close()
+
+
+# --- REPOSITORIO DE LA APLICACIÓN ---
+
+_repositorio = None
+
+
+def configurar(config):
+    """Elige el backend según DB_BACKEND (ver config.py)."""
+    global _repositorio
+    if config.get('DB_BACKEND', 'postgres') == 'sqlite':
+        _repositorio = RepositorioSqlite(config.get('DB_SQLITE_RUTA') or 'terminal.db')
+    else:
+        _repositorio = RepositorioPostgres()
+
+
+def obtener_repositorio():
+    global _repositorio
+    if _repositorio is None:
+        _repositorio = RepositorioPostgres()
+    return _repositorio
@@ -0,0 +1,95 @@
+# RESÚMENES DIARIOS (ROLLUPS) DE VERIFICACIONES Y EXTRAS
+# Las tablas se crean con sql/001_resumenes_diarios.sql (terminal_id de 010).
+# Las funciones de escritura reciben el cursor de la ruta para quedar
+# dentro de la misma transacción que el INSERT en el historial.
+# Cada fila es de un terminal (sql/010): se acumula y se lee por terminal_id.
+#
+# Solo se guarda lo que también guarda el historial. Lo que depende de la
+# flota (empresa dueña del bus en verificaciones, patente conocida en
+# extras) se toma de buses_permitidos al leer, como las hojas de detalle: un
+# bus que cambia de dueño sale igual en el resumen y en el detalle. Las
+# correcciones y borrados del historial recalculan sus días (triggers de 001).
+
+
+def acumular_verificacion(cur, terminal_id, fecha, patente, es_patente_valida, es_anden_correcto):
+    cur.execute("""
+        INSERT INTO resumen_diario_verificaciones AS r
+            (terminal_id, fecha, patente, es_patente_valida, cantidad, anden_correcto, anden_incorrecto)
+        VALUES (%s, %s, %s, %s, 1, %s, %s)
+        ON CONFLICT (terminal_id, fecha, patente, es_patente_valida) DO UPDATE
+        SET cantidad = r.cantidad + 1,
+            anden_correcto = r.anden_correcto + EXCLUDED.anden_correcto,
+            anden_incorrecto = r.anden_incorrecto + EXCLUDED.anden_incorrecto
+    """, (terminal_id, fecha, patente, bool(es_patente_valida),
+          1 if es_anden_correcto else 0, 0 if es_anden_correcto else 1))
+
+
+def acumular_extra(cur, terminal_id, fecha, patente, empresa):
+    cur.execute("""
+        INSERT INTO resumen_diario_extras AS r
+            (terminal_id, fecha, patente, empresa, cantidad)
+        VALUES (%s, %s, %s, %s, 1)
+        ON CONFLICT (terminal_id, fecha, patente, empresa) DO UPDATE
+        SET cantidad = r.cantidad + 1
+    """, (terminal_id, fecha, patente, empresa or 'NO REGISTRADA'))
+
+
+# --- LECTURA PARA LOS REPORTES ---
+# Devuelven filas listas para la hoja 'Resumen_Por_Placa', ordenadas por cantidad.
+
+def obtener_resumen_verificaciones(cur, terminal_id, f_inicio, f_fin):
+    cur.execute("""
+        SELECT
+            r.patente,
+            COALESCE(bp.empresa, 'No Registrada') AS empresa,
+            CASE WHEN r.es_patente_valida THEN 'SI' ELSE 'NO' END,
+            SUM(r.cantidad)::int AS cantidad_viajes,
+            SUM(r.anden_correcto)::int,
+            SUM(r.anden_incorrecto)::int
+        FROM resumen_diario_verificaciones r
+        LEFT JOIN buses_permitidos bp ON bp.patente = r.patente
+        WHERE r.terminal_id = %s AND r.fecha BETWEEN %s AND %s
+        GROUP BY r.patente, bp.empresa, r.es_patente_valida
+        ORDER BY cantidad_viajes DESC, r.patente ASC
+    """, (terminal_id, f_inicio, f_fin))
+    return cur.fetchall()
+
+
+def obtener_resumen_extras(cur, terminal_id, f_inicio, f_fin):
+    cur.execute("""
+        SELECT
+            r.patente,
+            r.empresa,
+            CASE WHEN bp.patente IS NOT NULL THEN 'SI' ELSE 'NO' END,
+            SUM(r.cantidad)::int AS cantidad_viajes
+        FROM resumen_diario_extras r
+        LEFT JOIN buses_permitidos bp ON bp.patente = r.patente
+        WHERE r.terminal_id = %s AND r.fecha BETWEEN %s AND %s
+        GROUP BY r.patente, r.empresa, bp.patente
+        ORDER BY cantidad_viajes DESC, r.patente ASC
+    """, (terminal_id, f_inicio, f_fin))
+    return cur.fetchall()
+
+
+# --- VERSIÓN DE DATOS PARA LA CACHÉ DE REPORTES ---
+# Versión de los datos del rango pedido (sql/002): suma de las versiones por
+# día del historial entre f_inicio y f_fin, más la versión de usuarios y
+# flota. Una escritura fuera del rango no cambia la clave del archivo en caché.
+
+def _version_rango(cur, tabla, terminal_id, f_inicio, f_fin):
+    cur.execute("""
+        SELECT COALESCE(SUM(version), 0) FROM version_reportes_dia
+        WHERE tabla = %s AND terminal_id = %s AND fecha BETWEEN %s AND %s
+    """, (tabla, terminal_id, f_inicio, f_fin))
+    dias = int(cur.fetchone()[0])
+    cur.execute("SELECT tabla, version FROM version_reportes ORDER BY tabla")
+    return (dias,) + tuple(cur.fetchall())
+
+
+def version_verificaciones(cur, terminal_id, f_inicio, f_fin):
+    """Reportes de verificaciones y oficial (historial + recorridos + operadores + flota)."""
+    return _version_rango(cur, 'historial_verificaciones', terminal_id, f_inicio, f_fin)
+
+
+def version_extras(cur, terminal_id, f_inicio, f_fin):
+    return _version_rango(cur, 'historial_extras', terminal_id, f_inicio, f_fin)
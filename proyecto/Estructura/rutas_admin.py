@@ -1,38 +1,63 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-import psycopg2
 from datetime import datetime
 import math
 import os
 import shutil
 from werkzeug.utils import secure_filename
-from dotenv import load_dotenv
 from psycopg2 import IntegrityError
 
-import pandas as pd
-from io import BytesIO
+from functools import partial
 from flask import send_file
 
-from manipulacion_datos.generar_salidas_llegadas import ejecutar_procesamiento_excel
-from manipulacion_datos.insertar_datos import ejecutar_insercion_datos, obtener_id_empresa, obtener_id_lugar
+import terminales
+import conflictos_anden
+
+from resumenes_diarios import (obtener_resumen_verificaciones, obtener_resumen_extras,
+                               version_verificaciones, version_extras)
+from cola_reportes import solicitar_reporte, leer_estado, ruta_archivo
+from motor_reportes import DefinicionReporte, generar_reporte, FORMATOS
+from cache_usuarios import invalidar_usuario
+from limite_login import obtener_contadores
+from auditoria import registrar, obtener_contadores as contadores_auditoria
+from db import obtener_conexion
+from repositorio import obtener_repositorio, SinConexion
+from consultas_lentas import obtener_resumen as resumen_consultas_lentas, UMBRAL_MS
 from werkzeug.security import generate_password_hash
 
-load_dotenv()
-
 admin_bp = Blueprint('admin_bp', __name__)
 
-def obtener_conexion_admin():
-    try:
-        return psycopg2.connect(
-            host=os.getenv("DB_HOST"),
-            database=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASS"),
-            port=os.getenv("DB_PORT", "5432")
-        )
-    except Exception as e:
-        print(f" Error DB Admin: {e}")
-        return None
+def _auditar(accion, tabla, registro_id=None, **detalle):
+    # Solo encola el evento; auditoria.py lo escribe en lote desde otro hilo
+    registrar(current_user.id, accion, tabla, registro_id, detalle)
+
+
+def _filtro_recorridos(terminal_id, f_fecha, f_hora, f_empresa, f_lugar, f_anden):
+    """WHERE común del panel y de las operaciones masivas (siempre dentro del terminal). Retorna (where, params)."""
+    condiciones = ["terminal_id = %s"]
+    params = [terminal_id]
+    
+    if f_fecha:
+        condiciones.append("fecha = %s")
+        params.append(f_fecha)
+    
+    # Lógica de filtro por hora
+    if f_hora:
+        condiciones.append("hora::text LIKE %s")
+        params.append(f"{f_hora}%")
+
+    if f_empresa:
+        condiciones.append("empresa_nombre = %s")
+        params.append(f_empresa)
+    if f_lugar:
+        condiciones.append("lugar = %s")
+        params.append(f_lugar)
+    if f_anden:
+        condiciones.append("anden = %s")
+        params.append(f_anden)
+
+    return " AND ".join(condiciones), params
+
 
 # --- PANEL PRINCIPAL ---
 @admin_bp.route('/admin')
@@ -40,10 +65,13 @@ def obtener_conexion_admin():
 def admin_panel():
     if current_user.rol != 'admin': return redirect(url_for('usuario_bp.dashboard'))
 
-    # Fecha por defecto: HOY
+    # Todo el panel trabaja sobre el terminal de la cuenta
+    terminal = terminales.terminal_usuario()
+
+    # Fecha por defecto: HOY (en la zona horaria del terminal)
     f_fecha = request.args.get('fecha', '')
     if not f_fecha:
-        f_fecha = datetime.now().strftime('%Y-%m-%d')
+        f_fecha = datetime.now(terminal.zona).strftime('%Y-%m-%d')
 
     # Nuevo filtro: HORA
     f_hora = request.args.get('hora', '').strip()
@@ -56,91 +84,146 @@ def admin_panel():
     por_pagina = 50 
     offset = (pagina - 1) * por_pagina
 
-    conn = obtener_conexion_admin()
-    if not conn:
+    # Solo se consultan los recorridos: empresas, lugares, usuarios, flota y
+    # noticias se cargan bajo demanda desde /admin/api/... al abrir cada modal.
+    # Llegadas y salidas (página y total de cada una) salen de una sola consulta.
+    filtros = {'fecha': f_fecha, 'hora': f_hora, 'empresa': f_empresa, 'lugar': f_lugar, 'anden': f_anden}
+    try:
+        pagina_recorridos = obtener_repositorio().buscar_recorridos(terminal.id, filtros, por_pagina, offset)
+    except SinConexion:
         flash("Error de conexión a la base de datos", "danger")
         return redirect(url_for('login'))
-    
+    total_llegadas, llegadas = pagina_recorridos['llegadas']
+    total_salidas, salidas = pagina_recorridos['salidas']
+
+    total_paginas = math.ceil(max(total_llegadas, total_salidas) / por_pagina) if max(total_llegadas, total_salidas) > 0 else 1
+
+    return render_template('admin.html', 
+                           llegadas=llegadas, 
+                           salidas=salidas, 
+                           pagina_actual=pagina, 
+                           total_paginas=total_paginas,
+                           filtros=filtros,
+                           codigo_terminal=terminales.codigo_en_url(terminal),
+                           estados=ESTADOS_RECORRIDO)
+
+
+# ==========================================
+# API JSON DEL PANEL (CARGA BAJO DEMANDA DE CADA PESTAÑA/MODAL)
+# ==========================================
+
+def _responder_pagina(sql, params, convertir, orden):
+    """
+    Ejecuta 'sql' paginado con ?page= y ?por_pagina= (máx. 1000).
+    El total sale en la misma consulta con COUNT(*) OVER().
+    """
+    pagina = max(request.args.get('page', 1, type=int), 1)
+    por_pagina = min(max(request.args.get('por_pagina', 50, type=int), 1), 1000)
+
+    conn = obtener_conexion()
+    if not conn:
+        return jsonify({'status': 'error', 'message': 'Error de conexión a la base de datos'}), 503
     cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT *, COUNT(*) OVER() FROM ({sql}) AS datos ORDER BY {orden} LIMIT %s OFFSET %s",
+                    (*params, por_pagina, (pagina - 1) * por_pagina))
+        filas = cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
 
-    cur.execute("SELECT id, nombre FROM empresas ORDER BY nombre ASC")
-    lista_empresas_full = cur.fetchall() 
-    
-    cur.execute("SELECT id, nombre FROM lugares ORDER BY nombre ASC")
-    lista_lugares_full = cur.fetchall()
+    total = filas[0][-1] if filas else 0
+    return jsonify({
+        'status': 'success',
+        'items': [convertir(f) for f in filas],
+        'pagina': pagina,
+        'total': total,
+        'total_paginas': max(math.ceil(total / por_pagina), 1),
+    })
+
+
+def _filtro_busqueda(columna, terminal_id=None):
+    """WHERE con la búsqueda ?q= sobre 'columna' y, si se indica, el terminal."""
+    condiciones, params = [], []
+    if terminal_id is not None:
+        condiciones.append("terminal_id = %s")
+        params.append(terminal_id)
+    q = request.args.get('q', '').strip()
+    if q:
+        condiciones.append(f"{columna} ILIKE %s")
+        params.append(f"%{q}%")
+    if condiciones:
+        return "WHERE " + " AND ".join(condiciones), params
+    return "", []
+
+
+@admin_bp.route('/admin/api/maestros/<tipo>')
+@login_required
+def api_maestros(tipo):
+    if current_user.rol != 'admin': return jsonify({'status': 'error', 'message': 'No autorizado'}), 403
 
-    # --- CAMBIO AQUÍ: Agregamos 'rut' al SELECT ---
-    cur.execute("SELECT id, username, rol, activo, rut FROM usuarios ORDER BY id ASC") 
-    lista_usuarios = cur.fetchall()
+    tabla = "empresas" if tipo == "empresa" else "lugares"
+    where, params = _filtro_busqueda("nombre")
+    return _responder_pagina(f"SELECT id, nombre FROM {tabla} {where}", params,
+                             lambda f: {'id': f[0], 'nombre': f[1]}, "nombre ASC")
 
-    lista_empresas = [e[1] for e in lista_empresas_full]
-    lista_lugares = [l[1] for l in lista_lugares_full]
 
-    cur.execute("SELECT id, contenido, fecha_creacion, activa FROM noticias ORDER BY id DESC")
-    lista_noticias = cur.fetchall()
+@admin_bp.route('/admin/api/usuarios')
+@login_required
+def api_usuarios():
+    if current_user.rol != 'admin': return jsonify({'status': 'error', 'message': 'No autorizado'}), 403
 
-    condiciones = ["1=1"]
-    params = []
-    
-    if f_fecha:
-        condiciones.append("fecha = %s")
-        params.append(f_fecha)
-    
-    # Lógica de filtro por hora
-    if f_hora:
-        condiciones.append("hora::text LIKE %s")
-        params.append(f"{f_hora}%")
+    where, params = _filtro_busqueda("username || ' ' || rut", current_user.terminal_id)
+    return _responder_pagina(f"SELECT id, username, rol, activo, rut FROM usuarios {where}", params,
+                             lambda f: {'id': f[0], 'username': f[1], 'rol': f[2], 'activo': f[3], 'rut': f[4]},
+                             "id ASC")
 
-    if f_empresa:
-        condiciones.append("empresa_nombre = %s")
-        params.append(f_empresa)
-    if f_lugar:
-        condiciones.append("lugar = %s")
-        params.append(f_lugar)
-    if f_anden:
-        condiciones.append("anden = %s")
-        params.append(f_anden)
 
-    where_clause = " AND ".join(condiciones)
+@admin_bp.route('/admin/api/flota')
+@login_required
+def api_flota():
+    if current_user.rol != 'admin': return jsonify({'status': 'error', 'message': 'No autorizado'}), 403
 
-    cur.execute(f"SELECT COUNT(*) FROM import_llegadas WHERE {where_clause}", params)
-    total_llegadas = cur.fetchone()[0]
-    cur.execute(f"SELECT id, hora, empresa_nombre, lugar, anden, fecha, 'llegadas' as tipo FROM import_llegadas WHERE {where_clause} ORDER BY hora ASC LIMIT %s OFFSET %s", (*params, por_pagina, offset))
-    llegadas = cur.fetchall()
+    where, params = _filtro_busqueda("patente || ' ' || COALESCE(empresa, '')")
+    return _responder_pagina(f"SELECT id, patente, empresa FROM buses_permitidos {where}", params,
+                             lambda f: {'id': f[0], 'patente': f[1], 'empresa': f[2]},
+                             "empresa ASC, patente ASC")
 
-    cur.execute(f"SELECT COUNT(*) FROM import_salidas WHERE {where_clause}", params)
-    total_salidas = cur.fetchone()[0]
-    cur.execute(f"SELECT id, hora, empresa_nombre, lugar, anden, fecha, 'salidas' as tipo FROM import_salidas WHERE {where_clause} ORDER BY hora ASC LIMIT %s OFFSET %s", (*params, por_pagina, offset))
-    salidas = cur.fetchall()
 
-    # --- CAMBIO AQUÍ TAMBIÉN (Por si estaba duplicado) ---
-    cur.execute("SELECT id, username, rol, activo, rut FROM usuarios ORDER BY id ASC")
-    lista_usuarios = cur.fetchall()
+@admin_bp.route('/admin/api/conflictos_anden')
+@login_required
+def api_conflictos_anden():
+    if current_user.rol != 'admin': return jsonify({'status': 'error', 'message': 'No autorizado'}), 403
 
-    # Cargar lista de patentes
-    cur.execute("SELECT id, patente, empresa FROM buses_permitidos ORDER BY empresa ASC, patente ASC")
-    lista_patentes = cur.fetchall()
+    hoy = datetime.now(terminales.terminal_usuario().zona).strftime('%Y-%m-%d')
+    try:
+        desde = datetime.strptime(request.args.get('desde') or hoy, '%Y-%m-%d').date()
+        hasta = datetime.strptime(request.args.get('hasta') or request.args.get('desde') or hoy, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Fecha inválida'}), 400
+    if hasta < desde or (hasta - desde).days >= conflictos_anden.MAX_DIAS:
+        return jsonify({'status': 'error',
+                        'message': f'El rango debe ser de 1 a {conflictos_anden.MAX_DIAS} días'}), 400
 
-    cur.close()
-    conn.close()
+    try:
+        conflictos = conflictos_anden.detectar(obtener_repositorio(), current_user.terminal_id, desde, hasta)
+    except SinConexion:
+        return jsonify({'status': 'error', 'message': 'Error de conexión a la base de datos'}), 503
+    return jsonify({'status': 'success', 'items': [conflictos_anden.a_dict(c) for c in conflictos],
+                    'total': len(conflictos)})
 
-    total_paginas = math.ceil(max(total_llegadas, total_salidas) / por_pagina) if max(total_llegadas, total_salidas) > 0 else 1
-    
-    filtros = {'fecha': f_fecha, 'hora': f_hora, 'empresa': f_empresa, 'lugar': f_lugar, 'anden': f_anden}
 
-    return render_template('admin.html', 
-                           llegadas=llegadas, 
-                           salidas=salidas, 
-                           lista_noticias=lista_noticias,
-                           pagina_actual=pagina, 
-                           total_paginas=total_paginas,
-                           lista_lugares=lista_lugares,
-                           lista_empresas=lista_empresas,
-                           filtros=filtros,
-                           empresas_full=lista_empresas_full,
-                           lugares_full=lista_lugares_full,
-                           usuarios=lista_usuarios,
-                           patentes=lista_patentes)
+@admin_bp.route('/admin/api/noticias')
+@login_required
+def api_noticias():
+    if current_user.rol != 'admin': return jsonify({'status': 'error', 'message': 'No autorizado'}), 403
+
+    return _responder_pagina("SELECT id, contenido, fecha_creacion, activa FROM noticias WHERE terminal_id = %s",
+                             [current_user.terminal_id],
+                             lambda f: {'id': f[0], 'contenido': f[1],
+                                        'fecha': f[2].strftime('%d-%m %H:%M') if f[2] else '-',
+                                        'activa': f[3]},
+                             "id DESC")
 
 # --- NUEVA NOTICIA ---
 @admin_bp.route('/admin/noticias/nueva', methods=['POST'])
@@ -150,10 +233,13 @@ def nueva_noticia():
     
     contenido = request.form.get('texto_noticia', '').strip()
     if contenido:
-        conn = obtener_conexion_admin()
+        conn = obtener_conexion()
         cur = conn.cursor()
-        cur.execute("INSERT INTO noticias (contenido) VALUES (%s)", (contenido,))
+        cur.execute("INSERT INTO noticias (contenido, terminal_id) VALUES (%s, %s) RETURNING id",
+                    (contenido, current_user.terminal_id))
+        id_noticia = cur.fetchone()[0]
         conn.commit()
+        _auditar('crear', 'noticias', id_noticia, contenido=contenido)
         cur.close()
         conn.close()
         flash('Noticia publicada.', 'success')
@@ -165,10 +251,11 @@ def nueva_noticia():
 def eliminar_noticia(id):
     if current_user.rol != 'admin': return redirect(url_for('usuario_bp.dashboard'))
     
-    conn = obtener_conexion_admin()
+    conn = obtener_conexion()
     cur = conn.cursor()
-    cur.execute("DELETE FROM noticias WHERE id = %s", (id,))
+    cur.execute("DELETE FROM noticias WHERE id = %s AND terminal_id = %s", (id, current_user.terminal_id))
     conn.commit()
+    _auditar('eliminar', 'noticias', id)
     cur.close()
     conn.close()
     flash('Noticia eliminada.', 'info')
@@ -207,6 +294,11 @@ def importar_excel():
             flash(f"Archivos con nombre incorrecto (falta 'SALIDAS' o 'LLEGADAS'): {', '.join(nombres_invalidos)}", "danger")
 
         if archivos_validos > 0:
+            # pandas/openpyxl se cargan recién aquí: los workers que solo sirven
+            # pantalla, dashboard u operador no pagan su tiempo de import ni su memoria
+            from manipulacion_datos.generar_salidas_llegadas import ejecutar_procesamiento_excel
+            from manipulacion_datos.insertar_datos import ejecutar_insercion_datos
+
             exito_csv, mensajes_csv = ejecutar_procesamiento_excel(carpeta_temp)
             
             # Mostramos errores de CSV (formato, fecha no encontrada)
@@ -214,7 +306,9 @@ def importar_excel():
                 flash(msg, "danger")
 
             if exito_csv:
-                exito_db, mensajes_db = ejecutar_insercion_datos(carpeta_temp)
+                exito_db, mensajes_db = ejecutar_insercion_datos(carpeta_temp, current_user.terminal_id)
+                _auditar('importar', 'recorridos', exito=exito_db,
+                         archivos=[a.filename for a in archivos if a.filename], mensajes=mensajes_db)
                 
                 # --- NUEVA LÓGICA SIN EMOJIS ---
                 for msg in mensajes_db:
@@ -229,7 +323,7 @@ def importar_excel():
                 # --- NUEVO: SINCRONIZACIÓN AUTOMÁTICA TRAS IMPORTACIÓN ---
                 if exito_db:
                     try:
-                        conn_sync = obtener_conexion_admin()
+                        conn_sync = obtener_conexion()
                         cur_sync = conn_sync.cursor()
                         
                         # 1. Insertar empresas nuevas faltantes
@@ -288,10 +382,11 @@ def eliminar(tipo, id):
     if current_user.rol != 'admin': return redirect(url_for('usuario_bp.dashboard'))
     
     tabla = "import_llegadas" if tipo == "llegada" else "import_salidas"
-    conn = obtener_conexion_admin()
+    conn = obtener_conexion()
     cur = conn.cursor()
-    cur.execute(f"DELETE FROM {tabla} WHERE id = %s", (id,))
+    cur.execute(f"DELETE FROM {tabla} WHERE id = %s AND terminal_id = %s", (id, current_user.terminal_id))
     conn.commit()
+    _auditar('eliminar', tabla, id)
     cur.close()
     conn.close()
     flash('Registro eliminado.', 'info')
@@ -314,8 +409,9 @@ def editar_registro():
     lugar = request.form.get('lugar')
     anden = request.form.get('anden')
 
-    conn = obtener_conexion_admin()
+    conn = obtener_conexion()
     cur = conn.cursor()
+    id_guardado = None   # id de la fila escrita (para el aviso de conflictos de andén)
 
     try:
         # --- NUEVO: SINCRONIZACIÓN AUTOMÁTICA ---
@@ -335,31 +431,194 @@ def editar_registro():
 
         if id_reg == '0':
             cur.execute(f"""
-                INSERT INTO {tabla} (fecha, hora, empresa_nombre, lugar, anden, estado)
-                VALUES (%s, %s, %s, %s, %s, 'Programado')
-            """, (fecha, hora, empresa, lugar, anden))
+                INSERT INTO {tabla} (fecha, hora, empresa_nombre, lugar, anden, estado, terminal_id)
+                VALUES (%s, %s, %s, %s, %s, 'Programado', %s)
+                RETURNING id
+            """, (fecha, hora, empresa, lugar, anden, current_user.terminal_id))
+            id_reg = id_guardado = cur.fetchone()[0]
+            accion = 'crear'
             flash('Nuevo recorrido creado exitosamente.', 'success')
         else:
             cur.execute(f"""
                 UPDATE {tabla} 
                 SET fecha=%s, hora=%s, empresa_nombre=%s, lugar=%s, anden=%s 
-                WHERE id=%s
-            """, (fecha, hora, empresa, lugar, anden, id_reg))
+                WHERE id=%s AND terminal_id=%s
+                RETURNING id
+            """, (fecha, hora, empresa, lugar, anden, id_reg, current_user.terminal_id))
+            fila = cur.fetchone()
+            id_guardado = fila[0] if fila else None
+            accion = 'editar'
             flash('Registro actualizado.', 'success')
 
         conn.commit()
+        _auditar(accion, tabla, id_reg, fecha=fecha, hora=hora, empresa=empresa, lugar=lugar, anden=anden)
 
     except Exception as e:
         conn.rollback()
         print(f"Error SQL: {e}") 
         flash(f'Error al guardar: {e}', 'danger')
+        id_guardado = None
     finally:
         cur.close()
         conn.close()
 
+    if id_guardado is not None:
+        _avisar_conflictos(tipo, id_guardado, fecha)
+
     return redirect(url_for('admin_bp.admin_panel'))
 
 
+def _avisar_conflictos(tipo, id_reg, fecha):
+    """Flash con los recorridos que comparten andén con el recién guardado (conflictos_anden.py)."""
+    try:
+        conflictos = conflictos_anden.detectar(obtener_repositorio(), current_user.terminal_id, fecha, fecha)
+    except (ValueError, SinConexion):
+        return
+    tipo = 'llegadas' if tipo == 'llegada' else 'salidas'
+    for c in conflictos_anden.del_recorrido(conflictos, tipo, id_reg):
+        otro = c.b if (c.a.tipo, c.a.id) == (tipo, id_reg) else c.a
+        flash(f"Conflicto de andén {c.anden}: se cruza con {conflictos_anden.describir(otro)} "
+              f"entre {c.desde.strftime('%H:%M')} y {c.hasta.strftime('%H:%M')}.", 'warning')
+
+
+# ==========================================
+# OPERACIONES MASIVAS SOBRE RECORRIDOS
+# ==========================================
+# Cada operación es UNA sentencia (CTE con DELETE/UPDATE por tabla) dentro de
+# una transacción: o se aplican todas las filas o ninguna.
+
+TABLAS_RECORRIDOS = {'salida': 'import_salidas', 'llegada': 'import_llegadas'}
+ESTADOS_RECORRIDO = ['Programado', 'En Andén', 'En Recorrido', 'Demorado', 'Finalizado', 'Cancelado']
+COLUMNAS_RECORRIDO = "id, fecha, hora, empresa_nombre, lugar, anden, estado, terminal_id"
+
+
+def _alcance_masivo(form, terminal_id):
+    """
+    Retorna {tabla: (where, params)} con las filas afectadas, siempre del terminal:
+    - modo 'ids': los ids marcados en el panel (ids_salida / ids_llegada).
+    - modo 'filtro': los filtros del panel sobre el tipo elegido (salida/llegada/ambos).
+    """
+    alcance = {}
+    if form.get('modo') == 'ids':
+        for tipo, tabla in TABLAS_RECORRIDOS.items():
+            ids = [int(x) for x in form.get(f'ids_{tipo}', '').split(',') if x.strip().isdigit()]
+            if ids:
+                alcance[tabla] = ("id = ANY(%s) AND terminal_id = %s", [ids, terminal_id])
+        return alcance
+
+    # Sin fecha el filtro abarcaría toda la programación histórica
+    if not form.get('fecha'):
+        raise ValueError("Para operar por filtro debes indicar al menos la fecha.")
+    where, params = _filtro_recorridos(terminal_id, form.get('fecha'), form.get('hora', '').strip(), form.get('empresa', ''),
+                                       form.get('lugar', ''), form.get('anden', ''))
+    tipo = form.get('tipo', 'ambos')
+    for t in (TABLAS_RECORRIDOS if tipo == 'ambos' else [tipo]):
+        if t in TABLAS_RECORRIDOS:
+            alcance[TABLAS_RECORRIDOS[t]] = (where, params)
+    return alcance
+
+
+def _sentencia_masiva(accion, form, alcance, previsualizar):
+    """Arma una sola sentencia que opera sobre todas las tablas y retorna la cantidad por tabla."""
+    if accion == 'editar':
+        nuevo_anden = form.get('nuevo_anden', '').strip() or None
+        nueva_empresa = form.get('nueva_empresa', '').strip() or None
+        minutos = form.get('desplazar_minutos', 0, type=int) or 0
+        if nuevo_anden is None and nueva_empresa is None and not minutos:
+            raise ValueError("Indica un nuevo andén, una nueva empresa o un desplazamiento de hora.")
+        if nuevo_anden is not None and not nuevo_anden.isdigit():
+            raise ValueError("El andén debe ser un número.")
+    elif accion == 'estado':
+        nuevo_estado = form.get('nuevo_estado')
+        if nuevo_estado not in ESTADOS_RECORRIDO:
+            raise ValueError("Estado no válido.")
+    elif accion != 'eliminar':
+        raise ValueError("Acción no válida.")
+
+    partes, params = [], []
+    for i, (tabla, (where, params_where)) in enumerate(alcance.items()):
+        if previsualizar:
+            partes.append(f"t{i} AS (SELECT 1 FROM {tabla} WHERE {where})")
+            params += params_where
+        elif accion == 'eliminar':
+            partes.append(f"t{i} AS (DELETE FROM {tabla} WHERE {where} RETURNING 1)")
+            params += params_where
+        elif accion == 'estado':
+            partes.append(f"t{i} AS (UPDATE {tabla} SET estado = %s WHERE {where} RETURNING 1)")
+            params += [nuevo_estado, *params_where]
+        else:
+            # Se borran y reinsertan (mismo id) en la misma sentencia: con un UPDATE
+            # directo, correr 30 min una serie cada 30 min choca con la clave única
+            # (terminal, fecha, hora, empresa, lugar) según el orden en que se actualicen las filas.
+            # El ORDER BY obliga a terminar todos los DELETE antes del primer INSERT.
+            partes.append(f"""m{i} AS (DELETE FROM {tabla} WHERE {where} RETURNING {COLUMNAS_RECORRIDO}),
+                t{i} AS (INSERT INTO {tabla} ({COLUMNAS_RECORRIDO})
+                         SELECT id,
+                                (fecha + hora + make_interval(mins => %s))::date,
+                                (fecha + hora + make_interval(mins => %s))::time,
+                                COALESCE(%s, empresa_nombre), lugar, COALESCE(%s::int, anden), estado, terminal_id
+                         FROM m{i} ORDER BY id RETURNING 1)""")
+            params += [*params_where, minutos, minutos, nueva_empresa, nuevo_anden]
+
+    conteos = ", ".join(f"(SELECT COUNT(*) FROM t{i})" for i in range(len(alcance)))
+    return f"WITH {', '.join(partes)} SELECT {conteos}", params
+
+
+@admin_bp.route('/admin/masivo', methods=['POST'])
+@login_required
+def operacion_masiva():
+    if current_user.rol != 'admin': return jsonify({'status': 'error', 'message': 'No autorizado'}), 403
+
+    accion = request.form.get('accion')
+    previsualizar = request.form.get('previsualizar') == '1'
+    es_fetch = request.headers.get('X-Requested-With') == 'fetch'
+
+    def responder(status, mensaje, cantidad=0, codigo=200):
+        if es_fetch:
+            return jsonify({'status': status, 'message': mensaje, 'cantidad': cantidad}), codigo
+        flash(mensaje, 'success' if status == 'success' else 'danger')
+        return redirect(url_for('admin_bp.admin_panel'))
+
+    try:
+        alcance = _alcance_masivo(request.form, current_user.terminal_id)
+        if not alcance:
+            return responder('error', "No hay recorridos seleccionados.", codigo=400)
+        sql, params = _sentencia_masiva(accion, request.form, alcance, previsualizar)
+    except ValueError as e:
+        return responder('error', str(e), codigo=400)
+
+    conn = obtener_conexion()
+    if not conn:
+        return responder('error', "Error de conexión a la base de datos", codigo=503)
+    cur = conn.cursor()
+    try:
+        # Si la nueva empresa no existe en la tabla maestra, la creamos (igual que editar_registro)
+        nueva_empresa = request.form.get('nueva_empresa', '').strip()
+        if accion == 'editar' and nueva_empresa and not previsualizar:
+            cur.execute("INSERT INTO empresas (nombre) SELECT %s WHERE NOT EXISTS (SELECT 1 FROM empresas WHERE nombre = %s)",
+                        (nueva_empresa, nueva_empresa))
+
+        cur.execute(sql, params)
+        cantidad = sum(cur.fetchone())
+        if previsualizar:
+            conn.rollback()
+            return responder('success', f"{cantidad} recorridos serán afectados.", cantidad)
+        conn.commit()
+        _auditar(f'masivo_{accion}', ','.join(alcance), cantidad=cantidad,
+                 formulario={k: v for k, v in request.form.items() if k != 'previsualizar'})
+        return responder('success', f"Operación aplicada a {cantidad} recorridos.", cantidad)
+    except IntegrityError:
+        conn.rollback()
+        return responder('error', "Conflicto: algún recorrido quedaría duplicado (misma fecha, hora, empresa y lugar). No se aplicaron cambios.", codigo=409)
+    except Exception as e:
+        conn.rollback()
+        print(f"Error operación masiva: {e}")
+        return responder('error', f"Error al aplicar la operación: {e}", codigo=500)
+    finally:
+        cur.close()
+        conn.close()
+
+
 # --- EDITAR TEXTO DE NOTICIA ---
 @admin_bp.route('/admin/noticias/editar', methods=['POST'])
 @login_required
@@ -370,10 +629,12 @@ def editar_noticia_texto():
     nuevo_contenido = request.form.get('texto_noticia_edit').strip()
     
     if id_noticia and nuevo_contenido:
-        conn = obtener_conexion_admin()
+        conn = obtener_conexion()
         cur = conn.cursor()
-        cur.execute("UPDATE noticias SET contenido = %s WHERE id = %s", (nuevo_contenido, id_noticia))
+        cur.execute("UPDATE noticias SET contenido = %s WHERE id = %s AND terminal_id = %s",
+                    (nuevo_contenido, id_noticia, current_user.terminal_id))
         conn.commit()
+        _auditar('editar', 'noticias', id_noticia, contenido=nuevo_contenido)
         cur.close()
         conn.close()
         flash('Noticia actualizada correctamente.', 'success')
@@ -389,10 +650,12 @@ def cambiar_estado_noticia(id):
     data = request.get_json()
     nuevo_estado = data.get('activa') # Esto será True o False
     
-    conn = obtener_conexion_admin()
+    conn = obtener_conexion()
     cur = conn.cursor()
-    cur.execute("UPDATE noticias SET activa = %s WHERE id = %s", (nuevo_estado, id))
+    cur.execute("UPDATE noticias SET activa = %s WHERE id = %s AND terminal_id = %s",
+                (nuevo_estado, id, current_user.terminal_id))
     conn.commit()
+    _auditar('estado', 'noticias', id, activa=nuevo_estado)
     cur.close()
     conn.close()
     
@@ -414,14 +677,16 @@ def agregar_maestro():
         flash("El nombre no puede estar vacío.", "warning")
         return redirect(url_for('admin_bp.admin_panel'))
 
-    conn = obtener_conexion_admin()
+    conn = obtener_conexion()
     cur = conn.cursor()
     
     tabla = "empresas" if tipo == "empresa" else "lugares"
     
     try:
-        cur.execute(f"INSERT INTO {tabla} (nombre) VALUES (%s)", (nombre,))
+        cur.execute(f"INSERT INTO {tabla} (nombre) VALUES (%s) RETURNING id", (nombre,))
+        id_nuevo = cur.fetchone()[0]
         conn.commit()
+        _auditar('crear', tabla, id_nuevo, nombre=nombre)
         flash(f"{tipo.capitalize()} '{nombre}' agregada correctamente.", "success")
     except IntegrityError:
         conn.rollback()
@@ -448,7 +713,7 @@ def eliminar_maestro():
         flash("Error: Identificador no válido.", "danger")
         return redirect(url_for('admin_bp.admin_panel'))
 
-    conn = obtener_conexion_admin()
+    conn = obtener_conexion()
     cur = conn.cursor()
     
     # Definimos en qué tabla buscar el nombre
@@ -466,38 +731,32 @@ def eliminar_maestro():
             
         nombre_real = resultado[0] # Ej: "Empresa Prueba"
 
-        # --- PASO 2: VERIFICAR SI ESE NOMBRE SE ESTÁ USANDO ---
-        # Buscamos en las tablas de recorridos por el TEXTO, no por el ID.
-        
-        if tipo == "empresa":
-            # Verificamos columna 'empresa_nombre'
-            cur.execute("SELECT COUNT(*) FROM import_salidas WHERE empresa_nombre = %s", (nombre_real,))
-            count_salidas = cur.fetchone()[0]
-            
-            cur.execute("SELECT COUNT(*) FROM import_llegadas WHERE empresa_nombre = %s", (nombre_real,))
-            count_llegadas = cur.fetchone()[0]
-            
-        else: # es lugar
-            # Verificamos columna 'lugar'
-            cur.execute("SELECT COUNT(*) FROM import_salidas WHERE lugar = %s", (nombre_real,))
-            count_salidas = cur.fetchone()[0]
-            
-            cur.execute("SELECT COUNT(*) FROM import_llegadas WHERE lugar = %s", (nombre_real,))
-            count_llegadas = cur.fetchone()[0]
+        # --- PASO 2: VERIFICAR SI SE ESTÁ USANDO ---
+        # Los recorridos referencian el maestro por id (sql/004_recorridos_maestros_fk.sql):
+        # basta con encontrar UN recorrido usando el índice, no hace falta contarlos.
+        columna = "empresa_id" if tipo == "empresa" else "lugar_id"
+        cur.execute(f"""
+            SELECT EXISTS (SELECT 1 FROM import_salidas WHERE {columna} = %s)
+                OR EXISTS (SELECT 1 FROM import_llegadas WHERE {columna} = %s)
+        """, (id_dato, id_dato))
+        en_uso = cur.fetchone()[0]
 
         # --- PASO 3: DECIDIR SI BORRAMOS ---
-        total_usos = count_salidas + count_llegadas
-
-        if total_usos > 0:
+        if en_uso:
             # Si se está usando, prohibimos borrar
-            flash(f"NO SE PUEDE BORRAR: '{nombre_real}' se está usando en {total_usos} recorridos. Debes eliminarlos primero.", "danger")
+            flash(f"NO SE PUEDE BORRAR: '{nombre_real}' se está usando en recorridos. Debes eliminarlos primero.", "danger")
             conn.rollback()
         else:
             # Si nadie lo usa, procedemos a borrar usando el ID
             cur.execute(f"DELETE FROM {tabla_maestra} WHERE id = %s", (id_dato,))
             conn.commit()
+            _auditar('eliminar', tabla_maestra, id_dato, nombre=nombre_real)
             flash(f"'{nombre_real}' eliminado correctamente.", "success")
 
+    except IntegrityError:
+        # La llave foránea lo impide si un recorrido lo tomó entre el EXISTS y el DELETE
+        conn.rollback()
+        flash(f"NO SE PUEDE BORRAR: '{nombre_real}' se está usando en recorridos. Debes eliminarlos primero.", "danger")
     except Exception as e:
         conn.rollback()
         flash(f"Error técnico al eliminar: {e}", "danger")
@@ -528,13 +787,15 @@ def crear_usuario_web():
     # encriptación
     hashed_password = generate_password_hash(password)
 
-    conn = obtener_conexion_admin()
+    conn = obtener_conexion()
     cur = conn.cursor()
     try:
-        # 2. Modificamos el INSERT para incluir el rut
-        cur.execute("INSERT INTO usuarios (username, rut, password, rol, activo) VALUES (%s, %s, %s, %s, TRUE)", 
-                    (username, rut, hashed_password, rol))
+        # 2. Modificamos el INSERT para incluir el rut (la cuenta queda en el terminal del administrador)
+        cur.execute("INSERT INTO usuarios (username, rut, password, rol, activo, terminal_id) VALUES (%s, %s, %s, %s, TRUE, %s) RETURNING id", 
+                    (username, rut, hashed_password, rol, current_user.terminal_id))
+        id_nuevo = cur.fetchone()[0]
         conn.commit()
+        _auditar('crear', 'usuarios', id_nuevo, username=username, rut=rut, rol=rol)
         flash(f"Usuario '{username}' (RUT: {rut}) creado exitosamente.", "success")
     
     except IntegrityError:
@@ -560,11 +821,13 @@ def eliminar_usuario(id_user):
         flash("No puedes eliminar tu propia cuenta mientras estás en sesión.", "danger")
         return redirect(url_for('admin_bp.admin_panel'))
 
-    conn = obtener_conexion_admin()
+    conn = obtener_conexion()
     cur = conn.cursor()
     try:
-        cur.execute("DELETE FROM usuarios WHERE id = %s", (id_user,))
+        cur.execute("DELETE FROM usuarios WHERE id = %s AND terminal_id = %s", (id_user, current_user.terminal_id))
         conn.commit()
+        invalidar_usuario(id_user)
+        _auditar('eliminar', 'usuarios', id_user)
         flash("Usuario eliminado correctamente.", "success")
     except Exception as e:
         conn.rollback()
@@ -597,7 +860,7 @@ def editar_usuario():
     
     rol = request.form.get('rol') # HTML name="rol"
 
-    conn = obtener_conexion_admin()
+    conn = obtener_conexion()
     cur = conn.cursor()
     
     try:
@@ -605,17 +868,20 @@ def editar_usuario():
             # Si escribieron algo en password, la actualizamos
             hashed_password = generate_password_hash(password)
             cur.execute("""
-                UPDATE usuarios SET username=%s, rut=%s, password=%s, rol=%s WHERE id=%s
-            """, (username, rut, hashed_password, rol, id_user))
+                UPDATE usuarios SET username=%s, rut=%s, password=%s, rol=%s WHERE id=%s AND terminal_id=%s
+            """, (username, rut, hashed_password, rol, id_user, current_user.terminal_id))
             flash(f"Usuario actualizado correctamente (con nueva contraseña).", "success")
         else:
             # Si la password está vacía, SOLO actualizamos datos, mantenemos la clave vieja
             cur.execute("""
-                UPDATE usuarios SET username=%s, rut=%s, rol=%s WHERE id=%s
-            """, (username, rut, rol, id_user))
+                UPDATE usuarios SET username=%s, rut=%s, rol=%s WHERE id=%s AND terminal_id=%s
+            """, (username, rut, rol, id_user, current_user.terminal_id))
             flash(f"Usuario actualizado correctamente.", "success")
         
         conn.commit()
+        invalidar_usuario(id_user)
+        _auditar('editar', 'usuarios', id_user, username=username, rut=rut, rol=rol,
+                 cambio_password=bool(password))
     except Exception as e:
         conn.rollback()
         flash(f"Error al editar (posible RUT duplicado): {e}", "danger")
@@ -626,6 +892,35 @@ def editar_usuario():
     return redirect(url_for('admin_bp.admin_panel'))
 
 
+# CONTADORES DEL LÍMITE DE LOGIN (por proceso)
+@admin_bp.route('/admin/seguridad/login')
+@login_required
+def contadores_login():
+    if current_user.rol != 'admin': return jsonify({'status': 'error', 'message': 'No autorizado'}), 403
+    return jsonify({'status': 'success', 'pid': os.getpid(), 'contadores': obtener_contadores()})
+
+
+# CONTADORES DE LA AUDITORÍA (por proceso: en cola, escritos, descartados)
+@admin_bp.route('/admin/auditoria/contadores')
+@login_required
+def contadores_auditoria_proceso():
+    if current_user.rol != 'admin': return jsonify({'status': 'error', 'message': 'No autorizado'}), 403
+    return jsonify({'status': 'success', 'pid': os.getpid(), 'contadores': contadores_auditoria()})
+
+
+# CONSULTAS LENTAS (huellas agrupadas y planes EXPLAIN de una muestra)
+@admin_bp.route('/admin/consultas_lentas')
+@login_required
+def consultas_lentas():
+    if current_user.rol != 'admin': return redirect(url_for('usuario_bp.dashboard'))
+    huellas, recientes = resumen_consultas_lentas()
+    filtro_huella = request.args.get('huella')
+    if filtro_huella:
+        recientes = [c for c in recientes if c['huella'] == filtro_huella]
+    return render_template('consultas_lentas.html', huellas=huellas, recientes=recientes,
+                           filtro_huella=filtro_huella, umbral_ms=UMBRAL_MS)
+
+
 # GESTIÓN DE PATENTES
 
 @admin_bp.route('/admin/flota/agregar', methods=['POST'])
@@ -640,11 +935,13 @@ def agregar_patente():
         flash("La patente es obligatoria.", "warning")
         return redirect(url_for('admin_bp.admin_panel'))
 
-    conn = obtener_conexion_admin()
+    conn = obtener_conexion()
     cur = conn.cursor()
     try:
-        cur.execute("INSERT INTO buses_permitidos (patente, empresa) VALUES (%s, %s)", (patente, empresa))
+        cur.execute("INSERT INTO buses_permitidos (patente, empresa) VALUES (%s, %s) RETURNING id", (patente, empresa))
+        id_nuevo = cur.fetchone()[0]
         conn.commit()
+        _auditar('crear', 'buses_permitidos', id_nuevo, patente=patente, empresa=empresa)
         flash(f"Patente {patente} agregada a la lista permitida.", "success")
     except IntegrityError:
         conn.rollback()
@@ -666,11 +963,12 @@ def eliminar_patente():
 
     id_patente = request.form.get('id')
     
-    conn = obtener_conexion_admin()
+    conn = obtener_conexion()
     cur = conn.cursor()
     try:
         cur.execute("DELETE FROM buses_permitidos WHERE id = %s", (id_patente,))
         conn.commit()
+        _auditar('eliminar', 'buses_permitidos', id_patente)
         flash("Patente eliminada de la lista permitida.", "success")
     except Exception as e:
         conn.rollback()
@@ -683,126 +981,46 @@ def eliminar_patente():
 
 
 
-# REPORTE DE VERIFICACIONES (EXCEL)
-
-@admin_bp.route('/admin/reportes/verificaciones', methods=['POST'])
-@login_required
-def descargar_reporte_verificaciones():
-    if current_user.rol != 'admin': return redirect(url_for('usuario_bp.dashboard'))
-
-    fecha_reporte = request.form.get('fecha_reporte')
-    
-    conn = obtener_conexion_admin()
-    cur = conn.cursor()
-
-    try:
-        # CONSULTA SQL MAESTRA
-        # Unimos tabla historial con usuarios para saber QUIÉN hizo la revisión
-        sql = """
-            SELECT 
-                h.id,
-                u.username as operador,
-                h.tipo_recorrido,
-                h.patente_ingresada,
-                CASE WHEN h.es_patente_valida THEN 'SI' ELSE 'NO' END as patente_ok,
-                h.anden_programado,
-                h.anden_real,
-                CASE WHEN h.es_anden_correcto THEN 'SI' ELSE 'NO' END as anden_ok,
-                TO_CHAR(h.fecha_manual, 'DD/MM/YYYY') as fecha_ingreso,
-                TO_CHAR(h.hora_manual, 'HH24:MI') as hora_ingreso,
-                h.observaciones
-            FROM historial_verificaciones h
-            JOIN usuarios u ON h.operador_id = u.id
-            WHERE h.fecha_manual = %s 
-            ORDER BY h.fecha_manual DESC, h.hora_manual DESC
-        """
-        
-        # Usamos Pandas para leer directo de la DB
-        df = pd.read_sql_query(sql, conn, params=(fecha_reporte,))
-        
-        if df.empty:
-            flash(f"No hay verificaciones registradas para el día {fecha_reporte}.", "warning")
-            return redirect(url_for('admin_bp.admin_panel'))
-
-        # RENOMBRAMOS COLUMNAS (Para que el Excel se vea bonito)
-        df.columns = ['ID', 'OPERADOR', 'TIPO', 'PATENTE', '¿PATENTE OK?', 
-                      'ANDÉN PROG.', 'ANDÉN REAL', '¿ANDÉN OK?', 
-                      'FECHA INGRESO', 'HORA INGRESO', 'OBSERVACIONES']
-
-        # GENERAR EXCEL EN MEMORIA (Sin guardar archivo en disco)
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Verificaciones')
-            
-            # Ajuste automático de ancho de columnas (Opcional, estético)
-            worksheet = writer.sheets['Verificaciones']
-            for column_cells in worksheet.columns:
-                length = max(len(str(cell.value)) for cell in column_cells)
-                worksheet.column_dimensions[column_cells[0].column_letter].width = length + 2
+# DEFINICIONES DE REPORTES
+# Cada reporte declara su consulta (parámetros %(terminal)s, %(inicio)s / %(fin)s), columnas
+# (título, ancho) y resumen; motor_reportes se encarga de leer por lotes y
+# escribir la salida elegida (XLSX, CSV o Parquet).
 
-        output.seek(0)
-        
-        # NOMBRE DEL ARCHIVO
-        nombre_archivo = f"Reporte_Verificaciones_{fecha_reporte}.xlsx"
-
-        return send_file(
-            output,
-            as_attachment=True,
-            download_name=nombre_archivo,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-
-    except Exception as e:
-        flash(f"Error al generar reporte: {e}", "danger")
-        return redirect(url_for('admin_bp.admin_panel'))
-    finally:
-        cur.close()
-        conn.close()
-
-
-# CAMBIAR ESTADO USUARIO (SWITCH)
-
-@admin_bp.route('/admin/usuarios/estado', methods=['POST'])
-@login_required
-def cambiar_estado_usuario():
-    if current_user.rol != 'admin': 
-        return jsonify({'status': 'error', 'message': 'No autorizado'}), 403
-
-    data = request.get_json()
-    usuario_id = data.get('id')
-    nuevo_estado = data.get('activo') # True o False
-
-    # Evitar que el admin se desactive a sí mismo por error
-    if int(usuario_id) == current_user.id:
-        return jsonify({'status': 'error', 'message': 'No puedes desactivar tu propia cuenta.'})
-
-    conn = obtener_conexion_admin()
-    cur = conn.cursor()
-    try:
-        cur.execute("UPDATE usuarios SET activo = %s WHERE id = %s", (nuevo_estado, usuario_id))
-        conn.commit()
-        return jsonify({'status': 'success'})
-    except Exception as e:
-        conn.rollback()
-        return jsonify({'status': 'error', 'message': str(e)})
-    finally:
-        cur.close()
-        conn.close()
+REPORTE_VERIFICACIONES = DefinicionReporte(
+    nombre='verificaciones',
+    # Unimos tabla historial con usuarios para saber QUIÉN hizo la revisión
+    consulta="""
+        SELECT 
+            h.id,
+            u.username as operador,
+            h.tipo_recorrido,
+            h.patente_ingresada,
+            CASE WHEN h.es_patente_valida THEN 'SI' ELSE 'NO' END as patente_ok,
+            h.anden_programado,
+            h.anden_real,
+            CASE WHEN h.es_anden_correcto THEN 'SI' ELSE 'NO' END as anden_ok,
+            TO_CHAR(h.fecha_manual, 'DD/MM/YYYY') as fecha_ingreso,
+            TO_CHAR(h.hora_manual, 'HH24:MI') as hora_ingreso,
+            h.observaciones
+        FROM historial_verificaciones h
+        JOIN usuarios u ON h.operador_id = u.id
+        WHERE h.terminal_id = %(terminal)s
+          AND h.fecha_manual BETWEEN %(inicio)s AND %(fin)s
+        ORDER BY h.fecha_manual DESC, h.hora_manual DESC
+    """,
+    columnas=[('ID', None), ('OPERADOR', None), ('TIPO', None), ('PATENTE', None), ('¿PATENTE OK?', None),
+              ('ANDÉN PROG.', None), ('ANDÉN REAL', None), ('¿ANDÉN OK?', None),
+              ('FECHA INGRESO', None), ('HORA INGRESO', None), ('OBSERVACIONES', None)],
+    hoja='Verificaciones',
+    archivo='Reporte_Verificaciones_{inicio}',
+    color_encabezado='#198754',
+)
 
 # --- REPORTE OFICIAL (Corregido para tablas separadas) ---
-@admin_bp.route('/admin/exportar_excel_rango', methods=['POST'])
-@login_required
-def exportar_excel_rango():
-    if current_user.rol != 'admin': return redirect(url_for('login'))
-
-    f_inicio = request.form['fecha_inicio']
-    f_fin = request.form['fecha_fin']
-
-    conn = obtener_conexion_admin()
-    cur = conn.cursor()
-
-    # LEFT JOIN condicionales a 'import_salidas' y 'import_llegadas'
-    query = """
+REPORTE_OFICIAL = DefinicionReporte(
+    nombre='oficial',
+    # LEFT JOIN condicionales a salidas y llegadas (vistas *_historico: vivas + archivo, ver sql/007)
+    consulta="""
         SELECT 
             h.id,
             TO_CHAR(h.fecha_manual, 'YYYY-MM-DD') as fecha,
@@ -824,185 +1042,212 @@ def exportar_excel_rango():
         FROM historial_verificaciones h
         
         -- UNIMOS CON SALIDAS (Solo si el tipo es 'salidas')
-        LEFT JOIN import_salidas s ON h.recorrido_id = s.id AND h.tipo_recorrido = 'salidas'
+        LEFT JOIN import_salidas_historico s ON h.recorrido_id = s.id AND h.tipo_recorrido = 'salidas'
         
         -- UNIMOS CON LLEGADAS (Solo si el tipo es 'llegadas')
-        LEFT JOIN import_llegadas l ON h.recorrido_id = l.id AND h.tipo_recorrido = 'llegadas'
+        LEFT JOIN import_llegadas_historico l ON h.recorrido_id = l.id AND h.tipo_recorrido = 'llegadas'
         
         JOIN usuarios u ON h.operador_id = u.id
         LEFT JOIN buses_permitidos bp ON h.patente_ingresada = bp.patente
         
-        WHERE h.fecha_manual BETWEEN %s AND %s
+        WHERE h.terminal_id = %(terminal)s
+          AND h.fecha_manual BETWEEN %(inicio)s AND %(fin)s
         ORDER BY h.fecha_manual DESC, h.hora_manual DESC
-    """
+    """,
+    columnas=[('ID', 15), ('Fecha', 15), ('Hora', 15), ('Lugar', 15), ('Empresa (Itinerario)', 15),
+              ('Andén', 15), ('Operador', 15), ('Placa', 15), ('¿Placa Válida?', 15),
+              ('Observación', 15), ('Empresa (Dueña Bus)', 15)],
+    hoja='Detalle_Oficial',
+    archivo='Reporte_OFICIAL_{inicio}_al_{fin}',
+    color_encabezado='#002b3f',
+    # El resumen sale de la tabla diaria pre-agregada (no del detalle); la empresa
+    # dueña se cruza con la flota actual, igual que 'Empresa (Dueña Bus)' (sql/001)
+    resumen=('Resumen_Por_Placa',
+             [('Placa', 20), ('Empresa', 20), ('¿Placa Válida?', 20), ('Cantidad_Viajes', 20),
+              ('Andén Correcto', 20), ('Andén Incorrecto', 20)],
+             obtener_resumen_verificaciones),
+)
 
-    cur.execute(query, (f_inicio, f_fin))
-    datos = cur.fetchall()
-    conn.close()
+# --- REPORTE DE EXTRAS ---
+REPORTE_EXTRAS = DefinicionReporte(
+    nombre='extras',
+    # LEFT JOIN con 'buses_permitidos' para ver si la placa es válida
+    consulta="""
+        SELECT 
+            h.id,
+            h.fecha,
+            h.hora,
+            COALESCE(h.lugar, '') as lugar,
+            h.empresa,
+            h.anden,
+            u.username as operador,
+            h.patente,
+            CASE WHEN bp.patente IS NOT NULL THEN 'SI' ELSE 'NO' END as placa_valida,
+            h.observacion
+        FROM historial_extras h
+        LEFT JOIN usuarios u ON h.operador_id = u.id
+        LEFT JOIN buses_permitidos bp ON h.patente = bp.patente
+        WHERE h.terminal_id = %(terminal)s
+          AND h.fecha BETWEEN %(inicio)s AND %(fin)s
+        ORDER BY h.fecha DESC, h.hora DESC
+    """,
+    columnas=[('ID', 10), ('Fecha', 15), ('Hora', 10), ('Lugar', 20), ('Empresa', 25), ('Andén', 10),
+              ('Operador', 20), ('Placa', 15), ('¿Placa Válida?', 15), ('Observación', 40)],
+    hoja='Detalle_Extras',
+    archivo='Reporte_EXTRAS_{inicio}_al_{fin}',
+    # Naranja para diferenciar que es un reporte EXTRA
+    color_encabezado='#fd7e14',
+    resumen=('Resumen_Por_Placa',
+             [('Placa', 20), ('Empresa', 20), ('¿Placa Válida?', 20), ('Cantidad_Viajes', 20)],
+             obtener_resumen_extras),
+)
+
+
+# REPORTES EN SEGUNDO PLANO (COLA + CACHÉ)
+# Las rutas de reporte solo calculan la versión de sus datos y encolan.
+# Si el archivo ya existe para esa versión se entrega de inmediato.
+# Reporte, versión y archivo en caché son del terminal del administrador.
+
+def _encolar_reporte(definicion, f_inicio, f_fin, obtener_version, mensaje_vacio):
+    formato = request.form.get('formato', 'xlsx')
+    if formato not in FORMATOS:
+        formato = 'xlsx'
+
+    terminal_id = current_user.terminal_id
+    conn = obtener_conexion()
+    if not conn:
+        return _responder_estado_reporte(None, {'estado': 'error', 'mensaje': 'Error de conexión a la base de datos'})
+    cur = conn.cursor()
+    try:
+        version = obtener_version(cur, terminal_id, f_inicio, f_fin)
+    except Exception as e:
+        return _responder_estado_reporte(None, {'estado': 'error', 'mensaje': f"Error al generar reporte: {e}"})
+    finally:
+        cur.close()
+        conn.close()
 
-    # 2. DEFINIR COLUMNAS
-    columnas = [
-        'ID', 
-        'Fecha', 
-        'Hora', 
-        'Lugar', 
-        'Empresa (Itinerario)', 
-        'Andén', 
-        'Operador', 
-        'Placa', 
-        '¿Placa Válida?', 
-        'Observación',
-        'Empresa (Dueña Bus)'
-    ]
-
-    df_main = pd.DataFrame(datos, columns=columnas)
-
-    if df_main.empty:
-        flash(f"No hay registros oficiales entre {f_inicio} y {f_fin}.", "warning")
-        return redirect(url_for('admin_bp.admin_panel'))
+    generador = partial(generar_reporte, definicion, formato, obtener_conexion, terminal_id)
+    clave, estado = solicitar_reporte(f"{definicion.nombre}_{formato}_t{terminal_id}", f_inicio, f_fin, version,
+                                      generador, mensaje_vacio, extension=formato)
+    return _responder_estado_reporte(clave, estado)
+
+
+def _responder_estado_reporte(clave, estado):
+    # Peticiones desde el panel (fetch): respondemos JSON y el navegador consulta el avance
+    if request.headers.get('X-Requested-With') == 'fetch':
+        respuesta = {'status': estado['estado'], 'message': estado.get('mensaje', '')}
+        if estado['estado'] == 'listo':
+            respuesta['url'] = url_for('admin_bp.descargar_reporte_generado', clave=clave)
+        elif estado['estado'] == 'pendiente':
+            respuesta['url'] = url_for('admin_bp.estado_reporte', clave=clave)
+        return jsonify(respuesta)
+
+    # Formulario normal (sin JavaScript)
+    if estado['estado'] == 'listo':
+        return redirect(url_for('admin_bp.descargar_reporte_generado', clave=clave))
+    if estado['estado'] == 'vacio':
+        flash(estado['mensaje'], "warning")
+    elif estado['estado'] == 'error':
+        flash(estado['mensaje'], "danger")
+    else:
+        flash("El reporte se está generando. Vuelva a solicitarlo en unos segundos.", "info")
+    return redirect(url_for('admin_bp.admin_panel'))
 
-    # 3. GENERAR EL RESUMEN
-    df_resumen = df_main.groupby(['Placa', 'Empresa (Dueña Bus)', '¿Placa Válida?']).size().reset_index(name='Cantidad_Viajes')
-    df_resumen = df_resumen.sort_values(by='Cantidad_Viajes', ascending=False)
-    
-    # Renombrar columna para coincidir con el otro reporte
-    df_resumen = df_resumen.rename(columns={'Empresa (Dueña Bus)': 'Empresa'})
 
-    # 4. GENERAR EXCEL
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        
-        # HOJA 1: DETALLE
-        df_main.to_excel(writer, sheet_name='Detalle_Oficial', index=False)
-        
-        # HOJA 2: RESUMEN
-        df_resumen.to_excel(writer, sheet_name='Resumen_Por_Placa', index=False)
+@admin_bp.route('/admin/reportes/trabajo/<clave>')
+@login_required
+def estado_reporte(clave):
+    if current_user.rol != 'admin': return jsonify({'status': 'error', 'message': 'No autorizado'}), 403
 
-        # --- ESTILOS ---
-        workbook = writer.book
-        fmt_head_blue = workbook.add_format({'bold': True, 'bg_color': '#002b3f', 'font_color': 'white', 'border': 1, 'align': 'center'})
-        fmt_center = workbook.add_format({'align': 'center', 'border': 1})
+    estado = leer_estado(clave)
+    if not estado:
+        return jsonify({'status': 'error', 'message': 'Reporte no encontrado.'}), 404
+    return _responder_estado_reporte(clave, estado)
 
-        # Estilo Hoja 1
-        worksheet1 = writer.sheets['Detalle_Oficial']
-        for i, col in enumerate(df_main.columns):
-            worksheet1.write(0, i, col, fmt_head_blue)
-            worksheet1.set_column(i, i, 15, fmt_center)
 
-        # Estilo Hoja 2
-        worksheet2 = writer.sheets['Resumen_Por_Placa']
-        for i, col in enumerate(df_resumen.columns):
-            worksheet2.write(0, i, col, fmt_head_blue)
-            worksheet2.set_column(i, i, 20, fmt_center)
+@admin_bp.route('/admin/reportes/descargar/<clave>')
+@login_required
+def descargar_reporte_generado(clave):
+    if current_user.rol != 'admin': return redirect(url_for('usuario_bp.dashboard'))
+
+    estado = leer_estado(clave)
+    if not estado or estado['estado'] != 'listo':
+        flash("El reporte ya no está disponible. Solicítelo nuevamente.", "warning")
+        return redirect(url_for('admin_bp.admin_panel'))
 
-    output.seek(0)
-    
     return send_file(
-        output,
+        ruta_archivo(clave, estado['extension']),
         as_attachment=True,
-        download_name=f"Reporte_OFICIAL_{f_inicio}_al_{f_fin}.xlsx",
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        download_name=estado['nombre'],
+        mimetype=FORMATOS[estado['extension']]
     )
-# --- REPORTE DE EXTRAS ---
-@admin_bp.route('/admin/reporte_extras_rango', methods=['POST'])
+
+
+# REPORTE DE VERIFICACIONES (UN DÍA)
+
+@admin_bp.route('/admin/reportes/verificaciones', methods=['POST'])
 @login_required
-def reporte_extras_rango():
+def descargar_reporte_verificaciones():
+    if current_user.rol != 'admin': return redirect(url_for('usuario_bp.dashboard'))
+
+    fecha_reporte = request.form.get('fecha_reporte')
+
+    return _encolar_reporte(REPORTE_VERIFICACIONES, fecha_reporte, fecha_reporte, version_verificaciones,
+                            f"No hay verificaciones registradas para el día {fecha_reporte}.")
+
+
+@admin_bp.route('/admin/exportar_excel_rango', methods=['POST'])
+@login_required
+def exportar_excel_rango():
     if current_user.rol != 'admin': return redirect(url_for('login'))
 
     f_inicio = request.form['fecha_inicio']
     f_fin = request.form['fecha_fin']
 
-    conn = obtener_conexion_admin()
-    cur = conn.cursor()
+    return _encolar_reporte(REPORTE_OFICIAL, f_inicio, f_fin, version_verificaciones,
+                            f"No hay registros oficiales entre {f_inicio} y {f_fin}.")
 
 
-    # 1. Hacemos LEFT JOIN con 'buses_permitidos' para ver si la placa es válida
-    query = """
-        SELECT 
-            h.id,
-            h.fecha,
-            h.hora,
-            COALESCE(h.lugar, '') as lugar,  -- AHORA SÍ TRAEMOS EL LUGAR
-            h.empresa,
-            h.anden,
-            u.username as operador,
-            h.patente,
-            CASE WHEN bp.patente IS NOT NULL THEN 'SI' ELSE 'NO' END as placa_valida,
-            h.observacion
-        FROM historial_extras h
-        LEFT JOIN usuarios u ON h.operador_id = u.id
-        LEFT JOIN buses_permitidos bp ON h.patente = bp.patente
-        WHERE h.fecha BETWEEN %s AND %s
-        ORDER BY h.fecha DESC, h.hora DESC
-    """
-    
-    cur.execute(query, (f_inicio, f_fin))
-    datos = cur.fetchall()
-    conn.close()
+@admin_bp.route('/admin/reporte_extras_rango', methods=['POST'])
+@login_required
+def reporte_extras_rango():
+    if current_user.rol != 'admin': return redirect(url_for('login'))
 
-    # NOMBRES
-    columnas = [
-        'ID', 
-        'Fecha', 
-        'Hora', 
-        'Lugar', 
-        'Empresa', 
-        'Andén', 
-        'Operador', 
-        'Placa', 
-        '¿Placa Válida?', 
-        'Observación'
-    ]
-    
-    df = pd.DataFrame(datos, columns=columnas)
-
-    if df.empty:
-        flash(f"No se encontraron registros extra entre {f_inicio} y {f_fin}.", "warning")
-        return redirect(url_for('admin_bp.admin_panel'))
+    f_inicio = request.form['fecha_inicio']
+    f_fin = request.form['fecha_fin']
 
-    # GENERAR TABLA RESUMEN (Conteos)
-    resumen = df.groupby(['Placa', 'Empresa', '¿Placa Válida?']).size().reset_index(name='Cantidad_Viajes')
-    resumen = resumen.sort_values(by='Cantidad_Viajes', ascending=False)
+    return _encolar_reporte(REPORTE_EXTRAS, f_inicio, f_fin, version_extras,
+                            f"No se encontraron registros extra entre {f_inicio} y {f_fin}.")
 
-    # GENERAR ARCHIVO EXCEL
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        
-        # 1. Hoja Principal con tus columnas
-        df.to_excel(writer, sheet_name='Detalle_Extras', index=False)
-        
-        # 2. Hoja Resumen
-        resumen.to_excel(writer, sheet_name='Resumen_Por_Placa', index=False)
-
-        # --- ESTILOS VISUALES ---
-        workbook = writer.book
-        # Estilo Naranja (Para diferenciar que es un reporte EXTRA)
-        fmt_head = workbook.add_format({'bold': True, 'bg_color': '#fd7e14', 'font_color': 'white', 'border': 1, 'align': 'center'})
-        fmt_center = workbook.add_format({'align': 'center', 'border': 1})
-        
-        worksheet = writer.sheets['Detalle_Extras']
-        
-        # Ajustar anchos de columna y centrar
-        anchos = [10, 15, 10, 20, 25, 10, 20, 15, 15, 40] # Anchos aproximados para tus columnas
-        for i, ancho in enumerate(anchos):
-            worksheet.set_column(i, i, ancho, fmt_center)
-            # Reescribir encabezado con formato
-            worksheet.write(0, i, columnas[i], fmt_head)
 
-        # Estilo para la hoja resumen
-        worksheet_res = writer.sheets['Resumen_Por_Placa']
-        for i, col in enumerate(resumen.columns):
-            worksheet_res.write(0, i, col, fmt_head)
-            worksheet_res.set_column(i, i, 20, fmt_center)
+# CAMBIAR ESTADO USUARIO (SWITCH)
 
-    output.seek(0)
-    
-    return send_file(
-        output, 
-        as_attachment=True, 
-        download_name=f"Reporte_EXTRAS_{f_inicio}_al_{f_fin}.xlsx",
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+@admin_bp.route('/admin/usuarios/estado', methods=['POST'])
+@login_required
+def cambiar_estado_usuario():
+    if current_user.rol != 'admin': 
+        return jsonify({'status': 'error', 'message': 'No autorizado'}), 403
 
+    data = request.get_json()
+    usuario_id = data.get('id')
+    nuevo_estado = data.get('activo') # True o False
 
+    # Evitar que el admin se desactive a sí mismo por error
+    if int(usuario_id) == current_user.id:
+        return jsonify({'status': 'error', 'message': 'No puedes desactivar tu propia cuenta.'})
 
+    conn = obtener_conexion()
+    cur = conn.cursor()
+    try:
+        cur.execute("UPDATE usuarios SET activo = %s WHERE id = %s AND terminal_id = %s",
+                    (nuevo_estado, usuario_id, current_user.terminal_id))
+        conn.commit()
+        invalidar_usuario(usuario_id)
+        _auditar('estado', 'usuarios', usuario_id, activo=nuevo_estado)
+        return jsonify({'status': 'success'})
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'status': 'error', 'message': str(e)})
+    finally:
+        cur.close()
+        conn.close()
@@ -1,28 +1,13 @@
 from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
 from flask_login import login_required, current_user
-import psycopg2
-import os
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
-import pytz
 
-load_dotenv()
+import terminales
+from auditoria import registrar
+from repositorio import obtener_repositorio, tabla_recorridos, SinConexion
 
 operador_bp = Blueprint('operador_bp', __name__)
 
-def obtener_conexion():
-    try:
-        return psycopg2.connect(
-            host=os.getenv("DB_HOST"),
-            database=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASS"),
-            port=os.getenv("DB_PORT", "5432")
-        )
-    except Exception as e:
-        print(f"Error DB Operador: {e}")
-        return None
-
 # --- RUTA PRINCIPAL DEL PANEL ---
 @operador_bp.route('/operador')
 @login_required
@@ -31,22 +16,15 @@ def panel_operador():
         flash("No tienes permiso.", "danger")
         return redirect(url_for('usuario_bp.dashboard'))
 
-    conn = obtener_conexion()
-    if not conn:
-        flash("Error de conexión.", "danger")
-        return redirect(url_for('usuario_bp.dashboard'))
-        
-    cur = conn.cursor()
-    
-    # 2. DEFINIR ZONA HORARIA CHILE
-    tz_chile = pytz.timezone('America/Punta_Arenas')
-    ahora_chile = datetime.now(tz_chile)
+    # 2. TERMINAL DE LA CUENTA Y SU ZONA HORARIA
+    terminal = terminales.terminal_usuario()
+    ahora_terminal = datetime.now(terminal.zona)
     
-    # 3. USAR HORA CHILENA COMO BASE
-    fecha_hoy_str = ahora_chile.strftime('%Y-%m-%d')
+    # 3. USAR LA HORA LOCAL DEL TERMINAL COMO BASE
+    fecha_hoy_str = ahora_terminal.strftime('%Y-%m-%d')
     fecha_seleccionada_str = fecha_hoy_str 
 
-    # Si es ADMIN y elige fecha (lógica igual, pero partiendo de la hora chilena correcta)
+    # Si es ADMIN y elige fecha (lógica igual, pero partiendo de la hora local correcta)
     if current_user.rol == 'admin':
         fecha_url = request.args.get('fecha')
         if fecha_url:
@@ -57,78 +35,34 @@ def panel_operador():
     fecha_siguiente_dt = fecha_dt + timedelta(days=1)
     fecha_siguiente_str = fecha_siguiente_dt.strftime('%Y-%m-%d')
 
-    # 3. LISTAS PARA FILTROS (Selects)
-    cur.execute("SELECT DISTINCT empresa_nombre FROM import_salidas UNION SELECT DISTINCT empresa_nombre FROM import_llegadas ORDER BY 1")
-    lista_empresas = [fila[0] for fila in cur.fetchall()]
-
-    cur.execute("SELECT DISTINCT lugar FROM import_salidas UNION SELECT DISTINCT lugar FROM import_llegadas ORDER BY 1")
-    lista_lugares = [fila[0] for fila in cur.fetchall()]
+    # 3. LISTAS PARA FILTROS (Selects) + recorridos del día seleccionado COMPLETO y madrugada siguiente hasta las 04:00
+    repo = obtener_repositorio()
+    try:
+        lista_empresas = repo.nombres_en_recorridos(terminal.id, 'empresa_nombre')
+        lista_lugares = repo.nombres_en_recorridos(terminal.id, 'lugar')
+        # Salidas y llegadas ya mezcladas y ordenadas por fecha y hora (vista 'recorridos')
+        filas = repo.recorridos_del_dia(terminal.id, fecha_seleccionada_str, fecha_siguiente_str)
+    except SinConexion:
+        flash("Error de conexión.", "danger")
+        return redirect(url_for('usuario_bp.dashboard'))
 
+    # 4. ARMAR LAS TARJETAS (el orden cronológico ya viene de la consulta:
+    #    las 23:00 de HOY salen antes que las 00:30 de MAÑANA)
     recorridos = []
-    
-    # 4. CONSULTA SALIDAS (Día seleccionado COMPLETO + Madrugada siguiente hasta las 04:00)
-    query_salidas = """
-        SELECT id, hora, empresa_nombre, lugar, anden, estado, fecha 
-        FROM import_salidas 
-        WHERE fecha = %s 
-           OR (fecha = %s AND hora <= '04:00:00')
-        ORDER BY fecha ASC, hora ASC
-    """
-    # Pasamos dos parámetros: fecha elegida y fecha siguiente
-    cur.execute(query_salidas, (fecha_seleccionada_str, fecha_siguiente_str))
-    
-    for fila in cur.fetchall():
-        # Lógica visual: Si la fecha es distinta a la seleccionada, es madrugada
-        es_madrugada = (str(fila[6]) == fecha_siguiente_str)
-        hora_formato = fila[1].strftime('%H:%M')
-        
-        # Opcional: Agregar un indicativo visual en la hora (ej: "01:00 (+1)")
-        # Por ahora lo dejamos limpio, pero el orden será correcto gracias al ORDER BY fecha, hora
-        
+    for tipo, id_bus, hora, empresa, lugar, anden, estado, fecha in filas:
         recorridos.append({
-            'id': fila[0],
-            'hora': hora_formato,
-            'empresa': fila[2],
-            'lugar': fila[3],
-            'anden': fila[4] if fila[4] else '?',
-            'estado': fila[5] if fila[5] else 'Sin estado',
-            'fecha': fila[6].strftime('%d/%m'),
-            'fecha_raw': fila[6], # Guardamos objeto fecha real para ordenar
-            'tipo': 'salidas',
-            'es_plus_uno': es_madrugada # Flag por si quieres usarlo en el HTML
+            'id': id_bus,
+            'hora': hora.strftime('%H:%M'),
+            'empresa': empresa,
+            'lugar': lugar,
+            'anden': anden if anden else '?',
+            'estado': estado if estado else 'Sin estado',
+            'fecha': fecha.strftime('%d/%m'),
+            'fecha_raw': fecha,
+            'tipo': tipo,
+            # Lógica visual: si la fecha es distinta a la seleccionada, es madrugada
+            'es_plus_uno': str(fecha) == fecha_siguiente_str
         })
-
-    # 5. CONSULTA LLEGADAS (Misma lógica)
-    query_llegadas = """
-        SELECT id, hora, empresa_nombre, lugar, anden, estado, fecha 
-        FROM import_llegadas 
-        WHERE fecha = %s 
-           OR (fecha = %s AND hora <= '04:00:00')
-        ORDER BY fecha ASC, hora ASC
-    """
-    cur.execute(query_llegadas, (fecha_seleccionada_str, fecha_siguiente_str))
-    
-    for fila in cur.fetchall():
-        es_madrugada = (str(fila[6]) == fecha_siguiente_str)
-        recorridos.append({
-            'id': fila[0],
-            'hora': fila[1].strftime('%H:%M'),
-            'empresa': fila[2],
-            'lugar': fila[3],
-            'anden': fila[4] if fila[4] else '?',
-            'estado': fila[5] if fila[5] else 'Sin estado',
-            'fecha': fila[6].strftime('%d/%m'),
-            'fecha_raw': fila[6],
-            'tipo': 'llegadas',
-            'es_plus_uno': es_madrugada
-        })
-
-    cur.close()
-    conn.close()
-
-    # 6. ORDENAR CRONOLÓGICAMENTE (Fecha primero, luego LA Hora)
-    # Esto asegura que las 23:00 de HOY salgan antes que las 00:30 de MAÑANA
-    recorridos.sort(key=lambda x: (x['fecha_raw'], x['hora']))
     
     return render_template('operador.html', 
                            recorridos=recorridos, 
@@ -153,18 +87,9 @@ def actualizar_estado():
         if not id_bus or not tipo:
             return jsonify({"status": "error", "message": "Faltan datos"}), 400
 
-        # Seleccionamos la tabla correcta según el tipo
-        tabla = 'import_llegadas' if tipo == 'llegadas' else 'import_salidas'
-        
-        conn = obtener_conexion()
-        cur = conn.cursor()
-        
-        # Actualizamos solo la columna 'estado'
-        cur.execute(f"UPDATE {tabla} SET estado = %s WHERE id = %s", (nuevo_estado, id_bus))
-        
-        conn.commit()
-        cur.close()
-        conn.close()
+        # Actualizamos solo la columna 'estado' en la tabla del tipo (recorridos del terminal del operador)
+        obtener_repositorio().actualizar_estado(current_user.terminal_id, tipo, id_bus, nuevo_estado)
+        registrar(current_user.id, 'estado', tabla_recorridos(tipo), id_bus, {'estado': nuevo_estado})
         
         return jsonify({"status": "success"})
         
@@ -193,71 +118,26 @@ def verificar_recorrido():
              return jsonify({'status': 'error', 'title': 'Datos Faltantes', 'message': 'Debe indicar Fecha y Hora.'}), 400
         # -----------------------------
 
-        conn = obtener_conexion()
-        cur = conn.cursor()
+        # 3. Validaciones y 4. guardado (historial, rollup diario y estado "En Andén")
+        resultado = obtener_repositorio().registrar_verificacion(
+            current_user.terminal_id, recorrido_id, tipo, current_user.id, patente_input, anden_real,
+            observaciones, fecha_manual, hora_manual)
 
-        # 3. Validaciones (Igual que antes)
-        cur.execute("SELECT id, empresa FROM buses_permitidos WHERE patente = %s AND activa = TRUE", (patente_input,))
-        bus_permitido = cur.fetchone()
-        es_patente_valida = True if bus_permitido else False
-        
-        if tipo in ['llegada', 'llegadas']:
-            tabla_db = 'import_llegadas'
-        else:
-            tabla_db = 'import_salidas'
-        
-        cur.execute(f"SELECT anden FROM {tabla_db} WHERE id = %s", (recorrido_id,))
-        resultado_origen = cur.fetchone()
-        
-        if not resultado_origen:
+        if resultado['resultado'] == 'no_encontrado':
              return jsonify({'status': 'error', 'title': 'Error', 'message': 'Recorrido no encontrado.'}), 404
-             
-        anden_programado = str(resultado_origen[0])
-        es_anden_correcto = (str(anden_real) == anden_programado)
 
-        # Bloquea re-registro del mismo recorrido (ya controlado una vez)
-        cur.execute("""
-            SELECT patente_ingresada, fecha_manual, hora_manual
-            FROM historial_verificaciones
-            WHERE recorrido_id = %s
-              AND tipo_recorrido = %s
-            ORDER BY id DESC
-            LIMIT 1
-        """, (recorrido_id, tipo))
-
-        registro_existente = cur.fetchone()
-        if registro_existente:
-            patente_existente = registro_existente[0]
-            fecha_existente = registro_existente[1].strftime('%d/%m/%Y') if registro_existente[1] else 's/f'
-            hora_existente = registro_existente[2].strftime('%H:%M') if registro_existente[2] else 's/h'
-            cur.close()
-            conn.close()
+        if resultado['resultado'] == 'ya_registrado':
+            fecha_existente = resultado['fecha'].strftime('%d/%m/%Y') if resultado['fecha'] else 's/f'
+            hora_existente = resultado['hora'].strftime('%H:%M') if resultado['hora'] else 's/h'
             return jsonify({
                 'status': 'warning',
                 'title': 'YA REGISTRADO',
-                'message': f'Este recorrido ya fue registrado con la patente {patente_existente} ({fecha_existente} {hora_existente}).'
+                'message': f'Este recorrido ya fue registrado con la patente {resultado["patente"]} ({fecha_existente} {hora_existente}).'
             })
 
-        # 4. GUARDAR EN BD (Usando las nuevas columnas)
-
-        cur.execute("""
-            INSERT INTO historial_verificaciones 
-            (recorrido_id, tipo_recorrido, operador_id, patente_ingresada, anden_real, 
-             es_patente_valida, es_anden_correcto, anden_programado, observaciones,
-             fecha_manual, hora_manual)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (recorrido_id, tipo, current_user.id, patente_input, anden_real, 
-              es_patente_valida, es_anden_correcto, anden_programado, observaciones,
-              fecha_manual, hora_manual))
-        
-        # Esto guarda el estado "En Andén" en la base de datos
-        cur.execute(f"UPDATE {tabla_db} SET estado = 'En Andén' WHERE id = %s", (recorrido_id,))
-        # -------------------------------
-        
-        conn.commit()
-        cur.close()
-        conn.close()
-
+        es_patente_valida = resultado['patente_valida']
+        es_anden_correcto = resultado['anden_correcto']
+        anden_programado = resultado['anden_programado']
 
         # 5. Respuesta
         if not es_patente_valida:
@@ -269,7 +149,6 @@ def verificar_recorrido():
 
     except Exception as e:
         print(f"Error Verificación: {e}")
-        if 'conn' in locals() and conn: conn.rollback()
         return jsonify({'status': 'error', 'title': 'Error Técnico', 'message': str(e)}), 500
     
 @operador_bp.route('/operador/registrar_extra', methods=['POST'])
@@ -294,32 +173,11 @@ def registrar_extra():
     if not patente or not tipo or not anden or not fecha_manual or not hora_manual:
         return jsonify({'status': 'error', 'title': 'Faltan Datos', 'message': 'Complete los campos obligatorios.'})
 
-    conn = obtener_conexion()
-    cur = conn.cursor()
-
     try:
-        # Validar Empresa (corrección de nombre de empresa)
-        cur.execute("SELECT empresa FROM buses_permitidos WHERE patente = %s", (patente,))
-        res_patente = cur.fetchone()
-        
-        empresa_final = empresa_manual
-        es_conocida = False
+        empresa_final, es_conocida = obtener_repositorio().registrar_extra(
+            current_user.terminal_id, fecha_manual, hora_manual, patente, empresa_manual, lugar_manual, tipo, anden,
+            current_user.id, observacion)
 
-        if res_patente:
-            empresa_final = res_patente[0]
-            es_conocida = True
-        else:
-            if not empresa_final: empresa_final = "NO REGISTRADA"
-
-
-        cur.execute("""
-            INSERT INTO historial_extras 
-            (fecha, hora, patente, empresa, lugar, tipo_recorrido, anden, operador_id, observacion)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (fecha_manual, hora_manual, patente, empresa_final, lugar_manual, tipo, anden, current_user.id, observacion))
-        
-        conn.commit()
-        
         titulo = "EXTRA GUARDADO"
         mensaje = f"Bus {patente} ({empresa_final}) registrado."
         status = 'success' if es_conocida else 'warning'
@@ -327,8 +185,4 @@ def registrar_extra():
         return jsonify({'status': status, 'title': titulo, 'message': mensaje})
 
     except Exception as e:
-        conn.rollback()
         return jsonify({'status': 'error', 'title': 'Error', 'message': str(e)})
-    finally:
-        cur.close()
-        conn.close()
\ No newline at end of file
@@ -0,0 +1,261 @@
+# SERVICIO ASÍNCRONO DE SOLO LECTURA (PANTALLA Y DASHBOARD PÚBLICO)
+# /pantalla y el dashboard público (/) son lecturas puras y se llevan casi
+# todo el tráfico (TVs que recargan cada 3 minutos, celulares). Aquí se
+# sirven con Starlette + asyncpg: un proceso con un solo event loop atiende
+# cientos de conexiones abiertas con un pool chico, y las consultas
+# independientes de cada página (recorridos y noticias; listas y
+# resultados) van en paralelo por conexiones distintas del pool.
+#
+# SQL, plantillas, ventana horaria y catálogo de terminales son los de la
+# app Flask (repositorio.consulta_*, templates/, terminales.py), así ambos
+# muestran lo mismo. El terminal sale de ?terminal=<código> (sin sesión
+# aquí: sin parámetro es TERMINAL_DEFECTO). Login, admin, operador y
+# /static siguen en gunicorn; el proxy separa por ruta, por ejemplo en nginx:
+#   location = /pantalla { proxy_pass http://127.0.0.1:8001; }
+#   location = /         { proxy_pass http://127.0.0.1:8001; }
+#   location /           { proxy_pass http://127.0.0.1:8000; }
+#
+# Uso (desde proyecto/Estructura, con el .env):
+#   uvicorn servicio_async:app --host 127.0.0.1 --port 8001
+#   python servicio_async.py
+import asyncio
+import datetime
+import math
+import os
+import re
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from urllib.parse import urlencode
+
+import asyncpg
+from dotenv import load_dotenv
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import HTMLResponse, PlainTextResponse
+from starlette.routing import Route
+
+import instantanea_pizarra
+import terminales
+from compresion import VENDOR, huella
+from config import Config
+from db import conexion_directa
+from repositorio import (CONSULTA_TERMINALES, consulta_buscar_recorridos, consulta_nombres_maestro,
+                         consulta_noticias, consulta_pizarra, paginar_por_tipo, separar_por_tipo,
+                         ventana_pizarra)
+
+load_dotenv()
+config = Config()
+instantanea_pizarra.configurar(config.DB_BACKEND == 'postgres', conexion_directa)
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+CARPETA_STATIC = os.path.join(CARPETA, 'static')
+POR_PAGINA = 15
+
+# Caídas de red, del servidor o del pool: la pantalla sigue (vacía), el dashboard responde 503
+ERRORES_BD = (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError)
+
+
+# --- PLANTILLAS (LAS MISMAS DE FLASK) ---
+
+# Endpoints de Flask que aparecen en las plantillas públicas
+RUTAS = {'inicio': '/pantalla', 'usuario_bp.dashboard': '/', 'login': '/login'}
+
+
+def url_for(endpoint, **valores):
+    """Lo mínimo del url_for de Flask para index.html y usuario.html (con la huella de compresion.py)."""
+    if endpoint == 'static':
+        archivo = valores.pop('filename')
+        version = huella(CARPETA_STATIC, archivo)
+        if version:
+            valores.setdefault('v', version)
+        ruta = f"/static/{archivo}"
+    else:
+        ruta = RUTAS[endpoint]
+    # Mismo formato que werkzeug: sin valores None y con los mismos caracteres sin escapar
+    consulta = urlencode([(k, v) for k, v in valores.items() if v is not None], safe="!$'()*,/:;?@")
+    return f"{ruta}?{consulta}" if consulta else ruta
+
+
+def vendor(nombre):
+    ruta, cdn = VENDOR[nombre]
+    if os.path.isfile(os.path.join(CARPETA_STATIC, ruta)):
+        return url_for('static', filename=ruta)
+    return cdn
+
+
+plantillas = Environment(loader=FileSystemLoader(os.path.join(CARPETA, 'templates')),
+                         autoescape=select_autoescape(['html', 'htm', 'xml']))
+plantillas.globals.update(url_for=url_for, vendor=vendor)
+
+
+def renderizar(nombre, **contexto):
+    return plantillas.get_template(nombre).render(**contexto)
+
+
+# --- CONSULTAS ---
+
+@lru_cache(maxsize=64)
+def sql_asyncpg(sql):
+    """SQL compartido (escrito para psycopg2) -> asyncpg: %s -> $1, $2... y %% -> %."""
+    numeros = iter(range(1, 1000))
+    return re.sub(r"%%|%s", lambda m: "%" if m.group() == "%%" else f"${next(numeros)}", sql)
+
+
+async def consultar(pool, consulta):
+    sql, params = consulta
+    async with pool.acquire(timeout=config.DB_POOL_ESPERA) as conn:
+        return await conn.fetch(sql_asyncpg(sql), *params)
+
+
+async def terminal_de(request):
+    """Terminal de ?terminal= (catálogo releído cada TERMINALES_TTL_SEG) o None si el código no existe."""
+    if terminales.vencido():
+        try:
+            filas = await consultar(request.app.state.pool, (CONSULTA_TERMINALES, []))
+        except ERRORES_BD as e:
+            print(f"Error de base de datos leyendo terminales (async): {e}")
+            filas = None
+        terminales.cargar(filas)
+    return terminales.por_codigo(request.query_params.get('terminal', '').strip())
+
+
+# --- RUTAS ---
+
+async def pantalla(request):
+    pool = request.app.state.pool
+    terminal = await terminal_de(request)
+    if terminal is None:
+        return PlainTextResponse("Terminal no encontrado.", status_code=404)
+    ahora = datetime.datetime.now(terminal.zona)
+    ventana = ventana_pizarra(ahora)
+
+    # Igual que app.inicio: instantánea en disco si el escritor la mantiene,
+    # la base si no, y la última instantánea si la base falla
+    instantanea = instantanea_pizarra.vigente(terminal.id)
+    if instantanea is None:
+        try:
+            filas, noticias = await asyncio.gather(
+                consultar(pool, consulta_pizarra(terminal.id, *ventana)),
+                consultar(pool, consulta_noticias(terminal.id)))
+            pizarra = separar_por_tipo(filas)
+            noticias = [fila[0] for fila in noticias]
+        except ERRORES_BD as e:
+            print(f"Error de base de datos en /pantalla (async): {e}")
+            instantanea = instantanea_pizarra.leer(terminal.id)
+            pizarra, noticias = {'llegadas': [], 'salidas': []}, []
+
+    datos_desde = None
+    if instantanea is not None:
+        pizarra = instantanea_pizarra.filtrar(instantanea.pizarra, *ventana)
+        noticias = instantanea.noticias
+        datos_desde = instantanea_pizarra.aviso(instantanea, terminal.zona)
+
+    if not noticias:
+        noticias = [terminal.bienvenida]
+
+    return HTMLResponse(renderizar(
+        'index.html',
+        terminal=terminal,
+        filas_salidas=Markup(renderizar('_filas_pizarra.html', filas=pizarra['salidas'], tipo='salida')),
+        filas_llegadas=Markup(renderizar('_filas_pizarra.html', filas=pizarra['llegadas'], tipo='llegada')),
+        noticias_db=noticias,
+        datos_desde=datos_desde,
+        hora_servidor=ahora.strftime('%Y-%m-%dT%H:%M:%S')))
+
+
+async def dashboard(request):
+    pool = request.app.state.pool
+    args = request.query_params
+    terminal = await terminal_de(request)
+    if terminal is None:
+        return PlainTextResponse("Terminal no encontrado.", status_code=404)
+    codigo_terminal = terminales.codigo_en_url(terminal)
+
+    # Mismos filtros y valores por defecto que rutas_recorridos.dashboard
+    filtros = {campo: args.get(campo, '').strip() for campo in ('fecha', 'hora', 'empresa', 'lugar', 'anden')}
+    try:
+        pagina = int(args.get('page', 1))
+    except ValueError:
+        pagina = 1
+    offset = (pagina - 1) * POR_PAGINA
+
+    if not filtros['fecha']:
+        filtros['fecha'] = datetime.datetime.now(terminal.zona).strftime('%Y-%m-%d')
+        titulo_estado = f"Programación para Hoy ({filtros['fecha']})"
+    else:
+        titulo_estado = f"Resultados para el día {filtros['fecha']}"
+
+    try:
+        consulta = consulta_buscar_recorridos(terminal.id, filtros, POR_PAGINA, offset)
+    except ValueError:
+        return PlainTextResponse("Fecha inválida.", status_code=400)
+
+    try:
+        lugares, empresas, filas = await asyncio.gather(
+            consultar(pool, consulta_nombres_maestro('lugar')),
+            consultar(pool, consulta_nombres_maestro('empresa')),
+            consultar(pool, consulta))
+    except ERRORES_BD as e:
+        print(f"Error de base de datos en el dashboard (async): {e}")
+        return PlainTextResponse("Error de conexión a la base de datos.", status_code=503)
+
+    pagina_recorridos = paginar_por_tipo(filas, POR_PAGINA, offset)
+    total_llegadas, llegadas = pagina_recorridos['llegadas']
+    total_salidas, salidas = pagina_recorridos['salidas']
+    total_paginas = max(math.ceil(total_llegadas / POR_PAGINA), math.ceil(total_salidas / POR_PAGINA))
+
+    resultados = renderizar('_resultados_dashboard.html',
+                            llegadas=llegadas,
+                            salidas=salidas,
+                            pagina_actual=pagina,
+                            total_paginas=total_paginas,
+                            filtros=filtros,
+                            codigo_terminal=codigo_terminal,
+                            total_salidas=total_salidas,
+                            total_llegadas=total_llegadas)
+    return HTMLResponse(renderizar('usuario.html',
+                                   terminal=terminal,
+                                   codigo_terminal=codigo_terminal,
+                                   titulo_estado=titulo_estado,
+                                   resultados=Markup(resultados),
+                                   lista_lugares=[fila[0] for fila in lugares],
+                                   lista_empresas=[fila[0] for fila in empresas],
+                                   filtros=filtros))
+
+
+# --- APLICACIÓN ---
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    # Con ASYNC_POOL_MIN=0 (defecto) no se conecta al arrancar: el servicio sube
+    # aunque Postgres no esté, y la pantalla se llena cuando vuelve
+    app.state.pool = await asyncpg.create_pool(
+        host=config.DB_HOST, port=int(config.DB_PORT), database=config.DB_NAME,
+        user=config.DB_USER, password=config.DB_PASS,
+        min_size=config.ASYNC_POOL_MIN, max_size=config.ASYNC_POOL_MAX,
+        command_timeout=config.DB_POOL_ESPERA)
+    # Este proceso también puede ser el escritor de la instantánea de /pantalla
+    instantanea_pizarra.iniciar()
+    try:
+        yield
+    finally:
+        await app.state.pool.close()
+
+
+middleware = []
+if config.COMPRESION_ACTIVA:
+    middleware.append(Middleware(GZipMiddleware, minimum_size=config.COMPRESION_MINIMO))
+
+app = Starlette(
+    routes=[Route('/pantalla', pantalla), Route('/', dashboard)],
+    middleware=middleware,
+    lifespan=ciclo_de_vida,
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host=os.getenv("ASYNC_HOST", "127.0.0.1"), port=int(os.getenv("ASYNC_PORT", "8001")))
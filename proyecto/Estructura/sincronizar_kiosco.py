@@ -0,0 +1,99 @@
+# SINCRONIZACIÓN DEL KIOSCO (POSTGRES -> SQLITE)
+# Copia a un archivo SQLite lo que necesita una pantalla remota para
+# funcionar sin red hacia la base central: empresas, lugares, noticias
+# activas, flota y los recorridos de ayer a --dias días adelante. Se corre
+# periódicamente (cron) en el kiosco, que levanta la app con
+#   DB_BACKEND=sqlite DB_SQLITE_RUTA=<archivo>
+# Un kiosco es de un terminal (--terminal, por defecto TERMINAL_DEFECTO):
+# se copian su fila de 'terminales', sus noticias y sus recorridos. La app
+# del kiosco corre con el mismo TERMINAL_DEFECTO para que /pantalla lo
+# muestre sin ?terminal=. También baja a static/vendor lo que falte de
+# Bootstrap (vendor_estaticos.py), para que la pantalla siga sin internet.
+#
+# Uso (desde proyecto/Estructura, con el .env de la base central):
+#   python sincronizar_kiosco.py --salida /var/lib/terminal/kiosco.db --dias 2 --terminal coyhaique
+import argparse
+import datetime
+import os
+import time
+
+from dotenv import load_dotenv
+
+import vendor_estaticos
+from db import conexion_directa
+from repositorio import RepositorioSqlite
+from terminales import CODIGO_DEFECTO
+
+# Tabla -> columnas copiadas (se reemplaza el contenido completo de cada tabla)
+TABLAS = {
+    'terminales': "id, codigo, nombre, zona_horaria, bienvenida",
+    'empresas': "id, nombre",
+    'lugares': "id, nombre",
+    'noticias': "id, contenido, fecha_creacion, activa, terminal_id",
+    'buses_permitidos': "id, patente, empresa, activa",
+    'import_llegadas': "id, lugar, hora, anden, empresa_nombre, fecha, estado, terminal_id",
+    'import_salidas': "id, lugar, hora, anden, empresa_nombre, fecha, estado, terminal_id",
+}
+
+
+def sincronizar(ruta, dias=2, codigo_terminal=CODIGO_DEFECTO):
+    """Reemplaza el contenido del SQLite en ruta con los datos del terminal; devuelve {tabla: filas copiadas}."""
+    origen = conexion_directa()
+    destino = RepositorioSqlite(ruta)
+    copiadas = {}
+    try:
+        cur_origen = origen.cursor()
+        cur_origen.execute("SELECT id FROM terminales WHERE codigo = %s", (codigo_terminal,))
+        fila = cur_origen.fetchone()
+        if fila is None:
+            raise SystemExit(f"No existe el terminal '{codigo_terminal}'.")
+        terminal_id = fila[0]
+
+        hoy = datetime.date.today()
+        rango = ("WHERE terminal_id = %s AND fecha BETWEEN %s AND %s",
+                 (terminal_id, hoy - datetime.timedelta(days=1), hoy + datetime.timedelta(days=dias)))
+        filtros = {
+            'terminales': ("WHERE id = %s", (terminal_id,)),
+            'noticias': ("WHERE terminal_id = %s AND activa = TRUE", (terminal_id,)),
+            'import_llegadas': rango,
+            'import_salidas': rango,
+        }
+
+        # Una sola transacción en el SQLite: la pantalla nunca ve la copia a medias
+        with destino._cursor(escribir=True) as cur:
+            # Se vacía en orden inverso: las filas por terminal antes que 'terminales' (llaves foráneas)
+            for tabla in reversed(list(TABLAS)):
+                cur.execute(f"DELETE FROM {tabla}")
+            for tabla, columnas in TABLAS.items():
+                where, params = filtros.get(tabla, ("", ()))
+                cur_origen.execute(f"SELECT {columnas} FROM {tabla} {where}", params)
+                filas = cur_origen.fetchall()
+                marcadores = ", ".join(["%s"] * len(columnas.split(",")))
+                cur.executemany(f"INSERT INTO {tabla} ({columnas}) VALUES ({marcadores})", filas)
+                copiadas[tabla] = len(filas)
+        cur_origen.close()
+    finally:
+        origen.close()
+    return copiadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copia los datos de pantalla a un SQLite para el kiosco.")
+    parser.add_argument('--salida', default=os.getenv("DB_SQLITE_RUTA", "terminal.db"))
+    parser.add_argument('--dias', type=int, default=2, help="Días de recorridos hacia adelante")
+    parser.add_argument('--terminal', default=CODIGO_DEFECTO, help="Código del terminal del kiosco")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    copiadas = sincronizar(args.salida, args.dias, args.terminal)
+    for tabla, cantidad in copiadas.items():
+        print(f"{tabla:<18}{cantidad:>8}")
+    print(f"Sincronizado {args.salida} en {time.perf_counter() - inicio:.1f}s")
+
+    # Mientras hay red, Bootstrap e íconos quedan locales para cuando se corte
+    vendor_estaticos.descargar()
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    main()
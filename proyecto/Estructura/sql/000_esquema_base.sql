@@ -0,0 +1,93 @@
+-- ESQUEMA BASE DEL SISTEMA
+-- Tablas que la aplicación asume (usuarios, maestros, recorridos, flota e
+-- historiales). Sirve para levantar una base vacía, por ejemplo para las
+-- pruebas de carga de benchmarks/. Después se aplican 001, 002, ... en orden.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS usuarios (
+    id SERIAL PRIMARY KEY,
+    username VARCHAR(100) NOT NULL,
+    rut VARCHAR(12) NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    rol VARCHAR(20) NOT NULL,
+    activo BOOLEAN NOT NULL DEFAULT TRUE
+);
+
+CREATE TABLE IF NOT EXISTS empresas (
+    id SERIAL PRIMARY KEY,
+    nombre VARCHAR(150) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS lugares (
+    id SERIAL PRIMARY KEY,
+    nombre VARCHAR(150) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS noticias (
+    id SERIAL PRIMARY KEY,
+    contenido TEXT NOT NULL,
+    fecha_creacion TIMESTAMP NOT NULL DEFAULT NOW(),
+    activa BOOLEAN NOT NULL DEFAULT TRUE
+);
+
+CREATE TABLE IF NOT EXISTS import_llegadas (
+    id SERIAL PRIMARY KEY,
+    lugar VARCHAR(150),
+    hora TIME NOT NULL,
+    anden INTEGER,
+    empresa_nombre VARCHAR(150),
+    fecha DATE NOT NULL,
+    estado VARCHAR(50) DEFAULT 'Programado',
+    UNIQUE (fecha, hora, empresa_nombre, lugar)
+);
+
+CREATE TABLE IF NOT EXISTS import_salidas (
+    id SERIAL PRIMARY KEY,
+    lugar VARCHAR(150),
+    hora TIME NOT NULL,
+    anden INTEGER,
+    empresa_nombre VARCHAR(150),
+    fecha DATE NOT NULL,
+    estado VARCHAR(50) DEFAULT 'Programado',
+    UNIQUE (fecha, hora, empresa_nombre, lugar)
+);
+
+CREATE TABLE IF NOT EXISTS buses_permitidos (
+    id SERIAL PRIMARY KEY,
+    patente VARCHAR(10) NOT NULL UNIQUE,
+    empresa VARCHAR(150),
+    activa BOOLEAN NOT NULL DEFAULT TRUE
+);
+
+CREATE TABLE IF NOT EXISTS historial_verificaciones (
+    id SERIAL PRIMARY KEY,
+    recorrido_id INTEGER NOT NULL,
+    tipo_recorrido VARCHAR(20) NOT NULL,
+    operador_id INTEGER REFERENCES usuarios(id),
+    patente_ingresada VARCHAR(10),
+    anden_real VARCHAR(10),
+    es_patente_valida BOOLEAN,
+    es_anden_correcto BOOLEAN,
+    anden_programado VARCHAR(10),
+    observaciones TEXT,
+    fecha_manual DATE,
+    hora_manual TIME,
+    fecha_registro TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS historial_extras (
+    id SERIAL PRIMARY KEY,
+    fecha DATE NOT NULL,
+    hora TIME NOT NULL,
+    patente VARCHAR(10) NOT NULL,
+    empresa VARCHAR(150),
+    lugar VARCHAR(150),
+    tipo_recorrido VARCHAR(20),
+    anden VARCHAR(10),
+    operador_id INTEGER REFERENCES usuarios(id),
+    observacion TEXT,
+    fecha_registro TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+COMMIT;
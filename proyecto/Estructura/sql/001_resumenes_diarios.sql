@@ -0,0 +1,159 @@
+-- RESÚMENES DIARIOS (ROLLUPS) PARA LOS REPORTES POR RANGO
+-- Se mantienen de forma incremental desde verificar_recorrido y registrar_extra,
+-- así los resúmenes por placa no tienen que recorrer el historial completo.
+--
+-- Solo se guarda lo que también guarda el historial: la validez de la
+-- patente al verificar y la empresa escrita en el extra. La empresa dueña
+-- del bus (verificaciones) y si la patente es conocida (extras) se toman de
+-- buses_permitidos al leer (resumenes_diarios.obtener_*), igual que las
+-- hojas de detalle: un bus que cambia de dueño sale igual en el resumen y
+-- en el detalle del mismo archivo.
+--
+-- Un UPDATE/DELETE/TRUNCATE del historial (psql, correcciones) vuelve a
+-- calcular los días que tocó, desde el detalle. Una carga directa al
+-- historial por fuera de la app debe terminar con:
+--   SELECT recalcular_resumenes_diarios();
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS resumen_diario_verificaciones (
+    fecha DATE NOT NULL,
+    patente VARCHAR(10) NOT NULL,
+    es_patente_valida BOOLEAN NOT NULL,
+    cantidad INTEGER NOT NULL DEFAULT 0,
+    anden_correcto INTEGER NOT NULL DEFAULT 0,
+    anden_incorrecto INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, patente, es_patente_valida)
+);
+
+CREATE TABLE IF NOT EXISTS resumen_diario_extras (
+    fecha DATE NOT NULL,
+    patente VARCHAR(10) NOT NULL,
+    empresa VARCHAR(150) NOT NULL,           -- La escrita en el extra ('NO REGISTRADA' si no hay)
+    cantidad INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, patente, empresa)
+);
+
+-- --- RECÁLCULO DE DÍAS DESDE EL HISTORIAL ---
+-- Se borran los días y se vuelven a agregar. Dos sentencias: el INSERT ve
+-- el DELETE (en una sola chocarían las llaves).
+
+CREATE OR REPLACE FUNCTION recalcular_resumen_verificaciones(fechas date[])
+RETURNS void AS $$
+    DELETE FROM resumen_diario_verificaciones WHERE fecha = ANY(fechas);
+
+    INSERT INTO resumen_diario_verificaciones
+        (fecha, patente, es_patente_valida, cantidad, anden_correcto, anden_incorrecto)
+    SELECT
+        fecha_manual,
+        COALESCE(patente_ingresada, ''),
+        COALESCE(es_patente_valida, FALSE),
+        COUNT(*),
+        COUNT(*) FILTER (WHERE es_anden_correcto),
+        COUNT(*) FILTER (WHERE NOT COALESCE(es_anden_correcto, FALSE))
+    FROM historial_verificaciones
+    WHERE fecha_manual = ANY(fechas)
+    GROUP BY 1, 2, 3;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION recalcular_resumen_extras(fechas date[])
+RETURNS void AS $$
+    DELETE FROM resumen_diario_extras WHERE fecha = ANY(fechas);
+
+    INSERT INTO resumen_diario_extras (fecha, patente, empresa, cantidad)
+    SELECT fecha, patente, COALESCE(empresa, 'NO REGISTRADA'), COUNT(*)
+    FROM historial_extras
+    WHERE fecha = ANY(fechas)
+    GROUP BY 1, 2, 3;
+$$ LANGUAGE sql;
+
+-- Todo el historial (carga inicial, cargas directas)
+CREATE OR REPLACE FUNCTION recalcular_resumenes_diarios()
+RETURNS void AS $$
+    TRUNCATE resumen_diario_verificaciones, resumen_diario_extras;
+
+    INSERT INTO resumen_diario_verificaciones
+        (fecha, patente, es_patente_valida, cantidad, anden_correcto, anden_incorrecto)
+    SELECT
+        fecha_manual,
+        COALESCE(patente_ingresada, ''),
+        COALESCE(es_patente_valida, FALSE),
+        COUNT(*),
+        COUNT(*) FILTER (WHERE es_anden_correcto),
+        COUNT(*) FILTER (WHERE NOT COALESCE(es_anden_correcto, FALSE))
+    FROM historial_verificaciones
+    WHERE fecha_manual IS NOT NULL
+    GROUP BY 1, 2, 3;
+
+    INSERT INTO resumen_diario_extras (fecha, patente, empresa, cantidad)
+    SELECT fecha, patente, COALESCE(empresa, 'NO REGISTRADA'), COUNT(*)
+    FROM historial_extras
+    GROUP BY 1, 2, 3;
+$$ LANGUAGE sql;
+
+-- --- TRIGGERS POR SENTENCIA SOBRE EL HISTORIAL ---
+-- Con tablas de transición: un UPDATE recalcula el día de la fila vieja y
+-- el de la nueva (una corrección puede cambiarla de día).
+
+CREATE OR REPLACE FUNCTION recalcular_resumen_historial()
+RETURNS trigger AS $$
+DECLARE
+    fechas date[];
+BEGIN
+    IF TG_TABLE_NAME = 'historial_verificaciones' THEN
+        IF TG_OP = 'DELETE' THEN
+            SELECT array_agg(DISTINCT fecha_manual) INTO fechas FROM filas_viejas;
+        ELSE
+            SELECT array_agg(fecha_manual) INTO fechas
+            FROM (SELECT fecha_manual FROM filas_viejas UNION SELECT fecha_manual FROM filas_nuevas) d;
+        END IF;
+        PERFORM recalcular_resumen_verificaciones(fechas);
+    ELSE
+        IF TG_OP = 'DELETE' THEN
+            SELECT array_agg(DISTINCT fecha) INTO fechas FROM filas_viejas;
+        ELSE
+            SELECT array_agg(fecha) INTO fechas
+            FROM (SELECT fecha FROM filas_viejas UNION SELECT fecha FROM filas_nuevas) d;
+        END IF;
+        PERFORM recalcular_resumen_extras(fechas);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION vaciar_resumen_historial()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'historial_verificaciones' THEN
+        TRUNCATE resumen_diario_verificaciones;
+    ELSE
+        TRUNCATE resumen_diario_extras;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t text;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['historial_verificaciones', 'historial_extras']
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_resumen_update ON %I', t);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_resumen_delete ON %I', t);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_resumen_truncate ON %I', t);
+        EXECUTE format('CREATE TRIGGER trg_resumen_update AFTER UPDATE ON %I
+                        REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas
+                        FOR EACH STATEMENT EXECUTE FUNCTION recalcular_resumen_historial()', t);
+        EXECUTE format('CREATE TRIGGER trg_resumen_delete AFTER DELETE ON %I
+                        REFERENCING OLD TABLE AS filas_viejas
+                        FOR EACH STATEMENT EXECUTE FUNCTION recalcular_resumen_historial()', t);
+        EXECUTE format('CREATE TRIGGER trg_resumen_truncate AFTER TRUNCATE ON %I
+                        FOR EACH STATEMENT EXECUTE FUNCTION vaciar_resumen_historial()', t);
+    END LOOP;
+END $$;
+
+-- CARGA INICIAL A PARTIR DEL HISTORIAL EXISTENTE (se puede volver a ejecutar)
+SELECT recalcular_resumenes_diarios();
+
+COMMIT;
@@ -0,0 +1,168 @@
+-- VERSIÓN DE LOS DATOS PARA LA CACHÉ DE REPORTES
+-- cola_reportes.py guarda cada archivo con la versión de los datos del
+-- rango pedido (resumenes_diarios.version_*). Un conteo de filas no sirve:
+-- una corrección, o un borrado más un registro nuevo el mismo día, lo deja
+-- igual y se seguiría entregando el archivo viejo.
+--
+--   - version_reportes_dia: una fila por (historial, día). Un trigger por
+--     sentencia sube los días tocados por cada INSERT/UPDATE/DELETE (tablas
+--     de transición); TRUNCATE sube todos. El reporte suma las versiones de
+--     los días de su rango: como solo crecen, la suma cambia con cualquier
+--     escritura dentro del rango y con ninguna fuera de él.
+--   - Los recorridos (import_*) que cita el reporte oficial suben los días
+--     de las verificaciones que los nombran, y solo si cambia lo que se
+--     imprime (lugar, empresa_nombre): el cambio de estado del operador o
+--     la importación de otro día no tocan reportes ya generados.
+--   - version_reportes: usuarios (nombre del operador) y flota
+--     (buses_permitidos) salen en todos los reportes; son ediciones del
+--     administrador y poco frecuentes, así que llevan una versión global.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS version_reportes_dia (
+    tabla VARCHAR(63) NOT NULL,
+    fecha DATE NOT NULL,
+    version BIGINT NOT NULL DEFAULT 1,
+    PRIMARY KEY (tabla, fecha)
+);
+
+CREATE TABLE IF NOT EXISTS version_reportes (
+    tabla VARCHAR(63) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO version_reportes (tabla) VALUES ('usuarios'), ('buses_permitidos')
+ON CONFLICT (tabla) DO NOTHING;
+
+-- Días ya registrados (versión 1), para que la primera suma ya los cuente
+INSERT INTO version_reportes_dia (tabla, fecha)
+SELECT DISTINCT 'historial_verificaciones', fecha_manual FROM historial_verificaciones
+WHERE fecha_manual IS NOT NULL
+UNION
+SELECT DISTINCT 'historial_extras', fecha FROM historial_extras
+ON CONFLICT DO NOTHING;
+
+-- TG_ARGV[0]: columna con la fecha del registro en el historial
+CREATE OR REPLACE FUNCTION subir_version_reportes_dia()
+RETURNS trigger AS $$
+DECLARE
+    dias text;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        UPDATE version_reportes_dia SET version = version + 1 WHERE tabla = TG_TABLE_NAME;
+        RETURN NULL;
+    ELSIF TG_OP = 'INSERT' THEN
+        dias := format('SELECT %I FROM filas_nuevas', TG_ARGV[0]);
+    ELSIF TG_OP = 'DELETE' THEN
+        dias := format('SELECT %I FROM filas_viejas', TG_ARGV[0]);
+    ELSE
+        -- Una corrección de fecha cambia el día viejo y el nuevo
+        dias := format('SELECT %1$I FROM filas_nuevas UNION SELECT %1$I FROM filas_viejas', TG_ARGV[0]);
+    END IF;
+
+    EXECUTE format('
+        INSERT INTO version_reportes_dia AS v (tabla, fecha)
+        SELECT DISTINCT %L, d.* FROM (%s) d
+        ON CONFLICT (tabla, fecha) DO UPDATE SET version = v.version + 1',
+        TG_TABLE_NAME, dias);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- TG_ARGV[0]: tipo_recorrido con que el historial nombra a la tabla ('salidas' / 'llegadas')
+CREATE OR REPLACE FUNCTION subir_version_reportes_recorridos()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        UPDATE version_reportes_dia SET version = version + 1
+        WHERE tabla = 'historial_verificaciones';
+        RETURN NULL;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO version_reportes_dia AS v (tabla, fecha)
+        SELECT DISTINCT 'historial_verificaciones', h.fecha_manual
+        FROM filas_viejas r
+        JOIN historial_verificaciones h ON h.recorrido_id = r.id AND h.tipo_recorrido = TG_ARGV[0]
+        ON CONFLICT (tabla, fecha) DO UPDATE SET version = v.version + 1;
+    ELSE
+        INSERT INTO version_reportes_dia AS v (tabla, fecha)
+        SELECT DISTINCT 'historial_verificaciones', h.fecha_manual
+        FROM filas_nuevas n
+        JOIN filas_viejas r ON r.id = n.id
+        JOIN historial_verificaciones h ON h.recorrido_id = r.id AND h.tipo_recorrido = TG_ARGV[0]
+        WHERE (n.lugar, n.empresa_nombre) IS DISTINCT FROM (r.lugar, r.empresa_nombre)
+        ON CONFLICT (tabla, fecha) DO UPDATE SET version = v.version + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION subir_version_reportes()
+RETURNS trigger AS $$
+BEGIN
+    UPDATE version_reportes SET version = version + 1 WHERE tabla = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Triggers de los historiales y de los recorridos. Función aparte: 006
+-- recrea import_* e historial_verificaciones particionadas y los vuelve a crear.
+CREATE OR REPLACE FUNCTION crear_triggers_version_reportes()
+RETURNS void AS $$
+DECLARE
+    t text;
+    col text;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['historial_verificaciones', 'historial_extras']
+    LOOP
+        col := CASE t WHEN 'historial_verificaciones' THEN 'fecha_manual' ELSE 'fecha' END;
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_version_reportes_insert ON %I', t);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_version_reportes_update ON %I', t);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_version_reportes_delete ON %I', t);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_version_reportes_truncate ON %I', t);
+        EXECUTE format('CREATE TRIGGER trg_version_reportes_insert AFTER INSERT ON %I
+                        REFERENCING NEW TABLE AS filas_nuevas
+                        FOR EACH STATEMENT EXECUTE FUNCTION subir_version_reportes_dia(%L)', t, col);
+        EXECUTE format('CREATE TRIGGER trg_version_reportes_update AFTER UPDATE ON %I
+                        REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas
+                        FOR EACH STATEMENT EXECUTE FUNCTION subir_version_reportes_dia(%L)', t, col);
+        EXECUTE format('CREATE TRIGGER trg_version_reportes_delete AFTER DELETE ON %I
+                        REFERENCING OLD TABLE AS filas_viejas
+                        FOR EACH STATEMENT EXECUTE FUNCTION subir_version_reportes_dia(%L)', t, col);
+        EXECUTE format('CREATE TRIGGER trg_version_reportes_truncate AFTER TRUNCATE ON %I
+                        FOR EACH STATEMENT EXECUTE FUNCTION subir_version_reportes_dia(%L)', t, col);
+    END LOOP;
+
+    FOREACH t IN ARRAY ARRAY['salidas', 'llegadas']
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_version_reportes_update ON %I', 'import_' || t);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_version_reportes_delete ON %I', 'import_' || t);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_version_reportes_truncate ON %I', 'import_' || t);
+        EXECUTE format('CREATE TRIGGER trg_version_reportes_update AFTER UPDATE ON %I
+                        REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas
+                        FOR EACH STATEMENT EXECUTE FUNCTION subir_version_reportes_recorridos(%L)',
+                       'import_' || t, t);
+        EXECUTE format('CREATE TRIGGER trg_version_reportes_delete AFTER DELETE ON %I
+                        REFERENCING OLD TABLE AS filas_viejas
+                        FOR EACH STATEMENT EXECUTE FUNCTION subir_version_reportes_recorridos(%L)',
+                       'import_' || t, t);
+        EXECUTE format('CREATE TRIGGER trg_version_reportes_truncate AFTER TRUNCATE ON %I
+                        FOR EACH STATEMENT EXECUTE FUNCTION subir_version_reportes_recorridos(%L)',
+                       'import_' || t, t);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT crear_triggers_version_reportes();
+
+-- Solo lo que imprimen los reportes: nombre del operador; patente y empresa de la flota
+DROP TRIGGER IF EXISTS trg_version_reportes ON usuarios;
+CREATE TRIGGER trg_version_reportes
+    AFTER UPDATE OF username OR DELETE ON usuarios
+    FOR EACH STATEMENT EXECUTE FUNCTION subir_version_reportes();
+
+DROP TRIGGER IF EXISTS trg_version_reportes ON buses_permitidos;
+CREATE TRIGGER trg_version_reportes
+    AFTER INSERT OR UPDATE OF patente, empresa OR DELETE OR TRUNCATE ON buses_permitidos
+    FOR EACH STATEMENT EXECUTE FUNCTION subir_version_reportes();
+
+COMMIT;
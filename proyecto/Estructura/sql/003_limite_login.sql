@@ -0,0 +1,12 @@
+-- ESTADO COMPARTIDO DEL LÍMITE DE INTENTOS DE LOGIN
+-- Solo se usa con LOGIN_LIMITE_BACKEND=postgres (ver limite_login.py).
+-- UNLOGGED: es estado efímero, no necesita WAL ni sobrevivir a una caída.
+
+CREATE UNLOGGED TABLE IF NOT EXISTS limite_login (
+    clave VARCHAR(100) PRIMARY KEY,          -- 'rut:12345678-9' o 'ip:10.0.0.5'
+    tokens DOUBLE PRECISION NOT NULL,
+    actualizado DOUBLE PRECISION NOT NULL,   -- epoch en segundos
+    fallos INTEGER NOT NULL DEFAULT 0,
+    ultimo_fallo DOUBLE PRECISION NOT NULL DEFAULT 0,
+    bloqueado_hasta DOUBLE PRECISION NOT NULL DEFAULT 0
+);
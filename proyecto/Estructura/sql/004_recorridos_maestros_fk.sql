@@ -0,0 +1,82 @@
+-- RECORRIDOS ENLAZADOS A EMPRESAS Y LUGARES POR ID
+-- import_salidas / import_llegadas guardan el nombre como texto; agregamos
+-- empresa_id y lugar_id con llave foránea e índice. Así eliminar_maestro
+-- revisa el uso con un EXISTS sobre el índice en vez de contar por nombre,
+-- y la base de datos impide borrar una empresa o lugar todavía en uso.
+--
+-- Las columnas de texto se mantienen (las usan las consultas y el
+-- ON CONFLICT de la importación); un trigger resuelve los ids a partir del
+-- nombre en cada INSERT/UPDATE y crea el maestro si aún no existe, igual
+-- que obtener_id_empresa / obtener_id_lugar.
+
+BEGIN;
+
+ALTER TABLE import_salidas
+    ADD COLUMN IF NOT EXISTS empresa_id INTEGER REFERENCES empresas(id),
+    ADD COLUMN IF NOT EXISTS lugar_id INTEGER REFERENCES lugares(id);
+
+ALTER TABLE import_llegadas
+    ADD COLUMN IF NOT EXISTS empresa_id INTEGER REFERENCES empresas(id),
+    ADD COLUMN IF NOT EXISTS lugar_id INTEGER REFERENCES lugares(id);
+
+-- Índices para el EXISTS de eliminar_maestro y para la revisión de la FK al borrar
+CREATE INDEX IF NOT EXISTS idx_import_salidas_empresa_id ON import_salidas (empresa_id);
+CREATE INDEX IF NOT EXISTS idx_import_salidas_lugar_id ON import_salidas (lugar_id);
+CREATE INDEX IF NOT EXISTS idx_import_llegadas_empresa_id ON import_llegadas (empresa_id);
+CREATE INDEX IF NOT EXISTS idx_import_llegadas_lugar_id ON import_llegadas (lugar_id);
+
+-- MAESTROS FALTANTES: nombres usados en recorridos que no están en las tablas maestras
+INSERT INTO empresas (nombre)
+SELECT DISTINCT r.empresa_nombre
+FROM (SELECT empresa_nombre FROM import_salidas UNION SELECT empresa_nombre FROM import_llegadas) r
+WHERE r.empresa_nombre IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM empresas e WHERE e.nombre = r.empresa_nombre);
+
+INSERT INTO lugares (nombre)
+SELECT DISTINCT r.lugar
+FROM (SELECT lugar FROM import_salidas UNION SELECT lugar FROM import_llegadas) r
+WHERE r.lugar IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM lugares l WHERE l.nombre = r.lugar);
+
+-- CARGA INICIAL DE LOS IDS
+UPDATE import_salidas s SET empresa_id = e.id FROM empresas e WHERE e.nombre = s.empresa_nombre;
+UPDATE import_salidas s SET lugar_id = l.id FROM lugares l WHERE l.nombre = s.lugar;
+UPDATE import_llegadas s SET empresa_id = e.id FROM empresas e WHERE e.nombre = s.empresa_nombre;
+UPDATE import_llegadas s SET lugar_id = l.id FROM lugares l WHERE l.nombre = s.lugar;
+
+-- TRIGGER: mantiene empresa_id / lugar_id al insertar o cambiar el nombre
+CREATE OR REPLACE FUNCTION resolver_maestros_recorrido() RETURNS trigger AS $$
+BEGIN
+    IF NEW.empresa_nombre IS NULL THEN
+        NEW.empresa_id := NULL;
+    ELSE
+        SELECT id INTO NEW.empresa_id FROM empresas WHERE nombre = NEW.empresa_nombre;
+        IF NEW.empresa_id IS NULL THEN
+            INSERT INTO empresas (nombre) VALUES (NEW.empresa_nombre) RETURNING id INTO NEW.empresa_id;
+        END IF;
+    END IF;
+
+    IF NEW.lugar IS NULL THEN
+        NEW.lugar_id := NULL;
+    ELSE
+        SELECT id INTO NEW.lugar_id FROM lugares WHERE nombre = NEW.lugar;
+        IF NEW.lugar_id IS NULL THEN
+            INSERT INTO lugares (nombre) VALUES (NEW.lugar) RETURNING id INTO NEW.lugar_id;
+        END IF;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_salidas_maestros ON import_salidas;
+CREATE TRIGGER trg_salidas_maestros
+    BEFORE INSERT OR UPDATE OF empresa_nombre, lugar ON import_salidas
+    FOR EACH ROW EXECUTE FUNCTION resolver_maestros_recorrido();
+
+DROP TRIGGER IF EXISTS trg_llegadas_maestros ON import_llegadas;
+CREATE TRIGGER trg_llegadas_maestros
+    BEFORE INSERT OR UPDATE OF empresa_nombre, lugar ON import_llegadas
+    FOR EACH ROW EXECUTE FUNCTION resolver_maestros_recorrido();
+
+COMMIT;
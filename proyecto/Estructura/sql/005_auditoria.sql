@@ -0,0 +1,15 @@
+-- AUDITORÍA DE CAMBIOS (QUIÉN CAMBIÓ QUÉ)
+-- La llena auditoria.py en lotes desde un hilo en segundo plano.
+
+CREATE TABLE IF NOT EXISTS auditoria (
+    id BIGSERIAL PRIMARY KEY,
+    fecha TIMESTAMP NOT NULL,                -- Momento de la acción (no de la escritura del lote)
+    usuario_id INTEGER,                      -- Sin FK: el evento debe sobrevivir al usuario eliminado
+    accion VARCHAR(50) NOT NULL,             -- 'crear', 'editar', 'eliminar', 'estado', ...
+    tabla VARCHAR(50) NOT NULL,
+    registro_id VARCHAR(50),
+    detalle JSONB
+);
+
+CREATE INDEX IF NOT EXISTS idx_auditoria_fecha ON auditoria (fecha);
+CREATE INDEX IF NOT EXISTS idx_auditoria_tabla_registro ON auditoria (tabla, registro_id);
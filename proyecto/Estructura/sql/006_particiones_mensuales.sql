@@ -0,0 +1,257 @@
+-- PARTICIONES MENSUALES DE RECORRIDOS Y VERIFICACIONES
+-- import_llegadas / import_salidas (por fecha) e historial_verificaciones
+-- (por fecha_manual) pasan a ser tablas particionadas por rango, un mes por
+-- partición (import_salidas_2026_03, ...) más una partición DEFAULT que
+-- recibe lo que llegue antes de que exista su mes. Las consultas del día
+-- (pantalla, dashboard, panel del operador) y los reportes por rango solo
+-- leen las particiones de esos meses, y un mes antiguo se saca con
+-- ALTER TABLE ... DETACH PARTITION sin reescribir nada.
+--
+-- Cambios de esquema:
+--   - La llave primaria pasa a ser (id, fecha) / (id, fecha_manual): Postgres
+--     exige la columna de partición en las llaves. El id sigue saliendo de la
+--     misma secuencia, así que sigue siendo único.
+--   - UNIQUE (fecha, hora, empresa_nombre, lugar) se mantiene igual: el
+--     ON CONFLICT de la importación no cambia.
+--   - historial_verificaciones.fecha_manual pasa a NOT NULL (la ruta de
+--     verificación ya la exige); las filas antiguas sin ella toman la fecha
+--     de fecha_registro.
+--   - Se recrean las FK a empresas/lugares, sus índices y los triggers
+--     resolver_maestros_recorrido de 004; se agrega un índice
+--     (recorrido_id, tipo_recorrido) para la revisión de "ya registrado".
+--   - Se recrean los triggers de los resúmenes diarios (001) y de la
+--     versión de reportes (002) sobre las tablas nuevas.
+--
+-- Las particiones futuras se crean con asegurar_particiones(desde, hasta):
+-- la importación de Excel la llama con el rango de fechas de las planillas
+-- y gunicorn al arrancar (mes actual + 3). También se puede programar:
+--   psql -c "SELECT asegurar_particiones();"
+--
+-- Se aplica una sola vez, después de 001..005 (si ya se aplicó, aborta).
+
+BEGIN;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'import_salidas'::regclass) THEN
+        RAISE EXCEPTION '006_particiones_mensuales ya fue aplicada';
+    END IF;
+END $$;
+
+-- --- FUNCIONES ---
+
+-- Crea la partición del mes de 'mes' si no existe. Las filas de ese mes que
+-- hayan caído en la partición DEFAULT se mueven a la nueva antes de
+-- adjuntarla (ATTACH toma un bloqueo más liviano que CREATE ... PARTITION OF).
+CREATE OR REPLACE FUNCTION crear_particion_mensual(tabla text, columna text, mes date)
+RETURNS boolean AS $$
+DECLARE
+    desde date := date_trunc('month', mes)::date;
+    hasta date := (date_trunc('month', mes) + interval '1 month')::date;
+    nombre text := tabla || '_' || to_char(mes, 'YYYY_MM');
+BEGIN
+    IF to_regclass(nombre) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', nombre, tabla);
+    IF to_regclass(tabla || '_default') IS NOT NULL THEN
+        EXECUTE format('WITH movidas AS (DELETE FROM %I WHERE %I >= $1 AND %I < $2 RETURNING *) '
+                       'INSERT INTO %I SELECT * FROM movidas',
+                       tabla || '_default', columna, columna, nombre)
+        USING desde, hasta;
+    END IF;
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   tabla, nombre, desde, hasta);
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Particiones de desde..hasta (por defecto mes actual + 3) para las tres
+-- tablas, más los meses que tengan filas en la DEFAULT. Devuelve cuántas creó.
+CREATE OR REPLACE FUNCTION asegurar_particiones(desde date DEFAULT NULL, hasta date DEFAULT NULL)
+RETURNS integer AS $$
+DECLARE
+    t record;
+    mes date;
+    creadas integer := 0;
+BEGIN
+    desde := date_trunc('month', COALESCE(desde, CURRENT_DATE))::date;
+    hasta := COALESCE(hasta, (CURRENT_DATE + interval '3 months')::date);
+
+    FOR t IN SELECT * FROM (VALUES ('import_llegadas', 'fecha'),
+                                   ('import_salidas', 'fecha'),
+                                   ('historial_verificaciones', 'fecha_manual')) AS v(tabla, columna)
+    LOOP
+        FOR mes IN SELECT generate_series(desde, hasta, interval '1 month')::date
+        LOOP
+            IF crear_particion_mensual(t.tabla, t.columna, mes) THEN
+                creadas := creadas + 1;
+            END IF;
+        END LOOP;
+
+        -- Meses que llegaron a la DEFAULT (fechas fuera del rango ya creado)
+        FOR mes IN EXECUTE format('SELECT DISTINCT date_trunc(''month'', %I)::date FROM %I',
+                                  t.columna, t.tabla || '_default')
+        LOOP
+            IF crear_particion_mensual(t.tabla, t.columna, mes) THEN
+                creadas := creadas + 1;
+            END IF;
+        END LOOP;
+    END LOOP;
+    RETURN creadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- --- IMPORT_SALIDAS ---
+
+ALTER TABLE import_salidas RENAME TO import_salidas_sin_particion;
+ALTER SEQUENCE import_salidas_id_seq OWNED BY NONE;
+
+CREATE TABLE import_salidas (
+    id INTEGER NOT NULL DEFAULT nextval('import_salidas_id_seq'),
+    lugar VARCHAR(150),
+    hora TIME NOT NULL,
+    anden INTEGER,
+    empresa_nombre VARCHAR(150),
+    fecha DATE NOT NULL,
+    estado VARCHAR(50) DEFAULT 'Programado',
+    empresa_id INTEGER,
+    lugar_id INTEGER
+) PARTITION BY RANGE (fecha);
+CREATE TABLE import_salidas_default PARTITION OF import_salidas DEFAULT;
+
+SELECT COUNT(*) AS particiones_creadas
+FROM generate_series(date_trunc('month', COALESCE((SELECT MIN(fecha) FROM import_salidas_sin_particion), CURRENT_DATE)),
+                     GREATEST((SELECT MAX(fecha) FROM import_salidas_sin_particion), CURRENT_DATE + 90),
+                     interval '1 month') mes
+WHERE crear_particion_mensual('import_salidas', 'fecha', mes::date);
+
+INSERT INTO import_salidas (id, lugar, hora, anden, empresa_nombre, fecha, estado, empresa_id, lugar_id)
+SELECT id, lugar, hora, anden, empresa_nombre, fecha, estado, empresa_id, lugar_id
+FROM import_salidas_sin_particion;
+
+DROP TABLE import_salidas_sin_particion;
+ALTER SEQUENCE import_salidas_id_seq OWNED BY import_salidas.id;
+
+-- Índices y llaves después de copiar: se construyen una vez por partición
+ALTER TABLE import_salidas
+    ADD CONSTRAINT import_salidas_pkey PRIMARY KEY (id, fecha),
+    ADD CONSTRAINT import_salidas_fecha_hora_empresa_nombre_lugar_key UNIQUE (fecha, hora, empresa_nombre, lugar),
+    ADD CONSTRAINT import_salidas_empresa_id_fkey FOREIGN KEY (empresa_id) REFERENCES empresas(id),
+    ADD CONSTRAINT import_salidas_lugar_id_fkey FOREIGN KEY (lugar_id) REFERENCES lugares(id);
+CREATE INDEX idx_import_salidas_empresa_id ON import_salidas (empresa_id);
+CREATE INDEX idx_import_salidas_lugar_id ON import_salidas (lugar_id);
+
+CREATE TRIGGER trg_salidas_maestros
+    BEFORE INSERT OR UPDATE OF empresa_nombre, lugar ON import_salidas
+    FOR EACH ROW EXECUTE FUNCTION resolver_maestros_recorrido();
+
+-- --- IMPORT_LLEGADAS ---
+
+ALTER TABLE import_llegadas RENAME TO import_llegadas_sin_particion;
+ALTER SEQUENCE import_llegadas_id_seq OWNED BY NONE;
+
+CREATE TABLE import_llegadas (
+    id INTEGER NOT NULL DEFAULT nextval('import_llegadas_id_seq'),
+    lugar VARCHAR(150),
+    hora TIME NOT NULL,
+    anden INTEGER,
+    empresa_nombre VARCHAR(150),
+    fecha DATE NOT NULL,
+    estado VARCHAR(50) DEFAULT 'Programado',
+    empresa_id INTEGER,
+    lugar_id INTEGER
+) PARTITION BY RANGE (fecha);
+CREATE TABLE import_llegadas_default PARTITION OF import_llegadas DEFAULT;
+
+SELECT COUNT(*) AS particiones_creadas
+FROM generate_series(date_trunc('month', COALESCE((SELECT MIN(fecha) FROM import_llegadas_sin_particion), CURRENT_DATE)),
+                     GREATEST((SELECT MAX(fecha) FROM import_llegadas_sin_particion), CURRENT_DATE + 90),
+                     interval '1 month') mes
+WHERE crear_particion_mensual('import_llegadas', 'fecha', mes::date);
+
+INSERT INTO import_llegadas (id, lugar, hora, anden, empresa_nombre, fecha, estado, empresa_id, lugar_id)
+SELECT id, lugar, hora, anden, empresa_nombre, fecha, estado, empresa_id, lugar_id
+FROM import_llegadas_sin_particion;
+
+DROP TABLE import_llegadas_sin_particion;
+ALTER SEQUENCE import_llegadas_id_seq OWNED BY import_llegadas.id;
+
+ALTER TABLE import_llegadas
+    ADD CONSTRAINT import_llegadas_pkey PRIMARY KEY (id, fecha),
+    ADD CONSTRAINT import_llegadas_fecha_hora_empresa_nombre_lugar_key UNIQUE (fecha, hora, empresa_nombre, lugar),
+    ADD CONSTRAINT import_llegadas_empresa_id_fkey FOREIGN KEY (empresa_id) REFERENCES empresas(id),
+    ADD CONSTRAINT import_llegadas_lugar_id_fkey FOREIGN KEY (lugar_id) REFERENCES lugares(id);
+CREATE INDEX idx_import_llegadas_empresa_id ON import_llegadas (empresa_id);
+CREATE INDEX idx_import_llegadas_lugar_id ON import_llegadas (lugar_id);
+
+CREATE TRIGGER trg_llegadas_maestros
+    BEFORE INSERT OR UPDATE OF empresa_nombre, lugar ON import_llegadas
+    FOR EACH ROW EXECUTE FUNCTION resolver_maestros_recorrido();
+
+-- --- HISTORIAL_VERIFICACIONES ---
+
+ALTER TABLE historial_verificaciones RENAME TO historial_verificaciones_sin_particion;
+ALTER SEQUENCE historial_verificaciones_id_seq OWNED BY NONE;
+
+CREATE TABLE historial_verificaciones (
+    id INTEGER NOT NULL DEFAULT nextval('historial_verificaciones_id_seq'),
+    recorrido_id INTEGER NOT NULL,
+    tipo_recorrido VARCHAR(20) NOT NULL,
+    operador_id INTEGER,
+    patente_ingresada VARCHAR(10),
+    anden_real VARCHAR(10),
+    es_patente_valida BOOLEAN,
+    es_anden_correcto BOOLEAN,
+    anden_programado VARCHAR(10),
+    observaciones TEXT,
+    fecha_manual DATE NOT NULL,
+    hora_manual TIME,
+    fecha_registro TIMESTAMP NOT NULL DEFAULT NOW()
+) PARTITION BY RANGE (fecha_manual);
+CREATE TABLE historial_verificaciones_default PARTITION OF historial_verificaciones DEFAULT;
+
+SELECT COUNT(*) AS particiones_creadas
+FROM generate_series(date_trunc('month', COALESCE((SELECT MIN(COALESCE(fecha_manual, fecha_registro::date))
+                                                   FROM historial_verificaciones_sin_particion), CURRENT_DATE)),
+                     CURRENT_DATE + 90,
+                     interval '1 month') mes
+WHERE crear_particion_mensual('historial_verificaciones', 'fecha_manual', mes::date);
+
+INSERT INTO historial_verificaciones
+    (id, recorrido_id, tipo_recorrido, operador_id, patente_ingresada, anden_real, es_patente_valida,
+     es_anden_correcto, anden_programado, observaciones, fecha_manual, hora_manual, fecha_registro)
+SELECT id, recorrido_id, tipo_recorrido, operador_id, patente_ingresada, anden_real, es_patente_valida,
+       es_anden_correcto, anden_programado, observaciones, COALESCE(fecha_manual, fecha_registro::date),
+       hora_manual, fecha_registro
+FROM historial_verificaciones_sin_particion;
+
+DROP TABLE historial_verificaciones_sin_particion;
+ALTER SEQUENCE historial_verificaciones_id_seq OWNED BY historial_verificaciones.id;
+
+ALTER TABLE historial_verificaciones
+    ADD CONSTRAINT historial_verificaciones_pkey PRIMARY KEY (id, fecha_manual),
+    ADD CONSTRAINT historial_verificaciones_operador_id_fkey FOREIGN KEY (operador_id) REFERENCES usuarios(id);
+CREATE INDEX idx_historial_verificaciones_recorrido ON historial_verificaciones (recorrido_id, tipo_recorrido);
+
+-- --- TRIGGERS DE 001 Y 002 ---
+-- Se crean después de copiar: las filas copiadas ya están en los resúmenes
+-- y en version_reportes_dia.
+
+CREATE TRIGGER trg_resumen_update AFTER UPDATE ON historial_verificaciones
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION recalcular_resumen_historial();
+CREATE TRIGGER trg_resumen_delete AFTER DELETE ON historial_verificaciones
+    REFERENCING OLD TABLE AS filas_viejas
+    FOR EACH STATEMENT EXECUTE FUNCTION recalcular_resumen_historial();
+CREATE TRIGGER trg_resumen_truncate AFTER TRUNCATE ON historial_verificaciones
+    FOR EACH STATEMENT EXECUTE FUNCTION vaciar_resumen_historial();
+
+SELECT crear_triggers_version_reportes();
+
+COMMIT;
+
+ANALYZE import_salidas;
+ANALYZE import_llegadas;
+ANALYZE historial_verificaciones;
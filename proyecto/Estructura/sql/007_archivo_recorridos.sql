@@ -0,0 +1,193 @@
+-- ARCHIVO DE RECORRIDOS ANTIGUOS
+-- La pantalla, el dashboard y el panel del operador solo miran días
+-- recientes, pero import_llegadas / import_salidas acumulan años. Con las
+-- particiones mensuales de 006, archivar un mes es un cambio de metadatos:
+-- la partición se desprende de la tabla viva (DETACH) y se adjunta a
+-- import_llegadas_archivo / import_salidas_archivo, sin copiar filas.
+--
+-- Al archivar un mes se le quitan los índices secundarios, las FK y los
+-- triggers (en el archivo solo se busca por id y fecha); archivado.py
+-- después lo reescribe compacto (CLUSTER) y lo congela (VACUUM FREEZE),
+-- porque VACUUM no puede ir dentro de una función. Las tablas vivas quedan
+-- solo con los meses recientes y sus índices chicos y en caché.
+--
+-- El archivo NO va comprimido: las tablas de Postgres no comprimen filas
+-- (TOAST solo comprime valores grandes, y un recorrido son unas pocas
+-- columnas cortas). Lo que se ahorra es el espacio muerto y los índices.
+--
+-- Un mes archivado queda cerrado: un INSERT o un cambio de fecha que caiga
+-- en él se rechaza (trigger en la partición DEFAULT) y asegurar_particiones
+-- no le vuelve a crear partición viva. Si no, la importación dejaba las filas
+-- en la DEFAULT, se creaba otra partición viva del mes, el siguiente
+-- archivado chocaba con el nombre del mes ya archivado y las vistas
+-- *_historico mostraban el mes dos veces.
+--
+-- Los reportes leen las vistas import_llegadas_historico /
+-- import_salidas_historico (vivas UNION ALL archivo).
+--
+-- El trabajo programado es archivado.py (horizonte ARCHIVO_MESES):
+--   python archivado.py --meses 12
+-- o directamente: SELECT * FROM archivar_recorridos(12);
+--
+-- Requiere 006_particiones_mensuales.sql.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS import_salidas_archivo (
+    id INTEGER NOT NULL,
+    lugar VARCHAR(150),
+    hora TIME NOT NULL,
+    anden INTEGER,
+    empresa_nombre VARCHAR(150),
+    fecha DATE NOT NULL,
+    estado VARCHAR(50),
+    empresa_id INTEGER,
+    lugar_id INTEGER,
+    PRIMARY KEY (id, fecha)
+) PARTITION BY RANGE (fecha);
+
+CREATE TABLE IF NOT EXISTS import_llegadas_archivo (
+    id INTEGER NOT NULL,
+    lugar VARCHAR(150),
+    hora TIME NOT NULL,
+    anden INTEGER,
+    empresa_nombre VARCHAR(150),
+    fecha DATE NOT NULL,
+    estado VARCHAR(50),
+    empresa_id INTEGER,
+    lugar_id INTEGER,
+    PRIMARY KEY (id, fecha)
+) PARTITION BY RANGE (fecha);
+
+-- --- VISTAS PARA LOS REPORTES (VIVAS + ARCHIVO) ---
+
+CREATE OR REPLACE VIEW import_salidas_historico AS
+    SELECT id, lugar, hora, anden, empresa_nombre, fecha, estado, empresa_id, lugar_id FROM import_salidas
+    UNION ALL
+    SELECT id, lugar, hora, anden, empresa_nombre, fecha, estado, empresa_id, lugar_id FROM import_salidas_archivo;
+
+CREATE OR REPLACE VIEW import_llegadas_historico AS
+    SELECT id, lugar, hora, anden, empresa_nombre, fecha, estado, empresa_id, lugar_id FROM import_llegadas
+    UNION ALL
+    SELECT id, lugar, hora, anden, empresa_nombre, fecha, estado, empresa_id, lugar_id FROM import_llegadas_archivo;
+
+-- --- MESES ARCHIVADOS CERRADOS ---
+
+-- Igual que en 006, pero un mes que ya está en el archivo no vuelve a tener partición viva
+CREATE OR REPLACE FUNCTION crear_particion_mensual(tabla text, columna text, mes date)
+RETURNS boolean AS $$
+DECLARE
+    desde date := date_trunc('month', mes)::date;
+    hasta date := (date_trunc('month', mes) + interval '1 month')::date;
+    nombre text := tabla || '_' || to_char(mes, 'YYYY_MM');
+BEGIN
+    IF to_regclass(nombre) IS NOT NULL
+       OR to_regclass(tabla || '_archivo_' || to_char(mes, 'YYYY_MM')) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', nombre, tabla);
+    IF to_regclass(tabla || '_default') IS NOT NULL THEN
+        EXECUTE format('WITH movidas AS (DELETE FROM %I WHERE %I >= $1 AND %I < $2 RETURNING *) '
+                       'INSERT INTO %I SELECT * FROM movidas',
+                       tabla || '_default', columna, columna, nombre)
+        USING desde, hasta;
+    END IF;
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   tabla, nombre, desde, hasta);
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Lo que cae en la DEFAULT de un mes archivado (importación o cambio de fecha) se rechaza.
+-- TG_ARGV[0]: tabla viva (import_llegadas / import_salidas)
+CREATE OR REPLACE FUNCTION rechazar_mes_archivado()
+RETURNS trigger AS $$
+BEGIN
+    IF to_regclass(TG_ARGV[0] || '_archivo_' || to_char(NEW.fecha, 'YYYY_MM')) IS NOT NULL THEN
+        RAISE EXCEPTION 'El mes % de % está archivado: no se pueden agregar ni mover recorridos a esa fecha',
+                        to_char(NEW.fecha, 'YYYY-MM'), TG_ARGV[0]
+            USING ERRCODE = 'check_violation';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_rechazar_mes_archivado ON import_salidas_default;
+CREATE TRIGGER trg_rechazar_mes_archivado
+    BEFORE INSERT OR UPDATE OF fecha ON import_salidas_default
+    FOR EACH ROW EXECUTE FUNCTION rechazar_mes_archivado('import_salidas');
+
+DROP TRIGGER IF EXISTS trg_rechazar_mes_archivado ON import_llegadas_default;
+CREATE TRIGGER trg_rechazar_mes_archivado
+    BEFORE INSERT OR UPDATE OF fecha ON import_llegadas_default
+    FOR EACH ROW EXECUTE FUNCTION rechazar_mes_archivado('import_llegadas');
+
+-- --- ARCHIVADO ---
+
+-- Mueve al archivo los meses (particiones tabla_AAAA_MM) que terminan antes
+-- de "mes actual - meses". Devuelve una fila por partición archivada.
+CREATE OR REPLACE FUNCTION archivar_recorridos(meses integer)
+RETURNS TABLE (tabla text, particion text, filas bigint) AS $$
+DECLARE
+    limite date := (date_trunc('month', CURRENT_DATE) - make_interval(months => meses))::date;
+    p record;
+    obj record;
+    nuevo text;
+    desde date;
+BEGIN
+    FOR p IN
+        SELECT padre.relname::text AS padre, hija.relname::text AS hija
+        FROM pg_inherits i
+        JOIN pg_class padre ON padre.oid = i.inhparent
+        JOIN pg_class hija ON hija.oid = i.inhrelid
+        WHERE padre.relname IN ('import_llegadas', 'import_salidas')
+          AND hija.relname ~ '_\d{4}_\d{2}$'
+        ORDER BY hija.relname
+    LOOP
+        desde := to_date(right(p.hija, 7), 'YYYY_MM');
+        CONTINUE WHEN (desde + interval '1 month')::date > limite;
+
+        nuevo := p.padre || '_archivo_' || right(p.hija, 7);
+        -- Partición viva de un mes ya archivado (creada antes de que el mes quedara cerrado)
+        IF to_regclass(nuevo) IS NOT NULL THEN
+            RAISE EXCEPTION 'El mes % de % ya está archivado en %: revise las filas de % antes de archivar',
+                            right(p.hija, 7), p.padre, nuevo, p.hija;
+        END IF;
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', p.padre, p.hija);
+
+        -- Sin FK, UNIQUE ni triggers: en el archivo solo se busca por la llave (id, fecha),
+        -- y un maestro que ya solo aparece en el archivo se puede borrar
+        FOR obj IN SELECT conname FROM pg_constraint
+                   WHERE conrelid = p.hija::regclass AND contype IN ('f', 'u')
+        LOOP
+            EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', p.hija, obj.conname);
+        END LOOP;
+        FOR obj IN SELECT c.relname FROM pg_index x JOIN pg_class c ON c.oid = x.indexrelid
+                   WHERE x.indrelid = p.hija::regclass AND NOT x.indisprimary
+        LOOP
+            EXECUTE format('DROP INDEX %I', obj.relname);
+        END LOOP;
+        -- Tampoco depende de la secuencia de la tabla viva
+        EXECUTE format('ALTER TABLE %I ALTER COLUMN id DROP DEFAULT', p.hija);
+        FOR obj IN SELECT tgname FROM pg_trigger WHERE tgrelid = p.hija::regclass AND NOT tgisinternal
+        LOOP
+            EXECUTE format('DROP TRIGGER %I ON %I', obj.tgname, p.hija);
+        END LOOP;
+
+        EXECUTE format('ALTER TABLE %I RENAME TO %I', p.hija, nuevo);
+        SELECT c.relname INTO obj FROM pg_index x JOIN pg_class c ON c.oid = x.indexrelid
+        WHERE x.indrelid = nuevo::regclass AND x.indisprimary;
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', obj.relname, nuevo || '_pkey');
+        EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                       p.padre || '_archivo', nuevo, desde, (desde + interval '1 month')::date);
+
+        tabla := p.padre;
+        particion := nuevo;
+        EXECUTE format('SELECT COUNT(*) FROM %I', nuevo) INTO filas;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
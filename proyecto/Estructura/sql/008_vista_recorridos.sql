@@ -0,0 +1,22 @@
+-- VISTA UNIFICADA DE RECORRIDOS
+-- Salidas y llegadas en una sola relación con columna 'tipo'
+-- ('salidas' / 'llegadas'), para que la pantalla, el dashboard, el panel
+-- del operador y el panel de administración traigan ambos tipos con una
+-- sola consulta ya ordenada y paginada (ver repositorio.py).
+--
+-- Es un UNION ALL simple: Postgres lo aplana y cada rama usa su propio
+-- índice (fecha, hora, empresa_nombre, lugar) de 006, el mismo en las dos
+-- tablas; un filtro por tipo descarta la otra rama y uno por fecha poda
+-- las particiones. Escrituras, ON CONFLICT y auditoría siguen yendo a
+-- import_salidas / import_llegadas.
+
+BEGIN;
+
+CREATE OR REPLACE VIEW recorridos AS
+    SELECT 'salidas'::varchar(10) AS tipo, id, hora, empresa_nombre, lugar, anden, fecha, estado
+    FROM import_salidas
+    UNION ALL
+    SELECT 'llegadas'::varchar(10) AS tipo, id, hora, empresa_nombre, lugar, anden, fecha, estado
+    FROM import_llegadas;
+
+COMMIT;
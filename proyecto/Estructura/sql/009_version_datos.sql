@@ -0,0 +1,52 @@
+-- VERSIÓN DE LOS DATOS (CACHÉ DE FRAGMENTOS)
+-- cache_fragmentos.py guarda el HTML ya renderizado de las filas de la
+-- pantalla y de los resultados del dashboard, con la versión de las tablas
+-- de las que salió como parte de la llave. Un trigger por sentencia sube la
+-- versión de la tabla en cada INSERT/UPDATE/DELETE/TRUNCATE, venga de la app,
+-- de otro worker o de una carga por psql: la siguiente lectura ya usa otra
+-- llave y el fragmento viejo sale solo por LRU.
+--
+-- La versión se sube con UPDATE (no con una secuencia) para que el número
+-- nuevo sea visible recién cuando la escritura hace COMMIT; así nunca se
+-- cachea con la versión nueva algo leído antes de que los datos existan.
+-- Dos escrituras a la misma tabla se turnan en esa fila hasta el COMMIT.
+--
+-- Requiere 006_particiones_mensuales.sql (los triggers van en la tabla
+-- padre particionada).
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS version_datos (
+    tabla VARCHAR(63) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    actualizado TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO version_datos (tabla)
+VALUES ('import_llegadas'), ('import_salidas'), ('noticias'), ('empresas'), ('lugares')
+ON CONFLICT (tabla) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION subir_version_datos()
+RETURNS trigger AS $$
+BEGIN
+    UPDATE version_datos
+    SET version = version + 1, actualizado = now()
+    WHERE tabla = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t text;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['import_llegadas', 'import_salidas', 'noticias', 'empresas', 'lugares']
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_version_datos ON %I', t);
+        EXECUTE format('CREATE TRIGGER trg_version_datos
+                        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I
+                        FOR EACH STATEMENT EXECUTE FUNCTION subir_version_datos()', t);
+    END LOOP;
+END $$;
+
+COMMIT;
@@ -0,0 +1,339 @@
+-- VARIOS TERMINALES EN UNA INSTALACIÓN
+-- Hasta aquí el sistema suponía un solo terminal (Coyhaique): zona horaria
+-- y bienvenida fijas en el código, andenes y noticias globales. Con esta
+-- migración cada terminal es una fila de 'terminales' (código para la URL
+-- pública, nombre, zona horaria y texto de bienvenida) y las tablas por
+-- terminal llevan terminal_id:
+--   - import_llegadas / import_salidas (y su archivo de 007),
+--   - historial_verificaciones, historial_extras, sus resúmenes diarios
+--     (001) y las versiones por día de los reportes (002),
+--   - usuarios (cada cuenta trabaja en un terminal) y noticias.
+-- Empresas, lugares y la flota (buses_permitidos) siguen siendo comunes.
+-- Las filas existentes quedan en el terminal 1 ('coyhaique'); una
+-- escritura que no indique terminal_id también cae ahí (DEFAULT 1).
+--
+-- Llaves e índices empiezan por terminal_id: la clave única de recorridos
+-- pasa a (terminal_id, fecha, hora, empresa_nombre, lugar), así las
+-- consultas del día de un terminal (pantalla, dashboard, operador) leen un
+-- tramo contiguo del índice de la partición del mes, y dos terminales
+-- pueden tener el mismo servicio a la misma hora. Las particiones
+-- siguen siendo mensuales (006): el mes es la unidad del archivado (007) y
+-- subparticionar por terminal multiplicaría las tablas sin podar más que
+-- el índice.
+--
+-- version_datos (009) pasa a llevar una fila por (tabla, terminal): los
+-- triggers de recorridos y noticias suben solo la versión de los
+-- terminales tocados (tablas de transición), así una importación o los
+-- cambios de estado de un terminal no invalidan la caché de fragmentos de
+-- los demás. Empresas y lugares usan terminal_id = 0.
+--
+-- Un terminal nuevo se agrega con:
+--   INSERT INTO terminales (codigo, nombre, zona_horaria, bienvenida)
+--   VALUES ('puerto_aysen', 'Terminal de Puerto Aysén', 'America/Santiago',
+--           'Bienvenido al Terminal de Puerto Aysén');
+-- y sus cuentas se crean desde el panel de un administrador de ese terminal
+-- (o con UPDATE usuarios SET terminal_id = ...).
+--
+-- Los recálculos de resúmenes (001) y las versiones de reportes (002)
+-- pasan a trabajar por (terminal, día): una corrección en un terminal no
+-- recalcula ni invalida los reportes de otro.
+--
+-- Requiere 006, 007, 008 y 009. Se aplica una sola vez.
+
+BEGIN;
+
+CREATE TABLE terminales (
+    id SERIAL PRIMARY KEY,
+    codigo VARCHAR(30) NOT NULL UNIQUE,
+    nombre VARCHAR(150) NOT NULL,
+    zona_horaria VARCHAR(64) NOT NULL DEFAULT 'America/Punta_Arenas',
+    bienvenida TEXT NOT NULL
+);
+
+INSERT INTO terminales (id, codigo, nombre, zona_horaria, bienvenida)
+VALUES (1, 'coyhaique', 'Terminal de Buses de Coyhaique', 'America/Punta_Arenas',
+        'Bienvenido al Terminal de Buses de Coyhaique');
+SELECT setval('terminales_id_seq', 1);
+
+-- --- COLUMNA terminal_id ---
+-- Con DEFAULT constante no se reescriben las tablas (ni las particiones)
+
+ALTER TABLE usuarios ADD COLUMN terminal_id INTEGER NOT NULL DEFAULT 1 REFERENCES terminales(id);
+ALTER TABLE noticias ADD COLUMN terminal_id INTEGER NOT NULL DEFAULT 1 REFERENCES terminales(id);
+ALTER TABLE import_salidas ADD COLUMN terminal_id INTEGER NOT NULL DEFAULT 1 REFERENCES terminales(id);
+ALTER TABLE import_llegadas ADD COLUMN terminal_id INTEGER NOT NULL DEFAULT 1 REFERENCES terminales(id);
+ALTER TABLE historial_verificaciones ADD COLUMN terminal_id INTEGER NOT NULL DEFAULT 1 REFERENCES terminales(id);
+ALTER TABLE historial_extras ADD COLUMN terminal_id INTEGER NOT NULL DEFAULT 1 REFERENCES terminales(id);
+-- El archivo no lleva FK (ver 007); la columna tiene que existir para el ATTACH de archivar_recorridos
+ALTER TABLE import_salidas_archivo ADD COLUMN terminal_id INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE import_llegadas_archivo ADD COLUMN terminal_id INTEGER NOT NULL DEFAULT 1;
+
+-- --- LLAVES E ÍNDICES ---
+
+ALTER TABLE import_salidas
+    DROP CONSTRAINT import_salidas_fecha_hora_empresa_nombre_lugar_key,
+    ADD CONSTRAINT import_salidas_terminal_fecha_hora_empresa_lugar_key
+        UNIQUE (terminal_id, fecha, hora, empresa_nombre, lugar);
+ALTER TABLE import_llegadas
+    DROP CONSTRAINT import_llegadas_fecha_hora_empresa_nombre_lugar_key,
+    ADD CONSTRAINT import_llegadas_terminal_fecha_hora_empresa_lugar_key
+        UNIQUE (terminal_id, fecha, hora, empresa_nombre, lugar);
+
+CREATE INDEX idx_historial_verificaciones_terminal_fecha ON historial_verificaciones (terminal_id, fecha_manual);
+CREATE INDEX idx_historial_extras_terminal_fecha ON historial_extras (terminal_id, fecha);
+CREATE INDEX idx_noticias_terminal_activas ON noticias (terminal_id, id DESC) WHERE activa;
+
+ALTER TABLE resumen_diario_verificaciones
+    ADD COLUMN terminal_id INTEGER NOT NULL DEFAULT 1 REFERENCES terminales(id),
+    DROP CONSTRAINT resumen_diario_verificaciones_pkey,
+    ADD PRIMARY KEY (terminal_id, fecha, patente, es_patente_valida);
+ALTER TABLE resumen_diario_extras
+    ADD COLUMN terminal_id INTEGER NOT NULL DEFAULT 1 REFERENCES terminales(id),
+    DROP CONSTRAINT resumen_diario_extras_pkey,
+    ADD PRIMARY KEY (terminal_id, fecha, patente, empresa);
+ALTER TABLE version_reportes_dia
+    ADD COLUMN terminal_id INTEGER NOT NULL DEFAULT 1,
+    DROP CONSTRAINT version_reportes_dia_pkey,
+    ADD PRIMARY KEY (tabla, terminal_id, fecha);
+ALTER TABLE version_reportes_dia ALTER COLUMN terminal_id DROP DEFAULT;
+
+-- --- RESÚMENES DIARIOS POR TERMINAL (001) ---
+-- terminales[i], fechas[i] = un día; se borra y se vuelve a agregar.
+-- Dos sentencias: el INSERT ve el DELETE (en una sola chocarían las llaves).
+
+DROP FUNCTION IF EXISTS recalcular_resumen_verificaciones(date[]);
+DROP FUNCTION IF EXISTS recalcular_resumen_extras(date[]);
+
+CREATE OR REPLACE FUNCTION recalcular_resumen_verificaciones(terminales integer[], fechas date[])
+RETURNS void AS $$
+    DELETE FROM resumen_diario_verificaciones r
+    USING unnest(terminales, fechas) AS d(terminal_id, fecha)
+    WHERE r.terminal_id = d.terminal_id AND r.fecha = d.fecha;
+
+    INSERT INTO resumen_diario_verificaciones
+        (terminal_id, fecha, patente, es_patente_valida, cantidad, anden_correcto, anden_incorrecto)
+    SELECT
+        h.terminal_id,
+        h.fecha_manual,
+        COALESCE(h.patente_ingresada, ''),
+        COALESCE(h.es_patente_valida, FALSE),
+        COUNT(*),
+        COUNT(*) FILTER (WHERE h.es_anden_correcto),
+        COUNT(*) FILTER (WHERE NOT COALESCE(h.es_anden_correcto, FALSE))
+    FROM historial_verificaciones h
+    JOIN (SELECT DISTINCT * FROM unnest(terminales, fechas) AS d(terminal_id, fecha)) d
+      ON h.terminal_id = d.terminal_id AND h.fecha_manual = d.fecha
+    GROUP BY 1, 2, 3, 4;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION recalcular_resumen_extras(terminales integer[], fechas date[])
+RETURNS void AS $$
+    DELETE FROM resumen_diario_extras r
+    USING unnest(terminales, fechas) AS d(terminal_id, fecha)
+    WHERE r.terminal_id = d.terminal_id AND r.fecha = d.fecha;
+
+    INSERT INTO resumen_diario_extras (terminal_id, fecha, patente, empresa, cantidad)
+    SELECT h.terminal_id, h.fecha, h.patente, COALESCE(h.empresa, 'NO REGISTRADA'), COUNT(*)
+    FROM historial_extras h
+    JOIN (SELECT DISTINCT * FROM unnest(terminales, fechas) AS d(terminal_id, fecha)) d
+      ON h.terminal_id = d.terminal_id AND h.fecha = d.fecha
+    GROUP BY 1, 2, 3, 4;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION recalcular_resumenes_diarios()
+RETURNS void AS $$
+    TRUNCATE resumen_diario_verificaciones, resumen_diario_extras;
+
+    INSERT INTO resumen_diario_verificaciones
+        (terminal_id, fecha, patente, es_patente_valida, cantidad, anden_correcto, anden_incorrecto)
+    SELECT
+        terminal_id,
+        fecha_manual,
+        COALESCE(patente_ingresada, ''),
+        COALESCE(es_patente_valida, FALSE),
+        COUNT(*),
+        COUNT(*) FILTER (WHERE es_anden_correcto),
+        COUNT(*) FILTER (WHERE NOT COALESCE(es_anden_correcto, FALSE))
+    FROM historial_verificaciones
+    WHERE fecha_manual IS NOT NULL
+    GROUP BY 1, 2, 3, 4;
+
+    INSERT INTO resumen_diario_extras (terminal_id, fecha, patente, empresa, cantidad)
+    SELECT terminal_id, fecha, patente, COALESCE(empresa, 'NO REGISTRADA'), COUNT(*)
+    FROM historial_extras
+    GROUP BY 1, 2, 3, 4;
+$$ LANGUAGE sql;
+
+-- Los triggers de 001 (y de 006 en las tablas particionadas) siguen llamando a esta función
+CREATE OR REPLACE FUNCTION recalcular_resumen_historial()
+RETURNS trigger AS $$
+DECLARE
+    terminales integer[];
+    fechas date[];
+BEGIN
+    IF TG_TABLE_NAME = 'historial_verificaciones' THEN
+        IF TG_OP = 'DELETE' THEN
+            SELECT array_agg(terminal_id), array_agg(fecha_manual) INTO terminales, fechas
+            FROM (SELECT DISTINCT terminal_id, fecha_manual FROM filas_viejas) d;
+        ELSE
+            SELECT array_agg(terminal_id), array_agg(fecha_manual) INTO terminales, fechas
+            FROM (SELECT terminal_id, fecha_manual FROM filas_viejas
+                  UNION
+                  SELECT terminal_id, fecha_manual FROM filas_nuevas) d;
+        END IF;
+        PERFORM recalcular_resumen_verificaciones(terminales, fechas);
+    ELSE
+        IF TG_OP = 'DELETE' THEN
+            SELECT array_agg(terminal_id), array_agg(fecha) INTO terminales, fechas
+            FROM (SELECT DISTINCT terminal_id, fecha FROM filas_viejas) d;
+        ELSE
+            SELECT array_agg(terminal_id), array_agg(fecha) INTO terminales, fechas
+            FROM (SELECT terminal_id, fecha FROM filas_viejas
+                  UNION
+                  SELECT terminal_id, fecha FROM filas_nuevas) d;
+        END IF;
+        PERFORM recalcular_resumen_extras(terminales, fechas);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- --- VERSIONES DE REPORTES POR TERMINAL (002) ---
+-- Mismas funciones de trigger; los triggers de 002 no cambian.
+
+CREATE OR REPLACE FUNCTION subir_version_reportes_dia()
+RETURNS trigger AS $$
+DECLARE
+    dias text;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        UPDATE version_reportes_dia SET version = version + 1 WHERE tabla = TG_TABLE_NAME;
+        RETURN NULL;
+    ELSIF TG_OP = 'INSERT' THEN
+        dias := format('SELECT terminal_id, %I FROM filas_nuevas', TG_ARGV[0]);
+    ELSIF TG_OP = 'DELETE' THEN
+        dias := format('SELECT terminal_id, %I FROM filas_viejas', TG_ARGV[0]);
+    ELSE
+        -- Una corrección de fecha cambia el día viejo y el nuevo
+        dias := format('SELECT terminal_id, %1$I FROM filas_nuevas
+                        UNION SELECT terminal_id, %1$I FROM filas_viejas', TG_ARGV[0]);
+    END IF;
+
+    EXECUTE format('
+        INSERT INTO version_reportes_dia AS v (tabla, terminal_id, fecha)
+        SELECT DISTINCT %L, d.* FROM (%s) d
+        ON CONFLICT (tabla, terminal_id, fecha) DO UPDATE SET version = v.version + 1',
+        TG_TABLE_NAME, dias);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION subir_version_reportes_recorridos()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        UPDATE version_reportes_dia SET version = version + 1
+        WHERE tabla = 'historial_verificaciones';
+        RETURN NULL;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO version_reportes_dia AS v (tabla, terminal_id, fecha)
+        SELECT DISTINCT 'historial_verificaciones', h.terminal_id, h.fecha_manual
+        FROM filas_viejas r
+        JOIN historial_verificaciones h ON h.recorrido_id = r.id AND h.tipo_recorrido = TG_ARGV[0]
+        ON CONFLICT (tabla, terminal_id, fecha) DO UPDATE SET version = v.version + 1;
+    ELSE
+        INSERT INTO version_reportes_dia AS v (tabla, terminal_id, fecha)
+        SELECT DISTINCT 'historial_verificaciones', h.terminal_id, h.fecha_manual
+        FROM filas_nuevas n
+        JOIN filas_viejas r ON r.id = n.id
+        JOIN historial_verificaciones h ON h.recorrido_id = r.id AND h.tipo_recorrido = TG_ARGV[0]
+        WHERE (n.lugar, n.empresa_nombre) IS DISTINCT FROM (r.lugar, r.empresa_nombre)
+        ON CONFLICT (tabla, terminal_id, fecha) DO UPDATE SET version = v.version + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- --- VISTAS (terminal_id al final: CREATE OR REPLACE solo agrega columnas) ---
+
+CREATE OR REPLACE VIEW recorridos AS
+    SELECT 'salidas'::varchar(10) AS tipo, id, hora, empresa_nombre, lugar, anden, fecha, estado, terminal_id
+    FROM import_salidas
+    UNION ALL
+    SELECT 'llegadas'::varchar(10) AS tipo, id, hora, empresa_nombre, lugar, anden, fecha, estado, terminal_id
+    FROM import_llegadas;
+
+CREATE OR REPLACE VIEW import_salidas_historico AS
+    SELECT id, lugar, hora, anden, empresa_nombre, fecha, estado, empresa_id, lugar_id, terminal_id FROM import_salidas
+    UNION ALL
+    SELECT id, lugar, hora, anden, empresa_nombre, fecha, estado, empresa_id, lugar_id, terminal_id FROM import_salidas_archivo;
+
+CREATE OR REPLACE VIEW import_llegadas_historico AS
+    SELECT id, lugar, hora, anden, empresa_nombre, fecha, estado, empresa_id, lugar_id, terminal_id FROM import_llegadas
+    UNION ALL
+    SELECT id, lugar, hora, anden, empresa_nombre, fecha, estado, empresa_id, lugar_id, terminal_id FROM import_llegadas_archivo;
+
+-- --- VERSIÓN DE LOS DATOS POR TERMINAL ---
+
+ALTER TABLE version_datos
+    ADD COLUMN terminal_id INTEGER NOT NULL DEFAULT 0,
+    DROP CONSTRAINT version_datos_pkey,
+    ADD PRIMARY KEY (tabla, terminal_id);
+
+UPDATE version_datos SET terminal_id = 1 WHERE tabla IN ('import_llegadas', 'import_salidas', 'noticias');
+
+-- Sube la versión de (tabla, terminal) para cada terminal de 'terminales';
+-- la fila se crea la primera vez que se escribe en un terminal nuevo. En
+-- orden de terminal, para que dos escrituras simultáneas no se bloqueen cruzadas.
+CREATE OR REPLACE FUNCTION subir_version_terminales(tabla_origen text, terminales integer[])
+RETURNS void AS $$
+    INSERT INTO version_datos AS v (tabla, terminal_id, version)
+    SELECT tabla_origen, t, 1 FROM unnest(terminales) AS t ORDER BY t
+    ON CONFLICT (tabla, terminal_id) DO UPDATE
+    SET version = v.version + 1, actualizado = now();
+$$ LANGUAGE sql;
+
+-- Trigger por sentencia con tablas de transición: solo los terminales de las filas escritas
+CREATE OR REPLACE FUNCTION subir_version_datos_terminal()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM subir_version_terminales(TG_TABLE_NAME, ARRAY(SELECT DISTINCT terminal_id FROM filas_nuevas));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM subir_version_terminales(TG_TABLE_NAME, ARRAY(SELECT DISTINCT terminal_id FROM filas_viejas));
+    ELSE
+        PERFORM subir_version_terminales(TG_TABLE_NAME, ARRAY(SELECT terminal_id FROM filas_nuevas
+                                                              UNION
+                                                              SELECT terminal_id FROM filas_viejas));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Postgres no admite tablas de transición en un trigger de varios eventos:
+-- uno por evento, y TRUNCATE (sin filas) sube la versión de todos los terminales
+DO $$
+DECLARE
+    t text;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['import_llegadas', 'import_salidas', 'noticias']
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_version_datos ON %I', t);
+        EXECUTE format('CREATE TRIGGER trg_version_datos_insert AFTER INSERT ON %I
+                        REFERENCING NEW TABLE AS filas_nuevas
+                        FOR EACH STATEMENT EXECUTE FUNCTION subir_version_datos_terminal()', t);
+        EXECUTE format('CREATE TRIGGER trg_version_datos_update AFTER UPDATE ON %I
+                        REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas
+                        FOR EACH STATEMENT EXECUTE FUNCTION subir_version_datos_terminal()', t);
+        EXECUTE format('CREATE TRIGGER trg_version_datos_delete AFTER DELETE ON %I
+                        REFERENCING OLD TABLE AS filas_viejas
+                        FOR EACH STATEMENT EXECUTE FUNCTION subir_version_datos_terminal()', t);
+        EXECUTE format('CREATE TRIGGER trg_version_datos_truncate AFTER TRUNCATE ON %I
+                        FOR EACH STATEMENT EXECUTE FUNCTION subir_version_datos()', t);
+    END LOOP;
+END $$;
+
+COMMIT;
+
+ANALYZE import_salidas;
+ANALYZE import_llegadas;
@@ -0,0 +1,28 @@
+-- PERMANENCIA EN ANDÉN (DETECCIÓN DE CONFLICTOS)
+-- conflictos_anden.py modela cada recorrido como el intervalo en que su
+-- bus ocupa el andén: una salida desde 'minutos' antes de su hora (el bus
+-- llega a cargar pasajeros) y una llegada desde su hora hasta 'minutos'
+-- después (descarga). Dos intervalos que se solapan en el mismo andén y
+-- terminal son un conflicto.
+--
+-- Una fila por tipo con empresa_nombre = '' es el valor del tipo; una
+-- fila con empresa es la excepción para esa empresa (por ejemplo buses de
+-- dos pisos que cargan más lento):
+--   INSERT INTO permanencia_anden VALUES ('salidas', 'BUSES QUEILEN', 25);
+-- Es común a todos los terminales, como empresas y lugares.
+--
+-- Requiere 010 (terminal_id en recorridos). Se aplica una sola vez.
+
+BEGIN;
+
+CREATE TABLE permanencia_anden (
+    tipo VARCHAR(10) NOT NULL CHECK (tipo IN ('llegadas', 'salidas')),
+    empresa_nombre VARCHAR(150) NOT NULL DEFAULT '',
+    minutos INTEGER NOT NULL CHECK (minutos > 0),
+    PRIMARY KEY (tipo, empresa_nombre)
+);
+
+INSERT INTO permanencia_anden (tipo, empresa_nombre, minutos)
+VALUES ('salidas', '', 15), ('llegadas', '', 10);
+
+COMMIT;
@@ -0,0 +1,241 @@
+-- ESQUEMA SQLITE (KIOSCO / PRUEBAS)
+-- Equivalente a 000_esquema_base.sql + 001_resumenes_diarios.sql + 008 + 009
+-- + 010 + 011 para RepositorioSqlite (repositorio.py). Fechas y horas se
+-- guardan como texto ISO; los tipos DATE/TIME/TIMESTAMP/BOOLEAN activan los
+-- conversores que las devuelven como date/time/datetime/bool.
+-- Un archivo creado antes de 010 (sin terminal_id) se borra y se vuelve a
+-- llenar con sincronizar_kiosco.py.
+
+CREATE TABLE IF NOT EXISTS terminales (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    codigo VARCHAR(30) NOT NULL UNIQUE,
+    nombre VARCHAR(150) NOT NULL,
+    zona_horaria VARCHAR(64) NOT NULL DEFAULT 'America/Punta_Arenas',
+    bienvenida TEXT NOT NULL
+);
+INSERT OR IGNORE INTO terminales (id, codigo, nombre, zona_horaria, bienvenida)
+VALUES (1, 'coyhaique', 'Terminal de Buses de Coyhaique', 'America/Punta_Arenas',
+        'Bienvenido al Terminal de Buses de Coyhaique');
+
+CREATE TABLE IF NOT EXISTS usuarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(100) NOT NULL,
+    rut VARCHAR(12) NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    rol VARCHAR(20) NOT NULL,
+    activo BOOLEAN NOT NULL DEFAULT 1,
+    terminal_id INTEGER NOT NULL DEFAULT 1 REFERENCES terminales(id)
+);
+
+CREATE TABLE IF NOT EXISTS empresas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre VARCHAR(150) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS lugares (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre VARCHAR(150) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS noticias (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    contenido TEXT NOT NULL,
+    fecha_creacion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    activa BOOLEAN NOT NULL DEFAULT 1,
+    terminal_id INTEGER NOT NULL DEFAULT 1 REFERENCES terminales(id)
+);
+
+CREATE TABLE IF NOT EXISTS import_llegadas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lugar VARCHAR(150),
+    hora TIME NOT NULL,
+    anden INTEGER,
+    empresa_nombre VARCHAR(150),
+    fecha DATE NOT NULL,
+    estado VARCHAR(50) DEFAULT 'Programado',
+    terminal_id INTEGER NOT NULL DEFAULT 1 REFERENCES terminales(id),
+    UNIQUE (terminal_id, fecha, hora, empresa_nombre, lugar)
+);
+CREATE INDEX IF NOT EXISTS idx_llegadas_fecha_hora ON import_llegadas (terminal_id, fecha, hora);
+
+CREATE TABLE IF NOT EXISTS import_salidas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lugar VARCHAR(150),
+    hora TIME NOT NULL,
+    anden INTEGER,
+    empresa_nombre VARCHAR(150),
+    fecha DATE NOT NULL,
+    estado VARCHAR(50) DEFAULT 'Programado',
+    terminal_id INTEGER NOT NULL DEFAULT 1 REFERENCES terminales(id),
+    UNIQUE (terminal_id, fecha, hora, empresa_nombre, lugar)
+);
+CREATE INDEX IF NOT EXISTS idx_salidas_fecha_hora ON import_salidas (terminal_id, fecha, hora);
+
+CREATE TABLE IF NOT EXISTS buses_permitidos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patente VARCHAR(10) NOT NULL UNIQUE,
+    empresa VARCHAR(150),
+    activa BOOLEAN NOT NULL DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS historial_verificaciones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recorrido_id INTEGER NOT NULL,
+    tipo_recorrido VARCHAR(20) NOT NULL,
+    operador_id INTEGER REFERENCES usuarios(id),
+    patente_ingresada VARCHAR(10),
+    anden_real VARCHAR(10),
+    es_patente_valida BOOLEAN,
+    es_anden_correcto BOOLEAN,
+    anden_programado VARCHAR(10),
+    observaciones TEXT,
+    fecha_manual DATE,
+    hora_manual TIME,
+    fecha_registro TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    terminal_id INTEGER NOT NULL DEFAULT 1 REFERENCES terminales(id)
+);
+
+CREATE TABLE IF NOT EXISTS historial_extras (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha DATE NOT NULL,
+    hora TIME NOT NULL,
+    patente VARCHAR(10) NOT NULL,
+    empresa VARCHAR(150),
+    lugar VARCHAR(150),
+    tipo_recorrido VARCHAR(20),
+    anden VARCHAR(10),
+    operador_id INTEGER REFERENCES usuarios(id),
+    observacion TEXT,
+    fecha_registro TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    terminal_id INTEGER NOT NULL DEFAULT 1 REFERENCES terminales(id)
+);
+
+-- Empresa dueña y patente conocida se leen de buses_permitidos al generar
+-- el reporte, como en 001
+CREATE TABLE IF NOT EXISTS resumen_diario_verificaciones (
+    terminal_id INTEGER NOT NULL DEFAULT 1 REFERENCES terminales(id),
+    fecha DATE NOT NULL,
+    patente VARCHAR(10) NOT NULL,
+    es_patente_valida BOOLEAN NOT NULL,
+    cantidad INTEGER NOT NULL DEFAULT 0,
+    anden_correcto INTEGER NOT NULL DEFAULT 0,
+    anden_incorrecto INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (terminal_id, fecha, patente, es_patente_valida)
+);
+
+CREATE TABLE IF NOT EXISTS resumen_diario_extras (
+    terminal_id INTEGER NOT NULL DEFAULT 1 REFERENCES terminales(id),
+    fecha DATE NOT NULL,
+    patente VARCHAR(10) NOT NULL,
+    empresa VARCHAR(150) NOT NULL,
+    cantidad INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (terminal_id, fecha, patente, empresa)
+);
+
+-- Corregir o borrar historial recalcula el día de la fila vieja (y de la nueva),
+-- como los triggers de 001; aquí por fila
+CREATE TRIGGER IF NOT EXISTS trg_resumen_verificaciones_update AFTER UPDATE ON historial_verificaciones
+BEGIN
+    DELETE FROM resumen_diario_verificaciones
+    WHERE (terminal_id = OLD.terminal_id AND fecha = OLD.fecha_manual)
+       OR (terminal_id = NEW.terminal_id AND fecha = NEW.fecha_manual);
+    INSERT INTO resumen_diario_verificaciones
+        (terminal_id, fecha, patente, es_patente_valida, cantidad, anden_correcto, anden_incorrecto)
+    SELECT terminal_id, fecha_manual, COALESCE(patente_ingresada, ''), COALESCE(es_patente_valida, 0), COUNT(*),
+           SUM(CASE WHEN es_anden_correcto THEN 1 ELSE 0 END), SUM(CASE WHEN es_anden_correcto THEN 0 ELSE 1 END)
+    FROM historial_verificaciones
+    WHERE (terminal_id = OLD.terminal_id AND fecha_manual = OLD.fecha_manual)
+       OR (terminal_id = NEW.terminal_id AND fecha_manual = NEW.fecha_manual)
+    GROUP BY 1, 2, 3, 4;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_resumen_verificaciones_delete AFTER DELETE ON historial_verificaciones
+BEGIN
+    DELETE FROM resumen_diario_verificaciones WHERE terminal_id = OLD.terminal_id AND fecha = OLD.fecha_manual;
+    INSERT INTO resumen_diario_verificaciones
+        (terminal_id, fecha, patente, es_patente_valida, cantidad, anden_correcto, anden_incorrecto)
+    SELECT terminal_id, fecha_manual, COALESCE(patente_ingresada, ''), COALESCE(es_patente_valida, 0), COUNT(*),
+           SUM(CASE WHEN es_anden_correcto THEN 1 ELSE 0 END), SUM(CASE WHEN es_anden_correcto THEN 0 ELSE 1 END)
+    FROM historial_verificaciones
+    WHERE terminal_id = OLD.terminal_id AND fecha_manual = OLD.fecha_manual
+    GROUP BY 1, 2, 3, 4;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_resumen_extras_update AFTER UPDATE ON historial_extras
+BEGIN
+    DELETE FROM resumen_diario_extras
+    WHERE (terminal_id = OLD.terminal_id AND fecha = OLD.fecha)
+       OR (terminal_id = NEW.terminal_id AND fecha = NEW.fecha);
+    INSERT INTO resumen_diario_extras (terminal_id, fecha, patente, empresa, cantidad)
+    SELECT terminal_id, fecha, patente, COALESCE(empresa, 'NO REGISTRADA'), COUNT(*)
+    FROM historial_extras
+    WHERE (terminal_id = OLD.terminal_id AND fecha = OLD.fecha)
+       OR (terminal_id = NEW.terminal_id AND fecha = NEW.fecha)
+    GROUP BY 1, 2, 3, 4;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_resumen_extras_delete AFTER DELETE ON historial_extras
+BEGIN
+    DELETE FROM resumen_diario_extras WHERE terminal_id = OLD.terminal_id AND fecha = OLD.fecha;
+    INSERT INTO resumen_diario_extras (terminal_id, fecha, patente, empresa, cantidad)
+    SELECT terminal_id, fecha, patente, COALESCE(empresa, 'NO REGISTRADA'), COUNT(*)
+    FROM historial_extras
+    WHERE terminal_id = OLD.terminal_id AND fecha = OLD.fecha
+    GROUP BY 1, 2, 3, 4;
+END;
+
+-- Minutos que cada recorrido ocupa su andén (sql/011_permanencia_anden.sql)
+CREATE TABLE IF NOT EXISTS permanencia_anden (
+    tipo VARCHAR(10) NOT NULL CHECK (tipo IN ('llegadas', 'salidas')),
+    empresa_nombre VARCHAR(150) NOT NULL DEFAULT '',
+    minutos INTEGER NOT NULL CHECK (minutos > 0),
+    PRIMARY KEY (tipo, empresa_nombre)
+);
+INSERT OR IGNORE INTO permanencia_anden (tipo, empresa_nombre, minutos)
+VALUES ('salidas', '', 15), ('llegadas', '', 10);
+
+-- Vista unificada (sql/008_vista_recorridos.sql, terminal_id de 010)
+CREATE VIEW IF NOT EXISTS recorridos AS
+    SELECT 'salidas' AS tipo, id, hora, empresa_nombre, lugar, anden, fecha, estado, terminal_id FROM import_salidas
+    UNION ALL
+    SELECT 'llegadas' AS tipo, id, hora, empresa_nombre, lugar, anden, fecha, estado, terminal_id FROM import_llegadas;
+
+-- Versión de los datos para la caché de fragmentos (sql/009_version_datos.sql),
+-- por terminal como en 010 (empresas y lugares con terminal_id = 0).
+-- SQLite no tiene triggers por sentencia: aquí se sube una vez por fila.
+CREATE TABLE IF NOT EXISTS version_datos (
+    tabla VARCHAR(63) NOT NULL,
+    terminal_id INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0,
+    actualizado TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (tabla, terminal_id)
+);
+INSERT OR IGNORE INTO version_datos (tabla, terminal_id)
+VALUES ('import_llegadas', 1), ('import_salidas', 1), ('noticias', 1), ('empresas', 0), ('lugares', 0);
+CREATE TRIGGER IF NOT EXISTS trg_version_import_llegadas_insert AFTER INSERT ON import_llegadas
+BEGIN INSERT INTO version_datos (tabla, terminal_id, version) VALUES ('import_llegadas', NEW.terminal_id, 1) ON CONFLICT (tabla, terminal_id) DO UPDATE SET version = version + 1, actualizado = CURRENT_TIMESTAMP; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_import_llegadas_update AFTER UPDATE ON import_llegadas
+BEGIN INSERT INTO version_datos (tabla, terminal_id, version) VALUES ('import_llegadas', OLD.terminal_id, 1) ON CONFLICT (tabla, terminal_id) DO UPDATE SET version = version + 1, actualizado = CURRENT_TIMESTAMP; INSERT INTO version_datos (tabla, terminal_id, version) VALUES ('import_llegadas', NEW.terminal_id, 1) ON CONFLICT (tabla, terminal_id) DO UPDATE SET version = version + 1, actualizado = CURRENT_TIMESTAMP; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_import_llegadas_delete AFTER DELETE ON import_llegadas
+BEGIN INSERT INTO version_datos (tabla, terminal_id, version) VALUES ('import_llegadas', OLD.terminal_id, 1) ON CONFLICT (tabla, terminal_id) DO UPDATE SET version = version + 1, actualizado = CURRENT_TIMESTAMP; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_import_salidas_insert AFTER INSERT ON import_salidas
+BEGIN INSERT INTO version_datos (tabla, terminal_id, version) VALUES ('import_salidas', NEW.terminal_id, 1) ON CONFLICT (tabla, terminal_id) DO UPDATE SET version = version + 1, actualizado = CURRENT_TIMESTAMP; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_import_salidas_update AFTER UPDATE ON import_salidas
+BEGIN INSERT INTO version_datos (tabla, terminal_id, version) VALUES ('import_salidas', OLD.terminal_id, 1) ON CONFLICT (tabla, terminal_id) DO UPDATE SET version = version + 1, actualizado = CURRENT_TIMESTAMP; INSERT INTO version_datos (tabla, terminal_id, version) VALUES ('import_salidas', NEW.terminal_id, 1) ON CONFLICT (tabla, terminal_id) DO UPDATE SET version = version + 1, actualizado = CURRENT_TIMESTAMP; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_import_salidas_delete AFTER DELETE ON import_salidas
+BEGIN INSERT INTO version_datos (tabla, terminal_id, version) VALUES ('import_salidas', OLD.terminal_id, 1) ON CONFLICT (tabla, terminal_id) DO UPDATE SET version = version + 1, actualizado = CURRENT_TIMESTAMP; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_noticias_insert AFTER INSERT ON noticias
+BEGIN INSERT INTO version_datos (tabla, terminal_id, version) VALUES ('noticias', NEW.terminal_id, 1) ON CONFLICT (tabla, terminal_id) DO UPDATE SET version = version + 1, actualizado = CURRENT_TIMESTAMP; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_noticias_update AFTER UPDATE ON noticias
+BEGIN INSERT INTO version_datos (tabla, terminal_id, version) VALUES ('noticias', OLD.terminal_id, 1) ON CONFLICT (tabla, terminal_id) DO UPDATE SET version = version + 1, actualizado = CURRENT_TIMESTAMP; INSERT INTO version_datos (tabla, terminal_id, version) VALUES ('noticias', NEW.terminal_id, 1) ON CONFLICT (tabla, terminal_id) DO UPDATE SET version = version + 1, actualizado = CURRENT_TIMESTAMP; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_noticias_delete AFTER DELETE ON noticias
+BEGIN INSERT INTO version_datos (tabla, terminal_id, version) VALUES ('noticias', OLD.terminal_id, 1) ON CONFLICT (tabla, terminal_id) DO UPDATE SET version = version + 1, actualizado = CURRENT_TIMESTAMP; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_empresas_insert AFTER INSERT ON empresas
+BEGIN UPDATE version_datos SET version = version + 1, actualizado = CURRENT_TIMESTAMP WHERE tabla = 'empresas'; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_empresas_update AFTER UPDATE ON empresas
+BEGIN UPDATE version_datos SET version = version + 1, actualizado = CURRENT_TIMESTAMP WHERE tabla = 'empresas'; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_empresas_delete AFTER DELETE ON empresas
+BEGIN UPDATE version_datos SET version = version + 1, actualizado = CURRENT_TIMESTAMP WHERE tabla = 'empresas'; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_lugares_insert AFTER INSERT ON lugares
+BEGIN UPDATE version_datos SET version = version + 1, actualizado = CURRENT_TIMESTAMP WHERE tabla = 'lugares'; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_lugares_update AFTER UPDATE ON lugares
+BEGIN UPDATE version_datos SET version = version + 1, actualizado = CURRENT_TIMESTAMP WHERE tabla = 'lugares'; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_lugares_delete AFTER DELETE ON lugares
+BEGIN UPDATE version_datos SET version = version + 1, actualizado = CURRENT_TIMESTAMP WHERE tabla = 'lugares'; END;
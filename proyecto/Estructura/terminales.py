@@ -0,0 +1,105 @@
+# TERMINALES
+# Una instalación atiende varios terminales (sql/010_terminales.sql). Cada
+# uno tiene su código (el de la URL pública: /pantalla?terminal=coyhaique),
+# su zona horaria y el texto de bienvenida de la pantalla.
+#
+# El catálogo se lee de la BD y se guarda en memoria por TTL_SEGUNDOS
+# (TERMINALES_TTL_SEG). Si la lectura falla se sigue con lo último leído,
+# o con RESPALDO si nunca se leyó: la pantalla muestra igual la hora y la
+# bienvenida de su terminal aunque la base no responda.
+#
+# Quién es quién:
+#   - Pantalla y dashboard públicos: ?terminal=<código>; sin él, el de la
+#     cuenta con sesión, y si no hay sesión TERMINAL_DEFECTO.
+#   - Operador y administración: siempre el de la cuenta (usuarios.terminal_id),
+#     sin parámetro que lo cambie.
+import os
+import threading
+import time
+from collections import namedtuple
+
+import pytz
+from flask import abort, request
+from flask_login import current_user
+
+from repositorio import obtener_repositorio, SinConexion
+
+TTL_SEGUNDOS = float(os.getenv("TERMINALES_TTL_SEG", "60"))
+CODIGO_DEFECTO = os.getenv("TERMINAL_DEFECTO", "coyhaique")
+
+Terminal = namedtuple('Terminal', 'id codigo nombre zona bienvenida')
+
+RESPALDO = Terminal(1, CODIGO_DEFECTO, 'Terminal de Buses de Coyhaique', pytz.timezone('America/Punta_Arenas'),
+                    'Bienvenido al Terminal de Buses de Coyhaique')
+
+_por_id = {RESPALDO.id: RESPALDO}
+_por_codigo = {RESPALDO.codigo: RESPALDO}
+_leido = None   # time.monotonic() del último intento de lectura
+_lock = threading.Lock()
+
+
+def vencido():
+    return _leido is None or time.monotonic() - _leido >= TTL_SEGUNDOS
+
+
+def cargar(filas):
+    """
+    Reemplaza el catálogo con filas de repositorio.CONSULTA_TERMINALES.
+    filas=None (no se pudo leer) conserva el catálogo hasta el próximo intento.
+    """
+    global _por_id, _por_codigo, _leido
+    por_id = {}
+    for id_terminal, codigo, nombre, zona_horaria, bienvenida in filas or ():
+        por_id[id_terminal] = Terminal(id_terminal, codigo, nombre, pytz.timezone(zona_horaria), bienvenida)
+    with _lock:
+        if por_id:
+            _por_id, _por_codigo = por_id, {t.codigo: t for t in por_id.values()}
+        _leido = time.monotonic()
+
+
+def refrescar(repo=None):
+    if not vencido():
+        return
+    try:
+        filas = (repo or obtener_repositorio()).terminales()
+    except SinConexion:
+        filas = None
+    cargar(filas)
+
+
+def por_id(id_terminal):
+    """Terminal con ese id; uno que aún no está en el catálogo usa la zona y textos de RESPALDO."""
+    terminal = _por_id.get(id_terminal)
+    if terminal is None:
+        terminal = RESPALDO._replace(id=id_terminal, codigo=str(id_terminal))
+    return terminal
+
+
+def por_codigo(codigo):
+    """Terminal del código (sin él, TERMINAL_DEFECTO) o None si no existe."""
+    return _por_codigo.get((codigo or CODIGO_DEFECTO).strip().lower())
+
+
+def codigo_en_url(terminal):
+    """Código para ?terminal= en los enlaces públicos; None (sin parámetro) para el terminal por defecto."""
+    return None if terminal.codigo == CODIGO_DEFECTO else terminal.codigo
+
+
+# --- TERMINAL DE LA PETICIÓN (FLASK) ---
+
+def terminal_usuario():
+    """Terminal de la cuenta con sesión (operador y administración)."""
+    refrescar()
+    return por_id(current_user.terminal_id)
+
+
+def terminal_publico():
+    """Terminal de la pantalla o del dashboard público; 404 si el código no existe."""
+    refrescar()
+    codigo = request.args.get('terminal', '').strip()
+    if not codigo and current_user.is_authenticated:
+        return por_id(current_user.terminal_id)
+    terminal = por_codigo(codigo)
+    if terminal is None:
+        abort(404)
+    return terminal
@@ -0,0 +1,117 @@
+# CONFLICTOS DE ANDÉN (conflictos_anden.py)
+# Intervalos de ocupación por tipo y el barrido por andén, con filas como
+# las de Repositorio.ocupacion_andenes: (tipo, id, fecha, hora, empresa, lugar, anden).
+import datetime
+from itertools import combinations
+
+import conflictos_anden
+from conflictos_anden import buscar_conflictos, detectar, ocupacion
+
+DIA = datetime.date(2026, 3, 10)
+# Permanencias redondas para leer los intervalos de memoria
+PERMANENCIAS = {('salidas', ''): 20, ('llegadas', ''): 10, ('salidas', 'LENTA'): 40}
+
+
+def _ocupacion(tipo, id_recorrido, hora, anden=1, empresa='BUSES X', fecha=DIA):
+    fila = (tipo, id_recorrido, fecha, datetime.time.fromisoformat(hora), empresa, 'LUGAR', anden)
+    return ocupacion(fila, PERMANENCIAS)
+
+
+def _pares(conflictos):
+    return sorted(tuple(sorted((c.a.id, c.b.id))) for c in conflictos)
+
+
+def _momento(hora, fecha=DIA):
+    return datetime.datetime.combine(fecha, datetime.time.fromisoformat(hora))
+
+
+# --- INTERVALOS ---
+
+def test_salida_ocupa_antes_y_llegada_despues():
+    salida = _ocupacion('salidas', 1, '10:00')
+    llegada = _ocupacion('llegadas', 2, '10:00')
+    assert (salida.inicio, salida.fin) == (_momento('09:40'), _momento('10:00'))
+    assert (llegada.inicio, llegada.fin) == (_momento('10:00'), _momento('10:10'))
+    # Una sale a las 10:00 y la otra llega a las 10:00: se tocan, no se solapan
+    assert buscar_conflictos([salida, llegada]) == []
+
+
+def test_permanencia_por_empresa_y_por_defecto():
+    assert _ocupacion('salidas', 1, '10:00', empresa='LENTA').inicio == _momento('09:20')
+    sin_fila = ocupacion(('llegadas', 1, DIA, datetime.time(10), 'X', 'L', 1), {})
+    assert sin_fila.fin == _momento('10:00') + datetime.timedelta(
+        minutes=conflictos_anden.PERMANENCIA_DEFECTO['llegadas'])
+
+
+# --- BARRIDO ---
+
+def test_intervalos_que_se_tocan_no_son_conflicto():
+    a = _ocupacion('llegadas', 1, '10:00')   # 10:00-10:10
+    b = _ocupacion('llegadas', 2, '10:10')   # 10:10-10:20
+    assert buscar_conflictos([b, a]) == []
+
+
+def test_llegada_durante_la_carga_de_una_salida():
+    salida = _ocupacion('salidas', 1, '10:30')    # 10:10-10:30
+    llegada = _ocupacion('llegadas', 2, '10:05')  # 10:05-10:15
+    [conflicto] = buscar_conflictos([salida, llegada])
+    assert (conflicto.desde, conflicto.hasta) == (_momento('10:10'), _momento('10:15'))
+    assert (conflicto.a.id, conflicto.b.id) == (2, 1)
+
+
+def test_andenes_distintos_no_chocan():
+    ocupaciones = [_ocupacion('salidas', 1, '10:00', anden=1),
+                   _ocupacion('salidas', 2, '10:00', anden=2),
+                   _ocupacion('llegadas', 3, '09:45', anden=3)]
+    assert buscar_conflictos(ocupaciones) == []
+
+
+def test_tres_o_mas_buses_a_la_vez_dan_todos_los_pares():
+    ocupaciones = [_ocupacion('salidas', 1, '10:00'),    # 09:40-10:00
+                   _ocupacion('salidas', 2, '10:05'),    # 09:45-10:05
+                   _ocupacion('llegadas', 3, '09:50'),   # 09:50-10:00
+                   _ocupacion('llegadas', 4, '09:55'),   # 09:55-10:05
+                   _ocupacion('llegadas', 5, '10:05')]   # 10:05-10:15: solo toca a 2 y 4
+    conflictos = buscar_conflictos(ocupaciones)
+    assert len(conflictos) == 6
+    assert _pares(conflictos) == list(combinations([1, 2, 3, 4], 2))
+    assert [c.desde for c in conflictos] == sorted(c.desde for c in conflictos)
+
+
+def test_barrido_igual_a_comparar_todos_los_pares():
+    horas = ['08:00', '08:07', '08:15', '08:20', '08:21', '08:40', '08:55', '09:00', '09:02', '09:30']
+    ocupaciones = [_ocupacion('salidas' if i % 2 else 'llegadas', i, hora, anden=i % 3)
+                   for i, hora in enumerate(horas)]
+    esperados = sorted(tuple(sorted((a.id, b.id))) for a, b in combinations(ocupaciones, 2)
+                       if a.anden == b.anden and a.inicio < b.fin and b.inicio < a.fin)
+    assert _pares(buscar_conflictos(ocupaciones)) == esperados
+
+
+# --- MEDIANOCHE ---
+
+class _RepoFalso:
+
+    def __init__(self, filas):
+        self.filas = filas
+        self.rango = None
+
+    def permanencias_anden(self):
+        return PERMANENCIAS
+
+    def ocupacion_andenes(self, terminal_id, desde, hasta):
+        self.rango = (desde, hasta)
+        return [f for f in self.filas if desde <= f[2] <= hasta]
+
+
+def test_llegada_de_la_noche_choca_con_salida_de_la_madrugada():
+    manana = DIA + datetime.timedelta(days=1)
+    llegada = ('llegadas', 1, DIA, datetime.time(23, 55), 'X', 'L', 1)     # 23:55-00:05
+    salida = ('salidas', 2, manana, datetime.time(0, 20), 'Y', 'L', 1)     # 00:00-00:20
+    repo = _RepoFalso([llegada, salida])
+
+    [conflicto] = detectar(repo, 1, manana, manana)
+    assert repo.rango == (DIA, manana + datetime.timedelta(days=1))
+    assert (conflicto.desde, conflicto.hasta) == (_momento('00:00', manana), _momento('00:05', manana))
+
+    # El solape cae después de la medianoche: revisar solo el día anterior no lo muestra
+    assert detectar(repo, 1, DIA, DIA) == []
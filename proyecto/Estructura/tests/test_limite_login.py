@@ -0,0 +1,150 @@
+# LÍMITE DE INTENTOS DE LOGIN (limite_login.py)
+# Transiciones del balde de fichas y de la espera exponencial con un reloj
+# fijo, y el backend en memoria a través de la API que usa /login.
+import pytest
+
+import limite_login
+from limite_login import _consumir, _estado_nuevo, _exito, _fallo
+
+CFG = {'capacidad': 3, 'recarga_seg': 10.0, 'umbral_fallos': 2}
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Reloj manual para BackendMemoria (time.time)."""
+    class Reloj:
+        ahora = 1000.0
+    monkeypatch.setattr(limite_login.time, 'time', lambda: Reloj.ahora)
+    monkeypatch.setattr(limite_login, '_backend', limite_login.BackendMemoria())
+    return Reloj
+
+
+# --- BALDE DE FICHAS ---
+
+def test_consumir_hasta_vaciar_el_balde():
+    estado = _estado_nuevo(CFG, 0.0)
+    for _ in range(CFG['capacidad']):
+        estado, espera = _consumir(estado, CFG, 0.0)
+        assert espera == 0
+    estado, espera = _consumir(estado, CFG, 0.0)
+    assert espera == pytest.approx(CFG['recarga_seg'])
+    assert estado['tokens'] == pytest.approx(0)
+
+
+def test_el_balde_se_recarga_con_el_tiempo():
+    estado = _estado_nuevo(CFG, 0.0)
+    for _ in range(CFG['capacidad']):
+        estado, _ = _consumir(estado, CFG, 0.0)
+    # Media ficha recargada: falta la otra mitad
+    estado, espera = _consumir(estado, CFG, 5.0)
+    assert espera == pytest.approx(5.0)
+    estado, espera = _consumir(estado, CFG, 10.0)
+    assert espera == 0
+
+
+def test_la_recarga_no_pasa_de_la_capacidad():
+    estado = _estado_nuevo(CFG, 0.0)
+    estado, _ = _consumir(estado, CFG, 0.0)
+    estado, _ = _consumir(estado, CFG, 10_000.0)
+    assert estado['tokens'] == pytest.approx(CFG['capacidad'] - 1)
+
+
+# --- ESPERA EXPONENCIAL ---
+
+def test_bloqueo_desde_el_umbral_y_espera_que_se_duplica():
+    estado = _estado_nuevo(CFG, 0.0)
+    estado, _ = _fallo(estado, CFG, 0.0)
+    assert estado['bloqueado_hasta'] == 0.0
+
+    estado, _ = _fallo(estado, CFG, 1.0)
+    assert estado['bloqueado_hasta'] == pytest.approx(1.0 + limite_login.ESPERA_BASE_SEG)
+    estado, _ = _fallo(estado, CFG, 2.0)
+    assert estado['bloqueado_hasta'] == pytest.approx(2.0 + 2 * limite_login.ESPERA_BASE_SEG)
+    estado, _ = _fallo(estado, CFG, 3.0)
+    assert estado['bloqueado_hasta'] == pytest.approx(3.0 + 4 * limite_login.ESPERA_BASE_SEG)
+
+
+def test_bloqueado_rechaza_sin_gastar_fichas():
+    estado = _estado_nuevo(CFG, 0.0)
+    estado['bloqueado_hasta'] = 30.0
+    estado, espera = _consumir(estado, CFG, 10.0)
+    assert espera == pytest.approx(20.0)
+    assert estado['tokens'] == CFG['capacidad']
+
+
+def test_la_espera_tiene_tope(monkeypatch):
+    monkeypatch.setattr(limite_login, 'ESPERA_MAX_SEG', 60.0)
+    estado = _estado_nuevo(CFG, 0.0)
+    for i in range(40):
+        estado, _ = _fallo(estado, CFG, float(i))
+    assert estado['bloqueado_hasta'] == pytest.approx(39.0 + 60.0)
+
+
+def test_fallos_fuera_de_la_ventana_no_cuentan():
+    estado = _estado_nuevo(CFG, 0.0)
+    estado, _ = _fallo(estado, CFG, 0.0)
+    estado, _ = _fallo(estado, CFG, limite_login.VENTANA_FALLOS_SEG + 1)
+    assert estado['fallos'] == 1
+    assert estado['bloqueado_hasta'] == 0.0
+
+
+def test_exito_limpia_fallos_y_bloqueo():
+    estado = _estado_nuevo(CFG, 0.0)
+    for i in range(3):
+        estado, _ = _fallo(estado, CFG, float(i))
+    estado, _ = _exito(estado, CFG, 3.0)
+    assert estado['fallos'] == 0
+    assert estado['bloqueado_hasta'] == 0.0
+
+
+# --- API DE /login CON EL BACKEND EN MEMORIA ---
+
+def test_fallos_seguidos_bloquean_el_rut(reloj):
+    umbral = limite_login.LIMITES['rut']['umbral_fallos']
+    for _ in range(umbral):
+        assert limite_login.verificar_intento('1-9', '10.0.0.1') == (True, 0)
+        limite_login.registrar_fallo('1-9', '10.0.0.1')
+
+    permitido, espera = limite_login.verificar_intento('1-9', '10.0.0.1')
+    assert not permitido
+    assert espera == int(limite_login.ESPERA_BASE_SEG) + 1
+    # Otro RUT desde la misma IP sigue entrando
+    assert limite_login.verificar_intento('2-7', '10.0.0.1') == (True, 0)
+
+    reloj.ahora += limite_login.ESPERA_BASE_SEG
+    assert limite_login.verificar_intento('1-9', '10.0.0.1') == (True, 0)
+
+
+def test_exito_no_perdona_los_fallos_de_la_ip(reloj):
+    limite_login.registrar_fallo('1-9', '10.0.0.1')
+    limite_login.registrar_exito('1-9', '10.0.0.1')
+    assert limite_login._backend.estados['rut:1-9']['fallos'] == 0
+    assert limite_login._backend.estados['ip:10.0.0.1']['fallos'] == 1
+
+
+def test_cada_ip_tiene_su_balde(reloj):
+    capacidad = limite_login.LIMITES['ip']['capacidad']
+    for i in range(capacidad):
+        assert limite_login.verificar_intento(f'{i}-0', '10.0.0.1')[0]
+    assert not limite_login.verificar_intento('x-0', '10.0.0.1')[0]
+    assert limite_login.verificar_intento('x-0', '10.0.0.2')[0]
+
+
+# --- IP DEL CLIENTE DETRÁS DEL PROXY (PROXY_SALTOS) ---
+
+@pytest.mark.parametrize('saltos, ip_esperada', [(1, '203.0.113.7'), (0, '127.0.0.1')])
+def test_ip_del_limite_detras_de_nginx(monkeypatch, saltos, ip_esperada):
+    import app as modulo_app
+    vistas = []
+
+    def verificar(rut, ip):
+        vistas.append(ip)
+        return False, 5
+    monkeypatch.setattr(modulo_app, 'verificar_intento', verificar)
+
+    aplicacion = modulo_app.create_app({'PROXY_SALTOS': saltos, 'SECRET_KEY': 'pruebas', 'TESTING': True})
+    respuesta = aplicacion.test_client().post('/login', data={'rut': '1-9', 'password': 'x'},
+                                              headers={'X-Forwarded-For': '203.0.113.7'},
+                                              environ_base={'REMOTE_ADDR': '127.0.0.1'})
+    assert respuesta.status_code == 429
+    assert vistas == [ip_esperada]
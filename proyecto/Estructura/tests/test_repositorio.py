@@ -0,0 +1,158 @@
+# REPOSITORIO (repositorio.py) SOBRE SQLITE EN MEMORIA
+# El mismo SQL de Postgres pasa por traducir_sql: si una consulta usa algo
+# que la traducción no cubre, falla aquí antes que en un kiosco.
+import datetime
+
+import pytest
+
+from repositorio import RepositorioSqlite, paginar_por_tipo, traducir_sql
+
+HOY = datetime.date(2026, 3, 10)
+MANANA = HOY + datetime.timedelta(days=1)
+
+
+def _hora(texto):
+    return datetime.time.fromisoformat(texto)
+
+
+@pytest.fixture
+def repo():
+    repo = RepositorioSqlite(':memory:')
+    with repo._cursor(escribir=True) as cur:
+        cur.execute("INSERT INTO terminales (id, codigo, nombre, bienvenida) VALUES (2, 'otro', 'Otro', 'Hola')")
+        cur.execute("INSERT INTO usuarios (id, username, rut, password, rol) VALUES (7, 'ana', '1-9', 'x', 'operador')")
+        cur.execute("INSERT INTO buses_permitidos (patente, empresa) VALUES ('ABCD12', 'Buses Sur')")
+    return repo
+
+
+def _salidas(repo, terminal_id=1):
+    return repo.insertar_recorridos(terminal_id, 'salidas', [
+        ('Coyhaique', _hora('08:00'), 1, 'Buses Sur', HOY),
+        ('Aysén', _hora('09:30'), 2, 'Buses Norte', HOY),
+        ('Aysén', _hora('23:10'), 2, 'Buses Norte', HOY),
+        ('Cochrane', _hora('03:00'), 3, 'Buses Sur', MANANA),
+        ('Cochrane', _hora('06:00'), 3, 'Buses Sur', MANANA),
+    ])
+
+
+# --- TRADUCCIÓN DEL SQL ---
+
+def test_traducir_parametros_posicionales_y_nombrados():
+    assert traducir_sql("SELECT * FROM t WHERE a = %s AND b = %s") == "SELECT * FROM t WHERE a = ? AND b = ?"
+    assert traducir_sql("WHERE fecha BETWEEN %(inicio)s AND %(fin)s") == "WHERE fecha BETWEEN :inicio AND :fin"
+
+
+def test_traducir_quita_casts_y_cambia_ilike():
+    assert traducir_sql("SELECT SUM(c)::int, hora::text FROM t") == "SELECT SUM(c), hora FROM t"
+    assert traducir_sql("WHERE lugar ILIKE %s") == "WHERE lugar LIKE ?"
+    assert traducir_sql("WHERE lugar LIKE 'A%%'") == "WHERE lugar LIKE 'A%'"
+
+
+# --- IMPORTACIÓN ---
+
+def test_insertar_recorridos_omite_duplicados_y_crea_maestros(repo):
+    assert _salidas(repo) == 5
+    assert _salidas(repo) == 0
+    # El mismo recorrido en otro terminal no es duplicado
+    assert _salidas(repo, terminal_id=2) == 5
+    assert repo.nombres_maestro('empresa') == ['Buses Norte', 'Buses Sur']
+    assert repo.nombres_maestro('lugar') == ['Aysén', 'Cochrane', 'Coyhaique']
+
+
+def test_insertar_recorridos_cuenta_solo_las_nuevas(repo):
+    _salidas(repo)
+    nuevas = [('Coyhaique', _hora('08:00'), 1, 'Buses Sur', HOY),
+              ('Coyhaique', _hora('12:00'), 1, 'Buses Sur', HOY),
+              ('Coyhaique', _hora('12:00'), 1, 'Buses Sur', HOY)]
+    assert repo.insertar_recorridos(1, 'salidas', nuevas) == 1
+
+
+# --- PANTALLA ---
+
+def test_pizarra_desde_la_hora_limite_mas_madrugada(repo):
+    _salidas(repo)
+    repo.insertar_recorridos(1, 'llegadas', [('Aysén', _hora('10:00'), 4, 'Buses Norte', HOY)])
+    _salidas(repo, terminal_id=2)
+
+    pizarra = repo.pizarra(1, HOY, MANANA, _hora('09:00'))
+    assert [(f[1], f[3]) for f in pizarra['salidas']] == [
+        (_hora('09:30'), 'Aysén'), (_hora('23:10'), 'Aysén'), (_hora('03:00'), 'Cochrane')]
+    assert [f[1] for f in pizarra['llegadas']] == [_hora('10:00')]
+    # Fechas y horas vuelven como date/time, igual que con psycopg2
+    assert pizarra['salidas'][-1][5] == MANANA
+
+
+def test_pizarra_sin_hora_limite_trae_todo_el_dia(repo):
+    _salidas(repo)
+    pizarra = repo.pizarra(1, HOY.isoformat(), MANANA.isoformat())
+    assert len(pizarra['salidas']) == 4
+
+
+# --- DASHBOARD ---
+
+def test_buscar_recorridos_pagina_y_totales(repo):
+    _salidas(repo)
+    resultado = repo.buscar_recorridos(1, {'fecha': HOY.isoformat()}, limite=2, offset=1)
+    total, filas = resultado['salidas']
+    assert total == 3
+    assert [f[1] for f in filas] == [_hora('09:30'), _hora('23:10')]
+    assert resultado['llegadas'] == (0, [])
+
+
+def test_buscar_recorridos_filtros(repo):
+    _salidas(repo)
+    assert repo.buscar_recorridos(1, {'hora': '09'}, 10, 0)['salidas'][0] == 1
+    assert repo.buscar_recorridos(1, {'anden': '3'}, 10, 0)['salidas'][0] == 2
+    assert repo.buscar_recorridos(1, {'empresa': 'Buses Norte', 'lugar': 'Aysén'}, 10, 0)['salidas'][0] == 2
+    # Un andén que no es número no filtra
+    assert repo.buscar_recorridos(1, {'anden': 'x'}, 10, 0)['salidas'][0] == 5
+    assert repo.buscar_recorridos(2, {}, 10, 0)['salidas'] == (0, [])
+
+
+def test_paginar_por_tipo_usa_n1_solo_para_el_total():
+    filas = [('llegadas', 4, 1, 'a'), ('llegadas', 4, 3, 'c'), ('salidas', 1, 1, 'x')]
+    resultado = paginar_por_tipo(filas, limite=2, offset=2)
+    assert resultado == {'llegadas': (4, [('c',)]), 'salidas': (1, [])}
+
+
+# --- VERIFICACIONES ---
+
+def _id_salida(repo, hora):
+    with repo._cursor() as cur:
+        cur.execute("SELECT id FROM import_salidas WHERE terminal_id = 1 AND hora = %s", (_hora(hora),))
+        return cur.fetchone()[0]
+
+
+def test_registrar_verificacion(repo):
+    _salidas(repo)
+    id_recorrido = _id_salida(repo, '08:00')
+
+    resultado = repo.registrar_verificacion(1, id_recorrido, 'salidas', 7, 'ABCD12', '1', 'ok', HOY, _hora('08:05'))
+    assert resultado == {'resultado': 'registrado', 'patente_valida': True,
+                         'anden_correcto': True, 'anden_programado': '1'}
+    assert repo.recorridos_del_dia(1, HOY, MANANA)[0][6] == 'En Andén'
+    assert repo.resumen_verificaciones(1, HOY, HOY) == [('ABCD12', 'Buses Sur', 'SI', 1, 1, 0)]
+
+    repetido = repo.registrar_verificacion(1, id_recorrido, 'salidas', 7, 'ZZZZ99', '2', '', HOY, _hora('08:10'))
+    assert repetido == {'resultado': 'ya_registrado', 'patente': 'ABCD12', 'fecha': HOY, 'hora': _hora('08:05')}
+
+
+def test_registrar_verificacion_anden_y_patente_incorrectos(repo):
+    _salidas(repo)
+    resultado = repo.registrar_verificacion(1, _id_salida(repo, '09:30'), 'salidas', 7, 'ZZZZ99', '5', '',
+                                            HOY, _hora('09:31'))
+    assert (resultado['patente_valida'], resultado['anden_correcto']) == (False, False)
+
+
+def test_registrar_verificacion_de_otro_terminal(repo):
+    _salidas(repo)
+    resultado = repo.registrar_verificacion(2, _id_salida(repo, '08:00'), 'salidas', 7, 'ABCD12', '1', '',
+                                            HOY, _hora('08:05'))
+    assert resultado == {'resultado': 'no_encontrado'}
+
+
+# --- USUARIOS ---
+
+def test_usuario_por_id(repo):
+    assert repo.usuario_por_id(7) == (7, 'ana', 'x', 'operador', True, 1)
+    assert repo.usuario_por_id(99) is None
@@ -0,0 +1,13 @@
+# PRESUPUESTO DE ARRANQUE (benchmarks/tiempo_importacion.py)
+# Importar wsgi en un proceso nuevo: tiempo (mediana), RSS máximo y ningún
+# módulo pesado cargado al arrancar. Presupuestos por IMPORTACION_PRESUPUESTO_MS
+# e IMPORTACION_PRESUPUESTO_RSS_MB.
+import pytest
+
+from tiempo_importacion import revisar
+
+
+@pytest.mark.lento
+def test_arranque_de_la_app_dentro_del_presupuesto():
+    resultado = revisar('wsgi', repeticiones=3)
+    assert not resultado['fallas'], "\n".join(resultado['fallas'])
@@ -0,0 +1,57 @@
+# COPIA LOCAL DE BOOTSTRAP E ÍCONOS (static/vendor)
+# Descarga las mismas versiones que se usaban desde el CDN (fijadas en
+# compresion.VENDOR), para que las pantallas de TV no dependan de internet.
+# Se baja sola al desplegar, solo lo que falte:
+#   - gunicorn.conf.py (on_starting): en el maestro, antes de los workers.
+#   - sincronizar_kiosco.py: en cada sincronización del kiosco, que es el
+#     que después queda sin red.
+# Mientras un archivo no esté, las plantillas usan el CDN (compresion.vendor).
+# A mano (por ejemplo en la imagen del servidor):
+#   python vendor_estaticos.py
+#   python vendor_estaticos.py --forzar     (vuelve a descargar todo)
+import argparse
+import os
+import sys
+import urllib.request
+
+from compresion import VENDOR
+
+CARPETA_STATIC = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+# Al arrancar sin red no se espera más que esto por archivo
+ESPERA_SEG = float(os.getenv("VENDOR_ESPERA_SEG", "10"))
+
+
+def descargar(forzar=False, espera=ESPERA_SEG):
+    """Baja cada archivo de VENDOR que falte; devuelve los que fallaron."""
+    fallidos = []
+    for nombre, (ruta, url) in VENDOR.items():
+        destino = os.path.join(CARPETA_STATIC, ruta)
+        if os.path.isfile(destino) and not forzar:
+            print(f"{nombre:<26}ya está")
+            continue
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        try:
+            with urllib.request.urlopen(url, timeout=espera) as respuesta:
+                datos = respuesta.read()
+        except OSError as e:
+            print(f"{nombre:<26}ERROR {e}")
+            fallidos.append(nombre)
+            continue
+        # Escritura atómica: un archivo a medias nunca queda como "ya está"
+        with open(f"{destino}.tmp", 'wb') as f:
+            f.write(datos)
+        os.replace(f"{destino}.tmp", destino)
+        print(f"{nombre:<26}{len(datos):>9} bytes")
+    return fallidos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Descarga Bootstrap y sus íconos a static/vendor.")
+    parser.add_argument('--forzar', action='store_true', help="Descarga aunque el archivo ya exista")
+    args = parser.parse_args()
+    if descargar(args.forzar, espera=30):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
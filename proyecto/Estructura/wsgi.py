@@ -0,0 +1,6 @@
+# PUNTO DE ENTRADA WSGI PARA PRODUCCIÓN
+#   gunicorn -c gunicorn.conf.py wsgi:app
+# (en desarrollo se sigue usando: python app.py)
+from app import create_app
+
+app = create_app()